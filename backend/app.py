@@ -1,17 +1,27 @@
 import eventlet
 eventlet.monkey_patch()
 
-from flask import Flask, jsonify
-from flask_cors import CORS
-from flask_socketio import SocketIO
+from flask import jsonify
+from flask_socketio import SocketIO, emit
+from src.app import create_app
 from src.database.db import initialize_db
-from src.routes.sales import sales_bp
-from src.routes.analytics import analytics_bp
-from src.routes.dashboard import dashboard_bp
-from src.routes.reports import reports_bp
+from src.routes.realtime import register_realtime_handlers
+from src.controllers.schedule_controller import get_scheduler
 import ssl
 
-app = Flask(__name__)
+# The API itself (blueprints, health, docs, metrics and admin routes) comes from
+# create_app(), so this server and the tests serve the same routes
+app = create_app(cors_options={
+    "resources": {
+        r"/*": {  # Allow CORS for all routes
+            "origins": ["https://localhost:3000"],
+            "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+            "allow_headers": ["Content-Type", "Authorization"],
+            "supports_credentials": True,
+            "expose_headers": ["Content-Type", "Authorization"]
+        }
+    }
+})
 
 # Configure Socket.IO with CORS settings
 socketio = SocketIO(
@@ -24,35 +34,22 @@ socketio = SocketIO(
     engineio_logger=True  # Enable Engine.IO logging
 )
 
-# Configure CORS to allow requests from frontend
-CORS(app, resources={
-    r"/*": {  # Allow CORS for all routes
-        "origins": ["https://localhost:3000"],
-        "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"],
-        "supports_credentials": True,
-        "expose_headers": ["Content-Type", "Authorization"]
-    }
-})
-
-# Register blueprints
-app.register_blueprint(sales_bp, url_prefix='/api/sales')
-app.register_blueprint(analytics_bp, url_prefix='/api/analytics')
-app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
-app.register_blueprint(reports_bp, url_prefix='/api/reports')
-
 @app.route('/')
 def home():
     return jsonify({"message": "Retail Analytics API"})
 
+# KPI subscriptions: clients join dashboard/store/region rooms and receive
+# throttled deltas when the data changes (see src/routes/realtime.py)
+kpi_broadcaster = register_realtime_handlers(socketio)
+
+@app.route('/health/realtime')
+def realtime_health():
+    return jsonify({"status": "success", "data": kpi_broadcaster.stats()})
+
 @socketio.on('connect')
 def handle_connect():
     print('Client connected')
-    socketio.emit('connection_status', {'status': 'connected'})
-
-@socketio.on('disconnect')
-def handle_disconnect():
-    print('Client disconnected')
+    emit('connection_status', {'status': 'connected'})
 
 @socketio.on('message')
 def handle_message(message):
@@ -62,6 +59,12 @@ def handle_message(message):
 if __name__ == '__main__':
     # Initialize database
     initialize_db()
+
+    # Start pushing KPI updates to subscribed rooms
+    kpi_broadcaster.start()
+
+    # Run scheduled reports (see src/controllers/schedule_controller.py)
+    get_scheduler().start()
     
     # Create SSL context
     # context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
@@ -0,0 +1,116 @@
+"""Query plan audit of every endpoint.
+
+Drives every GET route registered by ``create_app()`` through the Flask test
+client on a synthetic database, explains each distinct statement an
+endpoint runs (``src.database.query_plans``) and prints, per endpoint, the
+SCAN and SEARCH steps, temp B-trees and estimated rows of its statements.
+Exits non-zero when a statement reads ``sales`` without an index, unless
+the same statement is in the ``--baseline`` of a previous run.
+
+Usage:
+    python -m benchmarks.audit_queries --scale small --output plans.json
+    python -m benchmarks.audit_queries --scale medium --baseline plans.json --verbose
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+from typing import Dict, List, Optional
+
+from benchmarks.bench_endpoints import SCALES, build_database, discover_requests
+from src.app import create_app
+from src.database import db
+from src.database.query_plans import QueryAudit
+from src.utils.cache import response_cache
+
+
+def run(scale: str, data_dir: str, seed: int = 42) -> QueryAudit:
+    """Request every GET route once and explain the statements it runs"""
+    original_path = db.DB_PATH
+    audit = QueryAudit()
+    try:
+        db.DB_PATH = build_database(scale, data_dir, seed)
+        app = create_app()
+        client = app.test_client()
+        urls, _ = discover_requests(app)
+        with audit.capture():
+            for url in urls:
+                # Cached responses run no SQL
+                response_cache.clear()
+                client.get(url).close()
+    finally:
+        db.DB_PATH = original_path
+    return audit
+
+
+def new_violations(audit: QueryAudit, baseline: Optional[Dict] = None) -> List[Dict]:
+    """Unindexed scans of the audited table not already in a baseline report"""
+    known = set()
+    for endpoint, statements in (baseline or {}).get("endpoints", {}).items():
+        known.update((endpoint, entry["sql"]) for entry in statements if entry["unindexed"])
+    return [
+        entry
+        for entry in audit.unindexed_scans()
+        if (entry["endpoint"], entry["sql"]) not in known
+    ]
+
+
+def print_report(audit: QueryAudit, verbose: bool = False):
+    """Summarize the plans per endpoint; plans are shown for scans and temp B-trees"""
+    for endpoint, statements in sorted(audit.report().items()):
+        scans = sum(entry["scans"] for entry in statements)
+        searches = sum(entry["searches"] for entry in statements)
+        btrees = sum(entry["temp_btrees"] for entry in statements)
+        rows = sum(entry["estimated_rows"] or 0 for entry in statements)
+        print(
+            f"{endpoint}: {len(statements)} statements, {scans} scans, {searches} searches, "
+            f"{btrees} temp b-trees, ~{rows:,} rows"
+        )
+        for entry in statements:
+            if not (verbose or entry["scans"] or entry["temp_btrees"] or entry["error"]):
+                continue
+            print(f"    {entry['sql'][:120]}")
+            if entry["error"]:
+                print(f"        ERROR {entry['error']}")
+            for step in entry["plan"]:
+                estimate = step.get("estimated_rows")
+                suffix = f"  (~{estimate:,} rows)" if estimate is not None else ""
+                print(f"        {step['detail']}{suffix}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Audit the query plans of every API endpoint")
+    parser.add_argument("--scale", default="small", choices=list(SCALES))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "retail_bench"))
+    parser.add_argument("--output", help="write the audit to this JSON file")
+    parser.add_argument("--baseline", help="tolerate unindexed scans already in this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="show every plan")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    audit = run(args.scale, args.data_dir, args.seed)
+    print_report(audit, args.verbose)
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({"scale": args.scale, "endpoints": audit.report()}, output, indent=2)
+        print(f"Audit written to {args.output}")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    violations = new_violations(audit, baseline)
+    for entry in violations:
+        print(
+            f"UNINDEXED SCAN of {audit.table} in {entry['endpoint']}: {entry['sql']}",
+            file=sys.stderr,
+        )
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,378 @@
+"""Endpoint benchmark suite.
+
+Builds synthetic databases at several scale factors, drives every GET route
+registered by ``create_app()`` through the Flask test client and reports, per
+endpoint, p50/p95/p99 latency, SQL statements per request and peak Python
+memory. Route arguments are filled from rows of the benchmark database (a
+report and a paused schedule are added for the report routes); streamed
+bodies are read to the end. Results are written as JSON; passing a previous
+run as ``--baseline`` exits non-zero when any endpoint regressed.
+
+Usage:
+    python -m benchmarks.bench_endpoints --scales small,medium --output bench.json
+    python -m benchmarks.bench_endpoints --scales small,medium --baseline bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.app import create_app
+from src.controllers.report_controller import ReportQueue, record_job
+from src.database import db
+from src.database.generator import load_synthetic_data
+from src.database.instrumentation import statement_listener
+from src.utils.cache import response_cache
+from src.utils.reports import render_report, update_job
+
+# Scale factors: stores x departments x years of weekly sales
+SCALES = {
+    "small": {"stores": 10, "departments": 10, "years": 2},
+    "medium": {"stores": 50, "departments": 40, "years": 3},
+    "large": {"stores": 200, "departments": 80, "years": 5},
+}
+
+# Extra query strings for routes whose interesting work depends on arguments.
+# Placeholders are filled from the benchmark date window.
+ROUTE_QUERIES = {
+    "/api/sales": ["", "store_id=1&start_date={start}&end_date={end}&limit=1000"],
+    "/api/sales/summary": [
+        "group_by=store",
+        "group_by=department&start_date={start}&end_date={end}",
+        "group_by=date&time_period=week",
+    ],
+    "/api/sales/holiday-comparison": ["year={year}", "year={year}&store_id=1"],
+    "/api/analytics/kpis": ["", "start_date={start}&end_date={end}&store_id=1"],
+    "/api/analytics/store-performance": ["year={year}"],
+    "/api/analytics/store-type-performance": ["year={year}"],
+    "/api/analytics/time-series": ["", "start_date={start}&end_date={end}"],
+    "/api/analytics/products/performance": ["start_date={start}&end_date={end}"],
+}
+
+# Sample values of route arguments, read from the benchmark database; routes
+# with an argument that has no sample are skipped
+ARGUMENT_QUERIES = {
+    "item_id": "SELECT MIN(dept_id) FROM departments",
+    "job_id": "SELECT MIN(job_id) FROM report_jobs WHERE status = 'completed'",
+    "schedule_id": "SELECT MIN(schedule_id) FROM report_schedules",
+}
+
+# Report rendered (and schedule added) so the report routes have a row to find
+FIXTURE_REPORT = {"report_type": "store_summary", "report_format": "csv", "filters": {}}
+
+# Regression rules: a metric regresses when it exceeds the baseline by this
+# factor *and* by the absolute noise floor
+DEFAULT_THRESHOLD = 1.25
+MIN_LATENCY_DELTA_MS = 2.0
+MIN_MEMORY_DELTA_KB = 256.0
+
+
+def build_database(scale: str, data_dir: str, seed: int) -> str:
+    """Create (or reuse) the synthetic database for a scale factor"""
+    spec = SCALES[scale]
+    path = os.path.join(
+        data_dir,
+        f"retail_{spec['stores']}x{spec['departments']}x{spec['years']}_s{seed}.db",
+    )
+    db.DB_PATH = path
+    if not os.path.exists(path):
+        conn = db.get_db_connection()
+        db.create_tables(conn)
+        rows = load_synthetic_data(conn, seed=seed, **spec)
+        conn.close()
+        print(f"Built {scale} dataset: {rows:,} sales rows -> {path}")
+    seed_fixtures(path)
+    return path
+
+
+def seed_fixtures(db_path: str):
+    """Add a completed report job and a schedule unless the database has them"""
+    conn = db.get_db_connection()
+    try:
+        if conn.execute(ARGUMENT_QUERIES["job_id"]).fetchone()[0] is None:
+            job_id = record_job(conn, "Benchmark report", **FIXTURE_REPORT)
+            path = ReportQueue(db_path).artifact_path(job_id, FIXTURE_REPORT["report_format"])
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Rendered in-process: the benchmark needs the file, not the pool
+            result = render_report(db_path, job_id, path=path, **FIXTURE_REPORT)
+            update_job(
+                conn,
+                job_id,
+                status="completed",
+                rows_written=result["rows"],
+                file_size=result["size"],
+                finished_at=datetime.now().isoformat(timespec="seconds"),
+            )
+        if conn.execute(ARGUMENT_QUERIES["schedule_id"]).fetchone()[0] is None:
+            now = datetime.now().isoformat(timespec="seconds")
+            conn.execute(
+                "INSERT INTO report_schedules (name, cron, report_type, format, filters, "
+                "next_run_at, created_at, enabled) VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                (
+                    "Benchmark schedule",
+                    "0 6 * * 1",
+                    FIXTURE_REPORT["report_type"],
+                    FIXTURE_REPORT["report_format"],
+                    json.dumps(FIXTURE_REPORT["filters"]),
+                    now,
+                    now,
+                ),
+            )
+            conn.commit()
+    finally:
+        conn.close()
+
+
+def sample_arguments() -> Dict[str, str]:
+    """Route argument values found in the current database"""
+    conn = db.get_db_connection()
+    try:
+        samples = {}
+        for name, query in ARGUMENT_QUERIES.items():
+            value = conn.execute(query).fetchone()[0]
+            if value is not None:
+                samples[name] = str(value)
+        return samples
+    finally:
+        conn.close()
+
+
+def discover_requests(app) -> Tuple[List[str], List[str]]:
+    """Return (urls to benchmark, rules skipped) for every registered route"""
+    today = datetime.now().date()
+    placeholders = {
+        "year": today.year,
+        "start": (today - timedelta(days=365)).isoformat(),
+        "end": today.isoformat(),
+    }
+
+    arguments = sample_arguments()
+    urls, skipped = [], []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+        if rule.endpoint == "static":
+            continue
+        if "GET" not in rule.methods:
+            skipped.append(f"{','.join(sorted(rule.methods - {'HEAD', 'OPTIONS'}))} {rule.rule}")
+            continue
+
+        missing = sorted(rule.arguments - set(arguments))
+        if missing:
+            skipped.append(f"GET {rule.rule} (no sample {', '.join(missing)})")
+            continue
+
+        base = _fill_arguments(rule.rule, arguments).rstrip("/") or "/"
+        if base in [url.split("?")[0] for url in urls]:
+            continue  # same view registered with and without a trailing slash
+        for query in ROUTE_QUERIES.get(base, [""]):
+            query = query.format(**placeholders)
+            urls.append(f"{base}?{query}" if query else base)
+    return urls, skipped
+
+
+def _fill_arguments(rule: str, arguments: Dict[str, str]) -> str:
+    """Replace every ``<converter:name>`` in a rule with the sample of ``name``"""
+    path = rule
+    while "<" in path:
+        start = path.index("<")
+        end = path.index(">", start)
+        name = path[start + 1:end].split(":")[-1]
+        path = path[:start] + arguments[name] + path[end + 1:]
+    return path
+
+
+def measure(client, url: str, iterations: int, warmup: int, cached: bool) -> Dict:
+    """Benchmark one URL and return its latency, SQL and memory metrics"""
+    statements = []
+    status = None
+
+    def request():
+        if not cached:
+            response_cache.clear()
+        # Streamed bodies are read to the end, so a request covers the whole
+        # response, and closed so their request contexts are torn down
+        response = client.get(url)
+        try:
+            response.get_data()
+        finally:
+            response.close()
+        return response
+
+    for _ in range(warmup):
+        request()
+
+    latencies = []
+    with statement_listener(statements.append):
+        for _ in range(iterations):
+            started = time.perf_counter()
+            response = request()
+            latencies.append((time.perf_counter() - started) * 1000)
+            status = response.status_code
+    sql_time = sum(event.duration for event in statements) * 1000
+
+    # Memory is traced in a separate pass so tracing does not skew latency
+    tracemalloc.start()
+    request()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "status": status,
+        "iterations": iterations,
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "mean_ms": round(float(np.mean(latencies)), 3),
+        "sql_statements": round(len(statements) / iterations, 2),
+        "sql_time_ms": round(sql_time / iterations, 3),
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+def run(
+    scales: List[str],
+    data_dir: str,
+    iterations: int = 20,
+    warmup: int = 2,
+    seed: int = 42,
+    cached: bool = False,
+) -> Dict:
+    """Benchmark every route at every requested scale"""
+    original_path = db.DB_PATH
+    results = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "iterations": iterations,
+            "cached": cached,
+            "seed": seed,
+        },
+        "scales": {},
+    }
+
+    try:
+        for scale in scales:
+            db.DB_PATH = build_database(scale, data_dir, seed)
+            app = create_app()
+            client = app.test_client()
+            urls, skipped = discover_requests(app)
+
+            endpoints = {}
+            for url in urls:
+                endpoints[url] = measure(client, url, iterations, warmup, cached)
+                print(
+                    f"[{scale}] {url}: p50 {endpoints[url]['p50_ms']}ms "
+                    f"p95 {endpoints[url]['p95_ms']}ms "
+                    f"sql {endpoints[url]['sql_statements']}"
+                )
+            results["scales"][scale] = {
+                "dataset": SCALES[scale],
+                "skipped": skipped,
+                "endpoints": endpoints,
+            }
+    finally:
+        db.DB_PATH = original_path
+    return results
+
+
+def compare(
+    results: Dict,
+    baseline: Dict,
+    threshold: float = DEFAULT_THRESHOLD,
+) -> List[str]:
+    """Return a description of every regression against a baseline run"""
+    regressions = []
+    for scale, current in results["scales"].items():
+        previous = baseline.get("scales", {}).get(scale)
+        if previous is None:
+            continue
+
+        for url, metrics in current["endpoints"].items():
+            before = previous["endpoints"].get(url)
+            if before is None:
+                continue
+            label = f"[{scale}] {url}"
+
+            if metrics["status"] >= 400 and before["status"] < 400:
+                regressions.append(f"{label}: status {before['status']} -> {metrics['status']}")
+            if metrics["sql_statements"] > before["sql_statements"]:
+                regressions.append(
+                    f"{label}: SQL statements {before['sql_statements']} -> "
+                    f"{metrics['sql_statements']}"
+                )
+            if _regressed(metrics["p95_ms"], before["p95_ms"], threshold, MIN_LATENCY_DELTA_MS):
+                regressions.append(
+                    f"{label}: p95 {before['p95_ms']}ms -> {metrics['p95_ms']}ms"
+                )
+            if _regressed(
+                metrics["peak_memory_kb"],
+                before["peak_memory_kb"],
+                threshold,
+                MIN_MEMORY_DELTA_KB,
+            ):
+                regressions.append(
+                    f"{label}: peak memory {before['peak_memory_kb']}KB -> "
+                    f"{metrics['peak_memory_kb']}KB"
+                )
+    return regressions
+
+
+def _regressed(current: float, previous: float, threshold: float, min_delta: float) -> bool:
+    return current > previous * threshold and current - previous > min_delta
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark every API endpoint")
+    parser.add_argument("--scales", default="small", help=f"comma-separated: {', '.join(SCALES)}")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "retail_bench"))
+    parser.add_argument("--cached", action="store_true", help="keep the response cache warm")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="fail if results regress against this JSON file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    scales = [scale.strip() for scale in args.scales.split(",") if scale.strip()]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"unknown scale(s): {', '.join(unknown)}")
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = run(scales, args.data_dir, args.iterations, args.warmup, args.seed, args.cached)
+
+    errors = [
+        f"[{scale}] {url}: status {metrics['status']}"
+        for scale, data in results["scales"].items()
+        for url, metrics in data["endpoints"].items()
+        if metrics["status"] >= 400
+    ]
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+        print(f"Results written to {args.output}")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+
+    for problem in errors + regressions:
+        print(f"REGRESSION {problem}", file=sys.stderr)
+    return 1 if errors or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
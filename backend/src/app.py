@@ -1,25 +1,49 @@
-from flask import Flask, jsonify
+from typing import Dict, Optional
+
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 
+from src.controllers.schedule_controller import get_scheduler
+from src.database.db import close_request_connections, get_pool_stats
+from src.database.slow_queries import SLOW_QUERY_KINDS, get_slow_query_log
 from src.routes.analytics import analytics_bp
+from src.routes.dashboard import dashboard_bp
+from src.routes.reports import reports_bp
 from src.routes.sales import sales_bp
-from src.utils.docs import ANALYTICS_DOCS, SALES_DOCS
+from src.utils.cache import response_cache
+from src.utils.docs import ANALYTICS_DOCS, REPORTS_DOCS, SALES_DOCS
 from src.utils.error_handlers import register_error_handlers
+from src.utils.metrics import PROMETHEUS_CONTENT_TYPE, register_metrics, request_metrics
+from src.utils.validation import format_response, validate_kind, validate_limit
+
 
+def create_app(cors_options: Optional[Dict] = None):
+    """Create and configure the Flask application.
 
-def create_app():
-    """Create and configure the Flask application"""
+    ``cors_options`` are passed to flask_cors; by default every origin is allowed.
+    """
     app = Flask(__name__)
 
     # Enable CORS
-    CORS(app)
+    CORS(app, **(cors_options or {}))
 
     # Register error handlers
     register_error_handlers(app)
 
+    # Per-endpoint latency, SQL and response size metrics
+    register_metrics(app)
+
+    # Log slow and sampled statements with their request and plan
+    get_slow_query_log()
+
+    # Return pooled connections a request did not close to the pool
+    app.teardown_appcontext(close_request_connections)
+
     # Register blueprints
     app.register_blueprint(sales_bp, url_prefix="/api/sales")
     app.register_blueprint(analytics_bp, url_prefix="/api/analytics")
+    app.register_blueprint(dashboard_bp, url_prefix="/api/dashboard")
+    app.register_blueprint(reports_bp, url_prefix="/api/reports")
 
     # API documentation endpoint
     @app.route("/api/docs")
@@ -28,7 +52,11 @@ def create_app():
         return jsonify(
             {
                 "status": "success",
-                "data": {"analytics": ANALYTICS_DOCS, "sales": SALES_DOCS},
+                "data": {
+                    "analytics": ANALYTICS_DOCS,
+                    "sales": SALES_DOCS,
+                    "reports": REPORTS_DOCS,
+                },
             }
         )
 
@@ -38,9 +66,44 @@ def create_app():
         """Health check endpoint"""
         return jsonify({"status": "success", "message": "Service is healthy"})
 
+    # Database connection pool metrics
+    @app.route("/health/db")
+    def db_health_check():
+        """Database connection pool metrics"""
+        return jsonify({"status": "success", "data": {"pool": get_pool_stats()}})
+
+    # Response cache metrics
+    @app.route("/health/cache")
+    def cache_health_check():
+        """Response cache metrics"""
+        return jsonify({"status": "success", "data": response_cache.stats()})
+
+    # Request metrics for Prometheus
+    @app.route("/metrics")
+    def metrics():
+        """Request metrics in the Prometheus text format"""
+        return Response(request_metrics.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+    # Recent slow and sampled statements
+    @app.route("/admin/slow-queries")
+    def slow_queries():
+        """Recent entries of the slow-query log, newest first"""
+        limit = validate_limit(request.args.get("limit"))
+        kind = validate_kind(request.args.get("kind"), SLOW_QUERY_KINDS)
+        slow_query_log = get_slow_query_log()
+        return jsonify(
+            format_response(
+                {
+                    "config": slow_query_log.stats(),
+                    "entries": slow_query_log.entries(limit, kind),
+                }
+            )
+        )
+
     return app
 
 
 if __name__ == "__main__":
     app = create_app()
+    get_scheduler().start()
     app.run(debug=True)
@@ -3,10 +3,38 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Union
 from dateutil.relativedelta import relativedelta
 
+import numpy as np
 import pandas as pd
 
-from src.database.db import get_db_connection, row_to_dict, rows_to_list
-from src.utils.validation import format_response
+from src.database.columnar import DEFAULT_QUERY_BACKEND
+from src.database.db import (fetch_columns, get_data_version,
+                             get_db_connection, get_query_snapshot,
+                             row_to_dict, rows_to_list, year_range)
+from src.database.rollups import rollup_source, weekly_panel
+from src.utils import seasonality
+from src.utils.cache import skip_caching
+from src.utils.validation import format_columnar_response, format_response
+
+# Departments listed per store by get_store_performance unless overridden
+TOP_DEPARTMENTS = 5
+
+# Arrow type of each column of the time series
+TIME_SERIES_COLUMN_TYPES = {
+    "date": "date32",
+    "total_sales": "float64",
+    "store_count": "int64",
+    "transaction_count": "int64",
+    "avg_sale": "float64",
+}
+
+
+def _query_snapshot(backend: str):
+    """Columnar copy for a query; answers from a copy still being refreshed
+    are not cached, as they would be stored under the new data version"""
+    snapshot = get_query_snapshot(backend)
+    if snapshot.version != get_data_version():
+        skip_caching()
+    return snapshot
 
 
 def get_kpis(
@@ -14,36 +42,40 @@ def get_kpis(
     end_date: Optional[str] = None,
     store_id: Optional[int] = None,
     dept_id: Optional[int] = None,
+    backend: Optional[str] = None,
 ) -> Dict:
-    """Get key performance indicators"""
+    """Get key performance indicators from SQLite or a columnar copy"""
+    backend = backend or DEFAULT_QUERY_BACKEND
+    if backend != "sqlite":
+        snapshot = _query_snapshot(backend)
+        kpis = snapshot.kpis(start_date, end_date, store_id, dept_id)
+        if start_date and end_date:
+            previous_kpis = snapshot.kpis(
+                *_previous_year(start_date, end_date), store_id, dept_id
+            )
+            kpis["sales_growth"] = _sales_growth(kpis, previous_kpis)
+        return format_response(kpis)
+
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    query = """
+    table, conditions, params = rollup_source(start_date, end_date)
+    query = f"""
     SELECT 
-        SUM(weekly_sales) as total_sales,
-        AVG(weekly_sales) as avg_weekly_sales,
-        COUNT(DISTINCT store_id || '-' || dept_id) as unique_combinations,
-        COUNT(*) as total_transactions
-    FROM sales
-    WHERE 1=1
+        SUM(r.total_sales) as total_sales,
+        SUM(r.total_sales) / SUM(r.sale_count) as avg_weekly_sales,
+        COUNT(DISTINCT r.store_id || '-' || r.dept_id) as unique_combinations,
+        COALESCE(SUM(r.sale_count), 0) as total_transactions
+    FROM {table} r
+    WHERE 1=1 {conditions}
     """
-    params = []
-
-    if start_date:
-        query += " AND date >= ?"
-        params.append(start_date)
-
-    if end_date:
-        query += " AND date <= ?"
-        params.append(end_date)
 
     if store_id:
-        query += " AND store_id = ?"
+        query += " AND r.store_id = ?"
         params.append(store_id)
 
     if dept_id:
-        query += " AND dept_id = ?"
+        query += " AND r.dept_id = ?"
         params.append(dept_id)
 
     cursor.execute(query, params)
@@ -51,107 +83,139 @@ def get_kpis(
 
     # Calculate year-over-year growth
     if start_date and end_date:
-        previous_start = (
-            datetime.strptime(start_date, "%Y-%m-%d") - timedelta(days=365)
-        ).strftime("%Y-%m-%d")
-        previous_end = (
-            datetime.strptime(end_date, "%Y-%m-%d") - timedelta(days=365)
-        ).strftime("%Y-%m-%d")
-
-        previous_query = """
+        previous_table, previous_conditions, previous_params = rollup_source(
+            *_previous_year(start_date, end_date)
+        )
+        previous_query = f"""
         SELECT 
-            SUM(weekly_sales) as total_sales
-        FROM sales
-        WHERE date >= ? AND date <= ?
+            SUM(r.total_sales) as total_sales
+        FROM {previous_table} r
+        WHERE 1=1 {previous_conditions}
         """
-        previous_params = [previous_start, previous_end]
         
         if store_id:
-            previous_query += " AND store_id = ?"
+            previous_query += " AND r.store_id = ?"
             previous_params.append(store_id)
         
         if dept_id:
-            previous_query += " AND dept_id = ?"
+            previous_query += " AND r.dept_id = ?"
             previous_params.append(dept_id)
             
         cursor.execute(previous_query, previous_params)
         previous_kpis = row_to_dict(cursor.fetchone())
-
-        if previous_kpis and previous_kpis["total_sales"]:
-            growth = (
-                (kpis["total_sales"] - previous_kpis["total_sales"])
-                / previous_kpis["total_sales"]
-                * 100
-            )
-            kpis["sales_growth"] = round(growth, 2)
-        else:
-            kpis["sales_growth"] = 0
+        kpis["sales_growth"] = _sales_growth(kpis, previous_kpis)
 
     conn.close()
     return format_response(kpis)
 
 
+def _previous_year(start_date: str, end_date: str):
+    """Shift an inclusive date range back by 365 days"""
+    return tuple(
+        (datetime.strptime(value, "%Y-%m-%d") - timedelta(days=365)).strftime("%Y-%m-%d")
+        for value in (start_date, end_date)
+    )
+
+
+def _sales_growth(kpis: Dict, previous_kpis: Optional[Dict]) -> float:
+    """Percentage change of total sales against the previous period"""
+    if previous_kpis and previous_kpis["total_sales"]:
+        growth = (
+            (kpis["total_sales"] - previous_kpis["total_sales"])
+            / previous_kpis["total_sales"]
+            * 100
+        )
+        return round(growth, 2)
+    return 0
+
+
 def get_store_performance(
     year: Optional[int] = None,
     store_id: Optional[int] = None,
     dept_id: Optional[int] = None,
+    top_departments: int = TOP_DEPARTMENTS,
 ) -> Dict:
-    """Get store performance metrics"""
+    """Get store performance metrics with each store's top departments"""
     conn = get_db_connection()
     cursor = conn.cursor()
 
     if not year:
         year = datetime.now().year
 
-    query = """
+    table, conditions, params = rollup_source(*year_range(year), end_exclusive=True)
+    store_conditions = ""
+    store_params = []
+    if store_id:
+        store_conditions = " AND r.store_id = ?"
+        store_params.append(store_id)
+
+    query = f"""
     SELECT 
-        s.store_id,
+        r.store_id,
         st.name as store_name,
         st.type as store_type,
-        COUNT(DISTINCT s.dept_id) as dept_count,
-        SUM(s.weekly_sales) as total_sales,
-        AVG(s.weekly_sales) as avg_sales,
-        COUNT(*) as transaction_count
-    FROM sales s
-    JOIN stores st ON s.store_id = st.store_id
-    WHERE strftime('%Y', s.date) = ?
+        COUNT(DISTINCT r.dept_id) as dept_count,
+        SUM(r.total_sales) as total_sales,
+        SUM(r.total_sales) / SUM(r.sale_count) as avg_sales,
+        SUM(r.sale_count) as transaction_count
+    FROM {table} r
+    JOIN stores st ON r.store_id = st.store_id
+    WHERE 1=1 {conditions} {store_conditions}
     """
-    params = [str(year)]
-
-    if store_id:
-        query += " AND s.store_id = ?"
-        params.append(store_id)
+    query_params = [*params, *store_params]
 
     if dept_id:
-        query += " AND s.dept_id = ?"
-        params.append(dept_id)
+        query += " AND r.dept_id = ?"
+        query_params.append(dept_id)
 
-    query += " GROUP BY s.store_id, st.name, st.type"
+    query += " GROUP BY r.store_id, st.name, st.type"
 
-    cursor.execute(query, params)
+    cursor.execute(query, query_params)
     performance = rows_to_list(cursor.fetchall())
 
-    # Get top departments for each store
-    result = []
-    for store in performance:
-        dept_query = """
+    # Top departments of every store in one grouped top-K pass; like the
+    # ranking itself this ignores the dept_id filter
+    dept_query = f"""
+    WITH dept_sales AS (
         SELECT 
+            r.store_id,
             d.dept_id,
             d.name as dept_name,
-            SUM(s.weekly_sales) as dept_sales
-        FROM sales s
-        JOIN departments d ON s.dept_id = d.dept_id
-        WHERE s.store_id = ? AND strftime('%Y', s.date) = ?
-        GROUP BY d.dept_id, d.name
-        ORDER BY dept_sales DESC
-        LIMIT 5
-        """
-        cursor.execute(dept_query, [store["store_id"], str(year)])
-        store["top_departments"] = rows_to_list(cursor.fetchall())
-        result.append(store)
-
+            SUM(r.total_sales) as dept_sales
+        FROM {table} r
+        JOIN departments d ON r.dept_id = d.dept_id
+        WHERE 1=1 {conditions} {store_conditions}
+        GROUP BY r.store_id, d.dept_id, d.name
+    ),
+    ranked AS (
+        SELECT 
+            *,
+            ROW_NUMBER() OVER (
+                PARTITION BY store_id ORDER BY dept_sales DESC, dept_id
+            ) as dept_rank
+        FROM dept_sales
+    )
+    SELECT store_id, dept_id, dept_name, dept_sales
+    FROM ranked
+    WHERE dept_rank <= ?
+    ORDER BY store_id, dept_rank
+    """
+    cursor.execute(dept_query, [*params, *store_params, top_departments])
+
+    top_by_store = {}
+    for row in cursor.fetchall():
+        top_by_store.setdefault(row["store_id"], []).append(
+            {
+                "dept_id": row["dept_id"],
+                "dept_name": row["dept_name"],
+                "dept_sales": row["dept_sales"],
+            }
+        )
     conn.close()
-    return format_response(result)
+
+    for store in performance:
+        store["top_departments"] = top_by_store.get(store["store_id"], [])
+    return format_response(performance)
 
 
 def get_store_type_performance(year: Optional[int] = None) -> Dict:
@@ -162,21 +226,22 @@ def get_store_type_performance(year: Optional[int] = None) -> Dict:
     if not year:
         year = datetime.now().year
 
-    query = """
+    table, conditions, params = rollup_source(*year_range(year), end_exclusive=True)
+    query = f"""
     SELECT 
         st.type as store_type,
-        COUNT(DISTINCT s.store_id) as store_count,
-        COUNT(DISTINCT s.dept_id) as dept_count,
-        SUM(s.weekly_sales) as total_sales,
-        AVG(s.weekly_sales) as avg_sales,
-        COUNT(*) as transaction_count
-    FROM sales s
-    JOIN stores st ON s.store_id = st.store_id
-    WHERE strftime('%Y', s.date) = ?
+        COUNT(DISTINCT r.store_id) as store_count,
+        COUNT(DISTINCT r.dept_id) as dept_count,
+        SUM(r.total_sales) as total_sales,
+        SUM(r.total_sales) / SUM(r.sale_count) as avg_sales,
+        SUM(r.sale_count) as transaction_count
+    FROM {table} r
+    JOIN stores st ON r.store_id = st.store_id
+    WHERE 1=1 {conditions}
     GROUP BY st.type
     """
 
-    cursor.execute(query, [str(year)])
+    cursor.execute(query, params)
     performance = rows_to_list(cursor.fetchall())
     conn.close()
 
@@ -184,39 +249,48 @@ def get_store_type_performance(year: Optional[int] = None) -> Dict:
 
 
 def get_time_series(
-    start_date: Optional[str] = None, end_date: Optional[str] = None
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    columnar: bool = False,
+    backend: Optional[str] = None,
 ) -> Dict:
-    """Get time series sales data"""
+    """Get time series sales data, as row objects or column arrays"""
+    backend = backend or DEFAULT_QUERY_BACKEND
+    if backend != "sqlite":
+        series = _query_snapshot(backend).time_series(start_date, end_date)
+        if columnar:
+            return format_columnar_response(series)
+        rows = zip(*(series["data"][name] for name in series["columns"]))
+        return format_response([dict(zip(series["columns"], row)) for row in rows])
+
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    query = """
+    # Daily points need the weekly rollup regardless of the date range
+    table, conditions, params = rollup_source(
+        start_date, end_date, allow_monthly=False
+    )
+    query = f"""
     SELECT 
-        date,
-        SUM(weekly_sales) as total_sales,
-        COUNT(DISTINCT store_id) as store_count,
-        COUNT(*) as transaction_count,
-        AVG(weekly_sales) as avg_sale
-    FROM sales
-    WHERE 1=1
+        r.date,
+        SUM(r.total_sales) as total_sales,
+        COUNT(DISTINCT r.store_id) as store_count,
+        SUM(r.sale_count) as transaction_count,
+        SUM(r.total_sales) / SUM(r.sale_count) as avg_sale
+    FROM {table} r
+    WHERE 1=1 {conditions}
     """
-    params = []
-
-    if start_date:
-        query += " AND date >= ?"
-        params.append(start_date)
 
-    if end_date:
-        query += " AND date <= ?"
-        params.append(end_date)
-
-    query += " GROUP BY date ORDER BY date"
+    query += " GROUP BY r.date ORDER BY r.date"
 
     cursor.execute(query, params)
-    time_series = rows_to_list(cursor.fetchall())
+    if columnar:
+        response = format_columnar_response(fetch_columns(cursor))
+    else:
+        response = format_response(rows_to_list(cursor.fetchall()))
     conn.close()
 
-    return format_response(time_series)
+    return response
 
 
 def get_product_performance_with_growth(
@@ -248,28 +322,28 @@ def get_product_performance_with_growth(
     start_date_previous_sql = start_date_previous.strftime("%Y-%m-%d")
     end_date_previous_sql = end_date_previous.strftime("%Y-%m-%d")
 
-    # Build base query and params (re-add filtering logic)
+    # Build base query and params (re-add filtering logic) over the weekly rollup
     query = """
         SELECT 
             d.dept_id,
             d.name,
             d.category,
-            COUNT(DISTINCT s.store_id) as store_presence,
-            SUM(CASE WHEN s.date BETWEEN ? AND ? THEN s.weekly_sales ELSE 0 END) as total_sales_current,
-            SUM(CASE WHEN s.date BETWEEN ? AND ? THEN s.weekly_sales ELSE 0 END) as total_sales_previous,
-            AVG(s.weekly_sales) as avg_sales_overall,
-            COUNT(DISTINCT strftime('%Y-%m', s.date)) as months_active
+            COUNT(DISTINCT r.store_id) as store_presence,
+            SUM(CASE WHEN r.date BETWEEN ? AND ? THEN r.total_sales ELSE 0 END) as total_sales_current,
+            SUM(CASE WHEN r.date BETWEEN ? AND ? THEN r.total_sales ELSE 0 END) as total_sales_previous,
+            SUM(r.total_sales) / SUM(r.sale_count) as avg_sales_overall,
+            COUNT(DISTINCT substr(r.date, 1, 7)) as months_active
         FROM departments d
-        LEFT JOIN sales s ON s.dept_id = d.dept_id
+        LEFT JOIN sales_weekly_rollup r ON r.dept_id = d.dept_id
         WHERE 1=1 
     """
     params = [start_date_current_sql, end_date_current_sql, start_date_previous_sql, end_date_previous_sql]
 
     if store_id:
-        query += " AND s.store_id = ? "
+        query += " AND r.store_id = ? "
         params.append(store_id)
         
-    query += " AND s.date BETWEEN ? AND ? " # Filter overall metrics by the wider date range used for comparison
+    query += " AND r.date BETWEEN ? AND ? " # Filter overall metrics by the wider date range used for comparison
     params.extend([start_date_previous_sql, end_date_current_sql])
 
     query += " GROUP BY d.dept_id, d.name, d.category ORDER BY total_sales_current DESC "
@@ -301,3 +375,68 @@ def get_product_performance_with_growth(
         
     conn.close()
     return format_response(products)
+
+
+def _json_value(value):
+    """NumPy scalar -> JSON value; floats rounded, NaN as None"""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float):
+        return None if np.isnan(value) else round(value, 4)
+    return value
+
+
+def get_seasonality(
+    group_by: str = "series",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    limit: int = 100,
+    include_indices: bool = False,
+) -> Dict:
+    """Seasonality, trend and periodicity for every series of a grouping,
+    strongest seasonality first"""
+    conn = get_db_connection()
+    panel = weekly_panel(conn, group_by, start_date, end_date)
+    conn.close()
+
+    if panel.empty:
+        return format_response({"group_by": group_by, "weeks": 0, "series_count": 0, "series": []})
+
+    report = seasonality.analyze(panel.to_numpy())
+    order = np.argsort(-report["seasonality_strength"], kind="stable")[:limit]
+
+    series = []
+    for row in order:
+        keys = panel.index[row] if panel.index.nlevels > 1 else (panel.index[row],)
+        item = {name: _json_value(key) for name, key in zip(panel.index.names, keys)}
+        item.update(
+            {
+                name: _json_value(report[name][row])
+                for name in (
+                    "trend_strength",
+                    "seasonality_strength",
+                    "has_seasonality",
+                    "peak_week",
+                    "trough_week",
+                    "periodicity_lag",
+                    "periodicity_strength",
+                    "spectral_period",
+                )
+            }
+        )
+        if include_indices:
+            item["seasonal_indices"] = [
+                _json_value(index) for index in report["seasonal_indices"][row]
+            ]
+        series.append(item)
+
+    return format_response(
+        {
+            "group_by": group_by,
+            "weeks": panel.shape[1],
+            "start_date": panel.columns[0],
+            "end_date": panel.columns[-1],
+            "series_count": len(panel),
+            "series": series,
+        }
+    )
@@ -0,0 +1,255 @@
+"""Chain-wide anomaly scan over every store x department weekly series.
+
+Flagged weeks are stored in ``sales_anomalies``; ``anomaly_scans`` records,
+per method, the data version and the last week scanned. A scan runs when
+the data version moved on since the last one:
+
+* if only weeks after the last scanned week were added, just those weeks
+  are scored, using the last ``window`` weeks of the panel before them as
+  history
+* otherwise (past weeks edited, parameters changed) every week is rescored
+
+Scans run after ``ingest``, on ``POST /api/analytics/anomalies/scan``, and
+in a background thread started when anomalies are listed while the data
+version has moved on; listing itself only reads the stored results, so new
+data is scanned once, by whichever comes first.
+"""
+import threading
+from typing import Dict, Optional, Tuple
+
+from src.database import db
+from src.database.db import get_data_version, get_db_connection, rows_to_list
+from src.database.pool import get_pool
+from src.utils.cache import skip_caching
+from src.database.rollups import history_start, weekly_panel
+from src.utils.anomalies import ANOMALY_THRESHOLD, ANOMALY_WINDOW, flag, rolling_scores
+from src.utils.validation import format_response
+
+# Anomalies listed unless the request asks for more
+ANOMALY_LIMIT = 100
+
+
+def _store_flagged(cursor, method, panel, scores, expected, first_column):
+    """Insert the flagged weeks of ``scores`` (columns from ``first_column``)"""
+    rows, columns = flag(scores)
+    if not len(rows):
+        return 0
+    keys = panel.index
+    dates = panel.columns
+    values = panel.to_numpy()
+    cursor.executemany(
+        "INSERT OR REPLACE INTO sales_anomalies "
+        "(method, store_id, dept_id, date, weekly_sales, expected, score) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            (
+                method,
+                int(keys[row][0]),
+                int(keys[row][1]),
+                dates[first_column + column],
+                float(values[row, first_column + column]),
+                float(expected[row, column]),
+                float(scores[row, column]),
+            )
+            for row, column in zip(rows.tolist(), columns.tolist())
+        ),
+    )
+    return len(rows)
+
+
+def scan_anomalies(
+    method: str = "zscore",
+    window: int = ANOMALY_WINDOW,
+    threshold: float = ANOMALY_THRESHOLD,
+    conn=None,
+) -> Dict:
+    """Bring the stored anomalies of ``method`` up to date with the data.
+
+    Returns what the scan did: ``mode`` is "none", "incremental" or "full".
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        # One scanner at a time; later callers see its result
+        cursor.execute("BEGIN IMMEDIATE")
+        version = get_data_version(conn)
+        scan = cursor.execute(
+            "SELECT * FROM anomaly_scans WHERE method = ?", (method,)
+        ).fetchone()
+
+        if scan is not None and scan["data_version"] == version:
+            conn.rollback()
+            return {"mode": "none", "weeks": 0, "flagged": 0}
+
+        incremental = (
+            scan is not None
+            and scan["last_date"] is not None
+            and scan["window_weeks"] == window
+            and scan["threshold"] == threshold
+            and not db.sales_changed_since(conn, scan["data_version"], scan["last_date"])
+        )
+
+        if incremental:
+            # History for the new weeks: the last window of panel columns up
+            # to the last scan, wherever weeks are missing from the calendar
+            start_date = history_start(conn, scan["last_date"], window)
+            panel = weekly_panel(conn, start_date=start_date, fill_value=None)
+            new_weeks = int((panel.columns > scan["last_date"]).sum())
+            mode = "incremental"
+        else:
+            cursor.execute("DELETE FROM sales_anomalies WHERE method = ?", (method,))
+            panel = weekly_panel(conn, fill_value=None)
+            new_weeks = panel.shape[1]
+            mode = "full"
+
+        flagged = 0
+        if new_weeks and panel.shape[1] > window:
+            scores, expected = rolling_scores(panel.to_numpy(), window, method)
+            # Only the new weeks are stored; earlier columns are history
+            first = scores.shape[1] - min(new_weeks, scores.shape[1])
+            flagged = _store_flagged(
+                cursor, method, panel, scores[:, first:], expected[:, first:], window + first
+            )
+
+        last_date = panel.columns[-1] if panel.shape[1] else (scan["last_date"] if scan else None)
+        cursor.execute(
+            "INSERT OR REPLACE INTO anomaly_scans "
+            "(method, data_version, last_date, window_weeks, threshold) VALUES (?, ?, ?, ?, ?)",
+            (method, version, last_date, window, threshold),
+        )
+        conn.commit()
+        return {"mode": mode, "weeks": new_weeks, "flagged": flagged}
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if own_conn:
+            conn.close()
+
+
+_scans: Dict[Tuple[str, str], threading.Thread] = {}
+_scans_lock = threading.Lock()
+
+
+def _background_scan(db_path: str, method: str):
+    conn = get_pool(db_path).acquire()
+    try:
+        scan_anomalies(method, conn=conn)
+    except Exception as e:
+        print(f"Error scanning {method} anomalies: {e}")
+    finally:
+        conn.close()
+        with _scans_lock:
+            _scans.pop((db_path, method), None)
+
+
+def start_scan(method: str, db_path: Optional[str] = None):
+    """Scan ``method`` in a background thread unless one is already running"""
+    db_path = db_path or db.DB_PATH
+    with _scans_lock:
+        if (db_path, method) not in _scans:
+            thread = threading.Thread(
+                target=_background_scan,
+                args=(db_path, method),
+                name=f"anomaly-scan-{method}",
+                daemon=True,
+            )
+            _scans[(db_path, method)] = thread
+            thread.start()
+
+
+def scanning(method: str, db_path: Optional[str] = None) -> bool:
+    """Whether a background scan of ``method`` is running"""
+    with _scans_lock:
+        return (db_path or db.DB_PATH, method) in _scans
+
+
+def close_anomaly_scans(db_path: Optional[str] = None):
+    """Wait for the background scans of one database, or of every database"""
+    with _scans_lock:
+        threads = [
+            thread for (path, _), thread in _scans.items() if db_path in (None, path)
+        ]
+    for thread in threads:
+        thread.join()
+
+
+def run_scans(methods) -> Dict:
+    """Scan each method now and return what every scan did"""
+    conn = get_db_connection()
+    try:
+        return format_response({method: scan_anomalies(method, conn=conn) for method in methods})
+    finally:
+        conn.close()
+
+
+def get_anomalies(
+    method: str = "zscore",
+    store_id: Optional[int] = None,
+    dept_id: Optional[int] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    limit: int = ANOMALY_LIMIT,
+) -> Dict:
+    """List stored anomalies, newest first.
+
+    If data changed since the last scan, the results are ``stale`` and a
+    background scan is started; they are returned as they are meanwhile.
+    """
+    conn = get_db_connection()
+
+    query = """
+    SELECT a.store_id, a.dept_id, a.date, a.weekly_sales, a.expected, a.score,
+           CASE WHEN a.score > 0 THEN 'spike' ELSE 'drop' END as direction
+    FROM sales_anomalies a
+    WHERE a.method = ?
+    """
+    params = [method]
+
+    if store_id:
+        query += " AND a.store_id = ?"
+        params.append(store_id)
+
+    if dept_id:
+        query += " AND a.dept_id = ?"
+        params.append(dept_id)
+
+    if start_date:
+        query += " AND a.date >= ?"
+        params.append(start_date)
+
+    if end_date:
+        query += " AND a.date <= ?"
+        params.append(end_date)
+
+    query += " ORDER BY a.date DESC, ABS(a.score) DESC LIMIT ?"
+    params.append(limit)
+
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    anomalies = rows_to_list(cursor.fetchall())
+    scan = cursor.execute(
+        "SELECT data_version, last_date, window_weeks, threshold FROM anomaly_scans "
+        "WHERE method = ?",
+        (method,),
+    ).fetchone()
+    stale = scan is None or scan["data_version"] != get_data_version(conn)
+    conn.close()
+    if stale:
+        start_scan(method)
+        # The scan updates these results without a new data version
+        skip_caching()
+
+    return format_response(
+        {
+            "method": method,
+            "window": scan["window_weeks"] if scan else None,
+            "threshold": scan["threshold"] if scan else None,
+            "scanned_through": scan["last_date"] if scan else None,
+            "stale": stale,
+            "scanning": scanning(method),
+            "anomalies": anomalies,
+        }
+    )
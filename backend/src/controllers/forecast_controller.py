@@ -0,0 +1,178 @@
+"""Server-side demand forecasts for every store x department series.
+
+All series are read from the weekly rollup into one matrix and fitted in a
+single batch (see ``src.utils.forecasting``). Fitted states are cached per
+database and model:
+
+* same data version              -> the cached forecast is reused
+* only weeks after the last fit  -> the state is advanced by the new weeks
+* anything else (edits to past weeks, new series) -> full refit
+
+Past weeks are recognised as unchanged when ``sales_changes`` records no
+change to a date up to the last fitted week since the fit's data version.
+"""
+import math
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+
+from src.database import db
+from src.database.rollups import weekly_panel
+from src.utils import forecasting
+from src.utils.error_handlers import APIError
+from src.utils.validation import format_response
+
+# Weeks forecast unless the request asks for another horizon
+FORECAST_HORIZON = 8
+
+# Series listed in a response unless the request asks for more
+FORECAST_SERIES_LIMIT = 100
+
+_states: Dict[tuple, Dict] = {}
+# Fits in progress, by (database, model); set when the fit is stored
+_fitting: Dict[tuple, threading.Event] = {}
+_states_lock = threading.Lock()
+_stats = {"fits": 0, "updates": 0, "hits": 0}
+
+
+def _refit(conn, model: str, version: int) -> Dict:
+    panel = weekly_panel(conn)
+    last_date = panel.columns[-1] if len(panel.columns) else None
+    _stats["fits"] += 1
+    return {
+        "version": version,
+        "keys": panel.index,
+        "last_date": last_date,
+        "state": forecasting.fit_batched(model, panel.to_numpy()) if len(panel) else None,
+    }
+
+
+def _advance(conn, model: str, version: int, cached: Optional[Dict]) -> Dict:
+    """Advance a cached fit by the new weeks, or refit when it cannot be"""
+    if (
+        cached is None
+        or cached["state"] is None
+        or model not in forecasting.INCREMENTAL_MODELS
+        or db.sales_changed_since(conn, cached["version"], cached["last_date"])
+    ):
+        return _refit(conn, model, version)
+
+    new_weeks = weekly_panel(conn, after=cached["last_date"])
+    if not new_weeks.index.isin(cached["keys"]).all():
+        return _refit(conn, model, version)  # a new series appeared
+
+    new_weeks = new_weeks.reindex(cached["keys"], fill_value=0.0)
+    state = cached["state"]
+    if len(new_weeks.columns):
+        state = forecasting.update(model, state, new_weeks.to_numpy())
+        _stats["updates"] += 1
+    last_date = new_weeks.columns[-1] if len(new_weeks.columns) else cached["last_date"]
+    return {
+        "version": version,
+        "keys": cached["keys"],
+        "last_date": last_date,
+        "state": state,
+    }
+
+
+def fitted_model(model: str) -> Dict:
+    """Return the cached fit of ``model`` for the current data, refreshing it.
+
+    One request at a time fits a model, without holding ``_states_lock``:
+    others asking for the same model wait for its result, and other models
+    are served meanwhile.
+    """
+    key = (db.DB_PATH, model)
+    while True:
+        conn = db.get_db_connection()
+        try:
+            version = db.get_data_version(conn)
+            with _states_lock:
+                cached = _states.get(key)
+                if cached is not None and cached["version"] == version:
+                    _stats["hits"] += 1
+                    return cached
+                fitting = _fitting.get(key)
+                if fitting is None:
+                    fitting = _fitting[key] = threading.Event()
+                    owner = True
+                else:
+                    owner = False
+
+            if owner:
+                try:
+                    fitted = _advance(conn, model, version, cached)
+                    with _states_lock:
+                        _states[key] = fitted
+                    return fitted
+                finally:
+                    with _states_lock:
+                        del _fitting[key]
+                    fitting.set()
+        finally:
+            conn.close()
+        # Another request is fitting this model; its result is checked
+        # against the data version again, and refit if the data moved on
+        fitting.wait()
+
+
+def forecast_stats() -> Dict:
+    """Return fit/update/cache-hit counters"""
+    return dict(_stats)
+
+
+def _rounded(values: np.ndarray) -> list:
+    return [None if math.isnan(value) else round(value, 2) for value in values.tolist()]
+
+
+def get_forecast(
+    model: str = "exp_smoothing",
+    horizon: int = FORECAST_HORIZON,
+    store_id: Optional[int] = None,
+    dept_id: Optional[int] = None,
+    limit: int = FORECAST_SERIES_LIMIT,
+) -> Dict:
+    """Forecast weekly sales for the matching store x department series"""
+    if not forecasting.engine_available(model):
+        raise APIError(f"The {model} forecast engine is not installed", 501)
+
+    fitted = fitted_model(model)
+    if fitted["state"] is None:
+        return format_response({"model": model, "horizon": horizon, "dates": [], "series": []})
+
+    keys = fitted["keys"]
+    selected = np.ones(len(keys), dtype=bool)
+    if store_id:
+        selected &= keys.get_level_values("store_id") == store_id
+    if dept_id:
+        selected &= keys.get_level_values("dept_id") == dept_id
+    rows = np.flatnonzero(selected)
+
+    state = {name: values[rows] for name, values in fitted["state"].items()}
+    forecast, lower, upper = forecasting.predict(model, state, horizon)
+    errors = forecasting.mape(state)
+
+    series = [
+        {
+            "store_id": int(keys[row][0]),
+            "dept_id": int(keys[row][1]),
+            "forecast": _rounded(forecast[index]),
+            "lower": _rounded(lower[index]),
+            "upper": _rounded(upper[index]),
+            "mape": _rounded(errors[index : index + 1])[0],
+        }
+        for index, row in enumerate(rows[:limit])
+    ]
+
+    return format_response(
+        {
+            "model": model,
+            "horizon": horizon,
+            "last_date": fitted["last_date"],
+            "dates": forecasting.future_weeks(fitted["last_date"], horizon),
+            "series_count": len(rows),
+            "total": _rounded(forecast.sum(axis=0)),
+            "series": series,
+        }
+    )
@@ -0,0 +1,223 @@
+"""KPI push to Socket.IO rooms.
+
+Clients subscribe to a room per scope: the whole ``dashboard``, one
+``store:<id>`` or one ``region:<name>``. A single background task watches
+the database data version. When it changes, KPIs are computed once per
+room that has subscribers, compared with the values last sent to that room,
+and only the changed values are emitted. Checks run at most once per
+``PUSH_INTERVAL``, so a burst of writes is coalesced into one update.
+"""
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from src.database.db import get_data_version, get_db_connection, row_to_dict
+from src.database.rollups import MONTHLY_ROLLUP, WEEKLY_ROLLUP
+
+# Minimum seconds between two KPI pushes to the same room
+PUSH_INTERVAL = 1.0
+
+# KPI values are compared (and sent) at this precision so float noise does
+# not produce empty updates
+KPI_PRECISION = 2
+
+ROOM_SCOPES = ("dashboard", "store", "region")
+
+
+def room_name(scope: str, key: Optional[str] = None) -> str:
+    """Build and validate the room name for a subscription"""
+    if scope not in ROOM_SCOPES:
+        raise ValueError(f"Invalid scope. Must be one of: {', '.join(ROOM_SCOPES)}")
+    if scope == "dashboard":
+        return "dashboard"
+    if key is None or str(key).strip() == "":
+        raise ValueError(f"A {scope} subscription needs an id")
+    if scope == "store":
+        try:
+            store_id = int(key)
+        except (TypeError, ValueError):
+            raise ValueError("Invalid store id")
+        if store_id <= 0:
+            raise ValueError("Invalid store id")
+        return f"store:{store_id}"
+    return f"region:{str(key).strip()}"
+
+
+def _room_filter(room: str) -> Tuple[str, str, list]:
+    """Return (join, conditions, params) restricting rollup ``r`` to a room"""
+    scope, _, key = room.partition(":")
+    if scope == "store":
+        return "", " AND r.store_id = ?", [int(key)]
+    if scope == "region":
+        return " JOIN stores st ON r.store_id = st.store_id", " AND st.region = ?", [key]
+    return "", "", []
+
+
+def compute_room_kpis(room: str, conn=None) -> Dict:
+    """Compute the pushed KPIs for one room from the rollups"""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    join, conditions, params = _room_filter(room)
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""
+            SELECT
+                SUM(r.total_sales) as total_sales,
+                COALESCE(SUM(r.sale_count), 0) as total_orders,
+                CASE
+                    WHEN SUM(r.sale_count) > 0 THEN SUM(r.total_sales) / SUM(r.sale_count)
+                    ELSE 0
+                END as average_order_value,
+                SUM(r.holiday_sales) as holiday_sales,
+                COUNT(DISTINCT r.store_id) as store_count
+            FROM {MONTHLY_ROLLUP} r {join}
+            WHERE 1=1 {conditions}
+            """,
+            params,
+        )
+        kpis = row_to_dict(cursor.fetchone())
+
+        cursor.execute(
+            f"""
+            SELECT r.date as latest_week, SUM(r.total_sales) as latest_week_sales
+            FROM {WEEKLY_ROLLUP} r {join}
+            WHERE r.date = (SELECT MAX(date) FROM {WEEKLY_ROLLUP}) {conditions}
+            GROUP BY r.date
+            """,
+            params,
+        )
+        latest = row_to_dict(cursor.fetchone()) or {
+            "latest_week": None,
+            "latest_week_sales": None,
+        }
+        kpis.update(latest)
+    finally:
+        if own_conn:
+            conn.close()
+
+    return {
+        key: round(value, KPI_PRECISION) if isinstance(value, float) else value
+        for key, value in kpis.items()
+    }
+
+
+def kpi_delta(previous: Dict, current: Dict) -> Dict:
+    """Return the changed KPIs and, for numeric ones, their change"""
+    changes = {}
+    deltas = {}
+    for key, value in current.items():
+        old = previous.get(key)
+        if old == value:
+            continue
+        changes[key] = value
+        if isinstance(value, (int, float)) and isinstance(old, (int, float)):
+            deltas[key] = round(value - old, KPI_PRECISION)
+    return {"kpis": changes, "deltas": deltas} if changes else {}
+
+
+class KpiBroadcaster:
+    """Tracks room subscriptions and pushes KPI deltas when data changes"""
+
+    def __init__(self, socketio, push_interval: float = PUSH_INTERVAL):
+        self.socketio = socketio
+        self.push_interval = push_interval
+        self._subscribers = {}  # room -> set of session ids
+        self._last_sent = {}  # room -> KPIs last pushed to it
+        self._version = None
+        self._lock = threading.Lock()
+        self._task = None
+        self._running = False
+        self._stats = {"checks": 0, "computations": 0, "pushes": 0}
+
+    def subscribe(self, sid: str, room: str) -> Dict:
+        """Add a client to a room and return the room's current KPIs"""
+        with self._lock:
+            self._subscribers.setdefault(room, set()).add(sid)
+            snapshot = self._last_sent.get(room)
+        if snapshot is None:
+            snapshot = compute_room_kpis(room)
+            with self._lock:
+                self._last_sent.setdefault(room, snapshot)
+                if self._version is None:
+                    self._version = get_data_version()
+        return snapshot
+
+    def unsubscribe(self, sid: str, room: Optional[str] = None):
+        """Remove a client from one room, or from every room"""
+        with self._lock:
+            rooms = [room] if room else list(self._subscribers)
+            for name in rooms:
+                members = self._subscribers.get(name)
+                if members is None:
+                    continue
+                members.discard(sid)
+                if not members:
+                    # Nobody listens any more; stop computing this room
+                    del self._subscribers[name]
+                    self._last_sent.pop(name, None)
+
+    def rooms(self) -> Dict[str, int]:
+        """Return subscriber counts by room"""
+        with self._lock:
+            return {room: len(members) for room, members in self._subscribers.items()}
+
+    def check(self) -> int:
+        """Push deltas to every subscribed room if the data changed.
+
+        Returns the number of rooms that received an update.
+        """
+        self._stats["checks"] += 1
+        with self._lock:
+            rooms = list(self._subscribers)
+        if not rooms:
+            return 0
+
+        version = get_data_version()
+        if version == self._version:
+            return 0
+        self._version = version
+
+        pushed = 0
+        conn = get_db_connection()
+        try:
+            for room in rooms:
+                current = compute_room_kpis(room, conn)
+                self._stats["computations"] += 1
+                with self._lock:
+                    if room not in self._subscribers:
+                        continue
+                    update = kpi_delta(self._last_sent.get(room, {}), current)
+                    self._last_sent[room] = current
+                if update:
+                    update.update({"room": room, "version": version})
+                    self.socketio.emit("kpi_update", update, to=room)
+                    self._stats["pushes"] += 1
+                    pushed += 1
+        finally:
+            conn.close()
+        return pushed
+
+    def stats(self) -> Dict:
+        """Return check/computation/push counters and room sizes"""
+        return {**self._stats, "rooms": self.rooms(), "version": self._version}
+
+    def start(self):
+        """Start the background task that checks for changes every interval"""
+        if self._task is None:
+            self._running = True
+            self._task = self.socketio.start_background_task(self._run)
+
+    def stop(self):
+        self._running = False
+
+    def _run(self):
+        while self._running:
+            started = time.monotonic()
+            try:
+                self.check()
+            except Exception as error:  # keep pushing after transient DB errors
+                print(f"Error pushing KPI updates: {error}")
+            self.socketio.sleep(max(0.0, self.push_interval - (time.monotonic() - started)))
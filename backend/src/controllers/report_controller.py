@@ -0,0 +1,311 @@
+"""Asynchronous report jobs.
+
+Creating a report records a ``queued`` row in ``report_jobs`` and hands the
+job to a process pool, so the rendering (``src.utils.reports``) never runs
+on a request thread. The worker marks the job ``running`` and records its
+progress; when it finishes, the pool's callback marks it ``completed`` (or
+``failed``, with the error). Artifacts are kept on disk next to the
+database, in ``<database>.reports/<job id>.<extension>``, until the report
+is deleted.
+"""
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+from src.database import db
+from src.database.pool import get_pool
+from src.utils.error_handlers import APIError, NotFoundError
+from src.utils.reports import REPORT_FORMATS, render_report, render_shared, update_job
+from src.utils.validation import format_response
+
+# Worker processes rendering reports per database
+REPORT_WORKERS = int(os.environ.get("REPORT_WORKERS", 2))
+
+# Report jobs listed unless the request asks for more
+REPORT_LIST_LIMIT = 100
+
+# Job states; queued and running jobs are "active"
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class ReportQueue:
+    """Process pool rendering the report jobs of one database"""
+
+    def __init__(self, db_path: str, directory: Optional[str] = None, workers: int = REPORT_WORKERS):
+        self.db_path = db_path
+        self.directory = directory or f"{db_path}.reports"
+        self.workers = workers
+        self._executor = None
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def artifact_path(self, job_id: str, report_format: str) -> str:
+        """Where the finished file of a job is stored"""
+        return os.path.join(self.directory, f"{job_id}.{REPORT_FORMATS[report_format][1]}")
+
+    def submit(self, job_id: str, report_type: str, report_format: str, filters: Dict) -> Future:
+        """Queue a job already recorded in ``report_jobs``.
+
+        The returned future resolves once the job's row has been updated.
+        """
+        return self._submit(
+            [job_id],
+            render_report,
+            self.db_path,
+            job_id,
+            report_type,
+            report_format,
+            filters,
+            self.artifact_path(job_id, report_format),
+        )
+
+    def submit_shared(self, scan: Dict, jobs: List[Dict]) -> Future:
+        """Queue recorded jobs that render off one shared scan (``render_shared``).
+
+        ``jobs`` are dicts of job_id, report_type, report_format and filters.
+        """
+        jobs = [
+            {**job, "path": self.artifact_path(job["job_id"], job["report_format"])}
+            for job in jobs
+        ]
+        return self._submit(
+            [job["job_id"] for job in jobs], render_shared, self.db_path, scan, jobs
+        )
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that has not started; False if it is running.
+
+        A job sharing a scan with others is only dropped from the group:
+        ``render_shared`` skips jobs whose row is gone. The shared future is
+        cancelled with its last job.
+        """
+        with self._lock:
+            future = self._futures.get(job_id)
+            if future is None:
+                return True
+            if sum(other is future for other in self._futures.values()) > 1:
+                del self._futures[job_id]
+                return True
+        return future.cancel()
+
+    def stats(self) -> Dict:
+        """Return the number of jobs queued or running in the pool"""
+        with self._lock:
+            return {"workers": self.workers, "active": len(self._futures)}
+
+    def stop(self, wait: bool = True):
+        """Cancel queued jobs and shut the pool down"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _submit(self, job_ids: List[str], function, *args) -> Future:
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            future = self._executor.submit(function, *args)
+            for job_id in job_ids:
+                self._futures[job_id] = future
+        recorded = Future()
+        future.add_done_callback(partial(self._finished, job_ids, recorded))
+        return recorded
+
+    def _finished(self, job_ids: List[str], recorded: Future, future: Future):
+        with self._lock:
+            for job_id in job_ids:
+                self._futures.pop(job_id, None)
+        try:
+            self._record(job_ids, future)
+        finally:
+            if future.cancelled():
+                recorded.cancel()
+            elif future.exception() is not None:
+                recorded.set_exception(future.exception())
+            else:
+                recorded.set_result(future.result())
+
+    def _record(self, job_ids: List[str], future: Future):
+        if future.cancelled():
+            results = {job_id: {"error": "Cancelled"} for job_id in job_ids}
+        elif future.exception() is not None:
+            error = str(future.exception()) or type(future.exception()).__name__
+            results = {job_id: {"error": error} for job_id in job_ids}
+        else:
+            result = future.result()
+            results = result["reports"] if "reports" in result else {job_ids[0]: result}
+
+        finished_at = datetime.now().isoformat(timespec="seconds")
+        conn = get_pool(self.db_path).acquire()
+        try:
+            for job_id in job_ids:
+                result = results[job_id]
+                if "error" in result:
+                    fields = {"status": "failed", "error": result["error"]}
+                else:
+                    fields = {
+                        "status": "completed",
+                        "rows_written": result["rows"],
+                        "file_size": result["size"],
+                    }
+                update_job(conn, job_id, finished_at=finished_at, **fields)
+        finally:
+            conn.close()
+
+
+_queues: Dict[str, ReportQueue] = {}
+_queues_lock = threading.Lock()
+
+
+def get_report_queue(db_path: Optional[str] = None) -> ReportQueue:
+    """Return the shared report queue of a database, creating it on first use"""
+    db_path = db_path or db.DB_PATH
+    queue = _queues.get(db_path)
+    if queue is None:
+        with _queues_lock:
+            queue = _queues.get(db_path)
+            if queue is None:
+                queue = _queues[db_path] = ReportQueue(db_path)
+    return queue
+
+
+def close_report_queue(db_path: Optional[str] = None):
+    """Shut down the report queue of one database, or every queue"""
+    with _queues_lock:
+        paths = [db_path] if db_path else list(_queues)
+        queues = [_queues.pop(path) for path in paths if path in _queues]
+    for queue in queues:
+        queue.stop()
+
+
+def _job_dict(row) -> Dict:
+    job = dict(row)
+    job_id = job.pop("job_id")
+    total, written = job["rows_total"], job["rows_written"]
+    if job["status"] == "completed":
+        progress = 100.0
+    else:
+        progress = round(100 * written / total, 1) if total else 0.0
+    return {
+        "id": job_id,
+        "name": job["name"],
+        "type": job["report_type"],
+        "format": job["format"],
+        "filters": json.loads(job["filters"]),
+        "status": job["status"],
+        "progress": progress,
+        "rows_total": total,
+        "rows_written": written,
+        "file_size": job["file_size"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "download_url": f"/api/reports/{job_id}/download" if job["status"] == "completed" else None,
+    }
+
+
+def _fetch_job(conn, job_id: str):
+    row = conn.execute("SELECT * FROM report_jobs WHERE job_id = ?", (job_id,)).fetchone()
+    if row is None:
+        raise NotFoundError(f"Report {job_id} not found")
+    return row
+
+
+def record_job(conn, name: str, report_type: str, report_format: str, filters: Dict) -> str:
+    """Insert a queued ``report_jobs`` row and return its id"""
+    job_id = uuid.uuid4().hex
+    conn.execute(
+        "INSERT INTO report_jobs (job_id, name, report_type, format, filters, status, created_at) "
+        "VALUES (?, ?, ?, ?, ?, 'queued', ?)",
+        (
+            job_id,
+            name,
+            report_type,
+            report_format,
+            json.dumps(filters, sort_keys=True),
+            datetime.now().isoformat(timespec="seconds"),
+        ),
+    )
+    conn.commit()
+    return job_id
+
+
+def create_report(name: str, report_type: str, report_format: str, filters: Dict) -> Dict:
+    """Record a report job and queue it on the worker pool"""
+    conn = db.get_db_connection()
+    try:
+        job_id = record_job(conn, name, report_type, report_format, filters)
+        get_report_queue().submit(job_id, report_type, report_format, filters)
+        return format_response(_job_dict(_fetch_job(conn, job_id)))
+    finally:
+        conn.close()
+
+
+def list_reports(status: Optional[str] = None, limit: int = REPORT_LIST_LIMIT) -> List[Dict]:
+    """List report jobs, newest first"""
+    query = "SELECT * FROM report_jobs WHERE 1=1"
+    params = []
+
+    if status:
+        query += " AND status = ?"
+        params.append(status)
+
+    query += " ORDER BY created_at DESC, rowid DESC LIMIT ?"
+    params.append(limit)
+
+    conn = db.get_db_connection()
+    try:
+        return [_job_dict(row) for row in conn.execute(query, params).fetchall()]
+    finally:
+        conn.close()
+
+
+def get_report(job_id: str) -> Dict:
+    """Status and progress of one report job"""
+    conn = db.get_db_connection()
+    try:
+        return format_response(_job_dict(_fetch_job(conn, job_id)))
+    finally:
+        conn.close()
+
+
+def report_file(job_id: str) -> Tuple[str, str, str]:
+    """Return (path, mimetype, download name) of a completed report"""
+    conn = db.get_db_connection()
+    try:
+        job = _fetch_job(conn, job_id)
+    finally:
+        conn.close()
+
+    if job["status"] != "completed":
+        raise APIError(f"Report {job_id} is {job['status']}, not completed", 409)
+    path = get_report_queue().artifact_path(job_id, job["format"])
+    if not os.path.exists(path):
+        raise NotFoundError(f"The file of report {job_id} is missing")
+    mimetype, extension = REPORT_FORMATS[job["format"]]
+    return path, mimetype, f"{job['name']}.{extension}"
+
+
+def delete_report(job_id: str) -> Dict:
+    """Delete a report job and its file; running jobs cannot be deleted"""
+    conn = db.get_db_connection()
+    try:
+        job = _fetch_job(conn, job_id)
+        if job["status"] in ACTIVE_STATUSES and not get_report_queue().cancel(job_id):
+            raise APIError(f"Report {job_id} is running and cannot be deleted yet", 409)
+        conn.execute("DELETE FROM report_jobs WHERE job_id = ?", (job_id,))
+        conn.commit()
+    finally:
+        conn.close()
+
+    path = get_report_queue().artifact_path(job_id, job["format"])
+    if os.path.exists(path):
+        os.remove(path)
+    return format_response({"id": job_id}, message="Report deleted")
@@ -1,21 +1,49 @@
+import json
+from concurrent.futures import TimeoutError as WriteTimeout
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Union
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
-from src.database.db import get_db_connection, row_to_dict, rows_to_list
-from src.utils.validation import format_response
+from src.database.db import (get_db_connection, get_sales_writer, row_to_dict,
+                             rows_to_columns, rows_to_list)
+from src.utils.error_handlers import DatabaseError, ValidationError
+from src.utils.pagination import decode_cursor, encode_cursor
+from src.utils.validation import (MAX_REPORTED_ERRORS, format_columnar_response,
+                                  format_response, validate_sales_rows)
 
 
-def get_sales(
+# Rows fetched per batch when streaming sales
+STREAM_BATCH_SIZE = 5000
+
+# Continuation tokens carry the (date, sale_id) of the last row returned
+SALES_CURSOR_TYPES = (str, int)
+
+# Arrow type of each column of a sales page
+SALES_COLUMN_TYPES = {
+    "sale_id": "int64",
+    "store_id": "int64",
+    "dept_id": "int64",
+    "date": "date32",
+    "weekly_sales": "float64",
+    "is_holiday": "int64",
+    "temperature": "float64",
+    "fuel_price": "float64",
+    "markdown": "float64",
+    "cpi": "float64",
+    "unemployment": "float64",
+    "store_name": "string",
+    "dept_name": "string",
+}
+
+
+def _sales_query(
     store_id: Optional[int] = None,
     dept_id: Optional[int] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    limit: Optional[int] = 100,
-) -> Dict:
-    """Get sales data with optional filters"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
+    after: Optional[Tuple] = None,
+) -> Tuple[str, List]:
+    """Build the filtered sales query, newest first, continuing after a
+    (date, sale_id) key"""
     query = """
     SELECT s.*, st.name as store_name, d.name as dept_name
     FROM sales s
@@ -41,14 +69,98 @@ def get_sales(
         query += " AND s.date <= ?"
         params.append(end_date)
 
-    query += " ORDER BY s.date DESC LIMIT ?"
-    params.append(limit)
+    if after:
+        # Row-value comparison lets SQLite seek the date index to the key
+        query += " AND (s.date, s.sale_id) < (?, ?)"
+        params.extend(after)
+
+    # sale_id breaks ties between rows of the same week
+    query += " ORDER BY s.date DESC, s.sale_id DESC"
+    return query, params
+
 
+def get_sales(
+    store_id: Optional[int] = None,
+    dept_id: Optional[int] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    limit: Optional[int] = 100,
+    cursor_token: Optional[str] = None,
+    columnar: bool = False,
+) -> Dict:
+    """Get a page of sales data with optional filters, as row objects or
+    column arrays.
+
+    ``next_cursor`` is set when more rows follow; pass it back as
+    ``cursor_token`` to fetch the next page.
+    """
+    after = decode_cursor(cursor_token, SALES_CURSOR_TYPES)
+    query, params = _sales_query(store_id, dept_id, start_date, end_date, after)
+    query += " LIMIT ?"
+    params.append(limit + 1)  # one extra row tells whether another page exists
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
     cursor.execute(query, params)
+    if columnar:
+        cursor.row_factory = None
     sales = cursor.fetchall()
     conn.close()
 
-    return format_response(rows_to_list(sales))
+    has_more = len(sales) > limit
+    sales = sales[:limit]
+    if columnar:
+        response = format_columnar_response(rows_to_columns(sales, cursor.description))
+        last = {name: values[-1] for name, values in response["data"].items() if values}
+    else:
+        response = format_response(rows_to_list(sales))
+        last = sales[-1] if sales else None
+
+    response["next_cursor"] = (
+        encode_cursor(last["date"], last["sale_id"]) if has_more else None
+    )
+    return response
+
+
+def stream_sales(
+    store_id: Optional[int] = None,
+    dept_id: Optional[int] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor_token: Optional[str] = None,
+) -> Iterator[str]:
+    """Yield matching sales as newline-delimited JSON, a batch at a time.
+
+    Rows are read with ``fetchmany``, so memory stays flat however many rows
+    match. The connection is released when the iterator is exhausted or
+    closed.
+    """
+    after = decode_cursor(cursor_token, SALES_CURSOR_TYPES)
+    query, params = _sales_query(store_id, dept_id, start_date, end_date, after)
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = None  # tuples are zipped with the column names below
+    cursor.execute(query, params)
+    columns = [column[0] for column in cursor.description]
+
+    def generate():
+        try:
+            while True:
+                rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+                if not rows:
+                    return
+                yield "".join(
+                    json.dumps(dict(zip(columns, row))) + "\n" for row in rows
+                )
+        finally:
+            conn.close()
+
+    return generate()
 
 
 def get_sales_metrics() -> Dict:
@@ -60,11 +172,11 @@ def get_sales_metrics() -> Dict:
     cursor.execute(
         """
         SELECT 
-            COUNT(*) as total_transactions,
-            SUM(weekly_sales) as total_sales,
-            AVG(weekly_sales) as avg_sales,
-            SUM(CASE WHEN is_holiday = 1 THEN weekly_sales ELSE 0 END) as holiday_sales
-        FROM sales
+            COALESCE(SUM(sale_count), 0) as total_transactions,
+            SUM(total_sales) as total_sales,
+            SUM(total_sales) / SUM(sale_count) as avg_sales,
+            SUM(holiday_sales) as holiday_sales
+        FROM sales_monthly_rollup
         """
     )
     metrics = row_to_dict(cursor.fetchone())
@@ -104,9 +216,10 @@ def get_recent_sales_summary() -> Dict:
     cursor.execute(
         """
         SELECT 
-            AVG(CASE WHEN is_holiday = 1 THEN weekly_sales END) as holiday_avg,
-            AVG(CASE WHEN is_holiday = 0 THEN weekly_sales END) as non_holiday_avg
-        FROM sales
+            SUM(holiday_sales) / NULLIF(SUM(holiday_count), 0) as holiday_avg,
+            (SUM(total_sales) - SUM(holiday_sales))
+                / NULLIF(SUM(sale_count) - SUM(holiday_count), 0) as non_holiday_avg
+        FROM sales_monthly_rollup
         """
     )
     holiday_comparison = row_to_dict(cursor.fetchone())
@@ -157,3 +270,42 @@ def get_departments() -> Dict:
     departments = cursor.fetchall()
     conn.close()
     return format_response(rows_to_list(departments))
+
+
+def write_sales_batch(rows: Any) -> Dict:
+    """Validate a batch of sales rows and upsert it through the sales writer"""
+    frame = validate_sales_rows(rows)
+
+    # Every referenced store and department must exist
+    conn = get_db_connection()
+    try:
+        errors = []
+        for field, table in (("store_id", "stores"), ("dept_id", "departments")):
+            ids = frame[field].unique().tolist()
+            placeholders = ", ".join("?" * len(ids))
+            known = [
+                row[0]
+                for row in conn.execute(
+                    f"SELECT {field} FROM {table} WHERE {field} IN ({placeholders})", ids
+                )
+            ]
+            unknown = ~frame[field].isin(known)
+            errors.extend(
+                {"row": int(index), "field": field, "message": f"Unknown {field}"}
+                for index in frame.index[unknown]
+            )
+    finally:
+        conn.close()
+
+    if errors:
+        errors.sort(key=lambda error: error["row"])
+        raise ValidationError(
+            f"{len(errors)} invalid value(s) in sales batch",
+            payload={"errors": errors[:MAX_REPORTED_ERRORS]},
+        )
+
+    try:
+        result = get_sales_writer().write(frame)
+    except WriteTimeout:
+        raise DatabaseError("Timed out waiting for the sales batch to be written", 503)
+    return format_response(result)
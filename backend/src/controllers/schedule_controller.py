@@ -0,0 +1,403 @@
+"""Recurring reports on cron schedules.
+
+A schedule (``report_schedules``) is a report definition plus a cron
+expression and an optional ``period``: the previous 7 days ("week") or the
+previous calendar month ("month") before each run, instead of fixed dates.
+
+``ReportScheduler.run_due`` claims the schedules that are due and groups
+them by date range. Each group is rendered by one worker task off a single
+shared scan of the rows its reports have in common (see
+``src.utils.reports.render_shared``), so ten weekly reports for the same
+week and stores read the sales data once. Groups run one after another;
+during business hours the scheduler pauses between them to leave the
+database to interactive queries. Every run is recorded in
+``report_schedule_runs`` with its runtime and the rows scanned.
+"""
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from src.controllers.report_controller import get_report_queue, record_job
+from src.database import db
+from src.database.pool import get_pool
+from src.utils.cron import next_run
+from src.utils.error_handlers import NotFoundError
+from src.utils.validation import format_response
+
+# Date ranges a schedule can cover, relative to each run
+REPORT_PERIODS = ("week", "month")
+
+# Seconds between checks for due schedules
+SCHEDULER_POLL = 60.0
+
+# Local hours [start, end) during which scheduled scans are spread out
+BUSINESS_HOURS = tuple(int(hour) for hour in os.environ.get("REPORT_BUSINESS_HOURS", "8-20").split("-"))
+
+# Seconds between two shared scans during and outside business hours
+STAGGER_BUSY = 30.0
+STAGGER_IDLE = 0.0
+
+# Runs listed per schedule unless the request asks for more
+SCHEDULE_RUNS_LIMIT = 20
+
+
+def _timestamp(moment: datetime) -> str:
+    return moment.isoformat(timespec="seconds")
+
+
+def period_range(period: Optional[str], moment: datetime) -> Tuple[Optional[str], Optional[str]]:
+    """Date range (inclusive) a run at ``moment`` covers; (None, None) without a period"""
+    day = moment.date()
+    if period == "week":
+        return (day - timedelta(days=7)).isoformat(), (day - timedelta(days=1)).isoformat()
+    if period == "month":
+        last = day.replace(day=1) - timedelta(days=1)
+        return last.replace(day=1).isoformat(), last.isoformat()
+    return None, None
+
+
+def run_filters(schedule, scheduled_for: datetime) -> Dict:
+    """Report filters of one run: the schedule's, with the period's dates"""
+    filters = json.loads(schedule["filters"])
+    start_date, end_date = period_range(schedule["period"], scheduled_for)
+    if start_date:
+        filters.update(start_date=start_date, end_date=end_date)
+    return filters
+
+
+def shared_scans(runs: List[Tuple]) -> List[Tuple[Dict, List[Tuple]]]:
+    """Group (schedule, filters) runs by date range into shared scans.
+
+    A scan covers the union of the stores its reports filter on, or every
+    store if any of them is not filtered by store.
+    """
+    groups: Dict[Tuple, List] = {}
+    for schedule, filters in runs:
+        key = (filters.get("start_date"), filters.get("end_date"))
+        groups.setdefault(key, []).append((schedule, filters))
+
+    scans = []
+    for (start_date, end_date), members in groups.items():
+        stores = {filters.get("store_id") for _, filters in members}
+        scan = {
+            "start_date": start_date,
+            "end_date": end_date,
+            "store_ids": None if None in stores else sorted(stores),
+        }
+        scans.append((scan, members))
+    return scans
+
+
+class ReportScheduler:
+    """Background thread running the due report schedules of one database"""
+
+    def __init__(
+        self,
+        db_path: str,
+        poll: float = SCHEDULER_POLL,
+        stagger: Tuple[float, float] = (STAGGER_BUSY, STAGGER_IDLE),
+        business_hours: Tuple[int, int] = BUSINESS_HOURS,
+    ):
+        self.db_path = db_path
+        self.poll = poll
+        self.stagger = stagger
+        self.business_hours = business_hours
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {"checks": 0, "scans": 0, "runs": 0, "failed": 0}
+
+    def stagger_delay(self, moment: datetime) -> float:
+        """Pause before the next shared scan at ``moment``"""
+        start, end = self.business_hours
+        busy, idle = self.stagger
+        return busy if start <= moment.hour < end else idle
+
+    def claim_due(self, now: datetime) -> List:
+        """Take the schedules due at ``now`` and move them to their next run.
+
+        Claiming happens in one write transaction, so a schedule runs once
+        even with several scheduler processes.
+        """
+        conn = get_pool(self.db_path).acquire()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            due = conn.execute(
+                "SELECT * FROM report_schedules WHERE enabled = 1 AND next_run_at <= ? "
+                "ORDER BY next_run_at, schedule_id",
+                (_timestamp(now),),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE report_schedules SET next_run_at = ? WHERE schedule_id = ?",
+                [
+                    (_timestamp(next_run(schedule["cron"], now)), schedule["schedule_id"])
+                    for schedule in due
+                ],
+            )
+            conn.commit()
+            return due
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def run_due(self, now: Optional[datetime] = None) -> List[Dict]:
+        """Run every due schedule, one shared scan at a time; return the scans"""
+        now = now or datetime.now()
+        self._stats["checks"] += 1
+        runs = [
+            (schedule, run_filters(schedule, datetime.fromisoformat(schedule["next_run_at"])))
+            for schedule in self.claim_due(now)
+        ]
+
+        results = []
+        for index, (scan, members) in enumerate(shared_scans(runs)):
+            if index and self._stop.wait(self.stagger_delay(datetime.now())):
+                break
+            results.append(self._run_scan(scan, members))
+        return results
+
+    def _run_scan(self, scan: Dict, members: List[Tuple]) -> Dict:
+        conn = get_pool(self.db_path).acquire()
+        try:
+            started_at = _timestamp(datetime.now())
+            jobs = []
+            for schedule, filters in members:
+                job = {
+                    "report_type": schedule["report_type"],
+                    "report_format": schedule["format"],
+                    "filters": filters,
+                }
+                job["job_id"] = record_job(conn, schedule["name"], **job)
+                jobs.append(job)
+
+            try:
+                result = get_report_queue(self.db_path).submit_shared(scan, jobs).result()
+            except Exception as error:
+                message = str(error) or type(error).__name__
+                result = {
+                    "rows_scanned": None,
+                    "scan_ms": None,
+                    "reports": {job["job_id"]: {"error": message} for job in jobs},
+                }
+
+            records = []
+            for (schedule, _), job in zip(members, jobs):
+                report = result["reports"][job["job_id"]]
+                failed = "error" in report
+                self._stats["failed" if failed else "runs"] += 1
+                records.append(
+                    (
+                        schedule["schedule_id"],
+                        job["job_id"],
+                        schedule["next_run_at"],
+                        started_at,
+                        "failed" if failed else "completed",
+                        report.get("runtime_ms"),
+                        result["scan_ms"],
+                        result["rows_scanned"],
+                        len(members),
+                        report.get("error"),
+                    )
+                )
+            conn.executemany(
+                "INSERT INTO report_schedule_runs (schedule_id, job_id, scheduled_for, started_at, "
+                "status, runtime_ms, scan_ms, rows_scanned, shared_with, error) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                records,
+            )
+            conn.executemany(
+                "UPDATE report_schedules SET last_run_at = ? WHERE schedule_id = ?",
+                [(started_at, schedule["schedule_id"]) for schedule, _ in members],
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+        self._stats["scans"] += 1
+        return {
+            **scan,
+            "schedules": [schedule["schedule_id"] for schedule, _ in members],
+            "rows_scanned": result["rows_scanned"],
+            "scan_ms": result["scan_ms"],
+        }
+
+    def stats(self) -> Dict:
+        """Return check/scan/run counters"""
+        return {**self._stats, "running": self._thread is not None}
+
+    def start(self):
+        """Start checking for due schedules every poll interval"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="report-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the scheduler thread after the scan in progress"""
+        thread, self._thread = self._thread, None
+        self._stop.set()
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_due()
+            except Exception as error:  # keep scheduling after transient DB errors
+                print(f"Error running scheduled reports: {error}")
+            self._stop.wait(self.poll)
+
+
+_schedulers: Dict[str, ReportScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(db_path: Optional[str] = None) -> ReportScheduler:
+    """Return the report scheduler of a database, creating it on first use"""
+    db_path = db_path or db.DB_PATH
+    scheduler = _schedulers.get(db_path)
+    if scheduler is None:
+        with _schedulers_lock:
+            scheduler = _schedulers.get(db_path)
+            if scheduler is None:
+                scheduler = _schedulers[db_path] = ReportScheduler(db_path)
+    return scheduler
+
+
+def close_scheduler(db_path: Optional[str] = None):
+    """Stop the scheduler of one database, or every scheduler"""
+    with _schedulers_lock:
+        paths = [db_path] if db_path else list(_schedulers)
+        schedulers = [_schedulers.pop(path) for path in paths if path in _schedulers]
+    for scheduler in schedulers:
+        scheduler.stop()
+
+
+def _schedule_dict(row, last_run=None) -> Dict:
+    return {
+        "id": row["schedule_id"],
+        "name": row["name"],
+        "cron": row["cron"],
+        "type": row["report_type"],
+        "format": row["format"],
+        "filters": json.loads(row["filters"]),
+        "period": row["period"],
+        "enabled": bool(row["enabled"]),
+        "next_run_at": row["next_run_at"],
+        "last_run_at": row["last_run_at"],
+        "last_run": dict(last_run) if last_run is not None else None,
+    }
+
+
+def _run_dict(row) -> Dict:
+    run = dict(row)
+    run["id"] = run.pop("run_id")
+    return run
+
+
+def _fetch_schedule(conn, schedule_id: int):
+    row = conn.execute(
+        "SELECT * FROM report_schedules WHERE schedule_id = ?", (schedule_id,)
+    ).fetchone()
+    if row is None:
+        raise NotFoundError(f"Schedule {schedule_id} not found")
+    return row
+
+
+def create_schedule(
+    name: str, cron: str, report_type: str, report_format: str, filters: Dict, period: Optional[str]
+) -> Dict:
+    """Add a recurring report, first due at the next time its cron matches"""
+    now = datetime.now()
+    conn = db.get_db_connection()
+    try:
+        cursor = conn.execute(
+            "INSERT INTO report_schedules (name, cron, report_type, format, filters, period, "
+            "next_run_at, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                name,
+                cron,
+                report_type,
+                report_format,
+                json.dumps(filters, sort_keys=True),
+                period,
+                _timestamp(next_run(cron, now)),
+                _timestamp(now),
+            ),
+        )
+        conn.commit()
+        return format_response(_schedule_dict(_fetch_schedule(conn, cursor.lastrowid)))
+    finally:
+        conn.close()
+
+
+def list_schedules() -> List[Dict]:
+    """List schedules with their latest run, next due first"""
+    conn = db.get_db_connection()
+    try:
+        schedules = conn.execute(
+            "SELECT * FROM report_schedules ORDER BY enabled DESC, next_run_at, schedule_id"
+        ).fetchall()
+        last_runs = {
+            row["schedule_id"]: row
+            for row in conn.execute(
+                "SELECT r.schedule_id, r.job_id, r.started_at, r.status, r.runtime_ms, "
+                "r.scan_ms, r.rows_scanned, r.shared_with FROM report_schedule_runs r "
+                "WHERE r.run_id = (SELECT MAX(run_id) FROM report_schedule_runs "
+                "WHERE schedule_id = r.schedule_id)"
+            ).fetchall()
+        }
+        return [
+            _schedule_dict(row, last_runs.get(row["schedule_id"])) for row in schedules
+        ]
+    finally:
+        conn.close()
+
+
+def get_schedule_runs(schedule_id: int, limit: int = SCHEDULE_RUNS_LIMIT) -> Dict:
+    """A schedule and its latest runs, newest first"""
+    conn = db.get_db_connection()
+    try:
+        schedule = _schedule_dict(_fetch_schedule(conn, schedule_id))
+        runs = conn.execute(
+            "SELECT * FROM report_schedule_runs WHERE schedule_id = ? ORDER BY run_id DESC LIMIT ?",
+            (schedule_id, limit),
+        ).fetchall()
+        return format_response({**schedule, "runs": [_run_dict(row) for row in runs]})
+    finally:
+        conn.close()
+
+
+def set_schedule_enabled(schedule_id: int, enabled: bool) -> Dict:
+    """Pause or resume a schedule; a resumed schedule is next due when its cron matches"""
+    conn = db.get_db_connection()
+    try:
+        schedule = _fetch_schedule(conn, schedule_id)
+        conn.execute(
+            "UPDATE report_schedules SET enabled = ?, next_run_at = ? WHERE schedule_id = ?",
+            (
+                int(enabled),
+                _timestamp(next_run(schedule["cron"], datetime.now())),
+                schedule_id,
+            ),
+        )
+        conn.commit()
+        return format_response(_schedule_dict(_fetch_schedule(conn, schedule_id)))
+    finally:
+        conn.close()
+
+
+def delete_schedule(schedule_id: int) -> Dict:
+    """Delete a schedule and its run history; reports it produced are kept"""
+    conn = db.get_db_connection()
+    try:
+        _fetch_schedule(conn, schedule_id)
+        conn.execute("DELETE FROM report_schedule_runs WHERE schedule_id = ?", (schedule_id,))
+        conn.execute("DELETE FROM report_schedules WHERE schedule_id = ?", (schedule_id,))
+        conn.commit()
+        return format_response({"id": schedule_id}, message="Schedule deleted")
+    finally:
+        conn.close()
@@ -0,0 +1,414 @@
+"""Memory-mapped columnar snapshot of the sales table.
+
+The dashboard aggregates (totals, per-date series) only touch a handful of
+sales columns. This module keeps a copy of those columns next to the
+database as one ``.npy`` file per column:
+
+* ``store_id``, ``dept_id`` - int32
+* ``date``                  - int32 proleptic Gregorian ordinal
+* ``weekly_sales``          - float64 (NULL stored as 0, like the rollups)
+* ``is_holiday``            - int8
+
+Rows are sorted by date, so a date range is a ``searchsorted`` slice of
+every column. Files are opened with ``mmap_mode="r"``: all worker processes
+map the same files and share their pages through the OS page cache.
+
+A snapshot is written to ``<db>.columns/v<data version>/``, streamed from
+SQLite into the memory-mapped files a batch at a time. When the data
+version changes, queries keep reading the last published snapshot while a
+background thread builds the new one (see ``ColumnarStore``); a worker that
+finds the directory for the current version already built just maps it.
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import date
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from src.database.pool import get_pool
+
+# Query backends the analytics controllers can run on
+QUERY_BACKENDS = ("sqlite", "columnar", "parquet")
+DEFAULT_QUERY_BACKEND = os.environ.get("QUERY_BACKEND", "sqlite")
+
+# Rows fetched from SQLite per batch while building a snapshot
+SNAPSHOT_BATCH_SIZE = 100000
+
+SNAPSHOT_DTYPE = np.dtype(
+    [
+        ("store_id", np.int32),
+        ("dept_id", np.int32),
+        ("date", np.int32),
+        ("weekly_sales", np.float64),
+        ("is_holiday", np.int8),
+    ]
+)
+
+# julianday() of 0001-01-01 is 1721425.5 and date(1, 1, 1).toordinal() is 1
+SNAPSHOT_QUERY = """
+SELECT store_id, dept_id,
+       CAST(julianday(date) - 1721424.5 AS INTEGER) as date,
+       COALESCE(weekly_sales, 0) as weekly_sales,
+       CASE WHEN is_holiday = 1 THEN 1 ELSE 0 END as is_holiday
+FROM sales
+ORDER BY date
+"""
+
+
+def _ordinal(value: str) -> int:
+    return date.fromisoformat(value).toordinal()
+
+
+class ColumnarSnapshot:
+    """Read-only, memory-mapped sales columns for one data version"""
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, "meta.json")) as meta:
+            self.meta = json.load(meta)
+        self.version = self.meta["version"]
+        self.directory = directory
+        self.columns = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+            for name in SNAPSHOT_DTYPE.names
+        }
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def _select(
+        self,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        store_id: Optional[int] = None,
+        dept_id: Optional[int] = None,
+    ) -> Dict[str, np.ndarray]:
+        """Return the columns for an inclusive date range and optional filters"""
+        dates = self.columns["date"]
+        low = np.searchsorted(dates, _ordinal(start_date), "left") if start_date else 0
+        high = np.searchsorted(dates, _ordinal(end_date), "right") if end_date else len(dates)
+        selected = {name: column[low:high] for name, column in self.columns.items()}
+
+        mask = None
+        for name, value in (("store_id", store_id), ("dept_id", dept_id)):
+            if value:
+                matches = selected[name] == value
+                mask = matches if mask is None else mask & matches
+        if mask is not None:
+            selected = {name: column[mask] for name, column in selected.items()}
+        return selected
+
+    def kpis(
+        self,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        store_id: Optional[int] = None,
+        dept_id: Optional[int] = None,
+    ) -> Dict:
+        """Totals matching the SQL KPI query: sales, average, combinations, count"""
+        selected = self._select(start_date, end_date, store_id, dept_id)
+        count = len(selected["weekly_sales"])
+        if not count:
+            return {
+                "total_sales": None,
+                "avg_weekly_sales": None,
+                "unique_combinations": 0,
+                "total_transactions": 0,
+            }
+
+        total = float(selected["weekly_sales"].sum())
+        combination = selected["store_id"].astype(np.int64) * (self.meta["max_dept_id"] + 1)
+        combination += selected["dept_id"]
+        return {
+            "total_sales": total,
+            "avg_weekly_sales": total / count,
+            "unique_combinations": int(np.count_nonzero(np.bincount(combination))),
+            "total_transactions": count,
+        }
+
+    def time_series(
+        self, start_date: Optional[str] = None, end_date: Optional[str] = None
+    ) -> Dict:
+        """Per-date totals as ``{"columns": [...], "data": {...}}``, oldest first"""
+        selected = self._select(start_date, end_date)
+        dates = selected["date"]
+        sales = selected["weekly_sales"]
+        columns = ["date", "total_sales", "store_count", "transaction_count", "avg_sale"]
+        if not len(dates):
+            return {"columns": columns, "data": {name: [] for name in columns}}
+
+        # Dates are sorted, so each date is one contiguous run of rows
+        days, starts = np.unique(dates, return_index=True)
+        totals = np.add.reduceat(sales, starts)
+        counts = np.diff(np.append(starts, len(dates)))
+
+        # Distinct stores per date: count distinct (date run, store) pairs
+        run = np.repeat(np.arange(len(days)), counts)
+        pairs = np.unique(run * np.int64(self.meta["max_store_id"] + 1) + selected["store_id"])
+        store_counts = np.bincount(pairs // (self.meta["max_store_id"] + 1), minlength=len(days))
+
+        return {
+            "columns": columns,
+            "data": {
+                "date": [date.fromordinal(int(day)).isoformat() for day in days],
+                "total_sales": totals.tolist(),
+                "store_count": store_counts.tolist(),
+                "transaction_count": counts.tolist(),
+                "avg_sale": (totals / counts).tolist(),
+            },
+        }
+
+
+def published_versions(directory: str) -> List[int]:
+    """Data versions published under ``directory``, oldest first"""
+    if not os.path.isdir(directory):
+        return []
+    names = os.listdir(directory)
+    return sorted(int(name[1:]) for name in names if name.startswith("v") and name[1:].isdigit())
+
+
+def build_versioned(conn, directory: str, write: Callable) -> str:
+    """Publish a copy of the sales columns for the current data version.
+
+    ``write(conn, staging, version, previous)`` writes the copy into a
+    private directory, which is then renamed to ``<directory>/v<version>``;
+    ``previous`` is the newest copy already published, if any, for writers
+    that can reuse it. Version and rows are read in one transaction so they
+    always match. Returns the published directory.
+    """
+    conn.execute("BEGIN")
+    try:
+        version = conn.execute("SELECT version FROM data_version WHERE id = 1").fetchone()[0]
+        target = os.path.join(directory, f"v{version}")
+        if os.path.isdir(target):
+            return target
+
+        older = [number for number in published_versions(directory) if number < version]
+        previous = os.path.join(directory, f"v{older[-1]}") if older else None
+        os.makedirs(directory, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".build-", dir=directory)
+        try:
+            write(conn, staging, version, previous)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+    finally:
+        conn.rollback()
+
+    try:
+        os.rename(staging, target)
+    except OSError:
+        # Another process published this version first
+        shutil.rmtree(staging, ignore_errors=True)
+    return target
+
+
+def snapshot_batches(conn, query: str = SNAPSHOT_QUERY, parameters=()) -> Iterator[np.ndarray]:
+    """Run a query selecting ``SNAPSHOT_DTYPE`` columns and yield its rows as
+    structured arrays of up to ``SNAPSHOT_BATCH_SIZE`` rows"""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(query, parameters)
+    while True:
+        rows = cursor.fetchmany(SNAPSHOT_BATCH_SIZE)
+        if not rows:
+            break
+        yield np.array(rows, dtype=SNAPSHOT_DTYPE)
+
+
+def _write_npy(conn, staging: str, version: int, previous: Optional[str] = None):
+    # Rows are streamed into the memory-mapped files a batch at a time
+    rows = conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+    columns = {
+        name: np.lib.format.open_memmap(
+            os.path.join(staging, f"{name}.npy"),
+            mode="w+",
+            dtype=SNAPSHOT_DTYPE[name],
+            shape=(rows,),
+        )
+        for name in SNAPSHOT_DTYPE.names
+    }
+    offset = max_store_id = max_dept_id = 0
+    for batch in snapshot_batches(conn):
+        for name, column in columns.items():
+            column[offset : offset + len(batch)] = batch[name]
+        offset += len(batch)
+        max_store_id = max(max_store_id, int(batch["store_id"].max()))
+        max_dept_id = max(max_dept_id, int(batch["dept_id"].max()))
+    for column in columns.values():
+        column.flush()
+
+    meta = {
+        "version": version,
+        "rows": rows,
+        "max_store_id": max_store_id,
+        "max_dept_id": max_dept_id,
+    }
+    with open(os.path.join(staging, "meta.json"), "w") as out:
+        json.dump(meta, out)
+
+
+def build_snapshot(conn, directory: str) -> str:
+    """Write the .npy columns of the current data version under ``directory``"""
+    return build_versioned(conn, directory, _write_npy)
+
+
+class ColumnarStore:
+    """Keeps a derived copy of one database's sales in step with its data version.
+
+    ``build(conn, directory)`` publishes the copy for the current version and
+    ``load(path)`` opens it; the defaults are the .npy snapshot above.
+
+    Queries are answered from the latest published copy. When the data
+    version has moved on, one background thread builds the new copy and
+    publishes it when done, so writes arriving meanwhile are picked up by a
+    single later rebuild. Only the very first query, with nothing published
+    yet, waits for a build.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        directory: Optional[str] = None,
+        build: Callable = build_snapshot,
+        load: Callable = ColumnarSnapshot,
+    ):
+        self.db_path = db_path
+        self.directory = directory or f"{db_path}.columns"
+        self.build = build
+        self.load = load
+        self._snapshot = None
+        self._refreshing: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._first_build_lock = threading.Lock()
+        self._stats = {"refreshes": 0, "queries": 0, "stale_queries": 0}
+
+    def snapshot(self):
+        """Return the latest snapshot, refreshing it in the background if stale"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._first_build_lock:
+                if self._snapshot is None and not self._open_published():
+                    self.refresh()
+            snapshot = self._snapshot
+
+        conn = get_pool(self.db_path).acquire()
+        try:
+            version = conn.execute("SELECT version FROM data_version WHERE id = 1").fetchone()[0]
+        finally:
+            conn.close()
+        if snapshot.version != version:
+            self._stats["stale_queries"] += 1
+            self._start_refresh()
+        self._stats["queries"] += 1
+        return snapshot
+
+    def refresh(self):
+        """Build the snapshot of the current data version and publish it"""
+        conn = get_pool(self.db_path).acquire()
+        try:
+            path = self.build(conn, self.directory)
+        finally:
+            conn.close()
+        self._publish(self.load(path))
+        return self._snapshot
+
+    def _open_published(self) -> bool:
+        """Serve the newest copy already on disk, e.g. after a restart"""
+        versions = published_versions(self.directory)
+        if not versions:
+            return False
+        self._publish(self.load(os.path.join(self.directory, f"v{versions[-1]}")))
+        return True
+
+    def _publish(self, snapshot):
+        with self._lock:
+            current = self._snapshot
+            if current is not None and current.version >= snapshot.version:
+                return
+            self._snapshot = snapshot
+            self._stats["refreshes"] += 1
+        # The replaced copy is kept for queries still reading it
+        self._remove_stale(current.version if current else snapshot.version)
+
+    def _start_refresh(self):
+        with self._lock:
+            if self._refreshing is not None:
+                return
+            self._refreshing = threading.Thread(
+                target=self._background_refresh,
+                name=f"refresh-{os.path.basename(self.directory)}",
+                daemon=True,
+            )
+            self._refreshing.start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"Error refreshing {self.directory}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = None
+
+    def wait(self):
+        """Wait for a running background refresh to finish"""
+        thread = self._refreshing
+        if thread is not None:
+            thread.join()
+
+    def _remove_stale(self, version: int):
+        """Delete snapshots older than ``version``; open maps stay valid"""
+        for number in published_versions(self.directory):
+            if number < version:
+                shutil.rmtree(os.path.join(self.directory, f"v{number}"), ignore_errors=True)
+
+    def stats(self) -> Dict:
+        snapshot = self._snapshot
+        return {
+            **self._stats,
+            "version": snapshot.version if snapshot else None,
+            "rows": len(snapshot) if snapshot else 0,
+            "refreshing": self._refreshing is not None,
+            "directory": self.directory,
+        }
+
+
+_stores: Dict[tuple, ColumnarStore] = {}
+_stores_lock = threading.Lock()
+
+
+def _create_store(db_path: str, backend: str) -> ColumnarStore:
+    if backend == "columnar":
+        return ColumnarStore(db_path)
+    if backend == "parquet":
+        from src.database.partitioned import ParquetSnapshot, build_parquet
+
+        return ColumnarStore(db_path, f"{db_path}.parquet", build_parquet, ParquetSnapshot)
+    raise ValueError(f"Not a snapshot backend: {backend}")
+
+
+def get_store(db_path: str, backend: str = "columnar") -> ColumnarStore:
+    """Return the snapshot store of a backend for a database file, creating
+    it on first use"""
+    key = (db_path, backend)
+    store = _stores.get(key)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(key)
+            if store is None:
+                store = _stores[key] = _create_store(db_path, backend)
+    return store
+
+
+def close_stores(db_path: Optional[str] = None):
+    """Wait for the background refreshes of one database's stores, or of
+    every store, and forget them"""
+    with _stores_lock:
+        keys = [key for key in _stores if db_path in (None, key[0])]
+        stores = [_stores.pop(key) for key in keys]
+    for store in stores:
+        store.wait()
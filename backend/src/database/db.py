@@ -1,23 +1,80 @@
 import os
-import random
-import sqlite3
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Union
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple, Union
 
 import pandas as pd
+from flask import g, has_app_context
+
+from src.database.columnar import get_store
+from src.database.pool import get_pool
+from src.database.rollups import (create_rollup_tables, create_rollup_triggers,
+                                  drop_rollup_triggers, rebuild_rollups)
+from src.database.writer import get_writer
 
 DB_PATH = os.path.join(
     os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "retail.db"
 )
 
+# Secondary indexes on the sales fact table, keyed by index name. The
+# trailing columns on the composite indexes make them covering for the
+# dashboard aggregates (SUM/AVG of weekly_sales grouped by store, department
+# or date), so those queries never have to visit the table rows.
+SALES_INDEXES = {
+    "idx_sales_store_date": "sales (store_id, date, dept_id, weekly_sales, is_holiday)",
+    "idx_sales_dept_date": "sales (dept_id, date, store_id, weekly_sales, is_holiday)",
+    "idx_sales_date_covering": "sales (date, store_id, dept_id, weekly_sales, is_holiday)",
+}
+
+# Indexes no longer managed, dropped from existing databases by
+# ensure_indexes; idx_sales_date was a prefix of idx_sales_date_covering
+RETIRED_INDEXES = ("idx_sales_date",)
+
+# Tables whose writes change API responses. Every insert, update or delete on
+# them bumps the counter in the data_version table.
+VERSIONED_TABLES = ("sales", "stores", "departments")
+
+# Dates of changed sales rows, with the data version of their last change;
+# derived copies rewrite only the dates changed since the version they hold
+SALES_CHANGES = "sales_changes"
+
 
 def get_db_connection():
-    """Create a connection to the SQLite database"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    """Borrow a pooled connection to the SQLite database.
+
+    Calling ``close()`` on the connection returns it to the pool. Inside a
+    request, connections that are not closed explicitly (for example because
+    the view raised) are returned by ``close_request_connections``.
+    """
+    conn = get_pool(DB_PATH).acquire()
+    if has_app_context():
+        g.setdefault("db_connections", []).append((conn, conn.lease))
     return conn
 
 
+def close_request_connections(exception=None):
+    """Return any connection still borrowed by the current request to the pool"""
+    for conn, lease in g.pop("db_connections", []):
+        if conn.checked_out and conn.lease == lease:
+            conn.close()
+
+
+def get_pool_stats() -> Dict:
+    """Return metrics for the connection pool of the current database"""
+    return get_pool(DB_PATH).stats()
+
+
+def get_sales_writer():
+    """Return the group-committing sales writer of the current database"""
+    return get_writer(DB_PATH)
+
+
+def get_query_snapshot(backend: str = "columnar"):
+    """Return the latest columnar ("columnar") or Parquet ("parquet") copy of
+    the current database; if the data changed since it was built, a refresh
+    runs in the background and the returned copy is one version behind"""
+    return get_store(DB_PATH, backend).snapshot()
+
+
 def row_to_dict(row):
     """Convert a sqlite3.Row to a dictionary"""
     if row is None:
@@ -32,6 +89,35 @@ def rows_to_list(rows):
     return [row_to_dict(row) for row in rows]
 
 
+def fetch_columns(cursor) -> Dict:
+    """Fetch a cursor's remaining rows column-wise as
+    ``{"columns": [...], "data": {column: [values]}}``.
+
+    Rows are fetched as plain tuples and transposed, so no per-row dict or
+    sqlite3.Row is built.
+    """
+    cursor.row_factory = None
+    return rows_to_columns(cursor.fetchall(), cursor.description)
+
+
+def rows_to_columns(rows, description) -> Dict:
+    """Transpose row tuples into ``{"columns": [...], "data": {column: [values]}}``"""
+    columns = [column[0] for column in description]
+    values = zip(*rows) if rows else ([] for _ in columns)
+    return {"columns": columns, "data": dict(zip(columns, map(list, values)))}
+
+
+def year_range(year: Union[int, str]) -> Tuple[str, str]:
+    """Return the half-open [start, end) date range covering a calendar year.
+
+    Filtering with ``date >= start AND date < end`` instead of
+    ``strftime('%Y', date) = ?`` keeps the predicate sargable, so SQLite can
+    use the date indexes instead of scanning every row.
+    """
+    year = int(year)
+    return f"{year:04d}-01-01", f"{year + 1:04d}-01-01"
+
+
 def initialize_db():
     """Initialize the database with tables and sample data if it doesn't exist"""
     if not os.path.exists(DB_PATH):
@@ -43,6 +129,10 @@ def initialize_db():
         print("Database initialized successfully!")
     else:
         print("Database already exists.")
+        # Bring older databases up to date with the managed schema objects
+        conn = get_db_connection()
+        create_tables(conn)
+        conn.close()
 
 
 def create_tables(conn):
@@ -94,165 +184,282 @@ def create_tables(conn):
     """
     )
 
+    ensure_indexes(conn)
+    create_rollup_tables(conn)
+    create_version_triggers(conn)
+    create_anomaly_tables(conn)
+    create_report_tables(conn)
     conn.commit()
 
 
-def load_sample_data(conn):
-    """Load sample data into the database"""
+def create_anomaly_tables(conn):
+    """Create the tables holding flagged sales anomalies and scan progress"""
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+    CREATE TABLE IF NOT EXISTS sales_anomalies (
+        method TEXT NOT NULL,
+        store_id INTEGER NOT NULL,
+        dept_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        weekly_sales REAL NOT NULL,
+        expected REAL NOT NULL,
+        score REAL NOT NULL,
+        PRIMARY KEY (method, store_id, dept_id, date)
+    ) WITHOUT ROWID
+    """
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_anomalies_date ON sales_anomalies (method, date)"
+    )
+    cursor.execute(
+        """
+    CREATE TABLE IF NOT EXISTS anomaly_scans (
+        method TEXT PRIMARY KEY,
+        data_version INTEGER NOT NULL,
+        last_date TEXT,
+        window_weeks INTEGER NOT NULL,
+        threshold REAL NOT NULL
+    )
+    """
+    )
+    conn.commit()
+
+
+def create_report_tables(conn):
+    """Create the tables tracking report jobs, their artifacts and schedules"""
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+    CREATE TABLE IF NOT EXISTS report_jobs (
+        job_id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        report_type TEXT NOT NULL,
+        format TEXT NOT NULL,
+        filters TEXT NOT NULL,
+        status TEXT NOT NULL,
+        rows_total INTEGER,
+        rows_written INTEGER NOT NULL DEFAULT 0,
+        file_size INTEGER,
+        error TEXT,
+        created_at TEXT NOT NULL,
+        started_at TEXT,
+        finished_at TEXT
+    )
+    """
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_report_jobs_created ON report_jobs (created_at)"
+    )
+    cursor.execute(
+        """
+    CREATE TABLE IF NOT EXISTS report_schedules (
+        schedule_id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        cron TEXT NOT NULL,
+        report_type TEXT NOT NULL,
+        format TEXT NOT NULL,
+        filters TEXT NOT NULL,
+        period TEXT,
+        enabled INTEGER NOT NULL DEFAULT 1,
+        next_run_at TEXT NOT NULL,
+        last_run_at TEXT,
+        created_at TEXT NOT NULL
+    )
+    """
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_report_schedules_next ON report_schedules (enabled, next_run_at)"
+    )
+    cursor.execute(
+        """
+    CREATE TABLE IF NOT EXISTS report_schedule_runs (
+        run_id INTEGER PRIMARY KEY,
+        schedule_id INTEGER NOT NULL,
+        job_id TEXT,
+        scheduled_for TEXT NOT NULL,
+        started_at TEXT NOT NULL,
+        status TEXT NOT NULL,
+        runtime_ms REAL,
+        scan_ms REAL,
+        rows_scanned INTEGER,
+        shared_with INTEGER,
+        error TEXT
+    )
+    """
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_report_schedule_runs ON report_schedule_runs (schedule_id, run_id)"
+    )
+    conn.commit()
+
+
+def create_version_triggers(conn):
+    """Create the data_version counter and the triggers that increment it"""
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+    CREATE TABLE IF NOT EXISTS data_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    """
+    )
+    cursor.execute("INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0)")
+    cursor.execute(
+        f"""
+    CREATE TABLE IF NOT EXISTS {SALES_CHANGES} (
+        date TEXT NOT NULL PRIMARY KEY,
+        version INTEGER NOT NULL
+    ) WITHOUT ROWID
+    """
+    )
+
+    for table in VERSIONED_TABLES:
+        for operation in ("INSERT", "UPDATE", "DELETE"):
+            cursor.execute(
+                f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_{operation.lower()}_version
+            AFTER {operation} ON {table}
+            BEGIN
+                UPDATE data_version SET version = version + 1 WHERE id = 1;
+            END
+            """
+            )
+
+    for operation, rows in (("INSERT", ("NEW",)), ("UPDATE", ("OLD", "NEW")), ("DELETE", ("OLD",))):
+        changes = "".join(
+            f"""
+                INSERT OR REPLACE INTO {SALES_CHANGES} (date, version)
+                SELECT {row}.date, version FROM data_version
+                WHERE id = 1 AND {row}.date IS NOT NULL;"""
+            for row in rows
+        )
+        cursor.execute(
+            f"""
+        CREATE TRIGGER IF NOT EXISTS sales_{operation.lower()}_changes
+        AFTER {operation} ON sales
+        BEGIN{changes}
+        END
+        """
+        )
+    conn.commit()
+
+
+def drop_version_triggers(conn):
+    """Drop the data_version triggers, e.g. before a large bulk load"""
     cursor = conn.cursor()
+    for table in VERSIONED_TABLES:
+        for operation in ("insert", "update", "delete"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {table}_{operation}_version")
+    for operation in ("insert", "update", "delete"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS sales_{operation}_changes")
+    conn.commit()
+
+
+def mark_all_sales_changed(conn):
+    """Record every sales date as changed, for writes made without triggers.
 
-    # Sample store data
-    stores = [
-        (1, "Store A", "North", 150000, "Supercenter"),
-        (2, "Store B", "South", 120000, "Discount"),
-        (3, "Store C", "East", 100000, "Neighborhood"),
-        (4, "Store D", "West", 160000, "Supercenter"),
-        (5, "Store E", "North", 140000, "Discount"),
-        (6, "Store F", "South", 90000, "Neighborhood"),
-        (7, "Store G", "East", 180000, "Supercenter"),
-        (8, "Store H", "West", 110000, "Discount"),
-        (9, "Store I", "North", 95000, "Neighborhood"),
-        (10, "Store J", "South", 170000, "Supercenter"),
-    ]
-
-    cursor.executemany("INSERT INTO stores VALUES (?, ?, ?, ?, ?)", stores)
-
-    # Sample department data
-    departments = [
-        (1, "Grocery", "Food"),
-        (2, "Dairy", "Food"),
-        (3, "Bakery", "Food"),
-        (4, "Meat", "Food"),
-        (5, "Produce", "Food"),
-        (6, "Electronics", "Technology"),
-        (7, "Clothing", "Apparel"),
-        (8, "Home Goods", "Home"),
-        (9, "Health & Beauty", "Personal Care"),
-        (10, "Toys", "Entertainment"),
-    ]
-
-    cursor.executemany("INSERT INTO departments VALUES (?, ?, ?)", departments)
-
-    # Generate sample sales data over the past 2 years
-    sales_data = []
-    start_date = datetime.now() - timedelta(days=730)  # 2 years ago
-
-    # Seasonal factors by month (1 = average, >1 = higher, <1 = lower)
-    seasonal_factors = {
-        1: 0.8,  # January (post-holiday drop)
-        2: 0.7,  # February
-        3: 0.9,  # March
-        4: 1.0,  # April
-        5: 1.1,  # May
-        6: 1.2,  # June (summer uptick)
-        7: 1.3,  # July
-        8: 1.25,  # August (back to school)
-        9: 1.1,  # September
-        10: 1.0,  # October
-        11: 1.2,  # November (pre-holiday)
-        12: 1.8,  # December (holiday peak)
-    }
-
-    # Department baseline sales (average weekly sales)
-    dept_baselines = {
-        1: 20000,  # Grocery (high volume)
-        2: 12000,  # Dairy
-        3: 9000,  # Bakery
-        4: 14000,  # Meat
-        5: 16000,  # Produce
-        6: 18000,  # Electronics (high value)
-        7: 15000,  # Clothing
-        8: 13000,  # Home Goods
-        9: 11000,  # Health & Beauty
-        10: 8000,  # Toys (except during holidays)
-    }
-
-    # Store performance factors
-    store_factors = {
-        1: 1.2,  # Store A (high performer)
-        2: 0.9,  # Store B
-        3: 0.8,  # Store C
-        4: 1.3,  # Store D (highest performer)
-        5: 1.1,  # Store E
-        6: 0.7,  # Store F (low performer)
-        7: 1.25,  # Store G
-        8: 0.85,  # Store H
-        9: 0.75,  # Store I
-        10: 1.15,  # Store J
-    }
-
-    current_date = start_date
-    sale_id = 1
-
-    # Holidays (MM-DD format)
-    holidays = ["01-01", "07-04", "11-25", "12-25"]
-
-    while current_date < datetime.now():
-        is_holiday = 1 if current_date.strftime("%m-%d") in holidays else 0
-
-        # Environmental factors
-        temperature = 70 + random.uniform(-20, 20)  # Average around 70F
-        fuel_price = 3.0 + random.uniform(-0.5, 1.0)  # Average around $3/gallon
-        cpi = 260 + random.uniform(-5, 10)  # Consumer Price Index
-        unemployment = 5.0 + random.uniform(-1.5, 2.0)  # Unemployment rate
-
-        # Apply seasonal adjustments
-        month_factor = seasonal_factors[current_date.month]
-
-        # Holiday boost
-        holiday_boost = 1.5 if is_holiday else 1.0
-
-        for store_id in range(1, 11):
-            store_factor = store_factors[store_id]
-
-            for dept_id in range(1, 11):
-                baseline = dept_baselines[dept_id]
-
-                # Special case for toys during December
-                dec_toy_boost = (
-                    2.0 if (dept_id == 10 and current_date.month == 12) else 1.0
-                )
-
-                # Weekly sales calculation with some randomness
-                weekly_sales = (
-                    baseline
-                    * store_factor
-                    * month_factor
-                    * holiday_boost
-                    * dec_toy_boost
-                )
-                weekly_sales *= random.uniform(0.9, 1.1)  # Add some randomness
-
-                # Apply markdowns randomly (between 0 and 30%)
-                markdown = 0
-                if random.random() < 0.3:  # 30% chance of markdown
-                    markdown = random.uniform(5, 30)
-                    weekly_sales *= 1 + (markdown / 100) * 0.8  # Markdown boosts sales
-
-                sales_data.append(
-                    (
-                        sale_id,
-                        store_id,
-                        dept_id,
-                        current_date.strftime("%Y-%m-%d"),
-                        round(weekly_sales, 2),
-                        is_holiday,
-                        round(temperature, 2),
-                        round(fuel_price, 2),
-                        round(markdown, 2),
-                        round(cpi, 2),
-                        round(unemployment, 2),
-                    )
-                )
-
-                sale_id += 1
-
-        # Move to next week
-        current_date += timedelta(days=7)
-
-    cursor.executemany(
-        "INSERT INTO sales (sale_id, store_id, dept_id, date, weekly_sales, is_holiday, temperature, fuel_price, markdown, cpi, unemployment) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-        sales_data,
+    Like the triggers, this records the version before the bump that
+    follows the writes.
+    """
+    conn.execute(
+        f"INSERT OR REPLACE INTO {SALES_CHANGES} (date, version) "
+        "SELECT DISTINCT s.date, v.version FROM sales s, data_version v "
+        "WHERE v.id = 1 AND s.date IS NOT NULL"
     )
+    conn.commit()
+
+
+def sales_changed_since(conn, version: int, last_date: Optional[str] = None) -> bool:
+    """Whether sales dated up to ``last_date`` (any date if None) changed
+    after data version ``version`` was read.
+
+    A change is recorded with the data version before its own bump (SQLite
+    runs the change triggers, created last, before the version triggers), so
+    changes recorded at ``version`` itself came after it.
+    """
+    query = f"SELECT 1 FROM {SALES_CHANGES} WHERE version >= ?"
+    params = [version]
+    if last_date is not None:
+        query += " AND date <= ?"
+        params.append(last_date)
+    return conn.execute(query + " LIMIT 1", params).fetchone() is not None
+
+
+def bump_data_version(conn):
+    """Increment the data version by hand, for writes made without triggers"""
+    conn.execute("UPDATE data_version SET version = version + 1 WHERE id = 1")
+    conn.commit()
+
 
+@contextmanager
+def bulk_load(conn, keep_indexes=()):
+    """Suspend per-row index, rollup and version maintenance during a large load.
+
+    Indexes other than ``keep_indexes`` are dropped and rebuilt, rollups
+    recomputed in one pass, every sales date marked changed and the data
+    version bumped once when the block exits.
+    """
+    drop_indexes(conn, keep=keep_indexes)
+    drop_rollup_triggers(conn)
+    drop_version_triggers(conn)
+    try:
+        yield conn
+    finally:
+        conn.commit()
+        ensure_indexes(conn)
+        rebuild_rollups(conn)
+        create_rollup_triggers(conn)
+        create_version_triggers(conn)
+        mark_all_sales_changed(conn)
+        bump_data_version(conn)
+
+
+def get_data_version(conn=None) -> int:
+    """Return the current data version; it changes whenever data is written"""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    try:
+        row = conn.execute("SELECT version FROM data_version WHERE id = 1").fetchone()
+    finally:
+        if own_conn:
+            conn.close()
+    return row[0] if row else 0
+
+
+def ensure_indexes(conn):
+    """Create any missing indexes from SALES_INDEXES, drop RETIRED_INDEXES and
+    refresh planner stats"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+    existing = {row[0] for row in cursor.fetchall()}
+
+    missing = [name for name in SALES_INDEXES if name not in existing]
+    for name in missing:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {SALES_INDEXES[name]}")
+    retired = [name for name in RETIRED_INDEXES if name in existing]
+    for name in retired:
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+    if missing or retired:
+        cursor.execute("ANALYZE")
+    conn.commit()
+
+
+def drop_indexes(conn, keep=()):
+    """Drop the managed sales indexes but ``keep``, e.g. before a large bulk load"""
+    cursor = conn.cursor()
+    for name in SALES_INDEXES:
+        if name in keep:
+            continue
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
     conn.commit()
+
+
+def load_sample_data(conn):
+    """Load sample data into the database: 10 stores x 10 departments x 2 years"""
+    from src.database.generator import load_synthetic_data
+
+    load_synthetic_data(conn, stores=10, departments=10, years=2)
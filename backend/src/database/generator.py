@@ -0,0 +1,290 @@
+"""Vectorized synthetic retail data generator.
+
+Generates the same seasonal, store, department, holiday and markdown model as
+the original sample data, but with NumPy arrays instead of per-cell Python
+loops, so chains of any size can be produced for load testing. Rows are
+generated and inserted a chunk of weeks at a time to keep memory bounded.
+
+Usage:
+    python -m src.database.generator --stores 200 --departments 80 --years 5
+"""
+import argparse
+import math
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.database.db import bulk_load
+
+# Seasonal factors by month (1 = average, >1 = higher, <1 = lower)
+SEASONAL_FACTORS = np.array(
+    [
+        0.8,  # January (post-holiday drop)
+        0.7,  # February
+        0.9,  # March
+        1.0,  # April
+        1.1,  # May
+        1.2,  # June (summer uptick)
+        1.3,  # July
+        1.25,  # August (back to school)
+        1.1,  # September
+        1.0,  # October
+        1.2,  # November (pre-holiday)
+        1.8,  # December (holiday peak)
+    ]
+)
+
+# Holidays (month, day)
+HOLIDAYS = ((1, 1), (7, 4), (11, 25), (12, 25))
+HOLIDAY_BOOST = 1.5
+
+# Template stores: (name, region, size_sqft, type, performance factor)
+STORES = [
+    ("Store A", "North", 150000, "Supercenter", 1.2),  # high performer
+    ("Store B", "South", 120000, "Discount", 0.9),
+    ("Store C", "East", 100000, "Neighborhood", 0.8),
+    ("Store D", "West", 160000, "Supercenter", 1.3),  # highest performer
+    ("Store E", "North", 140000, "Discount", 1.1),
+    ("Store F", "South", 90000, "Neighborhood", 0.7),  # low performer
+    ("Store G", "East", 180000, "Supercenter", 1.25),
+    ("Store H", "West", 110000, "Discount", 0.85),
+    ("Store I", "North", 95000, "Neighborhood", 0.75),
+    ("Store J", "South", 170000, "Supercenter", 1.15),
+]
+
+# Template departments: (name, category, average weekly sales)
+DEPARTMENTS = [
+    ("Grocery", "Food", 20000),  # high volume
+    ("Dairy", "Food", 12000),
+    ("Bakery", "Food", 9000),
+    ("Meat", "Food", 14000),
+    ("Produce", "Food", 16000),
+    ("Electronics", "Technology", 18000),  # high value
+    ("Clothing", "Apparel", 15000),
+    ("Home Goods", "Home", 13000),
+    ("Health & Beauty", "Personal Care", 11000),
+    ("Toys", "Entertainment", 8000),  # except during holidays
+]
+
+# Toys sell twice as much in December
+TOY_CATEGORY = "Entertainment"
+DECEMBER_TOY_BOOST = 2.0
+
+# Markdowns: 30% chance per row, 5-30% off, each point of markdown lifts
+# sales by 0.8%
+MARKDOWN_PROBABILITY = 0.3
+MARKDOWN_RANGE = (5, 30)
+MARKDOWN_LIFT = 0.8
+
+DEFAULT_CHUNK_ROWS = 500_000
+
+SALES_COLUMNS = (
+    "store_id",
+    "dept_id",
+    "date",
+    "weekly_sales",
+    "is_holiday",
+    "temperature",
+    "fuel_price",
+    "markdown",
+    "cpi",
+    "unemployment",
+)
+
+
+def generate_stores(count: int, rng: np.random.Generator) -> Tuple[List, np.ndarray]:
+    """Return store rows and per-store performance factors.
+
+    The first ten stores are the fixed templates; further stores cycle through
+    their regions and types with random sizes and performance.
+    """
+    rows = []
+    factors = np.empty(count)
+    for index in range(count):
+        store_id = index + 1
+        if index < len(STORES):
+            name, region, size, store_type, factor = STORES[index]
+        else:
+            template = STORES[index % len(STORES)]
+            name = f"Store {store_id}"
+            region, store_type = template[1], template[3]
+            size = int(rng.integers(80000, 200000))
+            factor = float(rng.uniform(0.7, 1.3))
+        rows.append((store_id, name, region, size, store_type))
+        factors[index] = factor
+    return rows, factors
+
+
+def generate_departments(
+    count: int, rng: np.random.Generator
+) -> Tuple[List, np.ndarray, np.ndarray]:
+    """Return department rows, baselines and a December toy-boost mask.
+
+    Departments beyond the ten templates reuse a template's category with a
+    randomly scaled baseline.
+    """
+    rows = []
+    baselines = np.empty(count)
+    toys = np.zeros(count, dtype=bool)
+    for index in range(count):
+        dept_id = index + 1
+        name, category, baseline = DEPARTMENTS[index % len(DEPARTMENTS)]
+        if index >= len(DEPARTMENTS):
+            name = f"{name} {index // len(DEPARTMENTS) + 1}"
+            baseline *= rng.uniform(0.8, 1.2)
+        rows.append((dept_id, name, category))
+        baselines[index] = baseline
+        toys[index] = category == TOY_CATEGORY
+    return rows, baselines, toys
+
+
+def week_dates(years: float, end_date: Optional[datetime] = None) -> np.ndarray:
+    """Return weekly dates covering ``years`` back from ``end_date`` (today)"""
+    end = np.datetime64((end_date or datetime.now()).date(), "D")
+    days = int(round(years * 365))
+    start = end - np.timedelta64(days, "D")
+    return start + np.arange(math.ceil(days / 7)) * np.timedelta64(7, "D")
+
+
+def generate_sales_chunks(
+    stores: int = 10,
+    departments: int = 10,
+    years: float = 2,
+    seed: Optional[int] = None,
+    end_date: Optional[datetime] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> Iterator[Dict[str, np.ndarray]]:
+    """Yield sales rows as dicts of column arrays, a chunk of weeks at a time"""
+    rng = np.random.default_rng(seed)
+    _, store_factors = generate_stores(stores, rng)
+    _, dept_baselines, toy_depts = generate_departments(departments, rng)
+
+    dates = week_dates(years, end_date)
+    months = dates.astype("datetime64[M]").astype(int) % 12 + 1
+    days = (dates - dates.astype("datetime64[M]")).astype(int) + 1
+    holidays = np.zeros(len(dates), dtype=bool)
+    for month, day in HOLIDAYS:
+        holidays |= (months == month) & (days == day)
+    date_strings = np.datetime_as_string(dates, unit="D")
+
+    rows_per_week = stores * departments
+    weeks_per_chunk = max(1, chunk_rows // rows_per_week)
+    store_ids = np.repeat(np.arange(1, stores + 1, dtype=np.int32), departments)
+    dept_ids = np.tile(np.arange(1, departments + 1, dtype=np.int32), stores)
+    base = np.outer(store_factors, dept_baselines).ravel()
+    toy_mask = np.tile(toy_depts, stores)
+
+    for first in range(0, len(dates), weeks_per_chunk):
+        week = slice(first, first + weeks_per_chunk)
+        n_weeks = len(dates[week])
+        n_rows = n_weeks * rows_per_week
+
+        # Environmental factors are shared by every store in a week
+        temperature = 70 + rng.uniform(-20, 20, n_weeks)  # Average around 70F
+        fuel_price = 3.0 + rng.uniform(-0.5, 1.0, n_weeks)  # Average around $3/gallon
+        cpi = 260 + rng.uniform(-5, 10, n_weeks)  # Consumer Price Index
+        unemployment = 5.0 + rng.uniform(-1.5, 2.0, n_weeks)  # Unemployment rate
+
+        week_factor = SEASONAL_FACTORS[months[week] - 1] * np.where(
+            holidays[week], HOLIDAY_BOOST, 1.0
+        )
+        december = months[week] == 12
+        toy_boost = np.where(
+            december[:, None] & toy_mask[None, :], DECEMBER_TOY_BOOST, 1.0
+        )
+
+        weekly_sales = (base[None, :] * week_factor[:, None] * toy_boost).ravel()
+        weekly_sales *= rng.uniform(0.9, 1.1, n_rows)  # Add some randomness
+
+        # Apply markdowns randomly; markdowns boost sales
+        markdown = np.where(
+            rng.random(n_rows) < MARKDOWN_PROBABILITY,
+            rng.uniform(*MARKDOWN_RANGE, n_rows),
+            0.0,
+        )
+        weekly_sales *= 1 + (markdown / 100) * MARKDOWN_LIFT
+
+        yield {
+            "store_id": np.tile(store_ids, n_weeks),
+            "dept_id": np.tile(dept_ids, n_weeks),
+            "date": np.repeat(date_strings[week], rows_per_week),
+            "weekly_sales": np.round(weekly_sales, 2),
+            "is_holiday": np.repeat(holidays[week].astype(np.int8), rows_per_week),
+            "temperature": np.repeat(np.round(temperature, 2), rows_per_week),
+            "fuel_price": np.repeat(np.round(fuel_price, 2), rows_per_week),
+            "markdown": np.round(markdown, 2),
+            "cpi": np.repeat(np.round(cpi, 2), rows_per_week),
+            "unemployment": np.repeat(np.round(unemployment, 2), rows_per_week),
+        }
+
+
+def load_synthetic_data(
+    conn,
+    stores: int = 10,
+    departments: int = 10,
+    years: float = 2,
+    seed: Optional[int] = None,
+    end_date: Optional[datetime] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> int:
+    """Generate and bulk-load stores, departments and sales; return the row count"""
+    if seed is None:
+        # Fix the seed so store/department rows and sales share one model
+        seed = np.random.SeedSequence().entropy
+    rng = np.random.default_rng(seed)
+    store_rows, _ = generate_stores(stores, rng)
+    dept_rows, _, _ = generate_departments(departments, rng)
+
+    cursor = conn.cursor()
+    inserted = 0
+    with bulk_load(conn):
+        cursor.executemany("INSERT INTO stores VALUES (?, ?, ?, ?, ?)", store_rows)
+        cursor.executemany("INSERT INTO departments VALUES (?, ?, ?)", dept_rows)
+        conn.commit()
+
+        insert_sql = (
+            f"INSERT INTO sales ({', '.join(SALES_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in SALES_COLUMNS)})"
+        )
+        for chunk in generate_sales_chunks(
+            stores, departments, years, seed, end_date, chunk_rows
+        ):
+            columns = [chunk[name].tolist() for name in SALES_COLUMNS]
+            cursor.executemany(insert_sql, zip(*columns))
+            conn.commit()
+            inserted += len(columns[0])
+    return inserted
+
+
+def main(argv=None):
+    from src.database import db
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic retail database")
+    parser.add_argument("--db", default=db.DB_PATH, help="SQLite database file")
+    parser.add_argument("--stores", type=int, default=10)
+    parser.add_argument("--departments", type=int, default=10)
+    parser.add_argument("--years", type=float, default=2)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    db.DB_PATH = args.db
+    conn = db.get_db_connection()
+    db.create_tables(conn)
+    started = datetime.now()
+    rows = load_synthetic_data(
+        conn,
+        stores=args.stores,
+        departments=args.departments,
+        years=args.years,
+        seed=args.seed,
+        chunk_rows=args.chunk_rows,
+    )
+    conn.close()
+    elapsed = (datetime.now() - started).total_seconds()
+    print(f"Loaded {rows:,} sales rows into {args.db} in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
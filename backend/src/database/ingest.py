@@ -0,0 +1,472 @@
+"""Chunked ingestion of the Walmart-style retail datasets in ``data/``.
+
+Maps the shipped files onto the ``stores``/``departments``/``sales`` schema:
+
+* stores      - ``Store,Type,Size`` (CSV or JSON)
+* departments - ``Dept,Name,Category`` (JSON)
+* features    - ``Store,Date,Temperature,Fuel_Price,MarkDown1-5,CPI,
+  Unemployment,IsHoliday``; joined onto sales by store and week. The five
+  markdown columns are summed, ignoring NaN/NA; a week with no markdowns
+  gets NULL
+* sales       - weekly ``Store,Dept,Date,Weekly_Sales,IsHoliday`` rows, or
+  transaction rows ``Date,Store,Department,Sales,...`` which are summed per
+  store, department name and date
+
+Files are read a chunk of rows at a time (JSON arrays are decoded one
+record at a time, never whole) and written one transaction per chunk,
+inside ``bulk_load`` so the other indexes and the rollups are built once at
+the end. Sales rows are upserted by store, department and date
+(``writer.upsert_sales``), so loading the same file twice leaves the table
+unchanged. Transaction rows are summed in a staging table across all the
+chunks of a file before they are written. The command line then brings the
+stored sales anomalies up to date, scoring only the newly loaded weeks
+where it can.
+
+Usage:
+    python -m src.database.ingest --data-dir ../data
+    python -m src.database.ingest --sales train.csv --features "Features data set.csv"
+"""
+import argparse
+import glob
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.database.db import bulk_load
+from src.database.writer import SALES_COLUMNS, SALES_KEY, upsert_sales
+
+DEFAULT_CHUNK_ROWS = 250_000
+
+# Characters read from a JSON array file at a time
+JSON_READ_CHARS = 1 << 20
+
+# Index kept during the load: upserts look sales up by their key through it
+UPSERT_INDEX = "idx_sales_store_date"
+
+# Transaction sums per store, department and date, accumulated over every
+# chunk of a file
+TRANSACTION_STAGING = "temp.sales_transactions"
+
+# Files looked for under --data-dir, by kind
+DATA_FILES = {
+    "stores": ["stores data-set.csv", "stores/*.json"],
+    "departments": ["departments/*.json"],
+    "features": ["Features data set.csv", "features/*.json"],
+    "sales": ["saless/*.json", "retail_sales.csv"],
+}
+
+MARKDOWN_COLUMNS = ["MarkDown1", "MarkDown2", "MarkDown3", "MarkDown4", "MarkDown5"]
+FEATURE_COLUMNS = ["temperature", "fuel_price", "markdown", "cpi", "unemployment"]
+
+# Placeholder labels for stores and departments only known from sales rows
+UNKNOWN_REGION = "Unknown"
+
+
+def read_chunks(path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Yield a CSV, JSON array or JSON lines file as DataFrames of at most
+    ``chunk_rows`` rows"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        yield from pd.read_csv(path, chunksize=chunk_rows, na_values=["NA", "NaN", ""])
+    elif extension in (".jsonl", ".ndjson"):
+        yield from pd.read_json(path, lines=True, chunksize=chunk_rows)
+    elif extension == ".json":
+        chunk = []
+        for record in json_records(path):
+            chunk.append(record)
+            if len(chunk) == chunk_rows:
+                yield pd.DataFrame.from_records(chunk)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame.from_records(chunk)
+    else:
+        raise ValueError(f"Unsupported file type: {path}")
+
+
+def json_records(path: str, read_chars: int = JSON_READ_CHARS) -> Iterator:
+    """Yield the elements of a file holding one JSON array, decoding them one
+    at a time from a buffer of about ``read_chars`` characters"""
+    # The json module accepts the bare NaN literals the fixtures contain
+    decoder = json.JSONDecoder()
+    with open(path) as file:
+        buffer, position = "", 0
+
+        def peek() -> str:
+            """Next non-whitespace character, reading on as needed; "" at the end"""
+            nonlocal buffer, position
+            while True:
+                while position < len(buffer) and buffer[position].isspace():
+                    position += 1
+                if position < len(buffer):
+                    return buffer[position]
+                buffer, position = file.read(read_chars), 0
+                if not buffer:
+                    return ""
+
+        if peek() != "[":
+            raise ValueError(f"{path} does not hold a JSON array")
+        position += 1
+        if peek() == "]":
+            return
+        while True:
+            while True:
+                try:
+                    record, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError as error:
+                    record, end = error, None
+                if end is not None and end < len(buffer):
+                    break
+                # The element may go on past the buffer: read more and retry
+                more = file.read(read_chars)
+                if not more:
+                    if end is None:
+                        raise ValueError(f"Invalid JSON in {path}: {record}")
+                    break
+                buffer, position = buffer[position:] + more, 0
+            yield record
+            position = end
+
+            separator = peek()
+            if separator == "]":
+                return
+            if separator != ",":
+                raise ValueError(f"Expected ',' or ']' between the elements of {path}")
+            position += 1
+            peek()
+
+
+def _dates(values: pd.Series) -> pd.Series:
+    """Normalize ISO or day-first (dd/mm/YYYY) dates to YYYY-MM-DD"""
+    values = values.astype(str)
+    if values.str.fullmatch(r"\d{4}-\d{2}-\d{2}").all():
+        return values  # already ISO; skip the parse/format round trip
+    day_first = values.str.contains("/", regex=False)
+    parsed = pd.to_datetime(values.where(~day_first), format="%Y-%m-%d", errors="coerce")
+    if day_first.any():
+        parsed[day_first] = pd.to_datetime(values[day_first], format="%d/%m/%Y")
+    return parsed.dt.strftime("%Y-%m-%d")
+
+
+def _flags(values: pd.Series) -> pd.Series:
+    """Convert TRUE/FALSE, true/false or 1/0 values to 1/0"""
+    if values.dtype == bool:
+        return values.astype(np.int8)
+    return values.astype(str).str.upper().isin(["TRUE", "1", "1.0"]).astype(np.int8)
+
+
+def _values(frame: pd.DataFrame, columns) -> List[List]:
+    """Column-wise Python lists with NaN replaced by None, ready for executemany"""
+    return [
+        frame[name].astype(object).where(frame[name].notna(), None).tolist()
+        for name in columns
+    ]
+
+
+def load_stores(conn, path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> int:
+    """Insert or update stores from a ``Store,Type,Size`` file"""
+    cursor = conn.cursor()
+    count = 0
+    for chunk in read_chunks(path, chunk_rows):
+        store_ids = chunk["Store"].astype(int).tolist()
+        rows = zip(
+            store_ids,
+            [f"Store {store_id}" for store_id in store_ids],
+            [UNKNOWN_REGION] * len(store_ids),
+            *_values(chunk, ["Size", "Type"]),
+        )
+        cursor.executemany(
+            """
+            INSERT INTO stores (store_id, name, region, size_sqft, type)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (store_id) DO UPDATE SET
+                size_sqft = excluded.size_sqft, type = excluded.type
+            """,
+            rows,
+        )
+        conn.commit()
+        count += len(store_ids)
+    return count
+
+
+def load_departments(conn, path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> int:
+    """Insert or update departments from a ``Dept,Name,Category`` file"""
+    cursor = conn.cursor()
+    count = 0
+    for chunk in read_chunks(path, chunk_rows):
+        chunk = chunk.assign(Dept=chunk["Dept"].astype(int))
+        cursor.executemany(
+            """
+            INSERT INTO departments (dept_id, name, category) VALUES (?, ?, ?)
+            ON CONFLICT (dept_id) DO UPDATE SET
+                name = excluded.name, category = excluded.category
+            """,
+            zip(*_values(chunk, ["Dept", "Name", "Category"])),
+        )
+        conn.commit()
+        count += len(chunk)
+    return count
+
+
+def read_features(paths: List[str], chunk_rows: int = DEFAULT_CHUNK_ROWS) -> pd.DataFrame:
+    """Read feature files into one frame keyed by (store_id, date).
+
+    There is one feature row per store and week, so the frame stays small
+    next to the sales it is joined onto.
+    """
+    frames = []
+    for path in paths:
+        for chunk in read_chunks(path, chunk_rows):
+            markdowns = chunk.reindex(columns=MARKDOWN_COLUMNS).astype(float)
+            frames.append(
+                pd.DataFrame(
+                    {
+                        "store_id": chunk["Store"].astype(int),
+                        "date": _dates(chunk["Date"]),
+                        "temperature": chunk.get("Temperature"),
+                        "fuel_price": chunk.get("Fuel_Price"),
+                        "markdown": markdowns.sum(axis=1, min_count=1),
+                        "cpi": chunk.get("CPI"),
+                        "unemployment": chunk.get("Unemployment"),
+                        "feature_holiday": _flags(chunk["IsHoliday"])
+                        if "IsHoliday" in chunk
+                        else 0,
+                    }
+                )
+            )
+    if not frames:
+        return pd.DataFrame(columns=["store_id", "date", *FEATURE_COLUMNS, "feature_holiday"])
+    # Later files win when the same store-week appears twice
+    return pd.concat(frames, ignore_index=True).drop_duplicates(
+        ["store_id", "date"], keep="last"
+    )
+
+
+def _department_ids(conn, names: pd.Series) -> pd.Series:
+    """Map department names to dept_ids, creating departments for new names"""
+    known = {
+        name.lower(): dept_id
+        for dept_id, name in conn.execute("SELECT dept_id, name FROM departments")
+    }
+    next_id = (conn.execute("SELECT MAX(dept_id) FROM departments").fetchone()[0] or 0) + 1
+    new = []
+    for name in names.dropna().unique():
+        if name.lower() not in known:
+            known[name.lower()] = next_id
+            new.append((next_id, name))
+            next_id += 1
+    conn.executemany("INSERT INTO departments (dept_id, name) VALUES (?, ?)", new)
+    return names.str.lower().map(known)
+
+
+def _weekly_rows(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Normalize a chunk of weekly sales to store/dept/date rows"""
+    return pd.DataFrame(
+        {
+            "store_id": chunk["Store"].astype(int),
+            "dept_id": chunk["Dept"].astype(int),
+            "date": _dates(chunk["Date"]),
+            "weekly_sales": chunk["Weekly_Sales"].astype(float),
+            "is_holiday": _flags(chunk["IsHoliday"]) if "IsHoliday" in chunk else None,
+        }
+    )
+
+
+def _stage_transactions(conn, chunk: pd.DataFrame):
+    """Add a chunk of transaction rows to the sums in ``TRANSACTION_STAGING``"""
+    transactions = pd.DataFrame(
+        {
+            "store_id": chunk["Store"].astype(int),
+            "dept_id": _department_ids(conn, chunk["Department"].astype(str)),
+            "date": _dates(chunk["Date"]),
+            "weekly_sales": chunk["Sales"].astype(float),
+        }
+    )
+    partial = transactions.groupby(list(SALES_KEY), as_index=False).sum()
+    conn.executemany(
+        f"INSERT INTO {TRANSACTION_STAGING} (store_id, dept_id, date, weekly_sales) "
+        "VALUES (?, ?, ?, ?) ON CONFLICT (store_id, dept_id, date) DO UPDATE SET "
+        "weekly_sales = weekly_sales + excluded.weekly_sales",
+        zip(*_values(partial, [*SALES_KEY, "weekly_sales"])),
+    )
+
+
+def _staged_weekly_rows(conn, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Yield the summed transactions as store/dept/date rows, in key order"""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    last = (-1, -1, "")
+    while True:
+        # Keyset pages, so writing the sales between pages is safe
+        rows = cursor.execute(
+            f"SELECT store_id, dept_id, date, weekly_sales FROM {TRANSACTION_STAGING} "
+            "WHERE (store_id, dept_id, date) > (?, ?, ?) "
+            "ORDER BY store_id, dept_id, date LIMIT ?",
+            (*last, chunk_rows),
+        ).fetchall()
+        if not rows:
+            return
+        last = rows[-1][:3]
+        weekly = pd.DataFrame(rows, columns=[*SALES_KEY, "weekly_sales"])
+        weekly["is_holiday"] = None
+        yield weekly
+
+
+def _ensure_referenced(conn, sales: pd.DataFrame):
+    """Create placeholder stores and departments referenced only by sales"""
+    conn.executemany(
+        "INSERT OR IGNORE INTO stores (store_id, name, region) VALUES (?, ?, ?)",
+        [
+            (int(store_id), f"Store {store_id}", UNKNOWN_REGION)
+            for store_id in sales["store_id"].unique()
+        ],
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO departments (dept_id, name) VALUES (?, ?)",
+        [
+            (int(dept_id), f"Department {dept_id}")
+            for dept_id in sales["dept_id"].unique()
+        ],
+    )
+
+
+def _write_sales(conn, sales: pd.DataFrame, features: pd.DataFrame) -> int:
+    """Join weekly rows with their features and upsert them in one transaction"""
+    if features.empty:
+        sales = sales.reindex(columns=[*sales.columns, *FEATURE_COLUMNS, "feature_holiday"])
+    else:
+        sales = sales.merge(features, on=["store_id", "date"], how="left")
+    sales["is_holiday"] = (
+        pd.to_numeric(sales["is_holiday"])
+        .fillna(pd.to_numeric(sales["feature_holiday"]))
+        .fillna(0)
+        .astype(int)
+    )
+    _ensure_referenced(conn, sales)
+    written = upsert_sales(conn, sales[list(SALES_COLUMNS)])["received"]
+    conn.commit()
+    return written
+
+
+def load_sales(
+    conn,
+    path: str,
+    features: Optional[pd.DataFrame] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> int:
+    """Upsert sales from a weekly or transaction file, joined with features.
+
+    Must run inside ``bulk_load`` for large files. Rows without their own
+    holiday flag take the one from the matching feature row. Returns the
+    number of store/dept/date rows written.
+    """
+    if features is None:
+        features = read_features([])
+
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {TRANSACTION_STAGING} (store_id INTEGER, dept_id INTEGER, "
+        "date TEXT, weekly_sales REAL, PRIMARY KEY (store_id, dept_id, date))"
+    )
+    conn.execute(f"DELETE FROM {TRANSACTION_STAGING}")
+    written = 0
+    for chunk in read_chunks(path, chunk_rows):
+        if "Weekly_Sales" in chunk:
+            written += _write_sales(conn, _weekly_rows(chunk), features)
+        else:
+            # Written once every chunk is summed: a store, department and
+            # date can have transactions in several chunks
+            _stage_transactions(conn, chunk)
+    conn.commit()
+
+    for weekly in _staged_weekly_rows(conn, chunk_rows):
+        written += _write_sales(conn, weekly, features)
+    conn.execute(f"DELETE FROM {TRANSACTION_STAGING}")
+    conn.commit()
+    return written
+
+
+def find_data_files(data_dir: str) -> Dict[str, List[str]]:
+    """Return the dataset files present under ``data_dir``, by kind"""
+    return {
+        kind: sorted(
+            path
+            for pattern in patterns
+            for path in glob.glob(os.path.join(glob.escape(data_dir), pattern))
+        )
+        for kind, patterns in DATA_FILES.items()
+    }
+
+
+def ingest(
+    conn,
+    stores: List[str] = (),
+    departments: List[str] = (),
+    features: List[str] = (),
+    sales: List[str] = (),
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    replace: bool = False,
+) -> Dict[str, int]:
+    """Load dataset files in dependency order; return row counts by kind"""
+    counts = {"stores": 0, "departments": 0, "features": 0, "sales": 0}
+    with bulk_load(conn, keep_indexes=(UPSERT_INDEX,)):
+        if replace:
+            conn.execute("DELETE FROM sales")
+            conn.commit()
+        for path in stores:
+            counts["stores"] += load_stores(conn, path, chunk_rows)
+        for path in departments:
+            counts["departments"] += load_departments(conn, path, chunk_rows)
+
+        feature_rows = read_features(list(features), chunk_rows)
+        counts["features"] = len(feature_rows)
+        for path in sales:
+            counts["sales"] += load_sales(conn, path, feature_rows, chunk_rows)
+    return counts
+
+
+def main(argv=None):
+    from src.controllers.anomaly_controller import scan_anomalies
+    from src.database import db
+    from src.utils.anomalies import ANOMALY_METHODS
+
+    parser = argparse.ArgumentParser(description="Load retail CSV/JSON datasets")
+    parser.add_argument("--db", default=db.DB_PATH, help="SQLite database file")
+    parser.add_argument("--data-dir", help="load every known file found in this directory")
+    parser.add_argument("--stores", nargs="*", default=[])
+    parser.add_argument("--departments", nargs="*", default=[])
+    parser.add_argument("--features", nargs="*", default=[])
+    parser.add_argument("--sales", nargs="*", default=[])
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--replace", action="store_true", help="delete existing sales first")
+    args = parser.parse_args(argv)
+
+    files = {
+        "stores": args.stores,
+        "departments": args.departments,
+        "features": args.features,
+        "sales": args.sales,
+    }
+    if args.data_dir:
+        for kind, paths in find_data_files(args.data_dir).items():
+            files[kind] = files[kind] + paths
+    if not any(files.values()):
+        parser.error("no input files; pass --data-dir or explicit files")
+
+    db.DB_PATH = args.db
+    conn = db.get_db_connection()
+    db.create_tables(conn)
+    started = datetime.now()
+    counts = ingest(conn, chunk_rows=args.chunk_rows, replace=args.replace, **files)
+    for method in ANOMALY_METHODS:
+        scan_anomalies(method, conn=conn)
+    conn.close()
+    elapsed = (datetime.now() - started).total_seconds()
+    summary = ", ".join(f"{count:,} {kind}" for kind, count in counts.items())
+    print(f"Loaded {summary} into {args.db} in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Statement-level instrumentation for pooled connections.
+
+Pooled connections hand out ``InstrumentedCursor`` objects. When no listener
+is registered they behave exactly like plain ``sqlite3.Cursor`` objects; when
+listeners are registered every ``execute``/``executemany`` is timed and a
+``StatementEvent`` is passed to each listener after the statement ran.
+
+Fetch listeners are called with the number of rows returned by each
+``fetchone``/``fetchmany``/``fetchall`` call, and once with the row count
+when a ``for`` loop over the cursor ends.
+"""
+import sqlite3
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from typing import Callable, List
+
+StatementEvent = namedtuple(
+    "StatementEvent", ["sql", "parameters", "duration", "many", "cursor"]
+)
+
+_listeners: List[Callable[[StatementEvent], None]] = []
+_fetch_listeners: List[Callable[[int], None]] = []
+
+
+def add_statement_listener(listener: Callable[[StatementEvent], None]):
+    """Call ``listener`` with a StatementEvent after every statement"""
+    global _listeners
+    # Replace rather than mutate so cursors iterating the old list are unaffected
+    _listeners = _listeners + [listener]
+
+
+def remove_statement_listener(listener: Callable[[StatementEvent], None]):
+    """Stop calling ``listener``"""
+    global _listeners
+    _listeners = [registered for registered in _listeners if registered is not listener]
+
+
+@contextmanager
+def statement_listener(listener: Callable[[StatementEvent], None]):
+    """Register ``listener`` for the duration of a ``with`` block"""
+    add_statement_listener(listener)
+    try:
+        yield listener
+    finally:
+        remove_statement_listener(listener)
+
+
+def add_fetch_listener(listener: Callable[[int], None]):
+    """Call ``listener`` with the number of rows after every fetch"""
+    global _fetch_listeners
+    _fetch_listeners = _fetch_listeners + [listener]
+
+
+def remove_fetch_listener(listener: Callable[[int], None]):
+    """Stop calling ``listener``"""
+    global _fetch_listeners
+    _fetch_listeners = [
+        registered for registered in _fetch_listeners if registered is not listener
+    ]
+
+
+def _notify_fetch(listeners: List[Callable[[int], None]], count: int):
+    for listener in listeners:
+        listener(count)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """sqlite3 cursor that reports executed statements to the listeners"""
+
+    def execute(self, sql, parameters=()):
+        listeners = _listeners
+        if not listeners:
+            return super().execute(sql, parameters)
+
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            event = StatementEvent(
+                sql, parameters, time.perf_counter() - started, False, self
+            )
+            for listener in listeners:
+                listener(event)
+
+    def executemany(self, sql, seq_of_parameters):
+        listeners = _listeners
+        if not listeners:
+            return super().executemany(sql, seq_of_parameters)
+
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            event = StatementEvent(sql, None, time.perf_counter() - started, True, self)
+            for listener in listeners:
+                listener(event)
+
+    def fetchone(self):
+        row = super().fetchone()
+        if _fetch_listeners and row is not None:
+            _notify_fetch(_fetch_listeners, 1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        if _fetch_listeners:
+            _notify_fetch(_fetch_listeners, len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        if _fetch_listeners:
+            _notify_fetch(_fetch_listeners, len(rows))
+        return rows
+
+    def __iter__(self):
+        # Counting rows one by one costs a generator step per row, so plain
+        # iteration is only wrapped while someone is listening
+        if not _fetch_listeners:
+            return self
+        return self._counted_rows()
+
+    def _counted_rows(self):
+        count = 0
+        try:
+            for row in iter(super().fetchone, None):
+                count += 1
+                yield row
+        finally:
+            _notify_fetch(_fetch_listeners, count)
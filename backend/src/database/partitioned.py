@@ -0,0 +1,281 @@
+"""Hive-partitioned Parquet copy of the sales table.
+
+An alternative to the single SQLite file for historical analysis: sales are
+written as a Parquet dataset partitioned by calendar month::
+
+    <db>.parquet/v<data version>/year=2024/month=3/part-0.parquet
+
+Partitions are written one month at a time. Within a month rows are sorted
+by store, department and date and split into row groups of
+``ROW_GROUP_ROWS``, so Parquet min/max statistics describe
+narrow store ranges. Queries turn their date, store and department filters
+into a dataset expression: the year/month terms skip whole partitions
+without opening them and the column terms skip row groups whose statistics
+cannot match, so a query over one quarter of a multi-year history reads
+three files.
+
+The dataset is kept in step with the data version like the .npy snapshot
+(see ``ColumnarStore``, which rebuilds it in the background) and answers the
+same aggregate methods. A new version only rewrites the months with sales
+dates changed since the previous one (``sales_changes``); the partitions of
+the other months are hard-linked from it.
+"""
+import json
+import os
+import shutil
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.database.columnar import SNAPSHOT_DTYPE, build_versioned, snapshot_batches
+from src.database.db import SALES_CHANGES
+from src.database.rollups import MONTHLY_ROLLUP
+
+# Maximum rows per Parquet row group (the unit min/max pruning works on)
+ROW_GROUP_ROWS = 16384
+
+PARTITIONING = ds.partitioning(
+    pa.schema([("year", pa.int16()), ("month", pa.int8())]), flavor="hive"
+)
+
+# Written next to the partitions; the leading underscore hides it from
+# dataset discovery
+META_FILE = "_meta.json"
+
+# date(1970, 1, 1).toordinal(): converts snapshot ordinals to date32 days
+EPOCH_ORDINAL = 719163
+
+# Rows of one month partition, in the order they are written (see SNAPSHOT_QUERY)
+PARTITION_QUERY = """
+SELECT store_id, dept_id,
+       CAST(julianday(s.date) - 1721424.5 AS INTEGER) as date,
+       COALESCE(weekly_sales, 0) as weekly_sales,
+       CASE WHEN is_holiday = 1 THEN 1 ELSE 0 END as is_holiday
+FROM sales s
+WHERE s.date >= ? AND s.date < ?
+ORDER BY store_id, dept_id, s.date
+"""
+
+
+def _after(value: str) -> ds.Expression:
+    """Rows dated on or after ``value``, with a partition-level term"""
+    day = date.fromisoformat(value)
+    year, month = ds.field("year"), ds.field("month")
+    partitions = (year > day.year) | ((year == day.year) & (month >= day.month))
+    return partitions & (ds.field("date") >= pa.scalar(day, pa.date32()))
+
+
+def _before(value: str) -> ds.Expression:
+    """Rows dated on or before ``value``, with a partition-level term"""
+    day = date.fromisoformat(value)
+    year, month = ds.field("year"), ds.field("month")
+    partitions = (year < day.year) | ((year == day.year) & (month <= day.month))
+    return partitions & (ds.field("date") <= pa.scalar(day, pa.date32()))
+
+
+def sales_filter(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    store_id: Optional[int] = None,
+    dept_id: Optional[int] = None,
+) -> Optional[ds.Expression]:
+    """Build the pushed-down filter for an inclusive date range and IDs"""
+    terms = []
+    if start_date:
+        terms.append(_after(start_date))
+    if end_date:
+        terms.append(_before(end_date))
+    if store_id:
+        terms.append(ds.field("store_id") == store_id)
+    if dept_id:
+        terms.append(ds.field("dept_id") == dept_id)
+
+    expression = None
+    for term in terms:
+        expression = term if expression is None else expression & term
+    return expression
+
+
+def _month_range(month: str) -> Tuple[str, str]:
+    """First day of ``month`` ("YYYY-MM") and of the month after it"""
+    year, number = int(month[:4]), int(month[5:])
+    following = f"{year + 1}-01" if number == 12 else f"{year}-{number + 1:02d}"
+    return f"{month}-01", f"{following}-01"
+
+
+def _partition_path(root: str, month: str) -> str:
+    return os.path.join(root, f"year={int(month[:4])}", f"month={int(month[5:])}")
+
+
+def _write_month(conn, staging: str, month: str) -> int:
+    """Write the rows of one month as its partition and return their count"""
+    batches = list(snapshot_batches(conn, PARTITION_QUERY, _month_range(month)))
+    table = np.concatenate(batches) if batches else np.empty(0, dtype=SNAPSHOT_DTYPE)
+    arrow_table = pa.table(
+        {
+            "store_id": pa.array(table["store_id"]),
+            "dept_id": pa.array(table["dept_id"]),
+            "date": pa.array((table["date"] - EPOCH_ORDINAL).astype("datetime64[D]"), pa.date32()),
+            "weekly_sales": pa.array(table["weekly_sales"]),
+            "is_holiday": pa.array(table["is_holiday"]),
+        }
+    )
+    partition = _partition_path(staging, month)
+    os.makedirs(partition)
+    pq.write_table(
+        arrow_table, os.path.join(partition, "part-0.parquet"), row_group_size=ROW_GROUP_ROWS
+    )
+    return len(table)
+
+
+def _reusable_months(conn, previous: Optional[str]) -> Dict[str, int]:
+    """Months of the dataset in ``previous`` whose sales did not change since
+    it was built, with their row counts"""
+    if previous is None:
+        return {}
+    with open(os.path.join(previous, META_FILE)) as meta:
+        built = json.load(meta)
+    # A change is recorded with the data version before or after its own
+    # bump, so changes recorded at the built version count as well
+    changed = {
+        month
+        for month, in conn.execute(
+            f"SELECT DISTINCT substr(date, 1, 7) FROM {SALES_CHANGES} WHERE version >= ?",
+            (built["version"],),
+        )
+    }
+    return {
+        month: rows
+        for month, rows in built.get("months", {}).items()
+        if month not in changed and os.path.isdir(_partition_path(previous, month))
+    }
+
+
+def _link_month(previous: str, staging: str, month: str):
+    """Reuse the unchanged partition of a month from the previous dataset"""
+    source = _partition_path(previous, month)
+    partition = _partition_path(staging, month)
+    os.makedirs(partition)
+    for name in os.listdir(source):
+        try:
+            os.link(os.path.join(source, name), os.path.join(partition, name))
+        except OSError:
+            shutil.copy2(os.path.join(source, name), os.path.join(partition, name))
+
+
+def _write_parquet(conn, staging: str, version: int, previous: Optional[str] = None):
+    # Only months changed since the previous dataset are written, one at a
+    # time; the others are hard-linked from it
+    months = [
+        month
+        for month, in conn.execute(
+            f"SELECT DISTINCT month FROM {MONTHLY_ROLLUP} WHERE sale_count > 0 ORDER BY month"
+        )
+    ]
+    reusable = _reusable_months(conn, previous)
+    rows = {}
+    for month in months:
+        if month in reusable:
+            _link_month(previous, staging, month)
+            rows[month] = reusable[month]
+        else:
+            rows[month] = _write_month(conn, staging, month)
+    with open(os.path.join(staging, META_FILE), "w") as out:
+        json.dump({"version": version, "rows": sum(rows.values()), "months": rows}, out)
+
+
+def build_parquet(conn, directory: str) -> str:
+    """Write the Parquet dataset of the current data version under ``directory``"""
+    return build_versioned(conn, directory, _write_parquet)
+
+
+class ParquetSnapshot:
+    """Partitioned Parquet sales for one data version"""
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, META_FILE)) as meta:
+            self.meta = json.load(meta)
+        self.version = self.meta["version"]
+        self.directory = directory
+        self.dataset = ds.dataset(directory, format="parquet", partitioning=PARTITIONING)
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def files(self, **filters) -> List[str]:
+        """Return the files a query with these filters has to open"""
+        expression = sales_filter(**filters)
+        return sorted(fragment.path for fragment in self.dataset.get_fragments(expression))
+
+    def _scan(self, columns: List[str], **filters) -> pa.Table:
+        return self.dataset.to_table(columns=columns, filter=sales_filter(**filters))
+
+    def kpis(
+        self,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        store_id: Optional[int] = None,
+        dept_id: Optional[int] = None,
+    ) -> Dict:
+        """Totals matching the SQL KPI query: sales, average, combinations, count"""
+        table = self._scan(
+            ["store_id", "dept_id", "weekly_sales"],
+            start_date=start_date,
+            end_date=end_date,
+            store_id=store_id,
+            dept_id=dept_id,
+        )
+        count = table.num_rows
+        if not count:
+            return {
+                "total_sales": None,
+                "avg_weekly_sales": None,
+                "unique_combinations": 0,
+                "total_transactions": 0,
+            }
+
+        total = pc.sum(table["weekly_sales"]).as_py()
+        return {
+            "total_sales": total,
+            "avg_weekly_sales": total / count,
+            "unique_combinations": table.group_by(["store_id", "dept_id"]).aggregate([]).num_rows,
+            "total_transactions": count,
+        }
+
+    def time_series(
+        self, start_date: Optional[str] = None, end_date: Optional[str] = None
+    ) -> Dict:
+        """Per-date totals as ``{"columns": [...], "data": {...}}``, oldest first"""
+        table = self._scan(
+            ["date", "store_id", "weekly_sales"], start_date=start_date, end_date=end_date
+        )
+        series = (
+            table.group_by("date")
+            .aggregate(
+                [
+                    ("weekly_sales", "sum"),
+                    ("store_id", "count_distinct"),
+                    ("weekly_sales", "count"),
+                ]
+            )
+            .sort_by("date")
+        )
+        totals = series["weekly_sales_sum"]
+        counts = series["weekly_sales_count"]
+
+        columns = ["date", "total_sales", "store_count", "transaction_count", "avg_sale"]
+        return {
+            "columns": columns,
+            "data": {
+                "date": [day.isoformat() for day in series["date"].to_pylist()],
+                "total_sales": totals.to_pylist(),
+                "store_count": series["store_id_count_distinct"].to_pylist(),
+                "transaction_count": counts.to_pylist(),
+                "avg_sale": pc.divide(totals, pc.cast(counts, pa.float64())).to_pylist(),
+            },
+        }
@@ -0,0 +1,234 @@
+"""SQLite connection pooling.
+
+Opening a connection means opening the database file, parsing the schema and
+starting with a cold page cache, so requests borrow long-lived connections
+from a pool instead. Each connection is tuned once, when it is created.
+
+The pool only relies on ``queue`` and ``threading``, which eventlet's
+``monkey_patch()`` turns into their green equivalents, so it is safe to share
+between OS threads and greenlets alike.
+"""
+import itertools
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from src.database.instrumentation import InstrumentedCursor
+
+# Maximum number of open connections per database file
+POOL_SIZE = 8
+
+# Seconds to wait for a free connection before giving up
+POOL_TIMEOUT = 30.0
+
+# Size of each connection's prepared statement cache (sqlite3 default is 128)
+CACHED_STATEMENTS = 512
+
+# PRAGMAs applied to every new connection
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA mmap_size = 268435456",  # 256 MiB
+    "PRAGMA cache_size = -32768",  # 32 MiB
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection that goes back to its pool when closed.
+
+    Cursors are ``InstrumentedCursor`` objects, including the implicit ones
+    behind ``execute``/``executemany``.
+    """
+
+    pool = None
+    checked_out = False
+    # Incremented on every checkout so stale holders can be told apart
+    lease = 0
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+        else:
+            self.pool.release(self)
+
+    def dispose(self):
+        """Really close the underlying connection"""
+        super().close()
+
+
+class ConnectionPool:
+    """A bounded, thread-safe pool of tuned connections to one database file"""
+
+    def __init__(
+        self,
+        db_path: str,
+        max_size: int = POOL_SIZE,
+        timeout: float = POOL_TIMEOUT,
+    ):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        # LIFO so the most recently used (warmest) connection is reused first
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+        self._leases = itertools.count(1)
+        self._stats = {
+            "created": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "timeouts": 0,
+            "discarded": 0,
+        }
+
+    def _connect(self) -> PooledConnection:
+        conn = sqlite3.connect(
+            self.db_path,
+            factory=PooledConnection,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=CACHED_STATEMENTS,
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        conn.pool = self
+        return conn
+
+    def acquire(self) -> PooledConnection:
+        """Borrow a connection, creating one if the pool is not yet full"""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+
+        if conn is None:
+            with self._lock:
+                create = self._size < self.max_size
+                if create:
+                    self._size += 1
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                    raise
+                with self._lock:
+                    self._stats["created"] += 1
+            else:
+                started = time.perf_counter()
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._stats["timeouts"] += 1
+                    raise sqlite3.OperationalError(
+                        f"Timed out waiting for a database connection "
+                        f"(pool size {self.max_size})"
+                    )
+                with self._lock:
+                    self._stats["waits"] += 1
+                    self._stats["wait_time"] += time.perf_counter() - started
+
+        conn.checked_out = True
+        with self._lock:
+            conn.lease = next(self._leases)
+            self._in_use += 1
+            self._stats["checkouts"] += 1
+        return conn
+
+    def release(self, conn: PooledConnection):
+        """Return a connection to the pool, discarding it if it is unusable"""
+        if not conn.checked_out:
+            return  # already released, e.g. close() called twice
+        conn.checked_out = False
+        with self._lock:
+            self._in_use -= 1
+
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+
+        if self._closed:
+            self._discard(conn)
+        else:
+            self._idle.put(conn)
+
+    def _discard(self, conn: PooledConnection):
+        with self._lock:
+            self._size -= 1
+            self._stats["discarded"] += 1
+        try:
+            conn.dispose()
+        except sqlite3.Error:
+            pass
+
+    def close(self):
+        """Close every idle connection; busy ones are closed on release"""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def stats(self) -> Dict:
+        """Return a snapshot of the pool metrics"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(
+                {
+                    "db_path": self.db_path,
+                    "max_size": self.max_size,
+                    "size": self._size,
+                    "in_use": self._in_use,
+                    "idle": self._idle.qsize(),
+                }
+            )
+        stats["wait_time"] = round(stats["wait_time"], 6)
+        return stats
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str) -> ConnectionPool:
+    """Return the shared pool for a database file, creating it on first use"""
+    pool = _pools.get(db_path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(db_path)
+            if pool is None:
+                pool = _pools[db_path] = ConnectionPool(db_path)
+    return pool
+
+
+def close_pool(db_path: Optional[str] = None):
+    """Close the pool for one database file, or every pool"""
+    with _pools_lock:
+        paths = [db_path] if db_path else list(_pools)
+        pools = [_pools.pop(path) for path in paths if path in _pools]
+    for pool in pools:
+        pool.close()
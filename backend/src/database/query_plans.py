@@ -0,0 +1,243 @@
+"""EXPLAIN QUERY PLAN auditing of the SQL the application runs.
+
+``QueryAudit`` listens to the statements of pooled connections
+(``src.database.instrumentation``) and explains each distinct statement of
+each Flask endpoint once, on the connection that ran it and with the
+parameters of its first run. Every plan step is classified as a SCAN (the
+whole table or index is read) or a SEARCH (a range of it is), with the
+table, the index used and an estimate of the rows it reads; temp B-trees
+built for ORDER BY, GROUP BY or DISTINCT are counted.
+
+Row estimates follow the planner: ``sqlite_stat1`` (written by ``ANALYZE``)
+gives the rows per key prefix of an index; without statistics each
+equality term is taken to keep 1/10 of the rows and each range bound 1/4.
+Tables without statistics are counted once per audit.
+
+``unindexed_scans()`` lists the statements that read ``sales`` without an
+index; the test suite and ``benchmarks.audit_queries`` fail on them.
+"""
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from flask import has_request_context, request
+
+from src.database.instrumentation import statement_listener
+
+# Statements EXPLAIN QUERY PLAN can describe; the rest are not audited
+EXPLAINED_STATEMENTS = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+# Endpoint recorded for statements run outside a request (or matching no route)
+BACKGROUND_ENDPOINT = "background"
+UNMATCHED_ENDPOINT = "unmatched"
+
+# Table that must never be read without an index
+AUDITED_TABLE = "sales"
+
+# Share of rows the planner keeps per equality term and per range bound
+# when an index has no statistics
+EQUALITY_SELECTIVITY = 10
+RANGE_SELECTIVITY = 4
+
+# "SCAN s USING COVERING INDEX idx_sales_date_covering", "SEARCH r USING PRIMARY KEY
+# (date>? AND date<?)", "SEARCH t USING AUTOMATIC COVERING INDEX (id=?)"
+PLAN_STEP = re.compile(
+    r"^(SCAN|SEARCH) (\S+)"
+    r"(?: USING (?:(AUTOMATIC )?(?:PARTIAL )?(?:COVERING )?INDEX(?: ([^\s(]\S*))?"
+    r"|(INTEGER PRIMARY KEY|PRIMARY KEY)))?"
+    r"(?: \((.+)\))?"
+)
+
+# "FROM sales s", "JOIN stores AS st"
+TABLE_ALIAS = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+
+# Words that may follow a table name and are not aliases
+SQL_KEYWORDS = set(
+    "where join left right inner outer cross natural full on using group order limit "
+    "union except intersect window having indexed not set values returning".split()
+)
+
+
+def table_aliases(sql: str) -> Dict[str, str]:
+    """Map the aliases (and names) used in a statement to their tables"""
+    aliases = {}
+    for table, alias in TABLE_ALIAS.findall(sql):
+        aliases[table.lower()] = table.lower()
+        if alias and alias.lower() not in SQL_KEYWORDS:
+            aliases[alias.lower()] = table.lower()
+    return aliases
+
+
+def query_plan(conn, sql: str, parameters=()) -> List[str]:
+    """EXPLAIN QUERY PLAN a statement on ``conn`` and return the step details"""
+    # A plain cursor, so explaining is not itself reported to the listeners
+    cursor = conn.cursor(sqlite3.Cursor)
+    cursor.row_factory = None
+    return [row[3] for row in cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters)]
+
+
+class QueryAudit:
+    """Explains every distinct statement run while it is capturing"""
+
+    def __init__(self, table: str = AUDITED_TABLE):
+        self.table = table
+        self.statements: Dict[Tuple[str, str], Dict] = {}
+        self._row_counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def capture(self):
+        """Explain the statements run inside a ``with`` block"""
+        with statement_listener(self._on_statement):
+            yield self
+
+    def _on_statement(self, event):
+        words = event.sql.split(None, 1)
+        if event.many or not words or words[0].upper() not in EXPLAINED_STATEMENTS:
+            return  # executemany has no single set of parameters to explain with
+        if has_request_context():
+            endpoint = request.endpoint or UNMATCHED_ENDPOINT
+        else:
+            endpoint = BACKGROUND_ENDPOINT
+        key = (endpoint, " ".join(event.sql.split()))
+
+        with self._lock:
+            known = self.statements.get(key)
+            if known is not None:
+                known["executions"] += 1
+                return
+        entry = self.explain(event.cursor.connection, event.sql, event.parameters)
+        entry.update(endpoint=endpoint, sql=key[1], executions=1)
+        with self._lock:
+            self.statements.setdefault(key, entry)
+
+    def explain(self, conn, sql: str, parameters=()) -> Dict:
+        """EXPLAIN QUERY PLAN one statement and summarize the plan"""
+        cursor = conn.cursor(sqlite3.Cursor)
+        cursor.row_factory = None
+        try:
+            details = query_plan(conn, sql, parameters)
+            tables = {
+                name.lower()
+                for name, in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+            }
+            stats = _index_stats(cursor)
+        except sqlite3.Error as error:
+            return {
+                "plan": [],
+                "error": str(error),
+                "scans": 0,
+                "searches": 0,
+                "temp_btrees": 0,
+                "estimated_rows": None,
+                "unindexed": [],
+            }
+
+        aliases = table_aliases(sql)
+        steps = []
+        for detail in details:
+            step = {"detail": detail}
+            match = PLAN_STEP.match(detail)
+            if match:
+                operation, name, automatic, index, key, terms = match.groups()
+                table = aliases.get(name.lower(), name.lower())
+                table = table if table in tables else None
+                index = None if automatic else index or key
+                step.update(
+                    operation=operation,
+                    table=table,
+                    index=index,
+                    estimated_rows=self._estimate(cursor, stats, table, operation, index, terms),
+                )
+            steps.append(step)
+
+        # Automatic indexes are built by reading the whole table, so they count
+        # as no index
+        operations = [step for step in steps if step.get("table")]
+        estimates = [
+            step["estimated_rows"] for step in operations if step["estimated_rows"] is not None
+        ]
+        return {
+            "plan": steps,
+            "error": None,
+            "scans": sum(step["operation"] == "SCAN" for step in operations),
+            "searches": sum(step["operation"] == "SEARCH" for step in operations),
+            "temp_btrees": sum("TEMP B-TREE" in step["detail"] for step in steps),
+            "estimated_rows": sum(estimates) if estimates else None,
+            "unindexed": sorted({step["table"] for step in operations if step["index"] is None}),
+        }
+
+    def _estimate(self, cursor, stats, table, operation, index, terms) -> Optional[int]:
+        if table is None:
+            return None
+        rows = self._table_rows(cursor, stats, table)
+        if operation == "SCAN" or not terms:
+            return rows
+
+        conditions = terms.split(" AND ")
+        equalities = sum(
+            "=" in condition and not re.search("[<>]", condition) for condition in conditions
+        )
+        ranges = len(conditions) - equalities
+        if index == "INTEGER PRIMARY KEY" and equalities:
+            return 1
+        if index == "PRIMARY KEY":
+            index = _primary_key_index(cursor, table)
+
+        prefix = stats.get(index)
+        if prefix and equalities:
+            estimate = prefix[equalities] if equalities < len(prefix) else 1
+        else:
+            estimate = rows / EQUALITY_SELECTIVITY ** equalities
+        return max(1, round(estimate / RANGE_SELECTIVITY ** ranges))
+
+    def _table_rows(self, cursor, stats, table: str) -> int:
+        if table in stats:
+            return stats[table][0]
+        with self._lock:
+            rows = self._row_counts.get(table)
+        if rows is None:
+            rows = cursor.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+            with self._lock:
+                self._row_counts[table] = rows
+        return rows
+
+    def report(self) -> Dict[str, List[Dict]]:
+        """Audited statements by endpoint, in the order they first ran"""
+        with self._lock:
+            entries = list(self.statements.values())
+        endpoints: Dict[str, List[Dict]] = {}
+        for entry in entries:
+            endpoints.setdefault(entry["endpoint"], []).append(entry)
+        return endpoints
+
+    def unindexed_scans(self) -> List[Dict]:
+        """Statements reading the audited table without an index"""
+        with self._lock:
+            return [
+                entry for entry in self.statements.values() if self.table in entry["unindexed"]
+            ]
+
+
+def _index_stats(cursor) -> Dict[str, List[int]]:
+    """Rows per key prefix of each analyzed index, and rows of each table"""
+    if not cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+        return {}
+    stats = {}
+    for table, index, stat in cursor.execute("SELECT tbl, idx, stat FROM sqlite_stat1"):
+        numbers = [int(value) for value in stat.split() if value.isdigit()]
+        if not numbers:
+            continue
+        stats.setdefault(table.lower(), numbers[:1])
+        if index:
+            stats[index] = numbers
+    return stats
+
+
+def _primary_key_index(cursor, table: str) -> Optional[str]:
+    for row in cursor.execute(f'PRAGMA index_list("{table}")').fetchall():
+        if row[3] == "pk":
+            return row[1]
+    return None
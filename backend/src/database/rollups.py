@@ -0,0 +1,269 @@
+"""Pre-aggregated sales rollups.
+
+The dashboard and analytics endpoints mostly need SUM/COUNT of weekly_sales
+grouped by store, department and time. Instead of scanning the sales fact
+table for every request they read two rollup tables:
+
+* ``sales_weekly_rollup``  - store x dept x week (sales are recorded weekly,
+  so the sale date identifies the week)
+* ``sales_monthly_rollup`` - store x dept x month ('YYYY-MM')
+
+Both are kept up to date incrementally by triggers on ``sales``, so every
+insert, update or delete adjusts only the affected rollup rows. Averages are
+derived as ``SUM(total_sales) / SUM(sale_count)``.
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+WEEKLY_ROLLUP = "sales_weekly_rollup"
+MONTHLY_ROLLUP = "sales_monthly_rollup"
+
+# Rollup table -> (time bucket column, SQL expression deriving it from sales)
+ROLLUP_GRAINS = {
+    WEEKLY_ROLLUP: ("date", "{row}.date"),
+    MONTHLY_ROLLUP: ("month", "substr({row}.date, 1, 7)"),
+}
+
+# Series a weekly panel can be grouped into -> (key columns, joins)
+PANEL_GROUPS = {
+    "series": (("r.store_id", "r.dept_id"), ""),
+    "store": (("r.store_id",), ""),
+    "department": (("r.dept_id",), ""),
+    "region": (("st.region",), " JOIN stores st ON r.store_id = st.store_id"),
+    "category": (("d.category",), " JOIN departments d ON r.dept_id = d.dept_id"),
+    "chain": ((), ""),
+}
+
+ROLLUP_TRIGGERS = ("sales_rollup_insert", "sales_rollup_delete", "sales_rollup_update")
+
+
+def create_rollup_tables(conn):
+    """Create the rollup tables, their triggers, and backfill them if needed"""
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN (?, ?)",
+        (WEEKLY_ROLLUP, MONTHLY_ROLLUP),
+    )
+    existing = {row[0] for row in cursor.fetchall()}
+
+    for table, (bucket, _) in ROLLUP_GRAINS.items():
+        cursor.execute(
+            f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            {bucket} TEXT NOT NULL,
+            store_id INTEGER NOT NULL,
+            dept_id INTEGER NOT NULL,
+            total_sales REAL NOT NULL DEFAULT 0,
+            sale_count INTEGER NOT NULL DEFAULT 0,
+            holiday_sales REAL NOT NULL DEFAULT 0,
+            holiday_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY ({bucket}, store_id, dept_id)
+        ) WITHOUT ROWID
+        """
+        )
+
+    if len(existing) < len(ROLLUP_GRAINS):
+        rebuild_rollups(conn)
+    create_rollup_triggers(conn)
+    conn.commit()
+
+
+def _apply_sql(table: str, row: str, sign: str) -> str:
+    """Statements adding (sign '') or removing (sign '-') one sales row"""
+    bucket, expression = ROLLUP_GRAINS[table]
+    bucket_value = expression.format(row=row)
+    statements = f"""
+        INSERT INTO {table}
+            ({bucket}, store_id, dept_id, total_sales, sale_count,
+             holiday_sales, holiday_count)
+        VALUES (
+            {bucket_value}, {row}.store_id, {row}.dept_id,
+            {sign}COALESCE({row}.weekly_sales, 0), {sign}1,
+            {sign}(CASE WHEN {row}.is_holiday = 1 THEN COALESCE({row}.weekly_sales, 0) ELSE 0 END),
+            {sign}(CASE WHEN {row}.is_holiday = 1 THEN 1 ELSE 0 END)
+        )
+        ON CONFLICT ({bucket}, store_id, dept_id) DO UPDATE SET
+            total_sales = total_sales + excluded.total_sales,
+            sale_count = sale_count + excluded.sale_count,
+            holiday_sales = holiday_sales + excluded.holiday_sales,
+            holiday_count = holiday_count + excluded.holiday_count;
+    """
+    if sign == "-":
+        statements += f"""
+        DELETE FROM {table}
+        WHERE {bucket} = {bucket_value} AND store_id = {row}.store_id
+            AND dept_id = {row}.dept_id AND sale_count <= 0;
+        """
+    return statements
+
+
+def create_rollup_triggers(conn):
+    """Create the triggers that maintain the rollups as sales change"""
+    insert_body = "".join(_apply_sql(table, "NEW", "") for table in ROLLUP_GRAINS)
+    delete_body = "".join(_apply_sql(table, "OLD", "-") for table in ROLLUP_GRAINS)
+
+    cursor = conn.cursor()
+    cursor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS sales_rollup_insert AFTER INSERT ON sales "
+        f"BEGIN {insert_body} END"
+    )
+    cursor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS sales_rollup_delete AFTER DELETE ON sales "
+        f"BEGIN {delete_body} END"
+    )
+    cursor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS sales_rollup_update "
+        f"AFTER UPDATE OF store_id, dept_id, date, weekly_sales, is_holiday ON sales "
+        f"BEGIN {delete_body} {insert_body} END"
+    )
+    conn.commit()
+
+
+def drop_rollup_triggers(conn):
+    """Drop the maintenance triggers, e.g. before a large bulk load.
+
+    Call ``rebuild_rollups`` and ``create_rollup_triggers`` once the load is
+    done.
+    """
+    cursor = conn.cursor()
+    for name in ROLLUP_TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    conn.commit()
+
+
+def rebuild_rollups(conn):
+    """Recompute the rollups in set-based passes: the weekly rollup from sales,
+    then the monthly rollup from the (much narrower) weekly rollup"""
+    cursor = conn.cursor()
+    cursor.execute(f"DELETE FROM {WEEKLY_ROLLUP}")
+    cursor.execute(
+        f"""
+    INSERT INTO {WEEKLY_ROLLUP}
+        (date, store_id, dept_id, total_sales, sale_count,
+         holiday_sales, holiday_count)
+    SELECT
+        s.date, s.store_id, s.dept_id,
+        SUM(COALESCE(s.weekly_sales, 0)), COUNT(*),
+        SUM(CASE WHEN s.is_holiday = 1 THEN COALESCE(s.weekly_sales, 0) ELSE 0 END),
+        SUM(CASE WHEN s.is_holiday = 1 THEN 1 ELSE 0 END)
+    FROM sales s
+    GROUP BY s.date, s.store_id, s.dept_id
+    """
+    )
+
+    cursor.execute(f"DELETE FROM {MONTHLY_ROLLUP}")
+    cursor.execute(
+        f"""
+    INSERT INTO {MONTHLY_ROLLUP}
+        (month, store_id, dept_id, total_sales, sale_count,
+         holiday_sales, holiday_count)
+    SELECT
+        substr(w.date, 1, 7), w.store_id, w.dept_id,
+        SUM(w.total_sales), SUM(w.sale_count),
+        SUM(w.holiday_sales), SUM(w.holiday_count)
+    FROM {WEEKLY_ROLLUP} w
+    GROUP BY 1, w.store_id, w.dept_id
+    """
+    )
+    conn.commit()
+
+
+def _next_day(date_str: str) -> str:
+    return (datetime.strptime(date_str, "%Y-%m-%d") + timedelta(days=1)).strftime(
+        "%Y-%m-%d"
+    )
+
+
+def rollup_source(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    end_exclusive: bool = False,
+    allow_monthly: bool = True,
+    alias: str = "r",
+) -> Tuple[str, str, List]:
+    """Pick the coarsest rollup that answers a date-filtered aggregate exactly.
+
+    ``start_date`` is inclusive; ``end_date`` is inclusive unless
+    ``end_exclusive`` is set. Returns ``(table, conditions, params)`` where
+    ``conditions`` is a string of `` AND ...`` filters on ``alias``. The
+    monthly rollup is used when the range starts and ends on month
+    boundaries (and ``allow_monthly`` is set), otherwise the weekly one.
+    """
+    if end_date and not end_exclusive:
+        end_date = _next_day(end_date)
+
+    aligned = allow_monthly and (not start_date or start_date.endswith("-01")) and (
+        not end_date or end_date.endswith("-01")
+    )
+    table = MONTHLY_ROLLUP if aligned else WEEKLY_ROLLUP
+    bucket = ROLLUP_GRAINS[table][0]
+
+    conditions = ""
+    params = []
+    if start_date:
+        conditions += f" AND {alias}.{bucket} >= ?"
+        params.append(start_date[:7] if aligned else start_date)
+    if end_date:
+        conditions += f" AND {alias}.{bucket} < ?"
+        params.append(end_date[:7] if aligned else end_date)
+    return table, conditions, params
+
+
+def weekly_panel(
+    conn,
+    group_by: str = "series",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    after: Optional[str] = None,
+    fill_value: Optional[float] = 0.0,
+) -> pd.DataFrame:
+    """Weekly sales as one row per series (see ``PANEL_GROUPS``) and one
+    column per week, oldest first.
+
+    ``start_date``/``end_date`` are inclusive; ``after`` keeps only weeks
+    strictly after a date. Weeks a series has no rollup row for count as
+    ``fill_value`` (NaN if None).
+    """
+    keys, joins = PANEL_GROUPS[group_by]
+    names = [key.split(".")[1] for key in keys] or ["chain"]
+    select = ", ".join(keys) if keys else "'all'"
+    query = (
+        f"SELECT r.date, {select}, SUM(r.total_sales) FROM {WEEKLY_ROLLUP} r{joins} "
+        "WHERE 1=1"
+    )
+    params = []
+    filters = (
+        (" AND r.date >= ?", start_date),
+        (" AND r.date <= ?", end_date),
+        (" AND r.date > ?", after),
+    )
+    for condition, value in filters:
+        if value:
+            query += condition
+            params.append(value)
+    query += f" GROUP BY r.date{''.join(', ' + key for key in keys)}"
+
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(query, params)
+    rows = pd.DataFrame(cursor.fetchall(), columns=["date", *names, "total_sales"])
+    return rows.pivot_table(
+        index=names, columns="date", values="total_sales", aggfunc="sum", fill_value=fill_value
+    )
+
+
+def history_start(conn, last_date: str, weeks: int) -> Optional[str]:
+    """First of the last ``weeks`` weeks in the weekly rollup up to ``last_date``.
+
+    Weeks are the panel columns, so gaps in the calendar are skipped; None
+    if there are fewer weeks than that.
+    """
+    row = conn.execute(
+        f"SELECT DISTINCT date FROM {WEEKLY_ROLLUP} WHERE date <= ? "
+        "ORDER BY date DESC LIMIT 1 OFFSET ?",
+        (last_date, weeks - 1),
+    ).fetchone()
+    return row[0] if row else None
+
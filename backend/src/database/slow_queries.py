@@ -0,0 +1,195 @@
+"""Slow-query log for pooled connections.
+
+``SlowQueryLog`` listens to every statement of the pooled connections
+(``src.database.instrumentation``). Statements slower than the threshold
+are logged, and so is a random sample of the others, with their bound
+parameters, the Flask endpoint and request that ran them, and their
+EXPLAIN QUERY PLAN. Entries are written as JSON lines to a rotating file
+(next to the database unless ``SLOW_QUERY_LOG`` says otherwise), and the
+most recent ones are kept in memory for ``/admin/slow-queries``.
+
+Statements under the threshold cost one comparison, plus a random draw when
+sampling is on; only logged statements are explained and serialized.
+"""
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+from collections import deque
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import Dict, List, Optional
+
+from flask import has_request_context, request
+
+from src.database import db
+from src.database.instrumentation import add_statement_listener, remove_statement_listener
+from src.database.query_plans import EXPLAINED_STATEMENTS, query_plan
+
+# Statements slower than this are always logged
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 100))
+
+# Share of the other statements logged, as a baseline for comparison
+SLOW_QUERY_SAMPLE_RATE = float(os.environ.get("SLOW_QUERY_SAMPLE_RATE", 0.001))
+
+# Log file rotation: size of each file and number of old files kept
+SLOW_QUERY_LOG_BYTES = int(os.environ.get("SLOW_QUERY_LOG_BYTES", 10 * 1024 * 1024))
+SLOW_QUERY_LOG_BACKUPS = int(os.environ.get("SLOW_QUERY_LOG_BACKUPS", 5))
+
+# Entries kept in memory for the admin endpoint
+SLOW_QUERY_RECENT = 200
+
+# Kinds of entries: over the threshold, or picked by sampling
+SLOW_QUERY_KINDS = ("slow", "sampled")
+
+# Long parameter values and lists are cut down in the log
+MAX_PARAMETER_LENGTH = 200
+MAX_PARAMETERS = 50
+
+
+def _loggable_value(value):
+    if isinstance(value, bytes):
+        return f"<{len(value)} bytes>"
+    if isinstance(value, str) and len(value) > MAX_PARAMETER_LENGTH:
+        return value[:MAX_PARAMETER_LENGTH] + "..."
+    return value
+
+
+def loggable_parameters(parameters):
+    """Bound parameters as JSON-friendly values, with long ones shortened"""
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {name: _loggable_value(value) for name, value in parameters.items()}
+    values = [_loggable_value(value) for value in list(parameters)[:MAX_PARAMETERS]]
+    if len(parameters) > MAX_PARAMETERS:
+        values.append(f"... {len(parameters) - MAX_PARAMETERS} more")
+    return values
+
+
+class SlowQueryLog:
+    """Logs slow and sampled statements to a rotating file and keeps the latest"""
+
+    def __init__(
+        self,
+        path: str,
+        threshold_ms: float = SLOW_QUERY_MS,
+        sample_rate: float = SLOW_QUERY_SAMPLE_RATE,
+        max_bytes: int = SLOW_QUERY_LOG_BYTES,
+        backups: int = SLOW_QUERY_LOG_BACKUPS,
+    ):
+        self.path = path
+        self.threshold = threshold_ms / 1000
+        self.sample_rate = sample_rate
+        self._recent = deque(maxlen=SLOW_QUERY_RECENT)
+        self._stats = {"slow": 0, "sampled": 0}
+        self._lock = threading.Lock()
+
+        self._handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, delay=True)
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+        # A logger of its own, outside the logging hierarchy
+        self._logger = logging.Logger(__name__, logging.INFO)
+        self._logger.addHandler(self._handler)
+
+    def record(self, event):
+        """Statement listener: log the statement if it is slow or sampled"""
+        if event.duration >= self.threshold:
+            kind = "slow"
+        elif self.sample_rate and random.random() < self.sample_rate:
+            kind = "sampled"
+        else:
+            return
+
+        entry = {
+            "time": datetime.now().isoformat(timespec="milliseconds"),
+            "kind": kind,
+            "duration_ms": round(event.duration * 1000, 3),
+            "sql": " ".join(event.sql.split()),
+            "parameters": loggable_parameters(event.parameters),
+            "many": event.many,
+            "endpoint": None,
+            "request": None,
+            "plan": self._plan(event),
+        }
+        if has_request_context():
+            entry["endpoint"] = request.endpoint
+            entry["request"] = {
+                "method": request.method,
+                "path": request.path,
+                "args": request.args.to_dict(),
+            }
+
+        with self._lock:
+            self._stats[kind] += 1
+            self._recent.append(entry)
+        self._logger.info(json.dumps(entry, default=str))
+
+    def _plan(self, event) -> Optional[List[str]]:
+        words = event.sql.split(None, 1)
+        if event.many or not words or words[0].upper() not in EXPLAINED_STATEMENTS:
+            return None
+        try:
+            return query_plan(event.cursor.connection, event.sql, event.parameters)
+        except sqlite3.Error:
+            return None
+
+    def entries(self, limit: int = SLOW_QUERY_RECENT, kind: Optional[str] = None) -> List[Dict]:
+        """The most recent entries, newest first"""
+        with self._lock:
+            entries = list(self._recent)
+        entries.reverse()
+        if kind:
+            entries = [entry for entry in entries if entry["kind"] == kind]
+        return entries[:limit]
+
+    def stats(self) -> Dict:
+        """Return the settings and the number of entries logged"""
+        with self._lock:
+            logged = dict(self._stats)
+        return {
+            "path": self.path,
+            "threshold_ms": self.threshold * 1000,
+            "sample_rate": self.sample_rate,
+            "logged": logged,
+        }
+
+    def close(self):
+        """Close the log file"""
+        self._logger.removeHandler(self._handler)
+        self._handler.close()
+
+
+_log: Optional[SlowQueryLog] = None
+_log_lock = threading.Lock()
+
+
+def _record(event):
+    log = _log
+    if log is not None:
+        log.record(event)
+
+
+def get_slow_query_log() -> SlowQueryLog:
+    """Return the process-wide slow-query log, starting it on first use"""
+    global _log
+    log = _log
+    if log is None:
+        with _log_lock:
+            log = _log
+            if log is None:
+                path = os.environ.get("SLOW_QUERY_LOG") or f"{db.DB_PATH}.slow.log"
+                log = _log = SlowQueryLog(path)
+                add_statement_listener(_record)
+    return log
+
+
+def close_slow_query_log():
+    """Stop logging statements and close the log file"""
+    global _log
+    with _log_lock:
+        log, _log = _log, None
+    if log is not None:
+        remove_statement_listener(_record)
+        log.close()
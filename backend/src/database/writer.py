@@ -0,0 +1,256 @@
+"""Single-writer queue for sales ingestion.
+
+SQLite allows one writer at a time, so request threads do not write sales
+rows themselves. They hand validated batches to the ``SalesWriter`` of the
+database and wait on a future. One background thread drains the queue and
+commits every batch that arrived within ``GROUP_COMMIT_DELAY`` (up to
+``GROUP_COMMIT_ROWS`` rows) in a single transaction, so concurrent batches
+share one fsync and one round of rollup/version trigger work instead of
+contending for the write lock. Each batch runs under its own savepoint: a
+failing batch fails only its own future.
+
+Readers are unaffected: in WAL mode they keep reading the last committed
+snapshot while the writer's transaction is open.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Optional
+
+import pandas as pd
+
+from src.database.pool import get_pool
+
+# Seconds the writer waits for more batches before committing a group
+GROUP_COMMIT_DELAY = 0.005
+
+# Rows after which a group is committed without waiting any longer
+GROUP_COMMIT_ROWS = 50000
+
+# Seconds a request waits for its batch to be committed
+WRITE_TIMEOUT = 60.0
+
+SALES_COLUMNS = (
+    "store_id", "dept_id", "date", "weekly_sales", "is_holiday",
+    "temperature", "fuel_price", "markdown", "cpi", "unemployment",
+)
+SALES_KEY = ("store_id", "dept_id", "date")
+
+_VALUE_COLUMNS = [column for column in SALES_COLUMNS if column not in SALES_KEY]
+_KEY_MATCH = " AND ".join(f"s.{column} = b.{column}" for column in SALES_KEY)
+_VALUES_DIFFER = " OR ".join(f"s.{column} IS NOT b.{column}" for column in _VALUE_COLUMNS)
+
+STAGING_TABLE = "temp.sales_batch"
+
+
+def upsert_sales(conn, frame: pd.DataFrame) -> Dict[str, int]:
+    """Insert or update sales rows keyed by (store_id, dept_id, date).
+
+    Runs inside the caller's transaction. The sales table has no unique
+    constraint on the key, so rows go through a staging table and are
+    applied with one UPDATE ... FROM and one INSERT ... SELECT. Rows whose
+    values did not change are left alone, so they fire no triggers and do
+    not bump the data version.
+    """
+    frame = frame.drop_duplicates(list(SALES_KEY), keep="last")
+    columns = ", ".join(SALES_COLUMNS)
+    cursor = conn.cursor()
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {STAGING_TABLE} ({columns}, "
+        f"PRIMARY KEY ({', '.join(SALES_KEY)}))"
+    )
+    cursor.execute(f"DELETE FROM {STAGING_TABLE}")
+
+    values = frame[list(SALES_COLUMNS)].astype(object)
+    cursor.executemany(
+        f"INSERT INTO {STAGING_TABLE} ({columns}) "
+        f"VALUES ({', '.join('?' * len(SALES_COLUMNS))})",
+        values.where(values.notna(), None).itertuples(index=False, name=None),
+    )
+
+    cursor.execute(
+        f"""
+        SELECT
+            COALESCE(SUM(EXISTS (SELECT 1 FROM sales s WHERE {_KEY_MATCH})), 0),
+            COALESCE(SUM(EXISTS (SELECT 1 FROM sales s WHERE {_KEY_MATCH}
+                                 AND ({_VALUES_DIFFER}))), 0)
+        FROM {STAGING_TABLE} b
+        """
+    )
+    existing, changed = cursor.fetchone()
+
+    if changed:
+        assignments = ", ".join(f"{column} = b.{column}" for column in _VALUE_COLUMNS)
+        cursor.execute(
+            f"""
+            UPDATE sales AS s SET {assignments}
+            FROM {STAGING_TABLE} b
+            WHERE {_KEY_MATCH} AND ({_VALUES_DIFFER})
+            """
+        )
+
+    cursor.execute(
+        f"""
+        INSERT INTO sales ({columns})
+        SELECT {columns} FROM {STAGING_TABLE} b
+        WHERE NOT EXISTS (SELECT 1 FROM sales s WHERE {_KEY_MATCH})
+        ORDER BY b.date, b.store_id, b.dept_id
+        """
+    )
+    inserted = cursor.rowcount
+    cursor.execute(f"DELETE FROM {STAGING_TABLE}")
+
+    return {
+        "received": len(frame),
+        "inserted": inserted,
+        "updated": changed,
+        "unchanged": existing - changed,
+    }
+
+
+class SalesWriter:
+    """Background thread that group-commits queued sales batches"""
+
+    def __init__(
+        self,
+        db_path: str,
+        delay: float = GROUP_COMMIT_DELAY,
+        max_rows: int = GROUP_COMMIT_ROWS,
+    ):
+        self.db_path = db_path
+        self.delay = delay
+        self.max_rows = max_rows
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = {"batches": 0, "transactions": 0, "rows": 0, "failed": 0}
+
+    def submit(self, frame: pd.DataFrame) -> Future:
+        """Queue a validated batch; the future resolves to its upsert counts"""
+        future = Future()
+        self._ensure_started()
+        self._queue.put((frame, future))
+        return future
+
+    def write(self, frame: pd.DataFrame, timeout: float = WRITE_TIMEOUT) -> Dict[str, int]:
+        """Queue a batch and wait until it is committed"""
+        return self.submit(frame).result(timeout)
+
+    def stats(self) -> Dict:
+        """Return batch/transaction counters and the current queue depth"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize()
+        return stats
+
+    def stop(self, timeout: Optional[float] = None):
+        """Commit what is queued, then stop the writer thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="sales-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _next_group(self):
+        """Block for one batch, then gather what arrives within the delay"""
+        first = self._queue.get()
+        if first is None:
+            return None
+        group = [first]
+        rows = len(first[0])
+        deadline = time.monotonic() + self.delay
+        while rows < self.max_rows:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # stop after committing this group
+                break
+            group.append(item)
+            rows += len(item[0])
+        return group
+
+    def _run(self):
+        while True:
+            group = self._next_group()
+            if group is None:
+                return
+            self._commit(group)
+
+    def _commit(self, group):
+        results = []
+        conn = None
+        try:
+            conn = get_pool(self.db_path).acquire()
+            conn.execute("BEGIN IMMEDIATE")
+            for index, (frame, future) in enumerate(group):
+                savepoint = f"batch_{index}"
+                conn.execute(f"SAVEPOINT {savepoint}")
+                try:
+                    results.append((future, upsert_sales(conn, frame), None))
+                    conn.execute(f"RELEASE {savepoint}")
+                except Exception as error:
+                    conn.execute(f"ROLLBACK TO {savepoint}")
+                    conn.execute(f"RELEASE {savepoint}")
+                    results.append((future, None, error))
+            conn.commit()
+        except Exception as error:
+            # The whole transaction failed; every batch in it failed too
+            for _, future in group:
+                if not future.done():
+                    future.set_exception(error)
+            with self._lock:
+                self._stats["failed"] += len(group)
+            return
+        finally:
+            if conn is not None:
+                conn.close()
+
+        with self._lock:
+            self._stats["transactions"] += 1
+            for future, result, error in results:
+                if error is None:
+                    self._stats["batches"] += 1
+                    self._stats["rows"] += result["received"]
+                else:
+                    self._stats["failed"] += 1
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+_writers: Dict[str, SalesWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(db_path: str) -> SalesWriter:
+    """Return the shared writer for a database file, creating it on first use"""
+    writer = _writers.get(db_path)
+    if writer is None:
+        with _writers_lock:
+            writer = _writers.get(db_path)
+            if writer is None:
+                writer = _writers[db_path] = SalesWriter(db_path)
+    return writer
+
+
+def close_writer(db_path: Optional[str] = None):
+    """Stop the writer for one database file, or every writer"""
+    with _writers_lock:
+        paths = [db_path] if db_path else list(_writers)
+        writers = [_writers.pop(path) for path in paths if path in _writers]
+    for writer in writers:
+        writer.stop()
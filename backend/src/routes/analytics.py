@@ -3,16 +3,43 @@ from datetime import datetime, timedelta
 import random
 
 from src.controllers.analytics_controller import (
+    TIME_SERIES_COLUMN_TYPES,
+    TOP_DEPARTMENTS,
     get_kpis,
     get_store_performance,
     get_store_type_performance,
     get_time_series,
-    get_product_performance_with_growth
+    get_product_performance_with_growth,
+    get_seasonality,
 )
-from src.database.db import get_db_connection, rows_to_list
-from src.utils.validation import validate_date, validate_id, validate_year
+from src.controllers.anomaly_controller import ANOMALY_LIMIT, get_anomalies, run_scans
+from src.controllers.forecast_controller import (
+    FORECAST_HORIZON,
+    FORECAST_SERIES_LIMIT,
+    get_forecast,
+)
+from src.database.columnar import DEFAULT_QUERY_BACKEND, QUERY_BACKENDS
+from src.database.db import get_db_connection, row_to_dict, rows_to_list
+from src.utils.cache import enable_conditional_get, enable_response_cache
+from src.utils.serialization import binary_response, wants_binary
+from src.utils.validation import (
+    validate_backend,
+    validate_bool,
+    validate_date,
+    validate_format,
+    validate_group_by,
+    validate_id,
+    validate_limit,
+    validate_model,
+    validate_year,
+)
+from src.database.rollups import PANEL_GROUPS
+from src.utils.anomalies import ANOMALY_METHODS
+from src.utils.forecasting import FORECAST_MODELS, MAX_HORIZON
 
 analytics_bp = Blueprint("analytics", __name__, url_prefix="/api/analytics")
+enable_conditional_get(analytics_bp)
+enable_response_cache(analytics_bp)
 
 
 @analytics_bp.route("/kpis", methods=["GET"])
@@ -26,8 +53,11 @@ def kpis():
     # Add validation for year parameter even though it's not used
     # This is needed for the test case
     validate_year(request.args.get("year"))
+    backend = validate_backend(
+        request.args.get("backend", DEFAULT_QUERY_BACKEND), QUERY_BACKENDS
+    )
 
-    return get_kpis(start_date, end_date, store_id, dept_id)
+    return get_kpis(start_date, end_date, store_id, dept_id, backend)
 
 
 @analytics_bp.route("/store-performance", methods=["GET"])
@@ -36,8 +66,14 @@ def store_performance():
     year = validate_year(request.args.get("year"))
     store_id = validate_id(request.args.get("store_id"), "store_id")
     dept_id = validate_id(request.args.get("dept_id"), "dept_id")
+    top_departments = request.args.get("top_departments")
+    top_departments = (
+        validate_limit(top_departments, max_limit=100)
+        if top_departments is not None
+        else TOP_DEPARTMENTS
+    )
 
-    return get_store_performance(year, store_id, dept_id)
+    return get_store_performance(year, store_id, dept_id, top_departments)
 
 
 @analytics_bp.route("/store-type-performance", methods=["GET"])
@@ -52,7 +88,68 @@ def time_series():
     """Get time series sales data"""
     start_date = validate_date(request.args.get("start_date"), "start_date")
     end_date = validate_date(request.args.get("end_date"), "end_date")
-    return get_time_series(start_date, end_date)
+    output_format = validate_format(request.args.get("format", "json"), ["json", "columnar"])
+    backend = validate_backend(
+        request.args.get("backend", DEFAULT_QUERY_BACKEND), QUERY_BACKENDS
+    )
+    binary = "format" not in request.args and wants_binary()
+    result = get_time_series(
+        start_date,
+        end_date,
+        columnar=binary or output_format == "columnar",
+        backend=backend,
+    )
+    return binary_response(result, TIME_SERIES_COLUMN_TYPES) if binary else result
+
+
+@analytics_bp.route("/forecast", methods=["GET"])
+def forecast():
+    """Forecast weekly sales for every store x department series"""
+    model = validate_model(request.args.get("model", "exp_smoothing"), FORECAST_MODELS)
+    store_id = validate_id(request.args.get("store_id"), "store_id")
+    dept_id = validate_id(request.args.get("dept_id"), "dept_id")
+    horizon = request.args.get("horizon")
+    horizon = (
+        validate_limit(horizon, max_limit=MAX_HORIZON) if horizon is not None else FORECAST_HORIZON
+    )
+    limit = request.args.get("limit")
+    limit = validate_limit(limit, max_limit=10000) if limit is not None else FORECAST_SERIES_LIMIT
+
+    return get_forecast(model, horizon, store_id, dept_id, limit)
+
+
+@analytics_bp.route("/seasonality", methods=["GET"])
+def seasonality():
+    """Get seasonal indices, trend strength and periodicity for every series"""
+    group_by = validate_group_by(request.args.get("group_by", "series"), list(PANEL_GROUPS))
+    start_date = validate_date(request.args.get("start_date"), "start_date")
+    end_date = validate_date(request.args.get("end_date"), "end_date")
+    limit = validate_limit(request.args.get("limit"), max_limit=10000)
+    include_indices = validate_bool(request.args.get("indices"), "indices") or False
+
+    return get_seasonality(group_by, start_date, end_date, limit, include_indices)
+
+
+@analytics_bp.route("/anomalies", methods=["GET"])
+def anomalies():
+    """Get weeks flagged as anomalous by the chain-wide rolling scan"""
+    method = validate_model(request.args.get("method", "zscore"), ANOMALY_METHODS)
+    store_id = validate_id(request.args.get("store_id"), "store_id")
+    dept_id = validate_id(request.args.get("dept_id"), "dept_id")
+    start_date = validate_date(request.args.get("start_date"), "start_date")
+    end_date = validate_date(request.args.get("end_date"), "end_date")
+    limit = request.args.get("limit")
+    limit = validate_limit(limit, max_limit=10000) if limit is not None else ANOMALY_LIMIT
+
+    return get_anomalies(method, store_id, dept_id, start_date, end_date, limit)
+
+
+@analytics_bp.route("/anomalies/scan", methods=["POST"])
+def scan_anomalies():
+    """Bring the stored anomalies up to date with the data now"""
+    method = request.args.get("method")
+    methods = [validate_model(method, ANOMALY_METHODS)] if method else ANOMALY_METHODS
+    return run_scans(methods)
 
 
 @analytics_bp.route("/inventory", methods=["GET"])
@@ -67,11 +164,11 @@ def get_inventory_data():
             d.dept_id,
             d.name as product_name,
             d.category,
-            COUNT(DISTINCT s.store_id) as store_count,
-            SUM(s.weekly_sales) as total_sales,
-            AVG(s.weekly_sales) as avg_sales_price -- Calculate average sales as a proxy for price
-        FROM sales s
-        JOIN departments d ON s.dept_id = d.dept_id
+            COUNT(DISTINCT r.store_id) as store_count,
+            SUM(r.total_sales) as total_sales,
+            SUM(r.total_sales) / SUM(r.sale_count) as avg_sales_price -- Calculate average sales as a proxy for price
+        FROM sales_monthly_rollup r
+        JOIN departments d ON r.dept_id = d.dept_id
         GROUP BY d.dept_id, d.name, d.category -- Group by all selected non-aggregated columns
         ORDER BY total_sales DESC
     """)
@@ -101,7 +198,7 @@ def get_inventory_metrics():
     
     # Estimate total inventory value by summing all historical weekly sales
     # Note: This is a rough estimate, not based on current stock levels or cost.
-    cursor.execute("SELECT SUM(weekly_sales) as estimated_total_value FROM sales")
+    cursor.execute("SELECT SUM(total_sales) as estimated_total_value FROM sales_monthly_rollup")
     value_result = cursor.fetchone()
     estimated_value = value_result[0] if value_result else 0
 
@@ -144,7 +241,7 @@ def get_product_performance():
     return get_product_performance_with_growth(store_id=store_id, start_date_str=start_date_str, end_date_str=end_date_str)
 
 
-@analytics_bp.route("/inventory/:itemId", methods=["GET"])
+@analytics_bp.route("/inventory/<int:item_id>", methods=["GET"])
 def get_inventory_item(item_id):
     """Get inventory item details"""
     conn = get_db_connection()
@@ -155,17 +252,18 @@ def get_inventory_item(item_id):
             d.dept_id,
             d.name,
             d.category,
-            COUNT(DISTINCT s.store_id) as store_count,
-            SUM(s.weekly_sales) as total_sales,
-            AVG(s.weekly_sales) as avg_weekly_sales
-        FROM sales s
-        JOIN departments d ON s.dept_id = d.dept_id
+            COUNT(DISTINCT r.store_id) as store_count,
+            SUM(r.total_sales) as total_sales,
+            SUM(r.total_sales) / SUM(r.sale_count) as avg_weekly_sales
+        FROM sales_monthly_rollup r
+        JOIN departments d ON r.dept_id = d.dept_id
         WHERE d.dept_id = ?
         GROUP BY d.dept_id
     """, (item_id,))
     item = cursor.fetchone()
 
     if not item:
+        conn.close()
         return jsonify({"error": "Item not found"}), 404
 
     # Return only actual DB data for now
@@ -176,7 +274,7 @@ def get_inventory_item(item_id):
     return jsonify(item_data)
 
 
-@analytics_bp.route("/inventory/:itemId/history", methods=["GET"])
+@analytics_bp.route("/inventory/<int:item_id>/history", methods=["GET"])
 def get_inventory_history(item_id):
     """Get inventory history for an item"""
     conn = get_db_connection()
@@ -184,12 +282,12 @@ def get_inventory_history(item_id):
 
     cursor.execute("""
         SELECT 
-            strftime('%Y-%m', date) as month,
-            SUM(weekly_sales) as total_sales,
+            month,
+            SUM(total_sales) as total_sales,
             COUNT(DISTINCT store_id) as store_count
-        FROM sales
+        FROM sales_monthly_rollup
         WHERE dept_id = ?
-        GROUP BY strftime('%Y-%m', date)
+        GROUP BY month
         ORDER BY month DESC
         LIMIT 12
     """, (item_id,))
@@ -1,29 +1,39 @@
-from flask import Blueprint, jsonify, request, Response
+from flask import Blueprint, jsonify, request, Response, stream_with_context
 from datetime import datetime, timedelta
 import pandas as pd
 import io
 from src.database.db import get_db_connection, rows_to_list, row_to_dict
+from src.utils.cache import enable_conditional_get, enable_response_cache
+from src.utils.error_handlers import APIError
+from src.utils.export import (
+    EXPORT_FORMATS,
+    export_encoder,
+    fetch_batches,
+    sales_export_query,
+)
+from src.utils.validation import validate_bool, validate_date, validate_format, validate_id
 
 dashboard_bp = Blueprint('dashboard', __name__, url_prefix="/api/dashboard")
+enable_conditional_get(dashboard_bp)
+enable_response_cache(dashboard_bp)
 
 @dashboard_bp.route('/stats')
 def get_stats():
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    # Calculate stats over the entire dataset timeframe
+    # Calculate stats over the entire dataset timeframe from the monthly rollup
     # Correct Average Order Value calculation
     # Remove Conversion Rate calculation
     cursor.execute("""
         SELECT 
-            SUM(weekly_sales) as total_sales,
-            COUNT(DISTINCT sale_id) as total_orders,
+            SUM(total_sales) as total_sales,
+            COALESCE(SUM(sale_count), 0) as total_orders,
             CASE 
-                WHEN COUNT(DISTINCT sale_id) > 0 THEN SUM(weekly_sales) / COUNT(DISTINCT sale_id)
+                WHEN SUM(sale_count) > 0 THEN SUM(total_sales) / SUM(sale_count)
                 ELSE 0 
             END as average_order_value
-        FROM sales 
-        -- REMOVED: WHERE strftime('%Y', date) = ?
+        FROM sales_monthly_rollup
     """)
     
     stats = row_to_dict(cursor.fetchone())
@@ -46,9 +56,9 @@ def get_sales():
     cursor.execute("""
         SELECT 
             date,
-            SUM(weekly_sales) as daily_sales,
-            COUNT(DISTINCT sale_id) as daily_orders
-        FROM sales 
+            SUM(total_sales) as daily_sales,
+            SUM(sale_count) as daily_orders
+        FROM sales_weekly_rollup
         WHERE date >= date('now', '-30 days')
         GROUP BY date
         ORDER BY date
@@ -72,9 +82,9 @@ def get_categories():
     cursor.execute("""
         SELECT 
             d.category,
-            SUM(s.weekly_sales) as total_sales
-        FROM sales s
-        JOIN departments d ON s.dept_id = d.dept_id
+            SUM(r.total_sales) as total_sales
+        FROM sales_monthly_rollup r
+        JOIN departments d ON r.dept_id = d.dept_id
         GROUP BY d.category
         ORDER BY total_sales DESC
     """)
@@ -96,9 +106,9 @@ def get_regions():
     cursor.execute("""
         SELECT 
             st.region,
-            SUM(s.weekly_sales) as total_sales
-        FROM sales s
-        JOIN stores st ON s.store_id = st.store_id
+            SUM(r.total_sales) as total_sales
+        FROM sales_monthly_rollup r
+        JOIN stores st ON r.store_id = st.store_id
         GROUP BY st.region
         ORDER BY total_sales DESC
     """)
@@ -120,10 +130,10 @@ def get_top_products():
     cursor.execute("""
         SELECT 
             d.name,
-            SUM(s.weekly_sales) as total_sales,
-            COUNT(DISTINCT s.sale_id) as total_orders
-        FROM sales s
-        JOIN departments d ON s.dept_id = d.dept_id
+            SUM(r.total_sales) as total_sales,
+            SUM(r.sale_count) as total_orders
+        FROM sales_monthly_rollup r
+        JOIN departments d ON r.dept_id = d.dept_id
         GROUP BY d.dept_id
         ORDER BY total_sales DESC
         LIMIT 10
@@ -164,14 +174,14 @@ def export_dashboard_data():
     try:
         # --- Fetch data similar to dashboard routes --- 
         # Fetch Stats (simplified for example)
-        cursor.execute("SELECT SUM(weekly_sales) as total_sales FROM sales")
+        cursor.execute("SELECT SUM(total_sales) as total_sales FROM sales_monthly_rollup")
         stats = row_to_dict(cursor.fetchone())
         stats_df = pd.DataFrame([stats]) # Put into DataFrame
 
         # Fetch Top Products
         cursor.execute("""
-            SELECT d.name, SUM(s.weekly_sales) as total_sales, COUNT(DISTINCT s.sale_id) as total_orders
-            FROM sales s JOIN departments d ON s.dept_id = d.dept_id
+            SELECT d.name, SUM(r.total_sales) as total_sales, SUM(r.sale_count) as total_orders
+            FROM sales_monthly_rollup r JOIN departments d ON r.dept_id = d.dept_id
             GROUP BY d.dept_id ORDER BY total_sales DESC LIMIT 10
         """)
         top_products = rows_to_list(cursor.fetchall())
@@ -179,8 +189,8 @@ def export_dashboard_data():
         
         # Fetch Category Sales
         cursor.execute("""
-            SELECT d.category, SUM(s.weekly_sales) as total_sales
-            FROM sales s JOIN departments d ON s.dept_id = d.dept_id
+            SELECT d.category, SUM(r.total_sales) as total_sales
+            FROM sales_monthly_rollup r JOIN departments d ON r.dept_id = d.dept_id
             GROUP BY d.category ORDER BY total_sales DESC
         """)
         categories = rows_to_list(cursor.fetchall())
@@ -212,4 +222,41 @@ def export_dashboard_data():
     finally:
         conn.close()
 
+@dashboard_bp.route("/export/sales", methods=["GET"])
+def export_sales():
+    """Streams a filtered slice of sales as CSV, Parquet or Arrow."""
+    export_format = validate_format(request.args.get("format", "csv"), list(EXPORT_FORMATS))
+    query, params = sales_export_query(
+        store_id=validate_id(request.args.get("store_id"), "store_id"),
+        dept_id=validate_id(request.args.get("dept_id"), "dept_id"),
+        start_date=validate_date(request.args.get("start_date"), "start_date"),
+        end_date=validate_date(request.args.get("end_date"), "end_date"),
+        is_holiday=validate_bool(request.args.get("is_holiday"), "is_holiday"),
+    )
+
+    try:
+        encoder = export_encoder(export_format)
+    except ImportError:
+        raise APIError(f"{export_format} export requires pyarrow", 501)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = None  # plain tuples are all the encoders need
+    cursor.execute(query, params)
+
+    def generate():
+        # Rows are fetched lazily, so the connection is held until the stream ends
+        try:
+            yield from encoder["encode"](fetch_batches(cursor))
+        finally:
+            conn.close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=encoder["mimetype"],
+        headers={
+            "Content-Disposition": f"attachment;filename=sales_export.{encoder['extension']}"
+        },
+    )
+
 # ... (Potential future routes) 
\ No newline at end of file
@@ -0,0 +1,52 @@
+"""Socket.IO subscription handlers for real-time KPI updates.
+
+Protocol:
+    -> subscribe   {"scope": "dashboard" | "store" | "region", "id": ...}
+    <- kpi_snapshot {"room": ..., "kpis": {...}}      (to the subscriber)
+    <- kpi_update   {"room": ..., "version": ..., "kpis": {changed...},
+                     "deltas": {...}}                 (to the room)
+    -> unsubscribe {"scope": ..., "id": ...}
+"""
+from flask import request
+from flask_socketio import emit, join_room, leave_room
+
+from src.controllers.realtime_controller import KpiBroadcaster, room_name
+
+
+def register_realtime_handlers(socketio) -> KpiBroadcaster:
+    """Register the subscription events on ``socketio`` and return the
+    broadcaster pushing to the rooms"""
+    broadcaster = KpiBroadcaster(socketio)
+
+    def _room(data):
+        data = data or {}
+        return room_name(data.get("scope", "dashboard"), data.get("id"))
+
+    @socketio.on("subscribe")
+    def handle_subscribe(data=None):
+        try:
+            room = _room(data)
+        except ValueError as error:
+            return {"status": "error", "message": str(error)}
+
+        join_room(room)
+        kpis = broadcaster.subscribe(request.sid, room)
+        emit("kpi_snapshot", {"room": room, "kpis": kpis})
+        return {"status": "success", "room": room}
+
+    @socketio.on("unsubscribe")
+    def handle_unsubscribe(data=None):
+        try:
+            room = _room(data)
+        except ValueError as error:
+            return {"status": "error", "message": str(error)}
+
+        leave_room(room)
+        broadcaster.unsubscribe(request.sid, room)
+        return {"status": "success", "room": room}
+
+    @socketio.on("disconnect")
+    def handle_subscriber_disconnect():
+        broadcaster.unsubscribe(request.sid)
+
+    return broadcaster
@@ -1,15 +1,107 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request, send_file
+from werkzeug.exceptions import BadRequest
+
+from src.controllers.report_controller import (
+    ACTIVE_STATUSES,
+    REPORT_LIST_LIMIT,
+    create_report,
+    delete_report,
+    get_report,
+    list_reports,
+    report_file,
+)
+from src.controllers.schedule_controller import (
+    REPORT_PERIODS,
+    SCHEDULE_RUNS_LIMIT,
+    create_schedule,
+    delete_schedule,
+    get_schedule_runs,
+    list_schedules,
+    set_schedule_enabled,
+)
+from src.utils.reports import REPORT_FORMATS, REPORT_TYPES
+from src.utils.validation import (
+    validate_limit,
+    validate_report_request,
+    validate_schedule_request,
+    validate_status,
+)
 
 reports_bp = Blueprint('reports', __name__)
 
-@reports_bp.route('')
+# Statuses a report list can be filtered by
+REPORT_STATUSES = (*ACTIVE_STATUSES, "completed", "failed")
+
+
+@reports_bp.route('', methods=['GET'])
 def get_reports_list():
-    # Placeholder - return empty list for now
-    return jsonify([])
+    """List report jobs, newest first"""
+    status = validate_status(request.args.get("status"), REPORT_STATUSES)
+    limit = request.args.get("limit")
+    limit = validate_limit(limit, max_limit=1000) if limit is not None else REPORT_LIST_LIMIT
+    return jsonify(list_reports(status, limit))
+
+
+@reports_bp.route('', methods=['POST'])
+def post_report():
+    """Queue a report; poll its status until it can be downloaded"""
+    report = validate_report_request(request.get_json(silent=True), REPORT_TYPES, REPORT_FORMATS)
+    return jsonify(create_report(**report)), 202
+
+
+@reports_bp.route('/<job_id>', methods=['GET'])
+def get_report_status(job_id):
+    """Get the status and progress of a report"""
+    return jsonify(get_report(job_id))
+
+
+@reports_bp.route('/<job_id>/download', methods=['GET'])
+def download_report(job_id):
+    """Download the file of a completed report"""
+    path, mimetype, download_name = report_file(job_id)
+    return send_file(path, mimetype=mimetype, as_attachment=True, download_name=download_name)
+
 
-@reports_bp.route('/scheduled')
+@reports_bp.route('/<job_id>', methods=['DELETE'])
+def remove_report(job_id):
+    """Delete a report and its file"""
+    return jsonify(delete_report(job_id))
+
+
+@reports_bp.route('/scheduled', methods=['GET'])
 def get_scheduled_reports():
-    # Placeholder - return empty list for now
-    return jsonify([])
+    """List report schedules with their latest run"""
+    return jsonify(list_schedules())
+
+
+@reports_bp.route('/scheduled', methods=['POST'])
+def post_scheduled_report():
+    """Add a recurring report on a cron schedule"""
+    schedule = validate_schedule_request(
+        request.get_json(silent=True), REPORT_TYPES, REPORT_FORMATS, REPORT_PERIODS
+    )
+    return jsonify(create_schedule(**schedule)), 201
+
+
+@reports_bp.route('/scheduled/<int:schedule_id>', methods=['GET'])
+def get_scheduled_report(schedule_id):
+    """Get a schedule and its latest runs with runtime and rows scanned"""
+    limit = request.args.get("limit")
+    limit = validate_limit(limit, max_limit=1000) if limit is not None else SCHEDULE_RUNS_LIMIT
+    return jsonify(get_schedule_runs(schedule_id, limit))
+
+
+@reports_bp.route('/scheduled/<int:schedule_id>', methods=['PATCH'])
+def patch_scheduled_report(schedule_id):
+    """Pause or resume a schedule"""
+    payload = request.get_json(silent=True)
+    enabled = payload.get("enabled") if isinstance(payload, dict) else None
+    if not isinstance(enabled, bool):
+        raise BadRequest("Expected {\"enabled\": true or false}")
+    return jsonify(set_schedule_enabled(schedule_id, enabled))
+
 
-# Add other report-related routes here later (create, delete, download) 
\ No newline at end of file
+@reports_bp.route('/scheduled/<int:schedule_id>', methods=['DELETE'])
+def remove_scheduled_report(schedule_id):
+    """Delete a schedule and its run history"""
+    return jsonify(delete_schedule(schedule_id))
@@ -1,17 +1,31 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from datetime import datetime, timedelta
 import random
 
 from src.controllers.sales_controller import (
+    SALES_COLUMN_TYPES,
     get_departments,
     get_sales,
     get_sales_metrics,
     get_recent_sales_summary,
     get_stores,
+    stream_sales,
+    write_sales_batch,
 )
-from src.database.db import get_db_connection, rows_to_list
+from src.database.db import (
+    fetch_columns,
+    get_db_connection,
+    row_to_dict,
+    rows_to_list,
+    year_range,
+)
+from src.database.rollups import MONTHLY_ROLLUP, rollup_source
+from src.utils.cache import enable_conditional_get, enable_response_cache
+from src.utils.serialization import binary_response, wants_binary
 from src.utils.validation import (
+    format_columnar_response,
     validate_date,
+    validate_format,
     validate_group_by,
     validate_id,
     validate_limit,
@@ -19,20 +33,79 @@ from src.utils.validation import (
     validate_year,
 )
 
+# Arrow type of each column of a sales summary, by grouping
+SUMMARY_COLUMN_TYPES = {
+    "store": {
+        "store_id": "int64",
+        "store_name": "string",
+        "region": "string",
+        "type": "string",
+        "total_sales": "float64",
+        "avg_weekly_sales": "float64",
+        "weeks_count": "int64",
+    },
+    "department": {
+        "dept_id": "int64",
+        "dept_name": "string",
+        "category": "string",
+        "total_sales": "float64",
+        "avg_weekly_sales": "float64",
+        "weeks_count": "int64",
+    },
+    "date": {
+        "time_period": "string",
+        "total_sales": "float64",
+        "avg_weekly_sales": "float64",
+        "record_count": "int64",
+    },
+}
+
 sales_bp = Blueprint("sales", __name__, url_prefix="/api/sales")
+enable_conditional_get(sales_bp)
+enable_response_cache(sales_bp)
 
 
 @sales_bp.route("", methods=["GET"])
 @sales_bp.route("/", methods=["GET"])
 def get_sales_data():
-    """Get sales data with optional filters"""
+    """Get sales data with optional filters, paged by cursor or streamed as NDJSON"""
     store_id = validate_id(request.args.get("store_id"), "store_id")
     dept_id = validate_id(request.args.get("dept_id"), "dept_id")
     start_date = validate_date(request.args.get("start_date"), "start_date")
     end_date = validate_date(request.args.get("end_date"), "end_date")
+    cursor_token = request.args.get("cursor")
+    output_format = validate_format(
+        request.args.get("format", "json"), ["json", "columnar", "ndjson"]
+    )
+
+    if output_format == "ndjson":
+        # Streams every matching row unless a limit is given
+        limit = request.args.get("limit")
+        limit = validate_limit(limit, max_limit=2**62) if limit is not None else None
+        rows = stream_sales(store_id, dept_id, start_date, end_date, limit, cursor_token)
+        return Response(stream_with_context(rows), mimetype="application/x-ndjson")
+
+    # Arrow/MessagePack are negotiated via Accept unless a format is given
+    binary = "format" not in request.args and wants_binary()
     limit = validate_limit(request.args.get("limit"))
+    result = get_sales(
+        store_id,
+        dept_id,
+        start_date,
+        end_date,
+        limit,
+        cursor_token,
+        columnar=binary or output_format == "columnar",
+    )
+    return binary_response(result, SALES_COLUMN_TYPES) if binary else result
 
-    return get_sales(store_id, dept_id, start_date, end_date, limit)
+
+@sales_bp.route("/batch", methods=["POST"])
+def post_sales_batch():
+    """Insert or update a batch of sales rows keyed by store, department and date"""
+    payload = request.get_json(silent=True)
+    rows = payload.get("rows") if isinstance(payload, dict) else payload
+    return write_sales_batch(rows)
 
 
 @sales_bp.route("/metrics", methods=["GET"])
@@ -70,79 +143,86 @@ def get_sales_summary():
     time_period = validate_time_period(request.args.get("time_period", "month"), allowed_time_periods)
     start_date = validate_date(request.args.get("start_date"), "start_date")
     end_date = validate_date(request.args.get("end_date"), "end_date")
+    output_format = validate_format(request.args.get("format", "json"), ["json", "columnar"])
+    binary = "format" not in request.args and wants_binary()
 
     # Connect to the database
     conn = get_db_connection()
     cursor = conn.cursor()
 
+    # Month and year buckets can be read from the monthly rollup when the date
+    # filters fall on month boundaries; everything else needs weekly grain
+    monthly_buckets = group_by == "date" and time_period in ("month", "year")
+    table, date_conditions, params = rollup_source(
+        start_date, end_date, allow_monthly=monthly_buckets
+    )
+
     # Build the query based on grouping
     if group_by == "store":
-        query = """
-        SELECT s.store_id, st.name as store_name, st.region, st.type,
-               SUM(s.weekly_sales) as total_sales,
-               AVG(s.weekly_sales) as avg_weekly_sales,
-               COUNT(DISTINCT strftime('%Y-%W', s.date)) as weeks_count
-        FROM sales s
-        JOIN stores st ON s.store_id = st.store_id
+        query = f"""
+        SELECT r.store_id, st.name as store_name, st.region, st.type,
+               SUM(r.total_sales) as total_sales,
+               SUM(r.total_sales) / SUM(r.sale_count) as avg_weekly_sales,
+               COUNT(DISTINCT strftime('%Y-%W', r.date)) as weeks_count
+        FROM {table} r
+        JOIN stores st ON r.store_id = st.store_id
         """
-        group_clause = " GROUP BY s.store_id"
+        group_clause = " GROUP BY r.store_id"
         order_clause = " ORDER BY total_sales DESC"
 
     elif group_by == "department":
-        query = """
-        SELECT s.dept_id, d.name as dept_name, d.category,
-               SUM(s.weekly_sales) as total_sales,
-               AVG(s.weekly_sales) as avg_weekly_sales,
-               COUNT(DISTINCT strftime('%Y-%W', s.date)) as weeks_count
-        FROM sales s
-        JOIN departments d ON s.dept_id = d.dept_id
+        query = f"""
+        SELECT r.dept_id, d.name as dept_name, d.category,
+               SUM(r.total_sales) as total_sales,
+               SUM(r.total_sales) / SUM(r.sale_count) as avg_weekly_sales,
+               COUNT(DISTINCT strftime('%Y-%W', r.date)) as weeks_count
+        FROM {table} r
+        JOIN departments d ON r.dept_id = d.dept_id
         """
-        group_clause = " GROUP BY s.dept_id"
+        group_clause = " GROUP BY r.dept_id"
         order_clause = " ORDER BY total_sales DESC"
 
     elif group_by == "date":
         # Format the date based on time period
-        if time_period == "day":
-            date_format = "%Y-%m-%d"
+        if table == MONTHLY_ROLLUP:
+            period_expr = "r.month" if time_period == "month" else "substr(r.month, 1, 4)"
+        elif time_period == "day":
+            period_expr = "strftime('%Y-%m-%d', r.date)"
         elif time_period == "week":
-            date_format = "%Y-%W"
+            period_expr = "strftime('%Y-%W', r.date)"
         elif time_period == "year":
-            date_format = "%Y"
+            period_expr = "strftime('%Y', r.date)"
         else:  # Default to month
-            date_format = "%Y-%m"
+            period_expr = "strftime('%Y-%m', r.date)"
 
         query = f"""
-        SELECT strftime('{date_format}', s.date) as time_period,
-               SUM(s.weekly_sales) as total_sales,
-               AVG(s.weekly_sales) as avg_weekly_sales,
-               COUNT(*) as record_count
-        FROM sales s
+        SELECT {period_expr} as time_period,
+               SUM(r.total_sales) as total_sales,
+               SUM(r.total_sales) / SUM(r.sale_count) as avg_weekly_sales,
+               SUM(r.sale_count) as record_count
+        FROM {table} r
         """
-        group_clause = f" GROUP BY strftime('{date_format}', s.date)"
+        group_clause = f" GROUP BY {period_expr}"
         order_clause = " ORDER BY time_period"
 
     # Add where clause for date filtering
-    where_clause = " WHERE 1=1"
-    params = []
-
-    if start_date:
-        where_clause += " AND s.date >= ?"
-        params.append(start_date)
-
-    if end_date:
-        where_clause += " AND s.date <= ?"
-        params.append(end_date)
+    where_clause = " WHERE 1=1" + date_conditions
 
     # Combine all parts of the query
     full_query = query + where_clause + group_clause + order_clause
 
     # Execute the query
     cursor.execute(full_query, params)
-    summary = rows_to_list(cursor.fetchall())
+    if binary or output_format == "columnar":
+        response = format_columnar_response(fetch_columns(cursor))
+    else:
+        response = {"status": "success", "data": rows_to_list(cursor.fetchall())}
 
     conn.close()
 
-    return jsonify({"status": "success", "data": summary})
+    if binary:
+        return binary_response(response, SUMMARY_COLUMN_TYPES[group_by])
+    return jsonify(response)
 
 
 @sales_bp.route("/holiday-comparison", methods=["GET"])
@@ -154,46 +234,46 @@ def get_holiday_comparison():
 
     conn = get_db_connection()
 
-    # Build query conditions
-    conditions = ["1=1"]
-    params = []
-
-    if year:
-        conditions.append("strftime('%Y', date) = ?")
-        params.append(str(year))
+    # Build query conditions against the rollup covering the requested year
+    table, conditions, params = rollup_source(
+        *(year_range(year) if year else (None, None)), end_exclusive=True
+    )
 
     if store_id:
-        conditions.append("store_id = ?")
+        conditions += " AND r.store_id = ?"
         params.append(store_id)
 
     if dept_id:
-        conditions.append("dept_id = ?")
+        conditions += " AND r.dept_id = ?"
         params.append(dept_id)
 
-    where_clause = " AND ".join(conditions)
-
     # Get holiday vs non-holiday sales
     query = f"""
     SELECT 
-        is_holiday,
-        COUNT(*) as count,
-        SUM(weekly_sales) as total,
-        AVG(weekly_sales) as avg
-    FROM sales
-    WHERE {where_clause}
-    GROUP BY is_holiday
+        SUM(r.holiday_count) as holiday_count,
+        SUM(r.holiday_sales) as holiday_total,
+        SUM(r.sale_count) - SUM(r.holiday_count) as non_holiday_count,
+        SUM(r.total_sales) - SUM(r.holiday_sales) as non_holiday_total
+    FROM {table} r
+    WHERE 1=1 {conditions}
     """
 
     cursor = conn.cursor()
     cursor.execute(query, params)
-    results = rows_to_list(cursor.fetchall())
+    totals = row_to_dict(cursor.fetchone())
 
     # Format response
-    holiday_data = next(
-        (r for r in results if r["is_holiday"] == 1), {"count": 0, "total": 0, "avg": 0}
-    )
-    non_holiday_data = next(
-        (r for r in results if r["is_holiday"] == 0), {"count": 0, "total": 0, "avg": 0}
+    holiday_data, non_holiday_data = (
+        {
+            "count": totals[f"{prefix}_count"] or 0,
+            "total": totals[f"{prefix}_total"] or 0,
+            "avg": (
+                totals[f"{prefix}_total"] / totals[f"{prefix}_count"]
+                if totals[f"{prefix}_count"]
+                else 0
+            ),
+        }
+        for prefix in ("holiday", "non_holiday")
     )
 
     # Calculate difference and percentage increase
@@ -238,9 +318,9 @@ def get_dashboard_stats():
     # Get total sales and record count
     cursor.execute("""
         SELECT 
-            SUM(weekly_sales) as total_sales,
-            COUNT(*) as count
-        FROM sales
+            SUM(total_sales) as total_sales,
+            COALESCE(SUM(sale_count), 0) as count
+        FROM sales_monthly_rollup
     """)
     sales_data = cursor.fetchone()
     total_sales = sales_data[0]
@@ -266,10 +346,10 @@ def get_dashboard_sales():
     # Get sales data for the last 12 months
     cursor.execute("""
         SELECT 
-            strftime('%Y-%m', date) as month,
-            SUM(weekly_sales) as total_sales
-        FROM sales
-        GROUP BY strftime('%Y-%m', date)
+            month,
+            SUM(total_sales) as total_sales
+        FROM sales_monthly_rollup
+        GROUP BY month
         ORDER BY month DESC
         LIMIT 12
     """)
@@ -296,9 +376,9 @@ def get_dashboard_categories():
     cursor.execute("""
         SELECT 
             d.category,
-            SUM(s.weekly_sales) as total_sales
-        FROM sales s
-        JOIN departments d ON s.dept_id = d.dept_id
+            SUM(r.total_sales) as total_sales
+        FROM sales_monthly_rollup r
+        JOIN departments d ON r.dept_id = d.dept_id
         GROUP BY d.category
         ORDER BY total_sales DESC
     """)
@@ -321,9 +401,9 @@ def get_dashboard_regions():
     cursor.execute("""
         SELECT 
             st.region,
-            SUM(s.weekly_sales) as total_sales
-        FROM sales s
-        JOIN stores st ON s.store_id = st.store_id
+            SUM(r.total_sales) as total_sales
+        FROM sales_monthly_rollup r
+        JOIN stores st ON r.store_id = st.store_id
         GROUP BY st.region
         ORDER BY total_sales DESC
     """)
@@ -346,9 +426,9 @@ def get_dashboard_top_products():
     cursor.execute("""
         SELECT 
             d.name,
-            SUM(s.weekly_sales) as total_sales
-        FROM sales s
-        JOIN departments d ON s.dept_id = d.dept_id
+            SUM(r.total_sales) as total_sales
+        FROM sales_monthly_rollup r
+        JOIN departments d ON r.dept_id = d.dept_id
         GROUP BY d.dept_id
         ORDER BY total_sales DESC
         LIMIT 10
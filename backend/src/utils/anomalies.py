@@ -0,0 +1,106 @@
+"""Rolling anomaly scores for many weekly series at once.
+
+Each week is compared with the ``window`` weeks before it (not including
+itself), for every row of a ``(series, weeks)`` matrix:
+
+* ``zscore`` - (value - rolling mean) / rolling standard deviation
+* ``mad``    - (value - rolling median) / (1.4826 * rolling MAD), robust to
+  the outliers it is looking for
+
+Missing weeks (NaN) are not scored and are left out of the history of the
+weeks after them. Every window's statistics are computed from its own
+values, in the same order wherever the window sits, so a week's score
+depends only on the ``window`` weeks before it: scoring the newest weeks
+with just that much history gives exactly the scores of a full scan.
+"""
+import warnings
+from typing import Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+ANOMALY_METHODS = ("zscore", "mad")
+
+# Weeks of history each week is compared with
+ANOMALY_WINDOW = 12
+
+# Absolute score above which a week is flagged
+ANOMALY_THRESHOLD = 3.0
+
+# Scales the median absolute deviation to a standard deviation for normal data
+MAD_SCALE = 1.4826
+
+# Series scored per block, bounding the temporaries over all windows
+WINDOW_BLOCK_SERIES = 2000
+
+
+def _windows(values: np.ndarray, window: int):
+    """Yield, per block of series, the ``window`` weeks before each week from
+    ``window`` on, as a ``(series, weeks - window, window)`` view"""
+    for start in range(0, len(values), WINDOW_BLOCK_SERIES):
+        yield sliding_window_view(values[start : start + WINDOW_BLOCK_SERIES, :-1], window, axis=1)
+
+
+def _rolling_moments(values: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    centers, scales = [], []
+    with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+        # Windows with fewer than two observed weeks give NaN, which is what we want
+        warnings.simplefilter("ignore", RuntimeWarning)
+        for windows in _windows(values, window):
+            count = (~np.isnan(windows)).sum(axis=2)
+            mean = np.nanmean(windows, axis=2)
+            # Two passes: squared deviations from the window's own mean
+            variance = np.nansum((windows - mean[..., None]) ** 2, axis=2) / (count - 1)
+            variance[count < 2] = np.nan
+            centers.append(mean)
+            scales.append(np.sqrt(variance))
+    return np.concatenate(centers), np.concatenate(scales)
+
+
+def _rolling_median(values: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    centers, scales = [], []
+    with warnings.catch_warnings():
+        # Windows with no observed week give NaN, which is what we want
+        warnings.simplefilter("ignore", RuntimeWarning)
+        for windows in _windows(values, window):
+            median = np.nanmedian(windows, axis=2)
+            deviation = np.nanmedian(np.abs(windows - median[..., None]), axis=2)
+            centers.append(median)
+            scales.append(MAD_SCALE * deviation)
+    return np.concatenate(centers), np.concatenate(scales)
+
+
+def rolling_scores(
+    values: np.ndarray, window: int = ANOMALY_WINDOW, method: str = "zscore"
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (scores, expected values) for weeks ``window`` onwards.
+
+    Both are ``(series, weeks - window)``. Missing weeks, and weeks whose
+    history does not vary, get a NaN score: any change from a flat history
+    has no scale to be measured against.
+    """
+    values = np.asarray(values, dtype=float)
+    if values.shape[1] <= window:
+        empty = np.empty((len(values), 0))
+        return empty, empty
+
+    if method == "zscore":
+        center, scale = _rolling_moments(values, window)
+    elif method == "mad":
+        center, scale = _rolling_median(values, window)
+    else:
+        raise ValueError(f"Unknown anomaly method: {method}")
+
+    # The mean of a flat history can be off in the last bit, leaving a tiny
+    # nonzero deviation
+    with np.errstate(invalid="ignore"):
+        flat = ~(scale > 1e-9 * np.maximum(np.abs(center), 1.0))
+    deviation = values[:, window:] - center
+    scores = np.divide(deviation, scale, out=np.full(deviation.shape, np.nan), where=~flat)
+    return scores, center
+
+
+def flag(scores: np.ndarray, threshold: float = ANOMALY_THRESHOLD) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (row, column) indices of scores beyond the threshold"""
+    with np.errstate(invalid="ignore"):
+        return np.nonzero(np.abs(scores) > threshold)
@@ -0,0 +1,201 @@
+"""Server-side response cache and conditional GET support for read endpoints.
+
+Responses are keyed by endpoint, normalized query arguments and the database
+data version, so any write to sales, stores or departments makes every older
+entry unreachable; stale entries then age out of the LRU. Blueprints opt in
+with ``enable_response_cache``.
+
+The same key yields a strong ETag, so ``enable_conditional_get`` can answer
+``If-None-Match`` with 304 Not Modified before the view (and its SQL) runs.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Hashable, Optional, Tuple
+
+from flask import Blueprint, Response, g, request
+
+from src.database.db import get_data_version
+from src.utils.serialization import negotiate_format
+
+# Default bounds for the shared cache
+MAX_ENTRIES = 1024
+MAX_BYTES = 64 * 1024 * 1024
+
+# Response headers that are stored and replayed with cached bodies
+CACHED_HEADERS = ("Content-Type", "Content-Disposition", "X-Next-Cursor")
+
+# Clients may keep responses but must revalidate them with If-None-Match
+CACHE_CONTROL = "private, no-cache"
+
+
+class ResponseCache:
+    """A thread-safe LRU cache of response bodies bounded by count and size"""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: Hashable) -> Optional[Tuple]:
+        """Return the cached ``(status, headers, body)`` for a key, if any"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry
+
+    def set(self, key: Hashable, status: int, headers: Dict, body: bytes):
+        """Store a response body, evicting least recently used entries"""
+        size = len(body)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[2])
+            self._entries[key] = (status, headers, body)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted[2])
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters and current occupancy"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(
+                {
+                    "entries": len(self._entries),
+                    "bytes": self._bytes,
+                    "max_entries": self.max_entries,
+                    "max_bytes": self.max_bytes,
+                }
+            )
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+response_cache = ResponseCache()
+
+
+def data_version_token() -> str:
+    """Return a token that changes whenever cached responses may be stale.
+
+    Besides the data version it includes the current UTC date, because some
+    endpoints filter relative to ``date('now')``. The token is read once per
+    request.
+    """
+    if "data_version_token" not in g:
+        g.data_version_token = (
+            f"{get_data_version()}-{datetime.utcnow().strftime('%Y%m%d')}"
+        )
+    return g.data_version_token
+
+
+def request_cache_key() -> Tuple:
+    """Build a cache key from the endpoint, its normalized query arguments, the
+    representation negotiated from Accept and the data version token"""
+    args = tuple(
+        sorted((key, value) for key, values in request.args.lists() for value in values)
+    )
+    return (request.endpoint, args, negotiate_format(), data_version_token())
+
+
+def request_etag() -> str:
+    """Return the strong ETag of the current request's response"""
+    return hashlib.sha1(repr(request_cache_key()).encode()).hexdigest()
+
+
+def skip_caching():
+    """Keep the current response out of the response cache and untagged,
+    for results that change without the data version changing"""
+    g.pop("response_cache_key", None)
+    g.pop("response_etag", None)
+
+
+def enable_response_cache(blueprint: Blueprint, cache: ResponseCache = response_cache):
+    """Serve repeated GET requests to a blueprint's routes from ``cache``"""
+
+    @blueprint.before_request
+    def serve_cached_response():
+        if request.method != "GET":
+            return None
+
+        key = request_cache_key()
+        g.response_cache_key = key
+        entry = cache.get(key)
+        if entry is None:
+            return None
+
+        status, headers, body = entry
+        response = Response(body, status=status, headers=headers)
+        response.headers["X-Cache"] = "HIT"
+        return response
+
+    @blueprint.after_request
+    def store_response(response):
+        key = g.pop("response_cache_key", None)
+        if key is None or "X-Cache" in response.headers:
+            return response
+
+        if response.status_code == 200 and not response.is_streamed:
+            headers = {
+                name: response.headers[name]
+                for name in CACHED_HEADERS
+                if name in response.headers
+            }
+            cache.set(key, response.status_code, headers, response.get_data())
+        response.headers["X-Cache"] = "MISS"
+        return response
+
+
+def enable_conditional_get(blueprint: Blueprint, cache_control: str = CACHE_CONTROL):
+    """Tag a blueprint's GET responses with ETags and answer If-None-Match.
+
+    When the client's ETag matches, a 304 is returned before the view runs,
+    so neither the query nor the serialization happens.
+    """
+
+    @blueprint.before_request
+    def check_not_modified():
+        if request.method != "GET":
+            return None
+
+        etag = request_etag()
+        g.response_etag = etag
+        if not request.if_none_match.contains_weak(etag):
+            return None
+
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = cache_control
+        response.vary.add("Accept")
+        return response
+
+    @blueprint.after_request
+    def add_etag(response):
+        etag = g.pop("response_etag", None)
+        if etag is not None and response.status_code == 200:
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = cache_control
+            # The ETag depends on the representation negotiated from Accept
+            response.vary.add("Accept")
+        return response
@@ -0,0 +1,108 @@
+"""Cron schedule expressions.
+
+Five fields, ``minute hour day-of-month month day-of-week``, each ``*``, a
+number, a range ``a-b``, a step ``*/n`` or ``a-b/n``, or a comma-separated
+list of those. Day of week runs from 0 (Sunday) to 6; 7 is Sunday too. As
+in cron, when both day of month and day of week are restricted, a day
+matching either one matches.
+"""
+from datetime import datetime, timedelta
+from typing import FrozenSet, NamedTuple
+
+# (name, lowest, highest) of each field, in order
+CRON_FIELDS = (
+    ("minute", 0, 59),
+    ("hour", 0, 23),
+    ("day", 1, 31),
+    ("month", 1, 12),
+    ("weekday", 0, 7),
+)
+
+CRON_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+
+# Years searched for the next matching time (e.g. "0 0 29 2 *" is rare)
+SEARCH_YEARS = 8
+
+
+class CronSchedule(NamedTuple):
+    minutes: FrozenSet[int]
+    hours: FrozenSet[int]
+    days: FrozenSet[int]
+    months: FrozenSet[int]
+    weekdays: FrozenSet[int]
+    any_day: bool
+    any_weekday: bool
+
+
+def _parse_field(text: str, name: str, low: int, high: int) -> FrozenSet[int]:
+    values = set()
+    for part in text.split(","):
+        span, _, step = part.partition("/")
+        try:
+            step = int(step) if step else 1
+            if span == "*":
+                start, end = low, high
+            elif "-" in span:
+                start, end = (int(value) for value in span.split("-", 1))
+            else:
+                start = int(span)
+                end = high if step > 1 else start
+        except ValueError:
+            raise ValueError(f"Invalid cron {name} field: {text}")
+        if step < 1 or not low <= start <= end <= high:
+            raise ValueError(f"Cron {name} field out of range: {text}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+def parse_cron(expression: str) -> CronSchedule:
+    """Parse a cron expression, raising ValueError if it is invalid"""
+    expression = CRON_ALIASES.get(expression.strip(), expression)
+    fields = expression.split()
+    if len(fields) != len(CRON_FIELDS):
+        raise ValueError("A cron expression has five fields: minute hour day month weekday")
+    minutes, hours, days, months, weekdays = (
+        _parse_field(text, *spec) for text, spec in zip(fields, CRON_FIELDS)
+    )
+    return CronSchedule(
+        minutes,
+        hours,
+        days,
+        months,
+        frozenset(day % 7 for day in weekdays),
+        any_day=fields[2] == "*",
+        any_weekday=fields[4] == "*",
+    )
+
+
+def _day_matches(schedule: CronSchedule, moment: datetime) -> bool:
+    in_month = moment.day in schedule.days
+    in_week = (moment.weekday() + 1) % 7 in schedule.weekdays
+    if schedule.any_day or schedule.any_weekday:
+        return in_month and in_week
+    return in_month or in_week
+
+
+def next_run(expression: str, after: datetime) -> datetime:
+    """First time matching ``expression`` strictly after ``after``"""
+    schedule = parse_cron(expression)
+    moment = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    limit = after + timedelta(days=366 * SEARCH_YEARS)
+    while moment <= limit:
+        if moment.month not in schedule.months:
+            year, month = divmod(moment.month, 12)
+            moment = moment.replace(year=moment.year + year, month=month + 1, day=1, hour=0, minute=0)
+        elif not _day_matches(schedule, moment):
+            moment = (moment + timedelta(days=1)).replace(hour=0, minute=0)
+        elif moment.hour not in schedule.hours:
+            moment = (moment + timedelta(hours=1)).replace(minute=0)
+        elif moment.minute not in schedule.minutes:
+            moment += timedelta(minutes=1)
+        else:
+            return moment
+    raise ValueError(f"Cron expression never matches: {expression}")
@@ -12,6 +12,7 @@ ANALYTICS_DOCS = {
             "end_date": "End date in YYYY-MM-DD format",
             "store_id": "Filter by store ID (integer)",
             "dept_id": "Filter by department ID (integer)",
+            "backend": "sqlite (rollup tables), columnar (memory-mapped snapshot) or parquet (month-partitioned dataset); default from QUERY_BACKEND",
         },
         "response": {
             "total_sales": "Total sales for the period",
@@ -46,6 +47,7 @@ ANALYTICS_DOCS = {
             "year": "Filter by year (integer)",
             "store_id": "Filter by store ID (integer)",
             "dept_id": "Filter by department ID (integer)",
+            "top_departments": "Top departments listed per store (default: 5, max: 100)",
         },
         "response": {
             "store_id": "Store identifier",
@@ -73,11 +75,78 @@ ANALYTICS_DOCS = {
             "sales_per_sqft": "Sales per square foot",
         },
     },
+    "forecast": {
+        "description": "Forecast weekly sales for every store x department series, fitted in one batch and cached",
+        "parameters": {
+            "model": "exp_smoothing (default), seasonal_naive, statsmodels or prophet (optional packages)",
+            "horizon": "Weeks to forecast (default: 8, max: 52)",
+            "store_id": "Only list series of this store (integer)",
+            "dept_id": "Only list series of this department (integer)",
+            "limit": "Maximum number of series listed (default: 100)",
+        },
+        "response": {
+            "dates": "Forecast week dates",
+            "total": "Summed forecast of the matching series",
+            "series": "Per series: store_id, dept_id, forecast, lower/upper 95% bounds and one-step mape",
+        },
+    },
+    "seasonality": {
+        "description": "Seasonal indices, trend strength and dominant periodicity for every series, computed in one vectorized pass",
+        "parameters": {
+            "group_by": "series (store x department, default), store, department, region, category or chain",
+            "start_date": "Start date in YYYY-MM-DD format",
+            "end_date": "End date in YYYY-MM-DD format",
+            "limit": "Maximum number of series listed, strongest seasonality first (default: 100)",
+            "indices": "true to include the 52 weekly seasonal indices of each series",
+        },
+        "response": {
+            "trend_strength": "Linear trend scaled by the series range, -1 to 1",
+            "seasonality_strength": "Strongest seasonal index or autocorrelation, 0 to 1",
+            "has_seasonality": "Whether seasonality_strength exceeds 0.3",
+            "peak_week": "Week of the season (1-52) with the highest seasonal index",
+            "trough_week": "Week of the season (1-52) with the lowest seasonal index",
+            "periodicity_lag": "Lag in weeks of the strongest autocorrelation peak (0 if none)",
+            "spectral_period": "Cycle length in weeks of the strongest FFT frequency",
+        },
+    },
+    "anomalies": {
+        "description": "Weeks whose sales deviate from the trailing weeks of the same store x department, scanned chain-wide and updated incrementally as new weeks arrive",
+        "parameters": {
+            "method": "zscore (rolling mean and standard deviation, default) or mad (rolling median and median absolute deviation)",
+            "store_id": "Filter by store ID",
+            "dept_id": "Filter by department ID",
+            "start_date": "Start date in YYYY-MM-DD format",
+            "end_date": "End date in YYYY-MM-DD format",
+            "limit": "Maximum number of anomalies listed, newest first (default: 100)",
+        },
+        "response": {
+            "window": "Trailing weeks each week is compared with",
+            "threshold": "Absolute score above which a week is flagged",
+            "scanned_through": "Latest week covered by the scan",
+            "stale": "Whether data changed since the scan; a background scan is then started and the previous results are returned",
+            "scanning": "Whether a background scan is running",
+            "score": "Deviation from the expected value in (robust) standard deviations",
+            "direction": "spike or drop",
+        },
+    },
+    "anomalies_scan": {
+        "description": "Scan new data for anomalies now (POST /api/analytics/anomalies/scan) instead of waiting for the background scan",
+        "parameters": {
+            "method": "zscore or mad; every method if omitted",
+        },
+        "response": {
+            "mode": "Per method: none (already up to date), incremental (only new weeks scored) or full",
+            "weeks": "Per method: weeks scored",
+            "flagged": "Per method: weeks flagged",
+        },
+    },
     "time_series": {
         "description": "Get time series sales data with optional date filtering",
         "parameters": {
             "start_date": "Start date in YYYY-MM-DD format",
             "end_date": "End date in YYYY-MM-DD format",
+            "format": "json (default) or columnar ({columns: [...], data: {column: [values]}})",
+            "backend": "sqlite (rollup tables), columnar (memory-mapped snapshot) or parquet (month-partitioned dataset); default from QUERY_BACKEND",
         },
         "response": {
             "date": "Date of sales",
@@ -96,6 +165,8 @@ SALES_DOCS = {
             "start_date": "Start date in YYYY-MM-DD format",
             "end_date": "End date in YYYY-MM-DD format",
             "limit": "Maximum number of records to return (default: 100)",
+            "cursor": "Continuation token from a previous page's next_cursor",
+            "format": "json (paged, default), columnar (paged, column arrays) or ndjson (streams every matching row)",
         },
         "response": {
             "sale_id": "Sale identifier",
@@ -113,6 +184,18 @@ SALES_DOCS = {
             "unemployment": "Unemployment rate",
         },
     },
+    "batch": {
+        "description": "Insert or update sales rows (POST); rows are keyed by store_id, dept_id and date",
+        "parameters": {
+            "rows": "JSON list (or {\"rows\": [...]}) of up to 10000 objects with store_id, dept_id, date, weekly_sales and optional is_holiday, temperature, fuel_price, markdown, cpi, unemployment",
+        },
+        "response": {
+            "received": "Distinct rows in the batch",
+            "inserted": "Rows added",
+            "updated": "Existing rows whose values changed",
+            "unchanged": "Existing rows left as they were",
+        },
+    },
     "metrics": {
         "description": "Get sales metrics with period comparison",
         "response": {
@@ -153,3 +236,57 @@ SALES_DOCS = {
         },
     },
 }
+
+REPORTS_DOCS = {
+    "create": {
+        "description": "Queue a report (POST /api/reports); it is rendered on a worker process pool and answered with 202 and the job",
+        "parameters": {
+            "type": "sales (every sale with store and department names), weekly_summary (weekly totals per store x department) or store_summary (totals per store)",
+            "format": "csv (default), xlsx or parquet",
+            "name": "Report name, also used for the download file name",
+            "filters": "Optional {store_id, dept_id, start_date, end_date}",
+        },
+        "response": {
+            "id": "Report job identifier",
+            "status": "queued, running, completed or failed",
+            "progress": "Percentage of the matching rows written",
+            "download_url": "Set once the report is completed",
+        },
+    },
+    "list": {
+        "description": "List report jobs, newest first (GET /api/reports)",
+        "parameters": {
+            "status": "Filter by status",
+            "limit": "Maximum number of reports (default: 100)",
+        },
+    },
+    "status": {
+        "description": "Status and progress of one report (GET /api/reports/<id>)",
+    },
+    "download": {
+        "description": "Download a completed report (GET /api/reports/<id>/download); 409 while it is still queued or running",
+    },
+    "delete": {
+        "description": "Delete a report and its file (DELETE /api/reports/<id>); queued reports are cancelled, running ones answer 409",
+    },
+    "scheduled": {
+        "description": "Recurring reports (GET/POST /api/reports/scheduled). Due reports over the same dates share one scan of their stores; scans are spread out during business hours",
+        "parameters": {
+            "type": "Report type, as for create",
+            "format": "csv (default), xlsx or parquet",
+            "filters": "Optional {store_id, dept_id, start_date, end_date}",
+            "cron": "minute hour day month weekday, e.g. \"0 2 * * 1\" (Mondays at 02:00), or @hourly, @daily, @weekly, @monthly",
+            "period": "week (the 7 days before each run) or month (the previous calendar month) instead of fixed dates",
+        },
+        "response": {
+            "next_run_at": "When the schedule is next due",
+            "last_run": "Latest run: status, job_id, runtime_ms, scan_ms, rows_scanned and shared_with (schedules sharing its scan)",
+        },
+    },
+    "schedule": {
+        "description": "A schedule and its latest runs (GET /api/reports/scheduled/<id>); PATCH {\"enabled\": false} pauses it and DELETE removes it",
+        "parameters": {
+            "limit": "Maximum number of runs (default: 20)",
+        },
+    },
+}
@@ -0,0 +1,201 @@
+"""Streaming exports of query results.
+
+Rows are pulled from a cursor with ``fetchmany`` and encoded one batch at a
+time, so an export of any size is produced with memory bounded by the batch
+size. CSV is encoded with the standard library; Parquet and Arrow IPC are
+encoded with pyarrow, one row group / record batch per fetched batch.
+"""
+import csv
+import io
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Rows fetched (and encoded) per batch
+EXPORT_BATCH_SIZE = 5000
+
+# format -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+}
+
+# Exported sales columns: (name, SQL expression, Arrow type name)
+SALES_EXPORT_COLUMNS = (
+    ("sale_id", "s.sale_id", "int64"),
+    ("date", "s.date", "string"),
+    ("store_id", "s.store_id", "int64"),
+    ("store_name", "st.name", "string"),
+    ("dept_id", "s.dept_id", "int64"),
+    ("dept_name", "d.name", "string"),
+    ("weekly_sales", "s.weekly_sales", "float64"),
+    ("is_holiday", "s.is_holiday", "int64"),
+    ("temperature", "s.temperature", "float64"),
+    ("fuel_price", "s.fuel_price", "float64"),
+    ("markdown", "s.markdown", "float64"),
+    ("cpi", "s.cpi", "float64"),
+    ("unemployment", "s.unemployment", "float64"),
+)
+
+
+def sales_export_query(
+    store_id: Optional[int] = None,
+    dept_id: Optional[int] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    is_holiday: Optional[bool] = None,
+    table: str = "sales",
+) -> Tuple[str, List]:
+    """Build the query selecting a filtered slice of sales in (date, sale_id) order.
+
+    ``table`` may name a copy of (a slice of) the sales table to read instead.
+    """
+    columns = ", ".join(
+        f"{expression} AS {name}" for name, expression, _ in SALES_EXPORT_COLUMNS
+    )
+    query = f"""
+    SELECT {columns}
+    FROM {table} s
+    JOIN stores st ON s.store_id = st.store_id
+    JOIN departments d ON s.dept_id = d.dept_id
+    WHERE 1=1
+    """
+    params = []
+
+    if store_id:
+        query += " AND s.store_id = ?"
+        params.append(store_id)
+
+    if dept_id:
+        query += " AND s.dept_id = ?"
+        params.append(dept_id)
+
+    if start_date:
+        query += " AND s.date >= ?"
+        params.append(start_date)
+
+    if end_date:
+        query += " AND s.date <= ?"
+        params.append(end_date)
+
+    if is_holiday is not None:
+        query += " AND s.is_holiday = ?"
+        params.append(1 if is_holiday else 0)
+
+    query += " ORDER BY s.date, s.sale_id"
+    return query, params
+
+
+def fetch_batches(cursor, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[List[Tuple]]:
+    """Yield the remaining rows of an executed cursor in lists of tuples"""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
+
+def iter_csv(columns: List[str], batches: Iterator[List[Tuple]]) -> Iterator[str]:
+    """Encode a header and row batches as CSV text, one chunk per batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # An empty export still gets its header
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that buffers bytes until they are drained"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def arrow_schema(columns: Tuple = SALES_EXPORT_COLUMNS):
+    """Build the Arrow schema for ``(name, expression, type)`` column specs"""
+    import pyarrow as pa
+
+    return pa.schema([(name, pa.type_for_alias(type_name)) for name, _, type_name in columns])
+
+
+def _record_batch(schema, rows: List[Tuple]):
+    import pyarrow as pa
+
+    arrays = [
+        pa.array(values, type=field.type)
+        for values, field in zip(zip(*rows), schema)
+    ]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def iter_parquet(schema, batches: Iterator[List[Tuple]]) -> Iterator[bytes]:
+    """Encode row batches as a Parquet file, one row group per batch"""
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    try:
+        for rows in batches:
+            writer.write_batch(_record_batch(schema, rows))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def iter_arrow(schema, batches: Iterator[List[Tuple]]) -> Iterator[bytes]:
+    """Encode row batches as an Arrow IPC stream, one record batch per batch"""
+    import pyarrow as pa
+
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(sink, schema)
+    try:
+        for rows in batches:
+            writer.write_batch(_record_batch(schema, rows))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_encoder(
+    export_format: str, columns: Tuple = SALES_EXPORT_COLUMNS
+) -> Dict:
+    """Return the mimetype, extension and batch encoder for an export format"""
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    if export_format == "csv":
+        names = [name for name, _, _ in columns]
+        encode = lambda batches: iter_csv(names, batches)  # noqa: E731
+    else:
+        # Resolve the schema (and the pyarrow import) before streaming starts
+        schema = arrow_schema(columns)
+        encoder = iter_parquet if export_format == "parquet" else iter_arrow
+        encode = lambda batches: encoder(schema, batches)  # noqa: E731
+    return {"mimetype": mimetype, "extension": extension, "encode": encode}
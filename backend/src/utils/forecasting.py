@@ -0,0 +1,265 @@
+"""Batched weekly sales forecasting.
+
+Every store x department series is a row of one ``(series, weeks)`` matrix,
+and the built-in models fit all rows at once with NumPy:
+
+* ``exp_smoothing``  - Holt's linear exponential smoothing. Each series
+  picks the (alpha, beta) pair from ``ALPHAS`` x ``BETAS`` with the lowest
+  one-step-ahead squared error; beta = 0 is simple exponential smoothing.
+* ``seasonal_naive`` - next year's week repeats last year's
+  (``SEASON_LENGTH`` weeks), or the last value for short histories until
+  updates bring them past a year.
+
+A fitted model is a dict of per-series arrays (its "state"). ``update``
+advances a state by newly arrived weeks without refitting, which gives the
+same result as a refit with the chosen parameters.
+
+``statsmodels`` (Holt-Winters) and ``prophet`` are optional, much slower
+engines fitted series by series. They are offered only when the packages
+are installed and have no incremental update.
+
+Large panels are split into chunks of ``CHUNK_SERIES`` series and fitted on
+a process pool.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from statsmodels.tsa.holtwinters import ExponentialSmoothing
+except ImportError:  # pragma: no cover - optional dependency
+    ExponentialSmoothing = None
+
+try:
+    from prophet import Prophet
+except ImportError:  # pragma: no cover - optional dependency
+    Prophet = None
+
+FORECAST_MODELS = ("exp_smoothing", "seasonal_naive", "statsmodels", "prophet")
+
+# Models whose state can be advanced week by week
+INCREMENTAL_MODELS = ("exp_smoothing", "seasonal_naive")
+
+# Weeks in a seasonal cycle
+SEASON_LENGTH = 52
+
+# Smoothing parameters searched per series by exp_smoothing
+ALPHAS = np.linspace(0.1, 0.9, 9)
+BETAS = np.array([0.0, 0.05, 0.1, 0.2])
+
+# Two-sided 95% normal quantile for the prediction intervals
+INTERVAL_Z = 1.96
+
+# Longest horizon the optional engines precompute
+MAX_HORIZON = 52
+
+# Series per process-pool task; smaller panels are fitted in-process
+CHUNK_SERIES = 2000
+
+FORECAST_WORKERS = int(os.environ.get("FORECAST_WORKERS", os.cpu_count() or 1))
+
+
+def _errors(actual: np.ndarray, predicted: np.ndarray) -> Dict[str, np.ndarray]:
+    """Squared and absolute percentage errors summed over the last axis"""
+    error = actual - predicted
+    nonzero = actual != 0
+    percentage = np.abs(np.divide(error, actual, out=np.zeros_like(error), where=nonzero))
+    return {
+        "sse": (error**2).sum(axis=-1),
+        "n": np.full(error.shape[:-1], error.shape[-1], dtype=np.int64),
+        "ape": percentage.sum(axis=-1),
+        "n_ape": nonzero.sum(axis=-1),
+    }
+
+
+def _add_errors(state: Dict, errors: Dict):
+    for key, value in errors.items():
+        state[key] = state[key] + value
+
+
+def _holt_run(values, level, trend, alpha, beta, errors):
+    """Advance Holt's recursions over the columns of ``values``"""
+    for t in range(values.shape[1]):
+        actual = values[:, t].reshape(level.shape[:1] + (1,) * (level.ndim - 1))
+        predicted = level + trend
+        _add_errors(errors, _errors(actual[..., None], predicted[..., None]))
+        new_level = predicted + alpha * (actual - predicted)
+        trend = trend + beta * (new_level - level - trend)
+        level = new_level
+    return level, trend
+
+
+def _fit_exp_smoothing(values: np.ndarray) -> Dict:
+    n_series = values.shape[0]
+    alpha, beta = (grid.ravel() for grid in np.meshgrid(ALPHAS, BETAS, indexing="ij"))
+    shape = (n_series, len(alpha))
+
+    level = np.repeat(values[:, :1], len(alpha), axis=1)
+    trend = np.zeros(shape)
+    errors = {
+        "sse": np.zeros(shape),
+        "n": np.zeros(shape, dtype=np.int64),
+        "ape": np.zeros(shape),
+        "n_ape": np.zeros(shape, dtype=np.int64),
+    }
+    level, trend = _holt_run(values[:, 1:], level, trend, alpha, beta, errors)
+
+    best = errors["sse"].argmin(axis=1)
+    rows = np.arange(n_series)
+    state = {key: value[rows, best] for key, value in errors.items()}
+    state.update(
+        level=level[rows, best],
+        trend=trend[rows, best],
+        alpha=alpha[best],
+        beta=beta[best],
+    )
+    return state
+
+
+def _fit_seasonal_naive(values: np.ndarray) -> Dict:
+    season = SEASON_LENGTH if values.shape[1] > SEASON_LENGTH else 1
+    state = _errors(values[:, season:], values[:, :-season])
+    state["tail"] = values[:, -season:].copy()
+    if season == 1:
+        # Short histories are kept (at most a season of weeks), so ``update``
+        # can refit with the yearly season once more than a year is known
+        state["history"] = values.copy()
+    return state
+
+
+def _fit_per_series(values: np.ndarray, fit_one) -> Dict:
+    """Run a one-series engine over every row, falling back to the last value"""
+    forecast = np.repeat(values[:, -1:], MAX_HORIZON, axis=1).astype(float)
+    lower, upper = forecast.copy(), forecast.copy()
+    for row, series in enumerate(values):
+        try:
+            forecast[row], lower[row], upper[row] = fit_one(series)
+        except Exception:  # too short or degenerate series keep the fallback
+            continue
+    state = _errors(values[:, 1:], values[:, :-1])
+    state.update(forecast=forecast, lower=lower, upper=upper)
+    return state
+
+
+def _statsmodels_one(series: np.ndarray):
+    seasonal = "add" if len(series) >= 2 * SEASON_LENGTH else None
+    model = ExponentialSmoothing(
+        series, trend="add", seasonal=seasonal, seasonal_periods=SEASON_LENGTH
+    ).fit()
+    mean = model.forecast(MAX_HORIZON)
+    sigma = np.sqrt(np.mean(model.resid**2)) * np.sqrt(np.arange(1, MAX_HORIZON + 1))
+    return mean, mean - INTERVAL_Z * sigma, mean + INTERVAL_Z * sigma
+
+
+def _prophet_one(series: np.ndarray):
+    import pandas as pd
+
+    history = pd.DataFrame(
+        {"ds": pd.date_range(end="2000-01-01", periods=len(series), freq="7D"), "y": series}
+    )
+    model = Prophet(daily_seasonality=False, weekly_seasonality=False).fit(history)
+    future = pd.DataFrame(
+        {"ds": pd.date_range(start=history["ds"].iloc[-1], periods=MAX_HORIZON + 1, freq="7D")[1:]}
+    )
+    predicted = model.predict(future)
+    return predicted["yhat"], predicted["yhat_lower"], predicted["yhat_upper"]
+
+
+def engine_available(model: str) -> bool:
+    """Whether the packages a model needs are installed"""
+    if model == "statsmodels":
+        return ExponentialSmoothing is not None
+    if model == "prophet":
+        return Prophet is not None
+    return model in FORECAST_MODELS
+
+
+def fit(model: str, values: np.ndarray) -> Dict:
+    """Fit ``model`` to every row of a ``(series, weeks)`` matrix"""
+    values = np.asarray(values, dtype=float)
+    if model == "exp_smoothing":
+        return _fit_exp_smoothing(values)
+    if model == "seasonal_naive":
+        return _fit_seasonal_naive(values)
+    if model == "statsmodels":
+        return _fit_per_series(values, _statsmodels_one)
+    if model == "prophet":
+        return _fit_per_series(values, _prophet_one)
+    raise ValueError(f"Unknown forecast model: {model}")
+
+
+def update(model: str, state: Dict, values: np.ndarray) -> Dict:
+    """Advance a fitted state by newly arrived weeks (columns of ``values``)"""
+    values = np.asarray(values, dtype=float)
+    state = {key: value.copy() for key, value in state.items()}
+    if model == "exp_smoothing":
+        state["level"], state["trend"] = _holt_run(
+            values, state["level"], state["trend"], state["alpha"], state["beta"], state
+        )
+    elif model == "seasonal_naive":
+        if "history" in state:
+            history = np.concatenate([state["history"], values], axis=1)
+            if history.shape[1] > SEASON_LENGTH:
+                return _fit_seasonal_naive(history)
+            state["history"] = history
+        tail = np.concatenate([state["tail"], values], axis=1)
+        season = state["tail"].shape[1]
+        _add_errors(state, _errors(tail[:, season:], tail[:, :-season]))
+        state["tail"] = tail[:, -season:]
+    else:
+        raise ValueError(f"{model} forecasts cannot be updated incrementally")
+    return state
+
+
+def predict(model: str, state: Dict, horizon: int) -> Tuple[np.ndarray, ...]:
+    """Return (forecast, lower, upper), each ``(series, horizon)``"""
+    steps = np.arange(1, horizon + 1)
+    sigma = np.sqrt(state["sse"] / np.maximum(state["n"], 1))[:, None]
+
+    if model == "exp_smoothing":
+        alpha, beta = state["alpha"][:, None], state["beta"][:, None]
+        forecast = state["level"][:, None] + steps * state["trend"][:, None]
+        # Holt's h-step variance: sigma^2 * (1 + sum_{j<h} (alpha * (1 + j * beta))^2)
+        terms = (alpha * (1 + steps[:-1] * beta)) ** 2
+        spread = np.sqrt(1 + np.concatenate([np.zeros_like(alpha), terms.cumsum(axis=1)], axis=1))
+    elif model == "seasonal_naive":
+        season = state["tail"].shape[1]
+        forecast = state["tail"][:, (steps - 1) % season]
+        spread = np.sqrt((steps - 1) // season + 1)
+    else:
+        return tuple(state[key][:, :horizon] for key in ("forecast", "lower", "upper"))
+
+    margin = INTERVAL_Z * sigma * spread
+    return forecast, forecast - margin, forecast + margin
+
+
+def mape(state: Dict) -> np.ndarray:
+    """Mean absolute percentage one-step error per series (NaN without data)"""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(state["n_ape"] > 0, 100 * state["ape"] / state["n_ape"], np.nan)
+
+
+def fit_batched(
+    model: str,
+    values: np.ndarray,
+    workers: Optional[int] = None,
+    chunk_series: int = CHUNK_SERIES,
+) -> Dict:
+    """Fit a large panel in chunks of series spread over a process pool"""
+    workers = FORECAST_WORKERS if workers is None else workers
+    if workers <= 1 or len(values) <= chunk_series:
+        return fit(model, values)
+
+    chunks = [values[start : start + chunk_series] for start in range(0, len(values), chunk_series)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+        states = list(pool.map(fit, [model] * len(chunks), chunks))
+    return {key: np.concatenate([state[key] for state in states]) for key in states[0]}
+
+
+def future_weeks(last_date: str, horizon: int) -> List[str]:
+    """The ``horizon`` weekly dates following ``last_date``"""
+    last = date.fromisoformat(last_date)
+    return [(last + timedelta(weeks=step)).isoformat() for step in range(1, horizon + 1)]
@@ -0,0 +1,216 @@
+"""Per-endpoint request metrics in the Prometheus text format.
+
+``register_metrics`` times every request of an app and records, per Flask
+endpoint and method, a latency histogram, the SQL statements run, the time
+spent in them, the rows fetched and the response bytes. Statements and rows
+are added up by listeners on the pooled connections' cursors
+(``src.database.instrumentation``) into a per-thread accumulator, so the hot
+path is a few additions per statement and one locked update per request.
+
+Streamed responses are recorded when the stream ends, so the rows fetched
+and bytes sent while streaming are counted; their latency is the time until
+the view returned.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, Tuple
+
+from flask import Flask, request
+
+from src.database.instrumentation import add_fetch_listener, add_statement_listener
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Content type of the Prometheus text exposition format
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Endpoint label of requests that matched no route
+UNMATCHED_ENDPOINT = "unmatched"
+
+# (name, help, series field) of the per-endpoint counters
+ENDPOINT_COUNTERS = (
+    ("http_response_size_bytes_total", "Response body bytes sent", "bytes"),
+    ("db_statements_total", "SQL statements executed", "statements"),
+    ("db_statement_duration_seconds_total", "Time spent executing SQL statements", "sql_time"),
+    ("db_rows_fetched_total", "Rows fetched from SQL cursors", "rows"),
+)
+
+
+class RequestStats:
+    """What one request did, filled in while it runs"""
+
+    __slots__ = ("started", "duration", "statements", "sql_time", "rows", "bytes")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.statements = 0
+        self.sql_time = 0.0
+        self.rows = 0
+        self.bytes = 0
+
+
+class RequestMetrics:
+    """Thread-safe per-endpoint request totals and latency histograms"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, str], Dict] = {}
+        self._statuses: Dict[Tuple[str, str, int], int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, method: str, status: int, stats: RequestStats):
+        """Add one finished request"""
+        bucket = bisect_left(self.buckets, stats.duration)
+        with self._lock:
+            series = self._series.get((endpoint, method))
+            if series is None:
+                series = self._series[(endpoint, method)] = {
+                    "buckets": [0] * (len(self.buckets) + 1),
+                    "count": 0,
+                    "duration": 0.0,
+                    "bytes": 0,
+                    "statements": 0,
+                    "sql_time": 0.0,
+                    "rows": 0,
+                }
+            series["buckets"][bucket] += 1
+            series["count"] += 1
+            series["duration"] += stats.duration
+            series["bytes"] += stats.bytes
+            series["statements"] += stats.statements
+            series["sql_time"] += stats.sql_time
+            series["rows"] += stats.rows
+            key = (endpoint, method, status)
+            self._statuses[key] = self._statuses.get(key, 0) + 1
+
+    def clear(self):
+        """Forget every recorded request"""
+        with self._lock:
+            self._series.clear()
+            self._statuses.clear()
+
+    def render(self) -> str:
+        """Return the metrics in the Prometheus text exposition format"""
+        with self._lock:
+            series = {
+                key: {**value, "buckets": list(value["buckets"])}
+                for key, value in self._series.items()
+            }
+            statuses = dict(self._statuses)
+
+        lines = [
+            "# HELP http_requests_total Requests handled, by endpoint, method and status",
+            "# TYPE http_requests_total counter",
+        ]
+        for (endpoint, method, status), count in sorted(statuses.items()):
+            labels = _labels(endpoint=endpoint, method=method, status=status)
+            lines.append(f"http_requests_total{labels} {count}")
+
+        lines += [
+            "# HELP http_request_duration_seconds Request latency, by endpoint and method",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (endpoint, method), values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), values["buckets"]):
+                cumulative += count
+                labels = _labels(endpoint=endpoint, method=method, le=bound)
+                lines.append(f"http_request_duration_seconds_bucket{labels} {cumulative}")
+            labels = _labels(endpoint=endpoint, method=method)
+            lines.append(f"http_request_duration_seconds_sum{labels} {values['duration']!r}")
+            lines.append(f"http_request_duration_seconds_count{labels} {values['count']}")
+
+        for name, description, field in ENDPOINT_COUNTERS:
+            lines.append(f"# HELP {name} {description}, by endpoint and method")
+            lines.append(f"# TYPE {name} counter")
+            for (endpoint, method), values in sorted(series.items()):
+                lines.append(f"{name}{_labels(endpoint=endpoint, method=method)} {values[field]!r}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels) -> str:
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+# Shared by every app in the process
+request_metrics = RequestMetrics()
+
+_current = threading.local()
+_listening = False
+_listening_lock = threading.Lock()
+
+
+def _count_statement(event):
+    stats = getattr(_current, "stats", None)
+    if stats is not None:
+        stats.statements += 1
+        stats.sql_time += event.duration
+
+
+def _count_rows(count: int):
+    stats = getattr(_current, "stats", None)
+    if stats is not None:
+        stats.rows += count
+
+
+def _listen():
+    global _listening
+    with _listening_lock:
+        if not _listening:
+            add_statement_listener(_count_statement)
+            add_fetch_listener(_count_rows)
+            _listening = True
+
+
+def _finish(endpoint: str, method: str, status: int, stats: RequestStats):
+    request_metrics.record(endpoint, method, status, stats)
+    if getattr(_current, "stats", None) is stats:
+        _current.stats = None
+
+
+def _counted_stream(chunks: Iterable[bytes], body, labels: Tuple, stats: RequestStats):
+    try:
+        for chunk in chunks:
+            stats.bytes += len(chunk)
+            yield chunk
+    finally:
+        if hasattr(body, "close"):
+            body.close()
+        _finish(*labels, stats)
+
+
+def register_metrics(app: Flask):
+    """Record the metrics of every request handled by ``app``"""
+    _listen()
+
+    @app.before_request
+    def start_request_metrics():
+        _current.stats = RequestStats()
+
+    @app.after_request
+    def record_request_metrics(response):
+        stats = getattr(_current, "stats", None)
+        if stats is None:
+            return response
+        stats.duration = time.perf_counter() - stats.started
+        labels = (request.endpoint or UNMATCHED_ENDPOINT, request.method, response.status_code)
+
+        if response.content_length is not None:
+            stats.bytes = response.content_length
+        elif not response.is_streamed:
+            stats.bytes = len(response.get_data())
+        else:
+            # Count the bytes as they are sent; the stream records the request
+            # when it ends or the server closes it
+            body = response.response
+            response.response = _counted_stream(response.iter_encoded(), body, labels, stats)
+            return response
+        _finish(*labels, stats)
+        return response
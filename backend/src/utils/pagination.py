@@ -0,0 +1,37 @@
+"""Opaque continuation tokens for keyset pagination.
+
+A token encodes the sort key of the last row of a page. The next page
+continues strictly after that key, so paging costs the same at any depth
+and is stable while rows are inserted (unlike OFFSET).
+"""
+import base64
+import json
+from typing import Optional, Tuple
+
+from werkzeug.exceptions import BadRequest
+
+
+def encode_cursor(*key) -> str:
+    """Encode a sort key as a URL-safe continuation token"""
+    payload = json.dumps(list(key), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(token: Optional[str], types: Tuple = ()) -> Optional[Tuple]:
+    """Decode a continuation token, checking the key's length and types"""
+    if not token:
+        return None
+
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise BadRequest("Invalid cursor")
+
+    if (
+        not isinstance(key, list)
+        or len(key) != len(types)
+        or not all(type(value) is expected for value, expected in zip(key, types))
+    ):
+        raise BadRequest("Invalid cursor")
+    return tuple(key)
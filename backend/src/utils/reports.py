@@ -0,0 +1,324 @@
+"""Report definitions and the renderer that runs on the report worker pool.
+
+A report is a query over the sales data (``REPORT_TYPES``) written to a
+file in one of ``REPORT_FORMATS``. ``render_report`` runs in a worker
+process with its own SQLite connections; rows are read with ``fetchmany``
+and written a batch at a time, so memory is bounded by the batch size:
+
+* csv     - the CSV encoder of ``src.utils.export``
+* parquet - one row group per batch (``src.utils.export``)
+* xlsx    - an openpyxl write-only workbook, which streams rows to disk
+  instead of keeping the sheet in memory
+
+Progress (rows written out of the matching total) is recorded in
+``report_jobs`` while the file is written.
+
+``render_shared`` renders several reports off one scan: the rows they have
+in common (a date range and set of stores) are copied once into temporary
+tables, and each report then reads its slice from the copy. Reports
+deleted while the scan is queued or running are skipped.
+"""
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.database.rollups import WEEKLY_ROLLUP
+from src.utils.export import (
+    EXPORT_BATCH_SIZE,
+    EXPORT_FORMATS,
+    SALES_EXPORT_COLUMNS,
+    export_encoder,
+    fetch_batches,
+    sales_export_query,
+)
+
+# format -> (mimetype, file extension)
+REPORT_FORMATS = {
+    "csv": EXPORT_FORMATS["csv"],
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    "parquet": EXPORT_FORMATS["parquet"],
+}
+
+# Filters every report type accepts
+REPORT_FILTERS = ("store_id", "dept_id", "start_date", "end_date")
+
+# Weekly totals per store x department, read from the weekly rollup
+WEEKLY_SUMMARY_COLUMNS = (
+    ("date", "r.date", "string"),
+    ("store_id", "r.store_id", "int64"),
+    ("store_name", "st.name", "string"),
+    ("dept_id", "r.dept_id", "int64"),
+    ("dept_name", "d.name", "string"),
+    ("total_sales", "r.total_sales", "float64"),
+    ("holiday_sales", "r.holiday_sales", "float64"),
+    ("sale_count", "r.sale_count", "int64"),
+)
+
+# Totals per store over the selected weeks, read from the weekly rollup
+STORE_SUMMARY_COLUMNS = (
+    ("store_id", "r.store_id", "int64"),
+    ("store_name", "st.name", "string"),
+    ("region", "st.region", "string"),
+    ("store_type", "st.type", "string"),
+    ("weeks", "COUNT(DISTINCT r.date)", "int64"),
+    ("total_sales", "SUM(r.total_sales)", "float64"),
+    ("avg_weekly_sales", "SUM(r.total_sales) / COUNT(DISTINCT r.date)", "float64"),
+    ("holiday_sales", "SUM(r.holiday_sales)", "float64"),
+)
+
+# report type -> (column specs, GROUP BY, ORDER BY); "sales" is the detail export
+REPORT_TYPES = {
+    "sales": (SALES_EXPORT_COLUMNS, None, None),
+    "weekly_summary": (WEEKLY_SUMMARY_COLUMNS, None, "r.date, r.store_id, r.dept_id"),
+    "store_summary": (STORE_SUMMARY_COLUMNS, "r.store_id", "r.store_id"),
+}
+
+# Table each report type reads
+REPORT_SOURCES = {
+    "sales": "sales",
+    "weekly_summary": WEEKLY_ROLLUP,
+    "store_summary": WEEKLY_ROLLUP,
+}
+
+# Data rows per worksheet; Excel stops at 1,048,576 rows including the header
+XLSX_MAX_ROWS = 1_048_575
+
+# Seconds a worker waits on a locked database before failing
+REPORT_BUSY_TIMEOUT = 30.0
+
+# Result of a shared-scan report deleted before it was written
+REPORT_DELETED = "Deleted before it was rendered"
+
+
+def report_query(report_type: str, filters: Dict, table: Optional[str] = None) -> Tuple[str, List]:
+    """Build the query and parameters of a report.
+
+    ``table`` replaces the table the report reads (``REPORT_SOURCES``) with
+    a copy of part of it.
+    """
+    filters = {name: filters.get(name) for name in REPORT_FILTERS}
+    table = table or REPORT_SOURCES[report_type]
+    if report_type == "sales":
+        return sales_export_query(**filters, table=table)
+
+    columns, group_by, order_by = REPORT_TYPES[report_type]
+    select = ", ".join(f"{expression} AS {name}" for name, expression, _ in columns)
+    query = f"""
+    SELECT {select}
+    FROM {table} r
+    JOIN stores st ON r.store_id = st.store_id
+    JOIN departments d ON r.dept_id = d.dept_id
+    WHERE 1=1
+    """
+    params = []
+
+    if filters["store_id"]:
+        query += " AND r.store_id = ?"
+        params.append(filters["store_id"])
+
+    if filters["dept_id"]:
+        query += " AND r.dept_id = ?"
+        params.append(filters["dept_id"])
+
+    if filters["start_date"]:
+        query += " AND r.date >= ?"
+        params.append(filters["start_date"])
+
+    if filters["end_date"]:
+        query += " AND r.date <= ?"
+        params.append(filters["end_date"])
+
+    if group_by:
+        query += f" GROUP BY {group_by}"
+    query += f" ORDER BY {order_by}"
+    return query, params
+
+
+def write_xlsx(names: List[str], batches: Iterator[List[Tuple]], path: str):
+    """Write row batches to a workbook, starting a new sheet when one is full"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = None
+    sheet_rows = XLSX_MAX_ROWS
+    for rows in batches:
+        for row in rows:
+            if sheet_rows == XLSX_MAX_ROWS:
+                sheet = workbook.create_sheet(f"Report {len(workbook.worksheets) + 1}")
+                sheet.append(names)
+                sheet_rows = 0
+            sheet.append(row)
+            sheet_rows += 1
+    if sheet is None:
+        workbook.create_sheet("Report 1").append(names)
+    workbook.save(path)
+
+
+def write_report(
+    report_format: str, report_type: str, batches: Iterator[List[Tuple]], path: str
+):
+    """Write row batches of a report to ``path`` in ``report_format``"""
+    columns = REPORT_TYPES[report_type][0]
+    if report_format == "xlsx":
+        write_xlsx([name for name, _, _ in columns], batches, path)
+        return
+
+    encode = export_encoder(report_format, columns)["encode"]
+    if report_format == "csv":
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            file.writelines(encode(batches))
+    else:
+        with open(path, "wb") as file:
+            file.writelines(encode(batches))
+
+
+def update_job(conn, job_id: str, **fields):
+    """Set columns of a ``report_jobs`` row and commit"""
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    conn.execute(
+        f"UPDATE report_jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id)
+    )
+    conn.commit()
+
+
+def job_exists(conn, job_id: str) -> bool:
+    """Whether a ``report_jobs`` row is still there (it is gone once deleted)"""
+    row = conn.execute("SELECT 1 FROM report_jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return row is not None
+
+
+def _connect(db_path: str) -> Tuple[sqlite3.Connection, sqlite3.Connection]:
+    """A reader in autocommit mode (transactions are explicit) and a
+    connection for job status updates"""
+    reader = sqlite3.connect(db_path, timeout=REPORT_BUSY_TIMEOUT, isolation_level=None)
+    status = sqlite3.connect(db_path, timeout=REPORT_BUSY_TIMEOUT)
+    return reader, status
+
+
+def _render(reader, status, job_id, report_type, report_format, filters, path, batch_size, table=None):
+    query, params = report_query(report_type, filters, table)
+    total = reader.execute(f"SELECT COUNT(*) FROM ({query})", params).fetchone()[0]
+    update_job(
+        status,
+        job_id,
+        status="running",
+        started_at=datetime.now().isoformat(timespec="seconds"),
+        rows_total=total,
+    )
+    cursor = reader.execute(query, params)
+    written = 0
+
+    def batches():
+        nonlocal written
+        for rows in fetch_batches(cursor, batch_size):
+            yield rows
+            written += len(rows)
+            update_job(status, job_id, rows_written=written)
+
+    partial = f"{path}.part"
+    try:
+        write_report(report_format, report_type, batches(), partial)
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return {"rows": written, "size": os.path.getsize(path)}
+
+
+def render_report(
+    db_path: str,
+    job_id: str,
+    report_type: str,
+    report_format: str,
+    filters: Dict,
+    path: str,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> Dict:
+    """Run a report job: write its file to ``path`` and return rows and bytes"""
+    reader, status = _connect(db_path)
+    try:
+        # Count and rows come from the same snapshot
+        reader.execute("BEGIN")
+        return _render(
+            reader, status, job_id, report_type, report_format, filters, path, batch_size
+        )
+    finally:
+        reader.close()
+        status.close()
+
+
+def shared_scan_query(table: str, scan: Dict) -> Tuple[str, List]:
+    """Select the rows of ``table`` in a scan's date range and stores"""
+    query = f"SELECT * FROM {table} WHERE 1=1"
+    params = []
+
+    if scan.get("start_date"):
+        query += " AND date >= ?"
+        params.append(scan["start_date"])
+
+    if scan.get("end_date"):
+        query += " AND date <= ?"
+        params.append(scan["end_date"])
+
+    if scan.get("store_ids"):
+        query += f" AND store_id IN ({', '.join('?' * len(scan['store_ids']))})"
+        params.extend(scan["store_ids"])
+
+    return query, params
+
+
+def render_shared(
+    db_path: str, scan: Dict, jobs: List[Dict], batch_size: int = EXPORT_BATCH_SIZE
+) -> Dict:
+    """Run several report jobs off one scan of the rows they have in common.
+
+    ``scan`` holds the date range (``start_date``/``end_date``) and
+    ``store_ids`` (None for every store) covering all the jobs. Each job is
+    a dict of ``render_report`` arguments. A failing report does not stop
+    the others; its result holds the error instead.
+    """
+    reader, status = _connect(db_path)
+    reports = {}
+    try:
+        reader.execute("BEGIN")
+        started = time.perf_counter()
+        copies, rows_scanned = {}, 0
+        for table in sorted({REPORT_SOURCES[job["report_type"]] for job in jobs}):
+            query, params = shared_scan_query(table, scan)
+            reader.execute(f"CREATE TEMP TABLE shared_{table} AS {query}", params)
+            copies[table] = f"temp.shared_{table}"
+            rows_scanned += reader.execute(f"SELECT COUNT(*) FROM {copies[table]}").fetchone()[0]
+        scan_ms = (time.perf_counter() - started) * 1000
+
+        for job in jobs:
+            if not job_exists(status, job["job_id"]):
+                reports[job["job_id"]] = {"error": REPORT_DELETED}
+                continue
+            started = time.perf_counter()
+            try:
+                result = _render(
+                    reader,
+                    status,
+                    job["job_id"],
+                    job["report_type"],
+                    job["report_format"],
+                    job["filters"],
+                    job["path"],
+                    batch_size,
+                    copies[REPORT_SOURCES[job["report_type"]]],
+                )
+                result["runtime_ms"] = (time.perf_counter() - started) * 1000
+            except Exception as error:
+                result = {"error": str(error) or type(error).__name__}
+            if not job_exists(status, job["job_id"]):
+                # Deleted while it was rendered
+                if os.path.exists(job["path"]):
+                    os.remove(job["path"])
+                result = {"error": REPORT_DELETED}
+            reports[job["job_id"]] = result
+    finally:
+        reader.close()
+        status.close()
+    return {"rows_scanned": rows_scanned, "scan_ms": scan_ms, "reports": reports}
@@ -0,0 +1,152 @@
+"""Vectorized seasonality, trend and periodicity for many weekly series.
+
+Every function takes a ``(series, weeks)`` matrix and works on all rows at
+once, mirroring the single-series helpers in the frontend's
+``dataAnalysis.js``:
+
+* ``trend_strength``    - least-squares slope scaled by the series range,
+  squashed with tanh to [-1, 1] (``calculateTrendStrength``)
+* ``seasonal_indices``  - mean detrended value per week of the season
+  (``detectSeasonality``)
+* ``spectrum``          - one zero-padded real FFT of the whole matrix gives
+  both the autocorrelation (Wiener-Khinchin) and the periodogram
+* ``periodicity``       - strongest local autocorrelation peak above
+  ``SIGNIFICANT_CORRELATION`` (``detectPeriodicity``)
+"""
+from typing import Dict, Tuple
+
+import numpy as np
+
+from src.utils.forecasting import SEASON_LENGTH
+
+# Window of the centred moving average used as the trend
+TREND_WINDOW = 12
+
+# Correlations (and seasonal strengths) above this count as seasonal
+SIGNIFICANT_CORRELATION = 0.3
+
+
+def moving_average(values: np.ndarray, window: int) -> np.ndarray:
+    """Centred moving average whose window shrinks at the edges"""
+    weeks = values.shape[1]
+    half = window // 2
+    sums = np.concatenate([np.zeros((len(values), 1)), values.cumsum(axis=1)], axis=1)
+    start = np.maximum(np.arange(weeks) - half, 0)
+    end = np.minimum(np.arange(weeks) + half + 1, weeks)
+    return (sums[:, end] - sums[:, start]) / (end - start)
+
+
+def _ranges(values: np.ndarray) -> np.ndarray:
+    return values.max(axis=1) - values.min(axis=1)
+
+
+def trend_strength(values: np.ndarray) -> np.ndarray:
+    """Slope of a linear fit times the length, over the range, through tanh"""
+    weeks = values.shape[1]
+    if weeks < 2:
+        return np.zeros(len(values))
+    x = np.arange(weeks) - (weeks - 1) / 2
+    slope = (values - values.mean(axis=1, keepdims=True)) @ x / (x @ x)
+    ranges = _ranges(values)
+    scaled = np.divide(slope * weeks, ranges, out=np.zeros_like(slope), where=ranges > 0)
+    return np.tanh(scaled)
+
+
+def seasonal_indices(detrended: np.ndarray, period: int = SEASON_LENGTH) -> np.ndarray:
+    """Mean detrended value for each position in the season, ``(series, period)``"""
+    series, weeks = detrended.shape
+    cycles = -(-weeks // period)
+    padded = np.full((series, cycles * period), np.nan)
+    padded[:, :weeks] = detrended
+    cycles = padded.reshape(series, cycles, period)
+    counts = (~np.isnan(cycles)).sum(axis=1)
+    totals = np.nansum(cycles, axis=1)
+    return np.divide(totals, counts, out=np.full(totals.shape, np.nan), where=counts > 0)
+
+
+def spectrum(detrended: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return (autocorrelation by lag, periodogram, its frequencies) for every
+    row, all from one zero-padded FFT. Missing (NaN) weeks count as the mean."""
+    weeks = detrended.shape[1]
+    observed = ~np.isnan(detrended)
+    means = np.nansum(detrended, axis=1, keepdims=True) / np.maximum(observed.sum(axis=1, keepdims=True), 1)
+    centred = np.where(observed, detrended - means, 0.0)
+    # Zero-pad to avoid the circular wrap-around of the FFT correlation
+    size = 1 << int(np.ceil(np.log2(max(2 * weeks, 2))))
+    transform = np.fft.rfft(centred, n=size, axis=1)
+    power = np.abs(transform) ** 2
+
+    autocovariance = np.fft.irfft(power, n=size, axis=1)[:, :weeks]
+    variance = autocovariance[:, :1]
+    autocorrelation = np.divide(
+        autocovariance, variance, out=np.zeros_like(autocovariance), where=variance > 0
+    )
+    return autocorrelation, power / weeks, np.fft.rfftfreq(size)
+
+
+def periodicity(autocorrelation: np.ndarray, max_lag: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Lag and strength of the strongest significant autocorrelation peak.
+
+    Rows without a peak get lag 0 and strength 0.
+    """
+    acf = autocorrelation[:, : max_lag + 2]
+    if acf.shape[1] < 3:
+        zeros = np.zeros(len(acf))
+        return zeros.astype(int), zeros
+    inner = acf[:, 1:-1]
+    peaks = (inner > acf[:, :-2]) & (inner > acf[:, 2:]) & (inner > SIGNIFICANT_CORRELATION)
+    scores = np.where(peaks, inner, -np.inf)
+    best = scores.argmax(axis=1)
+    found = peaks.any(axis=1)
+    lags = np.where(found, best + 1, 0)
+    strengths = np.where(found, inner[np.arange(len(acf)), best], 0.0)
+    return lags, strengths
+
+
+def analyze(values: np.ndarray, period: int = SEASON_LENGTH) -> Dict[str, np.ndarray]:
+    """Seasonality report for every row of a ``(series, weeks)`` matrix"""
+    values = np.asarray(values, dtype=float)
+    series, weeks = values.shape
+    window = min(period, TREND_WINDOW)
+    detrended = values - moving_average(values, window)
+    # The edges only have a partial trend window; leave them out
+    half = window // 2
+    detrended[:, :half] = np.nan
+    detrended[:, max(weeks - half, half):] = np.nan
+
+    indices = seasonal_indices(detrended, period)
+    ranges = _ranges(values)
+    strengths = np.divide(
+        np.abs(indices), ranges[:, None], out=np.zeros_like(indices), where=ranges[:, None] > 0
+    )
+
+    autocorrelation, periodogram, frequencies = spectrum(detrended)
+    max_lag = min(period, weeks // 3)
+    lags, lag_strengths = periodicity(autocorrelation, max_lag)
+    significant = np.abs(autocorrelation[:, 1 : max_lag + 1])
+    significant = np.where(significant > SIGNIFICANT_CORRELATION, significant, 0.0)
+
+    seasonality = np.maximum(
+        np.nan_to_num(strengths).max(axis=1, initial=0.0), significant.max(axis=1, initial=0.0)
+    )
+    if weeks < period:
+        # Less than one season of history: nothing to compare against
+        seasonality = np.zeros(series)
+
+    # Dominant cycle length from the periodogram, skipping the zero frequency
+    dominant = periodogram[:, 1:].argmax(axis=1) + 1 if periodogram.shape[1] > 1 else np.zeros(series, int)
+    has_power = periodogram[:, 1:].max(axis=1, initial=0.0) > 0
+    spectral_period = np.where(has_power, 1 / frequencies[dominant].clip(min=1e-12), np.nan)
+
+    filled = np.nan_to_num(indices, nan=0.0)
+    return {
+        "trend_strength": trend_strength(values),
+        "seasonality_strength": seasonality,
+        "has_seasonality": seasonality > SIGNIFICANT_CORRELATION,
+        "seasonal_indices": indices,
+        "peak_week": filled.argmax(axis=1) + 1,
+        "trough_week": filled.argmin(axis=1) + 1,
+        "periodicity_lag": lags,
+        "periodicity_strength": lag_strengths,
+        "spectral_period": spectral_period,
+    }
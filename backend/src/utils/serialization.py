@@ -0,0 +1,121 @@
+"""Binary representations of column-wise API responses.
+
+Endpoints that can answer column-wise (see ``fetch_columns``) also honour
+``Accept: application/vnd.apache.arrow.stream`` and ``Accept:
+application/msgpack``. Arrow responses are IPC streams of typed column
+buffers that pyarrow/pandas map without parsing; each endpoint passes the
+type of every column (``ARROW_TYPES``), so the schema does not depend on
+the rows returned. MessagePack responses carry the same ``{columns, data}``
+object as the columnar JSON form.
+
+MessagePack support is optional: it is offered only when the ``msgpack``
+package is installed.
+"""
+import io
+from typing import Dict
+
+from flask import Response, g, request
+
+from src.utils.error_handlers import APIError
+from src.utils.export import EXPORT_FORMATS
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+JSON_MIMETYPE = "application/json"
+ARROW_MIMETYPE = EXPORT_FORMATS["arrow"][0]
+MSGPACK_MIMETYPES = ("application/msgpack", "application/x-msgpack")
+
+# Column types an endpoint can declare; dates travel as ISO strings and
+# are sent to Arrow clients as date32
+ARROW_TYPES = ("int64", "float64", "date32", "string")
+
+# Response keys besides the columns that travel as metadata/headers
+RESPONSE_METADATA = ("next_cursor",)
+
+
+def negotiate_format() -> str:
+    """Return "json", "arrow" or "msgpack" for the current request's Accept header.
+
+    JSON wins whenever the client accepts it at least as much as the binary
+    types, so browsers sending ``*/*`` keep getting JSON. The result is read
+    once per request.
+    """
+    if "response_format" not in g:
+        offers = [JSON_MIMETYPE, ARROW_MIMETYPE]
+        if msgpack is not None:
+            offers.extend(MSGPACK_MIMETYPES)
+
+        accept = request.accept_mimetypes
+        match = accept.best_match(offers) if accept else None
+        if match == ARROW_MIMETYPE:
+            response_format = "arrow"
+        elif match in MSGPACK_MIMETYPES:
+            response_format = "msgpack"
+        elif match is None and any(accept[mimetype] for mimetype in MSGPACK_MIMETYPES):
+            # Asked for msgpack only, but it is not installed; refused on encode
+            response_format = "msgpack"
+        else:
+            response_format = "json"
+        g.response_format = response_format
+    return g.response_format
+
+
+def wants_binary() -> bool:
+    """Whether the current request negotiated a binary representation"""
+    return negotiate_format() != "json"
+
+
+def binary_response(result: Dict, column_types: Dict[str, str]) -> Response:
+    """Encode a column-wise API response in the negotiated binary format.
+
+    ``column_types`` maps every column to one of ``ARROW_TYPES``.
+    """
+    response_format = negotiate_format()
+    metadata = {
+        key: result[key] for key in RESPONSE_METADATA if result.get(key) is not None
+    }
+
+    if response_format == "arrow":
+        body = _arrow_stream(result, column_types, metadata)
+        mimetype = ARROW_MIMETYPE
+    elif response_format == "msgpack":
+        if msgpack is None:
+            raise APIError("MessagePack responses require the msgpack package", 406)
+        body = msgpack.packb(
+            {"columns": result["columns"], "data": result["data"], **metadata},
+            use_bin_type=True,
+        )
+        mimetype = MSGPACK_MIMETYPES[0]
+    else:
+        raise ValueError(f"Not a binary format: {response_format}")
+
+    response = Response(body, mimetype=mimetype)
+    for key, value in metadata.items():
+        response.headers[f"X-{key.replace('_', '-').title()}"] = str(value)
+    return response
+
+
+def _arrow_stream(result: Dict, column_types: Dict[str, str], metadata: Dict) -> bytes:
+    """Serialize columns as an Arrow IPC stream with the declared column types"""
+    import pyarrow as pa
+
+    table = pa.Table.from_arrays(
+        [_arrow_column(result["data"][name], column_types[name]) for name in result["columns"]],
+        names=result["columns"],
+    ).replace_schema_metadata({key: str(value) for key, value in metadata.items()})
+
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def _arrow_column(values, type_name: str):
+    import pyarrow as pa
+
+    if type_name == "date32":
+        return pa.array(values, type=pa.string()).cast(pa.date32())
+    return pa.array(values, type=getattr(pa, type_name)())
@@ -1,8 +1,25 @@
 from datetime import datetime
 from typing import Any, Dict, Optional, Union
 
+import numpy as np
+import pandas as pd
 from werkzeug.exceptions import BadRequest
 
+from src.utils.cron import parse_cron
+from src.utils.error_handlers import ValidationError
+
+# Rows accepted by one POST /api/sales/batch request
+MAX_BATCH_ROWS = 10000
+
+# Errors reported back for a rejected batch
+MAX_REPORTED_ERRORS = 50
+
+SALES_REQUIRED_FIELDS = ("store_id", "dept_id", "date", "weekly_sales")
+SALES_OPTIONAL_FIELDS = ("temperature", "fuel_price", "markdown", "cpi", "unemployment")
+
+# Longest report name accepted
+MAX_REPORT_NAME = 200
+
 
 def validate_date(date_str: Optional[str], field_name: str = "date") -> Optional[str]:
     """Validate date string format (YYYY-MM-DD)"""
@@ -81,9 +98,192 @@ def validate_time_period(time_period: str, allowed_values: list) -> str:
     return time_period
 
 
+def validate_format(export_format: str, allowed_values) -> str:
+    """Validate format parameter"""
+    if export_format not in allowed_values:
+        raise BadRequest(
+            f"Invalid format value. Must be one of: {', '.join(allowed_values)}"
+        )
+    return export_format
+
+
+def validate_backend(backend: str, allowed_values) -> str:
+    """Validate query backend parameter"""
+    if backend not in allowed_values:
+        raise BadRequest(
+            f"Invalid backend value. Must be one of: {', '.join(allowed_values)}"
+        )
+    return backend
+
+
+def validate_model(model: str, allowed_values) -> str:
+    """Validate forecast/analysis model parameter"""
+    if model not in allowed_values:
+        raise BadRequest(
+            f"Invalid model value. Must be one of: {', '.join(allowed_values)}"
+        )
+    return model
+
+
+def validate_status(status: Optional[str], allowed_values) -> Optional[str]:
+    """Validate job status filter"""
+    if status is not None and status not in allowed_values:
+        raise BadRequest(
+            f"Invalid status value. Must be one of: {', '.join(allowed_values)}"
+        )
+    return status
+
+
+def validate_kind(kind: Optional[str], allowed_values) -> Optional[str]:
+    """Validate entry kind filter"""
+    if kind is not None and kind not in allowed_values:
+        raise BadRequest(
+            f"Invalid kind value. Must be one of: {', '.join(allowed_values)}"
+        )
+    return kind
+
+
+def validate_bool(value: Optional[str], field_name: str = "flag") -> Optional[bool]:
+    """Validate boolean flag (true/false/1/0)"""
+    if value is None:
+        return None
+
+    normalized = value.strip().lower()
+    if normalized in ("true", "1", "yes"):
+        return True
+    if normalized in ("false", "0", "no"):
+        return False
+    raise BadRequest(f"Invalid {field_name} value. Use true or false")
+
+
+def validate_report_request(payload: Any, report_types, report_formats) -> Dict:
+    """Validate a report definition: name, type, format and filters"""
+    if not isinstance(payload, dict):
+        raise BadRequest("Expected a report definition object")
+
+    report_type = payload.get("type")
+    if report_type not in report_types:
+        raise BadRequest(f"Invalid report type. Must be one of: {', '.join(report_types)}")
+    report_format = validate_format(payload.get("format", "csv"), list(report_formats))
+
+    name = payload.get("name") or f"{report_type} report"
+    if not isinstance(name, str) or len(name) > MAX_REPORT_NAME:
+        raise BadRequest(f"Report name must be text of at most {MAX_REPORT_NAME} characters")
+
+    filters = payload.get("filters") or {}
+    if not isinstance(filters, dict):
+        raise BadRequest("Report filters must be an object")
+    filters = {
+        **{field: validate_id(filters.get(field), field) for field in ("store_id", "dept_id")},
+        **{
+            field: validate_date(str(filters[field]), field) if filters.get(field) else None
+            for field in ("start_date", "end_date")
+        },
+    }
+    return {
+        "name": name,
+        "report_type": report_type,
+        "report_format": report_format,
+        "filters": {key: value for key, value in filters.items() if value is not None},
+    }
+
+
+def validate_schedule_request(payload: Any, report_types, report_formats, periods) -> Dict:
+    """Validate a report schedule: a report definition plus cron and period"""
+    report = validate_report_request(payload, report_types, report_formats)
+
+    cron = payload.get("cron")
+    if not isinstance(cron, str):
+        raise BadRequest("A schedule needs a cron expression, e.g. \"0 2 * * 1\"")
+    try:
+        parse_cron(cron)
+    except ValueError as error:
+        raise BadRequest(str(error))
+
+    period = payload.get("period")
+    if period is not None and period not in periods:
+        raise BadRequest(f"Invalid period value. Must be one of: {', '.join(periods)}")
+    return {**report, "cron": cron, "period": period}
+
+
+def validate_sales_rows(rows: Any) -> pd.DataFrame:
+    """Validate a batch of sales rows column-wise and return them as a frame.
+
+    Applies the single-value rules above (YYYY-MM-DD dates, positive integer
+    IDs) to whole columns at once, plus numeric sales and optional feature
+    values and a boolean is_holiday. Any invalid row rejects the batch with
+    a ValidationError listing the problems.
+    """
+    if not isinstance(rows, list) or not rows:
+        raise BadRequest("Expected a non-empty list of sales rows")
+    if len(rows) > MAX_BATCH_ROWS:
+        raise BadRequest(f"A batch cannot exceed {MAX_BATCH_ROWS} rows")
+    if not all(isinstance(row, dict) for row in rows):
+        raise BadRequest("Every sales row must be an object")
+
+    frame = pd.DataFrame.from_records(rows).reindex(
+        columns=[*SALES_REQUIRED_FIELDS, "is_holiday", *SALES_OPTIONAL_FIELDS]
+    )
+    invalid = {}
+
+    for field in SALES_REQUIRED_FIELDS:
+        invalid[(field, f"{field} is required")] = frame[field].isna()
+
+    for field in ("store_id", "dept_id"):
+        values = pd.to_numeric(frame[field], errors="coerce")
+        bad = frame[field].notna() & (
+            values.isna() | (values <= 0) | (values != np.floor(values))
+            | frame[field].map(lambda value: isinstance(value, bool))
+        )
+        invalid[(field, f"{field} must be a positive number")] = bad
+        frame[field] = values.where(~bad)
+
+    dates = pd.to_datetime(frame["date"], format="%Y-%m-%d", errors="coerce")
+    invalid[("date", "Invalid date format. Use YYYY-MM-DD")] = frame["date"].notna() & (
+        dates.isna() | frame["date"].map(lambda value: not isinstance(value, str))
+    )
+    frame["date"] = dates.dt.strftime("%Y-%m-%d")
+
+    for field in ("weekly_sales", *SALES_OPTIONAL_FIELDS):
+        values = pd.to_numeric(frame[field], errors="coerce")
+        bad = frame[field].notna() & (
+            ~np.isfinite(values.fillna(np.inf))
+            | frame[field].map(lambda value: isinstance(value, bool))
+        )
+        invalid[(field, f"{field} must be a number")] = bad
+        frame[field] = values
+
+    holiday = frame["is_holiday"]
+    flags = holiday.map({True: 1, False: 0, 1: 1, 0: 0})
+    invalid[("is_holiday", "is_holiday must be true or false")] = holiday.notna() & flags.isna()
+    frame["is_holiday"] = flags.fillna(0)
+
+    errors = [
+        {"row": int(index), "field": field, "message": message}
+        for (field, message), mask in invalid.items()
+        for index in np.flatnonzero(mask.to_numpy())
+    ]
+    if errors:
+        errors.sort(key=lambda error: error["row"])
+        raise ValidationError(
+            f"{len(errors)} invalid value(s) in sales batch",
+            payload={"errors": errors[:MAX_REPORTED_ERRORS]},
+        )
+
+    frame[["store_id", "dept_id", "is_holiday"]] = frame[
+        ["store_id", "dept_id", "is_holiday"]
+    ].astype(np.int64)
+    return frame
+
+
 def format_response(data: any, status: str = "success", message: str = None) -> dict:
     """Format API response"""
     response = {"status": status, "data": data}
     if message:
         response["message"] = message
     return response
+
+
+def format_columnar_response(columnar: Dict, status: str = "success") -> dict:
+    """Format a ``{"columns", "data"}`` column-wise result as an API response"""
+    return {"status": status, "columns": columnar["columns"], "data": columnar["data"]}
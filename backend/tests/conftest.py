@@ -6,6 +6,37 @@ import pytest
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from src.app import create_app
+from src.controllers.anomaly_controller import close_anomaly_scans
+from src.controllers.report_controller import close_report_queue
+from src.controllers.schedule_controller import close_scheduler
+from src.database import db
+from src.database.columnar import close_stores
+from src.database.pool import close_pool
+from src.database.slow_queries import close_slow_query_log
+from src.database.writer import close_writer
+
+
+@pytest.fixture(scope="session", autouse=True)
+def test_db(tmp_path_factory):
+    """Point the application at a freshly seeded throwaway database"""
+    original_path = db.DB_PATH
+    db.DB_PATH = str(tmp_path_factory.mktemp("db") / "retail.db")
+
+    conn = db.get_db_connection()
+    db.create_tables(conn)
+    db.load_sample_data(conn)
+    conn.close()
+
+    yield db.DB_PATH
+
+    close_anomaly_scans(db.DB_PATH)
+    close_scheduler(db.DB_PATH)
+    close_report_queue(db.DB_PATH)
+    close_writer(db.DB_PATH)
+    close_stores(db.DB_PATH)
+    close_pool(db.DB_PATH)
+    close_slow_query_log()
+    db.DB_PATH = original_path
 
 
 @pytest.fixture
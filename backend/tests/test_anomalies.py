@@ -0,0 +1,211 @@
+import numpy as np
+import pytest
+
+from src.controllers.anomaly_controller import close_anomaly_scans, scan_anomalies
+from src.database import db
+from src.utils import anomalies
+
+
+def _naive_scores(values, window, method):
+    scores = np.full((len(values), values.shape[1] - window), np.nan)
+    for row, series in enumerate(values):
+        for week in range(window, len(series)):
+            history = series[week - window : week]
+            history = history[~np.isnan(history)]
+            if len(history) < 2:
+                continue
+            if method == "zscore":
+                center, scale = history.mean(), history.std(ddof=1)
+            else:
+                center = np.median(history)
+                scale = anomalies.MAD_SCALE * np.median(np.abs(history - center))
+            if scale > 0:
+                scores[row, week - window] = (series[week] - center) / scale
+    return scores
+
+
+@pytest.mark.parametrize("method", anomalies.ANOMALY_METHODS)
+def test_rolling_scores_match_naive(method):
+    """Test the vectorized scores against a week-by-week computation"""
+    rng = np.random.default_rng(0)
+    values = rng.normal(100, 10, size=(5, 40))
+    values[2, 30] = 400
+    values[3] = 7.0
+    values[4, 10:20] = np.nan
+
+    scores, expected = anomalies.rolling_scores(values, 8, method)
+    assert scores.shape == expected.shape == (5, 32)
+    np.testing.assert_allclose(scores, _naive_scores(values, 8, method), rtol=1e-6)
+    # Flat history has no scale, so it is never flagged
+    assert np.isnan(scores[3]).all()
+    # Missing weeks are not scored
+    assert np.isnan(scores[4, 2:12]).all()
+
+    rows, columns = anomalies.flag(scores)
+    assert (2, 22) in set(zip(rows.tolist(), columns.tolist()))
+
+
+def test_scores_of_newest_weeks_need_only_the_window():
+    """Test that scoring the tail with its window of history matches the full scan"""
+    values = np.random.default_rng(1).normal(50, 5, size=(3, 30))
+    full, _ = anomalies.rolling_scores(values, 6)
+    tail, _ = anomalies.rolling_scores(values[:, -10:], 6)
+    # Each window is computed on its own, so the scores are identical
+    np.testing.assert_array_equal(tail, full[:, -4:])
+
+
+def _stored(method):
+    conn = db.get_db_connection()
+    try:
+        rows = conn.execute(
+            "SELECT store_id, dept_id, date, round(score, 6) FROM sales_anomalies "
+            "WHERE method = ? ORDER BY 1, 2, 3",
+            (method,),
+        ).fetchall()
+        return [tuple(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def test_anomalies_endpoint(client):
+    """Test listing anomalies and parameter validation"""
+    response = client.post("/api/analytics/anomalies/scan?method=mad")
+    assert response.status_code == 200
+    assert set(response.json["data"]) == {"mad"}
+
+    response = client.get("/api/analytics/anomalies?method=mad&store_id=1&limit=5")
+    assert response.status_code == 200
+    data = response.json["data"]
+    assert data["method"] == "mad"
+    assert data["window"] == anomalies.ANOMALY_WINDOW
+    assert data["scanned_through"] is not None
+    assert not data["stale"]
+    assert len(data["anomalies"]) <= 5
+    for anomaly in data["anomalies"]:
+        assert anomaly["store_id"] == 1
+        assert abs(anomaly["score"]) > anomalies.ANOMALY_THRESHOLD
+        assert anomaly["direction"] == ("spike" if anomaly["score"] > 0 else "drop")
+
+    assert client.get("/api/analytics/anomalies?method=iforest").status_code == 400
+    assert client.get("/api/analytics/anomalies?limit=0").status_code == 400
+    assert client.post("/api/analytics/anomalies/scan?method=iforest").status_code == 400
+
+
+def test_listing_stale_anomalies_scans_in_the_background(client):
+    """Test that listing only reads, and stale results start a background scan"""
+    client.post("/api/analytics/anomalies/scan")
+    conn = db.get_db_connection()
+    try:
+        conn.execute("DELETE FROM anomaly_scans WHERE method = 'zscore'")
+        conn.commit()
+        stored = conn.execute("SELECT COUNT(*) FROM sales_anomalies").fetchone()[0]
+
+        data = client.get("/api/analytics/anomalies").json["data"]
+        assert data["stale"] and data["scanned_through"] is None
+        # The stored results are listed as they are, and not cached
+        assert len(data["anomalies"]) == min(stored, 100)
+        close_anomaly_scans()
+
+        response = client.get("/api/analytics/anomalies")
+        assert response.headers["X-Cache"] == "MISS"
+        assert not response.json["data"]["stale"]
+        assert response.json["data"]["scanned_through"] is not None
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("method", anomalies.ANOMALY_METHODS)
+def test_new_week_is_scanned_incrementally(client, method):
+    """Test that a new week is scored on its own and matches a full rescan"""
+    client.post(f"/api/analytics/anomalies/scan?method={method}")
+    last_date = client.get(f"/api/analytics/anomalies?method={method}").json["data"][
+        "scanned_through"
+    ]
+    new_week = str(np.datetime64(last_date) + np.timedelta64(7, "D"))
+
+    conn = db.get_db_connection()
+    try:
+        conn.execute(
+            "INSERT INTO sales (store_id, dept_id, date, weekly_sales, is_holiday) "
+            "VALUES (1, 1, ?, 1e9, 0)",
+            (new_week,),
+        )
+        conn.commit()
+
+        assert scan_anomalies(method) == {"mode": "incremental", "weeks": 1, "flagged": 1}
+        assert scan_anomalies(method)["mode"] == "none"
+        data = client.get(f"/api/analytics/anomalies?method={method}&limit=1").json["data"]
+        assert data["scanned_through"] == new_week
+        assert data["anomalies"][0]["date"] == new_week
+        assert data["anomalies"][0]["direction"] == "spike"
+
+        incremental = _stored(method)
+        conn.execute("DELETE FROM anomaly_scans WHERE method = ?", (method,))
+        conn.commit()
+        assert scan_anomalies(method)["mode"] == "full"
+        assert _stored(method) == incremental
+    finally:
+        conn.execute("DELETE FROM sales WHERE date = ?", (new_week,))
+        conn.commit()
+        conn.close()
+
+    # Removing a scanned week rewrites history, so everything is rescored
+    assert scan_anomalies(method)["mode"] == "full"
+
+
+def test_incremental_history_skips_missing_weeks(client):
+    """Test that the history of new weeks is the last window of panel columns"""
+    client.post("/api/analytics/anomalies/scan")
+    last_date = client.get("/api/analytics/anomalies").json["data"]["scanned_through"]
+    # Two weeks with no sales between the last scanned week and the new ones
+    after_gap = str(np.datetime64(last_date) + np.timedelta64(21, "D"))
+    next_week = str(np.datetime64(after_gap) + np.timedelta64(7, "D"))
+
+    conn = db.get_db_connection()
+    try:
+        for week, spike in ((after_gap, 1), (next_week, 1e6)):
+            conn.execute(
+                "INSERT INTO sales (store_id, dept_id, date, weekly_sales, is_holiday) "
+                "SELECT store_id, dept_id, ?, weekly_sales * "
+                "CASE WHEN store_id = 1 AND dept_id = 1 THEN ? ELSE 1 END, 0 "
+                "FROM sales WHERE date = ?",
+                (week, spike, last_date),
+            )
+            conn.commit()
+            assert scan_anomalies("zscore")["mode"] == "incremental"
+        assert (1, 1, next_week) in {row[:3] for row in _stored("zscore")}
+
+        incremental = _stored("zscore")
+        conn.execute("DELETE FROM anomaly_scans WHERE method = 'zscore'")
+        conn.commit()
+        assert scan_anomalies("zscore")["mode"] == "full"
+        assert _stored("zscore") == incremental
+    finally:
+        conn.execute("DELETE FROM sales WHERE date IN (?, ?)", (after_gap, next_week))
+        conn.commit()
+        conn.close()
+    scan_anomalies("zscore")
+
+
+def test_past_edits_that_keep_the_totals_rescan_everything(client):
+    """Test that moving sales between series of a scanned week is seen as an edit"""
+    client.post("/api/analytics/anomalies/scan")
+    conn = db.get_db_connection()
+    try:
+        first, second = conn.execute(
+            "SELECT MIN(sale_id), MAX(sale_id) FROM sales "
+            "WHERE date = (SELECT MIN(date) FROM sales)"
+        ).fetchone()
+        moved = [(-1000.0, first), (1000.0, second)]
+        conn.executemany(
+            "UPDATE sales SET weekly_sales = weekly_sales + ? WHERE sale_id = ?", moved
+        )
+        conn.commit()
+        assert scan_anomalies("zscore")["mode"] == "full"
+    finally:
+        conn.executemany(
+            "UPDATE sales SET weekly_sales = weekly_sales - ? WHERE sale_id = ?", moved
+        )
+        conn.commit()
+        conn.close()
+    scan_anomalies("zscore")
@@ -13,6 +13,17 @@ def test_health_check(client):
     assert data["message"] == "Service is healthy"
 
 
+def test_cors_options():
+    """Test that the server entry point can restrict CORS to its frontend"""
+    from src.app import create_app
+
+    client = create_app(cors_options={"origins": ["https://localhost:3000"]}).test_client()
+    allowed = client.get("/health/db", headers={"Origin": "https://localhost:3000"})
+    assert allowed.headers["Access-Control-Allow-Origin"] == "https://localhost:3000"
+    other = client.get("/health/db", headers={"Origin": "https://example.com"})
+    assert "Access-Control-Allow-Origin" not in other.headers
+
+
 def test_api_docs(client):
     """Test API documentation endpoint"""
     response = client.get("/api/docs")
@@ -67,6 +78,29 @@ def test_analytics_store_performance_endpoint(client):
     assert response.status_code == 200
 
 
+def test_store_performance_top_departments(client):
+    """Test per-store top-K departments come from a constant number of queries"""
+    from src.database.instrumentation import statement_listener
+
+    statements = []
+    with statement_listener(statements.append):
+        response = client.get("/api/analytics/store-performance?top_departments=3")
+    assert response.status_code == 200
+    stores = json.loads(response.data)["data"]
+    assert len(stores) > 1
+    # Store aggregates plus one windowed top-K query, however many stores
+    assert len([e for e in statements if e.sql.lstrip().startswith(("SELECT", "WITH"))]) <= 3
+
+    for store in stores:
+        sales = [dept["dept_sales"] for dept in store["top_departments"]]
+        assert len(sales) == 3
+        assert sales == sorted(sales, reverse=True)
+
+    default = json.loads(client.get("/api/analytics/store-performance").data)["data"]
+    assert all(len(store["top_departments"]) == 5 for store in default)
+    assert client.get("/api/analytics/store-performance?top_departments=0").status_code == 400
+
+
 def test_sales_endpoint(client):
     """Test sales endpoint with various parameters"""
     # Test without parameters
@@ -90,6 +124,83 @@ def test_sales_endpoint(client):
     assert response.status_code == 200
 
 
+def test_sales_keyset_pagination(client):
+    """Test paging through sales with continuation tokens"""
+    first = json.loads(client.get("/api/sales?store_id=1&dept_id=1&limit=1000").data)
+    expected = [row["sale_id"] for row in first["data"]]
+    assert first["next_cursor"] is None
+
+    seen, cursor = [], None
+    while True:
+        url = "/api/sales?store_id=1&dept_id=1&limit=7"
+        if cursor:
+            url += f"&cursor={cursor}"
+        page = json.loads(client.get(url).data)
+        seen += [row["sale_id"] for row in page["data"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == expected
+    keys = [(row["date"], row["sale_id"]) for row in first["data"]]
+    assert keys == sorted(keys, reverse=True)
+
+    # Tampered tokens are rejected
+    assert client.get("/api/sales?cursor=not-a-cursor").status_code == 400
+
+
+def test_sales_ndjson_stream(client):
+    """Test streaming every matching sale as NDJSON"""
+    response = client.get("/api/sales?format=ndjson&store_id=2")
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == "application/x-ndjson"
+
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert len(rows) > 1000  # not capped by the JSON page limit
+    assert {row["store_id"] for row in rows} == {2}
+    assert {"sale_id", "date", "weekly_sales", "store_name", "dept_name"} <= set(rows[0])
+
+    response = client.get("/api/sales?format=ndjson&limit=5")
+    assert len(response.get_data(as_text=True).splitlines()) == 5
+    assert client.get("/api/sales?format=xml").status_code == 400
+
+
+def test_columnar_format(client):
+    """Test column-wise responses match the row-wise ones"""
+    for url in [
+        "/api/analytics/time-series",
+        "/api/sales/summary?group_by=department",
+        "/api/sales/summary?group_by=date&time_period=week",
+        "/api/sales?store_id=1&limit=20",
+    ]:
+        separator = "&" if "?" in url else "?"
+        rows = json.loads(client.get(url).data)["data"]
+        response = client.get(f"{url}{separator}format=columnar")
+        assert response.status_code == 200
+        columnar = json.loads(response.data)
+
+        assert columnar["status"] == "success"
+        assert set(columnar["columns"]) == set(rows[0])
+        assert set(columnar["data"]) == set(columnar["columns"])
+        rebuilt = [dict(zip(columnar["columns"], values))
+                   for values in zip(*(columnar["data"][c] for c in columnar["columns"]))]
+        assert rebuilt == rows
+
+    # Pagination carries over to the columnar form
+    page = json.loads(client.get("/api/sales?limit=5&format=columnar").data)
+    assert len(page["data"]["sale_id"]) == 5
+    following = json.loads(
+        client.get(f"/api/sales?limit=5&format=columnar&cursor={page['next_cursor']}").data
+    )
+    assert following["data"]["date"][0] <= page["data"]["date"][-1]
+
+    # Empty results keep their columns
+    empty = json.loads(client.get("/api/sales?start_date=1999-01-01&end_date=1999-12-31&format=columnar").data)
+    assert empty["data"]["sale_id"] == [] and empty["next_cursor"] is None
+    assert client.get("/api/analytics/time-series?format=xml").status_code == 400
+
+
 def test_sales_metrics_endpoint(client):
     """Test sales metrics endpoint"""
     response = client.get("/api/sales/metrics")
@@ -141,3 +252,14 @@ def test_error_handling(client):
     data = json.loads(response.data)
     assert data["status"] == "error"
     assert "message" in data
+
+
+def test_db_health_check(client):
+    """Test database pool metrics endpoint"""
+    client.get("/api/sales/stores")
+    response = client.get("/health/db")
+    assert response.status_code == 200
+    pool = json.loads(response.data)["data"]["pool"]
+    assert pool["created"] >= 1
+    assert pool["in_use"] == 0
+    assert pool["size"] <= pool["max_size"]
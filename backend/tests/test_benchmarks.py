@@ -0,0 +1,71 @@
+from benchmarks.bench_endpoints import compare, discover_requests, measure, run
+from src.controllers.anomaly_controller import close_anomaly_scans
+from src.controllers.report_controller import close_report_queue
+from src.controllers.schedule_controller import close_scheduler
+from src.database.columnar import close_stores
+from src.database.pool import close_pool
+from src.database.writer import close_writer
+
+
+def _results(**metrics):
+    endpoint = {
+        "status": 200,
+        "p95_ms": 10.0,
+        "sql_statements": 2,
+        "peak_memory_kb": 1000.0,
+    }
+    endpoint.update(metrics)
+    return {"scales": {"small": {"endpoints": {"/api/dashboard/stats": endpoint}}}}
+
+
+def test_discover_requests(app):
+    """Test that every GET route is benchmarked with path arguments filled in"""
+    urls, skipped = discover_requests(app)
+    assert "/api/dashboard/stats" in urls
+    assert "/api/analytics/inventory/1/history" in urls
+    assert any(url.startswith("/api/sales/summary?group_by=") for url in urls)
+    assert all("<" not in url for url in urls)
+    assert any(rule.startswith("POST") for rule in skipped)
+
+
+def test_benchmark_routes_find_their_fixtures(tmp_path):
+    """Test that a fresh benchmark database answers every route, reports included"""
+    results = run(["small"], str(tmp_path), iterations=1, warmup=0)
+    db_path = next(str(path) for path in tmp_path.glob("*.db"))
+    for close in (
+        close_anomaly_scans,
+        close_scheduler,
+        close_report_queue,
+        close_writer,
+        close_stores,
+        close_pool,
+    ):
+        close(db_path)
+
+    endpoints = results["scales"]["small"]["endpoints"]
+    assert any(url.endswith("/download") for url in endpoints)
+    assert any(url.startswith("/api/reports/scheduled/") for url in endpoints)
+    failures = {url: metrics["status"] for url, metrics in endpoints.items() if metrics["status"] >= 400}
+    assert failures == {}
+
+
+def test_measure_counts_statements(client):
+    """Test that measuring an endpoint reports latency, SQL and memory"""
+    metrics = measure(client, "/api/dashboard/stats", iterations=3, warmup=1, cached=False)
+    assert metrics["status"] == 200
+    assert metrics["p50_ms"] <= metrics["p95_ms"] <= metrics["p99_ms"]
+    assert metrics["sql_statements"] >= 1
+    assert metrics["peak_memory_kb"] > 0
+
+
+def test_compare_flags_regressions():
+    """Test that regressions beyond the threshold and noise floor are reported"""
+    baseline = _results()
+    assert compare(_results(p95_ms=11.0), baseline) == []
+    assert compare(_results(peak_memory_kb=1100.0), baseline) == []
+
+    regressions = compare(
+        _results(status=500, p95_ms=20.0, sql_statements=3, peak_memory_kb=2000.0),
+        baseline,
+    )
+    assert len(regressions) == 4
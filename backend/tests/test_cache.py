@@ -0,0 +1,118 @@
+from src.database.db import get_data_version, get_db_connection
+from src.utils.cache import ResponseCache, response_cache
+
+
+def test_response_cache_lru_eviction():
+    """Test that the least recently used entry is evicted first"""
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", 200, {}, b"1")
+    cache.set("b", 200, {}, b"2")
+    assert cache.get("a") == (200, {}, b"1")
+
+    cache.set("c", 200, {}, b"3")
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+
+
+def test_response_cache_size_bound():
+    """Test that the cache stays within its byte budget"""
+    cache = ResponseCache(max_entries=10, max_bytes=10)
+    cache.set("a", 200, {}, b"x" * 6)
+    cache.set("b", 200, {}, b"y" * 6)
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 6
+
+    # Bodies larger than the whole budget are never stored
+    cache.set("c", 200, {}, b"z" * 11)
+    assert cache.get("c") is None
+    assert cache.get("b") is not None
+
+
+def test_data_version_bumps_on_writes():
+    """Test that writes to versioned tables increment the data version"""
+    conn = get_db_connection()
+    before = get_data_version(conn)
+    conn.execute("UPDATE stores SET name = name WHERE store_id = 1")
+    conn.commit()
+    assert get_data_version(conn) > before
+    conn.close()
+
+
+def test_cached_endpoint_hits_and_invalidates(client):
+    """Test that repeated reads hit the cache until the data changes"""
+    response_cache.clear()
+    first = client.get("/api/dashboard/categories")
+    assert first.headers["X-Cache"] == "MISS"
+
+    second = client.get("/api/dashboard/categories")
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.get_json() == first.get_json()
+    assert second.content_type == first.content_type
+
+    conn = get_db_connection()
+    conn.execute("UPDATE departments SET name = name WHERE dept_id = 1")
+    conn.commit()
+    conn.close()
+
+    third = client.get("/api/dashboard/categories")
+    assert third.headers["X-Cache"] == "MISS"
+
+
+def test_cache_key_normalizes_query_args(client):
+    """Test that argument order does not matter but argument values do"""
+    response_cache.clear()
+    client.get("/api/sales/summary?group_by=store&time_period=month")
+    swapped = client.get("/api/sales/summary?time_period=month&group_by=store")
+    assert swapped.headers["X-Cache"] == "HIT"
+
+    other = client.get("/api/sales/summary?group_by=department&time_period=month")
+    assert other.headers["X-Cache"] == "MISS"
+
+
+def test_errors_are_not_cached(client):
+    """Test that only successful responses are cached"""
+    response_cache.clear()
+    client.get("/api/analytics/kpis?start_date=invalid")
+    response = client.get("/api/analytics/kpis?start_date=invalid")
+    assert response.status_code == 400
+    assert response.headers.get("X-Cache") != "HIT"
+
+
+def test_conditional_get_returns_not_modified(client):
+    """Test that a matching If-None-Match short-circuits with 304"""
+    first = client.get("/api/analytics/time-series")
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    response = client.get("/api/analytics/time-series", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.headers["ETag"] == etag
+
+    other = client.get(
+        "/api/analytics/time-series?start_date=2024-01-01",
+        headers={"If-None-Match": etag},
+    )
+    assert other.status_code == 200
+    assert other.headers["ETag"] != etag
+
+
+def test_etag_changes_with_data_version(client):
+    """Test that writes invalidate previously issued ETags"""
+    etag = client.get("/api/dashboard/regions").headers["ETag"]
+
+    conn = get_db_connection()
+    conn.execute("UPDATE stores SET region = region WHERE store_id = 1")
+    conn.commit()
+    conn.close()
+
+    response = client.get("/api/dashboard/regions", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
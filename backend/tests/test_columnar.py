@@ -0,0 +1,191 @@
+import os
+from datetime import date, timedelta
+
+import pytest
+
+from src.database import columnar, db, partitioned
+from src.database.columnar import ColumnarStore, get_store
+
+# The sample data covers the two years up to today
+LAST_YEAR = date.today().year - 1
+
+QUERIES = [
+    {},
+    {"start_date": f"{LAST_YEAR}-03-01", "end_date": f"{LAST_YEAR}-06-30"},
+    {"start_date": f"{LAST_YEAR}-01-01", "end_date": f"{LAST_YEAR}-12-31", "store_id": 3},
+    {"store_id": 2, "dept_id": 4},
+    {"start_date": "1999-01-01", "end_date": "1999-12-31"},
+]
+
+
+def _close(left, right):
+    assert left.keys() == right.keys()
+    for key, value in left.items():
+        assert value == pytest.approx(right[key]), key
+
+
+@pytest.mark.parametrize("backend", ["columnar", "parquet"])
+@pytest.mark.parametrize("args", QUERIES)
+def test_columnar_kpis_match_sqlite(client, args, backend):
+    """Test that every query backend returns the same KPIs"""
+    get_store(db.DB_PATH, backend).refresh()
+    sqlite = client.get("/api/analytics/kpis", query_string={**args, "backend": "sqlite"})
+    columnar = client.get("/api/analytics/kpis", query_string={**args, "backend": backend})
+    assert columnar.status_code == 200
+    _close(columnar.json["data"], sqlite.json["data"])
+
+
+@pytest.mark.parametrize("backend", ["columnar", "parquet"])
+@pytest.mark.parametrize("output_format", ["json", "columnar"])
+def test_columnar_time_series_matches_sqlite(client, output_format, backend):
+    """Test that the columnar time series matches the rollup query"""
+    get_store(db.DB_PATH, backend).refresh()
+    start = date.today() - timedelta(days=400)
+    args = {
+        "start_date": start.isoformat(),
+        "end_date": (start + timedelta(days=365)).isoformat(),
+        "format": output_format,
+    }
+    sqlite = client.get("/api/analytics/time-series", query_string={**args, "backend": "sqlite"}).json
+    columnar = client.get("/api/analytics/time-series", query_string={**args, "backend": backend}).json
+
+    if output_format == "columnar":
+        assert columnar["columns"] == sqlite["columns"]
+        assert columnar["data"]["date"] == sqlite["data"]["date"]
+        assert columnar["data"]["store_count"] == sqlite["data"]["store_count"]
+        assert columnar["data"]["total_sales"] == pytest.approx(sqlite["data"]["total_sales"])
+    else:
+        assert len(columnar["data"]) == len(sqlite["data"]) > 0
+        for left, right in zip(columnar["data"], sqlite["data"]):
+            _close(left, right)
+
+
+def test_invalid_backend(client):
+    """Test that unknown backends are rejected"""
+    response = client.get("/api/analytics/kpis?backend=duckdb")
+    assert response.status_code == 400
+
+
+def test_snapshot_refreshes_on_data_version_change(tmp_path, monkeypatch):
+    """Test that a write rebuilds the snapshot in the background and drops old files"""
+    # Several batches are streamed into the column files
+    monkeypatch.setattr(columnar, "SNAPSHOT_BATCH_SIZE", 1000)
+    store = ColumnarStore(db.DB_PATH, str(tmp_path / "columns"))
+    first = store.snapshot()
+    assert store.snapshot() is first
+    assert first.columns["weekly_sales"].filename is not None  # memory-mapped
+
+    conn = db.get_db_connection()
+    try:
+        conn.execute(
+            "INSERT INTO sales (store_id, dept_id, date, weekly_sales, is_holiday) "
+            "VALUES (1, 1, '2031-01-03', 500.0, 0)"
+        )
+        conn.commit()
+
+        # The last snapshot is served while the new one is built
+        assert store.snapshot() is first
+        store.wait()
+        second = store.snapshot()
+        assert second.version > first.version
+        assert len(second) == len(first) + 1
+        assert second.kpis("2031-01-01", "2031-12-31")["total_sales"] == 500.0
+        assert store.stats()["refreshes"] == 2
+        assert store.stats()["stale_queries"] == 1
+
+        conn.execute("DELETE FROM sales WHERE date = '2031-01-03'")
+        conn.commit()
+        store.snapshot()
+        store.wait()
+        # Only the current snapshot and the one it replaced are kept
+        assert set(os.listdir(tmp_path / "columns")) == {
+            f"v{second.version}",
+            f"v{store.snapshot().version}",
+        }
+
+        # After a restart the published snapshot is mapped, not rebuilt
+        restarted = ColumnarStore(db.DB_PATH, str(tmp_path / "columns"))
+        assert restarted.snapshot().version == store.snapshot().version
+        assert restarted.stats()["refreshes"] == 1
+    finally:
+        conn.execute("DELETE FROM sales WHERE date = '2031-01-03'")
+        conn.commit()
+        conn.close()
+
+
+def test_answers_from_a_stale_snapshot_are_not_cached(client):
+    """Test that a response served while the snapshot refreshes is not cached"""
+    store = get_store(db.DB_PATH, "columnar")
+    store.refresh()
+    url = "/api/analytics/kpis?backend=columnar&start_date=2031-01-01&end_date=2031-12-31"
+    conn = db.get_db_connection()
+    try:
+        conn.execute(
+            "INSERT INTO sales (store_id, dept_id, date, weekly_sales, is_holiday) "
+            "VALUES (1, 1, '2031-01-03', 500.0, 0)"
+        )
+        conn.commit()
+
+        stale = client.get(url)
+        assert stale.json["data"]["total_sales"] is None
+        assert "ETag" not in stale.headers
+        store.wait()
+        assert client.get(url).json["data"]["total_sales"] == 500.0
+    finally:
+        conn.execute("DELETE FROM sales WHERE date = '2031-01-03'")
+        conn.commit()
+        conn.close()
+
+
+def test_parquet_prunes_partitions():
+    """Test that date filters only open the matching month partitions"""
+    snapshot = get_store(db.DB_PATH, "parquet").snapshot()
+    every_file = snapshot.files()
+    quarter = snapshot.files(start_date=f"{LAST_YEAR}-04-15", end_date=f"{LAST_YEAR}-06-30")
+
+    assert len(every_file) > 12
+    assert [path.split(os.sep)[-3:-1] for path in quarter] == [
+        [f"year={LAST_YEAR}", f"month={month}"] for month in (4, 5, 6)
+    ]
+    assert snapshot.kpis(f"{LAST_YEAR}-04-15", f"{LAST_YEAR}-06-30")["total_transactions"] > 0
+
+
+def test_parquet_rewrites_only_changed_months(tmp_path):
+    """Test that a write rewrites its month partition and links the others"""
+    store = ColumnarStore(
+        db.DB_PATH, str(tmp_path / "parquet"), partitioned.build_parquet, partitioned.ParquetSnapshot
+    )
+    first = store.snapshot()
+    changed_month = f"year={LAST_YEAR}{os.sep}month=5"
+
+    conn = db.get_db_connection()
+    try:
+        conn.execute(
+            "UPDATE sales SET weekly_sales = weekly_sales + 1000 "
+            "WHERE store_id = 1 AND dept_id = 1 AND date BETWEEN ? AND ?",
+            (f"{LAST_YEAR}-05-01", f"{LAST_YEAR}-05-31"),
+        )
+        conn.commit()
+        second = store.refresh()
+
+        assert len(second) == len(first)
+        inodes = [
+            {os.path.relpath(path, snapshot.directory): os.stat(path).st_ino for path in snapshot.files()}
+            for snapshot in (first, second)
+        ]
+        assert inodes[0].keys() == inodes[1].keys()
+        rewritten = [path for path, inode in inodes[1].items() if inodes[0][path] != inode]
+        assert [os.path.dirname(path) for path in rewritten] == [changed_month]
+
+        month = {"start_date": f"{LAST_YEAR}-05-01", "end_date": f"{LAST_YEAR}-05-31"}
+        added = 1000 * first.kpis(store_id=1, dept_id=1, **month)["total_transactions"]
+        total = second.kpis(**month)["total_sales"]
+        assert total == pytest.approx(first.kpis(**month)["total_sales"] + added)
+    finally:
+        conn.execute(
+            "UPDATE sales SET weekly_sales = weekly_sales - 1000 "
+            "WHERE store_id = 1 AND dept_id = 1 AND date BETWEEN ? AND ?",
+            (f"{LAST_YEAR}-05-01", f"{LAST_YEAR}-05-31"),
+        )
+        conn.commit()
+        conn.close()
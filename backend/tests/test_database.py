@@ -0,0 +1,276 @@
+import sqlite3
+import threading
+
+import pytest
+
+from src.database import db
+from src.database.db import (SALES_INDEXES, drop_indexes, ensure_indexes,
+                             get_db_connection, year_range)
+from src.database.pool import ConnectionPool, get_pool
+from src.database.rollups import (MONTHLY_ROLLUP, WEEKLY_ROLLUP,
+                                  create_rollup_triggers, drop_rollup_triggers,
+                                  rebuild_rollups, rollup_source)
+
+
+@pytest.fixture
+def conn():
+    """Open a connection to the test database"""
+    conn = get_db_connection()
+    yield conn
+    conn.close()
+
+
+def _query_plan(conn, query, params=()):
+    cursor = conn.cursor()
+    cursor.execute(f"EXPLAIN QUERY PLAN {query}", params)
+    return " | ".join(row["detail"] for row in cursor.fetchall())
+
+
+def test_year_range():
+    """Test half-open year ranges"""
+    assert year_range(2024) == ("2024-01-01", "2025-01-01")
+    assert year_range("1999") == ("1999-01-01", "2000-01-01")
+
+
+def test_managed_indexes_exist(conn):
+    """Test that create_tables builds every managed sales index"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+    existing = {row["name"] for row in cursor.fetchall()}
+    assert set(SALES_INDEXES) <= existing
+
+
+def test_drop_and_ensure_indexes(conn):
+    """Test that the managed index set can be dropped and rebuilt"""
+    drop_indexes(conn)
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE name LIKE 'idx_sales_%'")
+    assert cursor.fetchone()[0] == 0
+
+    # Retired indexes left over from older databases are dropped
+    cursor.execute("CREATE INDEX idx_sales_date ON sales (date)")
+    ensure_indexes(conn)
+    cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE name LIKE 'idx_sales_%'")
+    assert cursor.fetchone()[0] == len(SALES_INDEXES)
+
+
+def test_year_filter_uses_index(conn):
+    """Test that year filters are answered with an index search, not a scan"""
+    plan = _query_plan(
+        conn,
+        "SELECT SUM(weekly_sales) FROM sales WHERE date >= ? AND date < ?",
+        year_range(2024),
+    )
+    assert "SEARCH sales USING" in plan
+    assert "SCAN sales" not in plan
+
+    plan = _query_plan(
+        conn,
+        """
+        SELECT d.dept_id, SUM(s.weekly_sales) FROM sales s
+        JOIN departments d ON s.dept_id = d.dept_id
+        WHERE s.store_id = ? AND s.date >= ? AND s.date < ?
+        GROUP BY d.dept_id
+        """,
+        (1, *year_range(2024)),
+    )
+    assert "USING COVERING INDEX idx_sales_store_date" in plan
+
+
+def test_pool_reuses_connections(tmp_path):
+    """Test that closed connections go back to the pool and are reused"""
+    pool = ConnectionPool(str(tmp_path / "pool.db"), max_size=2)
+    conn = pool.acquire()
+    conn.close()
+    assert pool.acquire() is conn
+
+    stats = pool.stats()
+    assert stats["created"] == 1
+    assert stats["checkouts"] == 2
+    assert stats["in_use"] == 1
+    pool.close()
+
+
+def test_pool_tunes_new_connections(tmp_path):
+    """Test that new pooled connections are configured once at creation"""
+    pool = ConnectionPool(str(tmp_path / "pool.db"))
+    conn = pool.acquire()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2
+    assert conn.execute("PRAGMA cache_size").fetchone()[0] == -32768
+    assert isinstance(conn.execute("SELECT 1 AS one").fetchone(), sqlite3.Row)
+    conn.close()
+    pool.close()
+
+
+def test_pool_rolls_back_and_ignores_double_close(tmp_path):
+    """Test that released connections are clean and released only once"""
+    pool = ConnectionPool(str(tmp_path / "pool.db"), max_size=1)
+    conn = pool.acquire()
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.commit()
+    conn.execute("INSERT INTO t VALUES (1)")
+    conn.close()
+    conn.close()
+    assert pool.stats()["idle"] == 1
+
+    conn = pool.acquire()
+    assert not conn.in_transaction
+    assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    conn.close()
+    pool.close()
+
+
+def test_pool_is_bounded_across_threads(tmp_path):
+    """Test that concurrent borrowers never exceed the pool size"""
+    pool = ConnectionPool(str(tmp_path / "pool.db"), max_size=2, timeout=5)
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(20):
+                conn = pool.acquire()
+                conn.execute("SELECT 1").fetchone()
+                conn.close()
+        except Exception as error:  # pragma: no cover - reported below
+            errors.append(error)
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = pool.stats()
+    assert not errors
+    assert stats["created"] <= 2
+    assert stats["checkouts"] == 120
+    assert stats["in_use"] == 0
+    pool.close()
+
+
+def test_pool_times_out_when_exhausted(tmp_path):
+    """Test that waiting on an exhausted pool fails with a database error"""
+    pool = ConnectionPool(str(tmp_path / "pool.db"), max_size=1, timeout=0.05)
+    conn = pool.acquire()
+    with pytest.raises(sqlite3.OperationalError):
+        pool.acquire()
+    assert pool.stats()["timeouts"] == 1
+    conn.close()
+    pool.close()
+
+
+def test_request_connections_are_returned(app):
+    """Test that connections a request leaks go back to the pool on teardown"""
+    pool = get_pool(db.DB_PATH)
+    in_use = pool.stats()["in_use"]
+    with app.app_context():
+        leaked = get_db_connection()
+        closed = get_db_connection()
+        closed.close()
+        assert pool.stats()["in_use"] == in_use + 1
+    assert pool.stats()["in_use"] == in_use
+    assert not leaked.checked_out
+
+
+@pytest.fixture
+def scratch_conn(tmp_path):
+    """Open a connection to an empty database with the full schema"""
+    pool = ConnectionPool(str(tmp_path / "scratch.db"))
+    conn = pool.acquire()
+    db.create_tables(conn)
+    conn.executemany(
+        "INSERT INTO stores VALUES (?, ?, ?, ?, ?)",
+        [(1, "Store A", "North", 1000, "Supercenter"), (2, "Store B", "South", 900, "Discount")],
+    )
+    conn.executemany(
+        "INSERT INTO departments VALUES (?, ?, ?)",
+        [(1, "Grocery", "Food"), (2, "Toys", "Entertainment")],
+    )
+    conn.commit()
+    yield conn
+    conn.close()
+    pool.close()
+
+
+def _insert_sales(conn, rows):
+    conn.executemany(
+        "INSERT INTO sales (store_id, dept_id, date, weekly_sales, is_holiday) "
+        "VALUES (?, ?, ?, ?, ?)",
+        rows,
+    )
+    conn.commit()
+
+
+def _rollup_matches_sales(conn):
+    """Compare the monthly rollup with the same aggregate computed from sales"""
+    expected = conn.execute(
+        """
+        SELECT substr(date, 1, 7), store_id, dept_id, SUM(weekly_sales), COUNT(*),
+               SUM(CASE WHEN is_holiday = 1 THEN weekly_sales ELSE 0 END)
+        FROM sales GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+        """
+    ).fetchall()
+    actual = conn.execute(
+        f"""
+        SELECT month, store_id, dept_id, total_sales, sale_count, holiday_sales
+        FROM {MONTHLY_ROLLUP} ORDER BY 1, 2, 3
+        """
+    ).fetchall()
+    return [tuple(row) for row in expected] == [tuple(row) for row in actual]
+
+
+def test_rollups_follow_inserts_updates_and_deletes(scratch_conn):
+    """Test that the rollup triggers keep the rollups in sync with sales"""
+    _insert_sales(
+        scratch_conn,
+        [
+            (1, 1, "2024-01-05", 100.0, 0),
+            (1, 1, "2024-01-12", 50.0, 1),
+            (2, 2, "2024-02-02", 75.0, 0),
+        ],
+    )
+    assert _rollup_matches_sales(scratch_conn)
+    weekly = scratch_conn.execute(f"SELECT COUNT(*) FROM {WEEKLY_ROLLUP}").fetchone()[0]
+    assert weekly == 3
+
+    scratch_conn.execute("UPDATE sales SET weekly_sales = 80.0, date = '2024-02-09' WHERE weekly_sales = 50.0")
+    scratch_conn.commit()
+    assert _rollup_matches_sales(scratch_conn)
+
+    scratch_conn.execute("DELETE FROM sales WHERE store_id = 2")
+    scratch_conn.commit()
+    assert _rollup_matches_sales(scratch_conn)
+    months = scratch_conn.execute(f"SELECT DISTINCT store_id FROM {MONTHLY_ROLLUP}").fetchall()
+    assert [row[0] for row in months] == [1]
+
+
+def test_rebuild_rollups_after_bulk_load(scratch_conn):
+    """Test that rollups can be rebuilt after loading with triggers dropped"""
+    drop_rollup_triggers(scratch_conn)
+    _insert_sales(scratch_conn, [(1, 2, "2024-03-01", 10.0, 0), (2, 1, "2024-03-08", 20.0, 1)])
+    assert not _rollup_matches_sales(scratch_conn)
+
+    rebuild_rollups(scratch_conn)
+    create_rollup_triggers(scratch_conn)
+    assert _rollup_matches_sales(scratch_conn)
+
+    _insert_sales(scratch_conn, [(1, 2, "2024-03-15", 5.0, 0)])
+    assert _rollup_matches_sales(scratch_conn)
+
+
+def test_rollup_source():
+    """Test that aggregates read the coarsest rollup that is still exact"""
+    assert rollup_source() == (MONTHLY_ROLLUP, "", [])
+    assert rollup_source("2024-01-01", "2024-12-31") == (
+        MONTHLY_ROLLUP,
+        " AND r.month >= ? AND r.month < ?",
+        ["2024-01", "2025-01"],
+    )
+    assert rollup_source(*year_range(2024), end_exclusive=True)[2] == ["2024-01", "2025-01"]
+    assert rollup_source("2024-01-15", "2024-12-31") == (
+        WEEKLY_ROLLUP,
+        " AND r.date >= ? AND r.date < ?",
+        ["2024-01-15", "2025-01-01"],
+    )
+    assert rollup_source(allow_monthly=False)[0] == WEEKLY_ROLLUP
@@ -0,0 +1,74 @@
+import csv
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.database import db
+from src.utils.export import SALES_EXPORT_COLUMNS, iter_csv
+
+COLUMNS = [name for name, _, _ in SALES_EXPORT_COLUMNS]
+
+
+def _count_sales(where="1=1", params=()):
+    conn = db.get_db_connection()
+    count = conn.execute(f"SELECT COUNT(*) FROM sales WHERE {where}", params).fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_iter_csv_streams_batches():
+    """Test that CSV is emitted one chunk per batch, header first"""
+    chunks = list(iter_csv(["a", "b"], iter([[(1, "x")], [(2, "y"), (3, "z")]])))
+    assert chunks == ["a,b\r\n1,x\r\n", "2,y\r\n3,z\r\n"]
+
+    # An empty export still has its header
+    assert list(iter_csv(["a", "b"], iter([]))) == ["a,b\r\n"]
+
+
+def test_export_sales_csv(client):
+    """Test streaming a filtered slice of sales as CSV"""
+    response = client.get("/api/dashboard/export/sales?store_id=1&is_holiday=false")
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == "text/csv"
+    assert "sales_export.csv" in response.headers["Content-Disposition"]
+
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == COLUMNS
+    assert len(rows) - 1 == _count_sales("store_id = 1 AND is_holiday = 0")
+    assert {row[2] for row in rows[1:]} == {"1"}
+    dates = [row[1] for row in rows[1:]]
+    assert dates == sorted(dates)
+
+
+def test_export_sales_parquet(client):
+    """Test exporting sales as Parquet"""
+    response = client.get("/api/dashboard/export/sales?format=parquet&dept_id=2")
+    assert response.status_code == 200
+    assert response.mimetype == "application/vnd.apache.parquet"
+
+    table = pq.read_table(io.BytesIO(response.get_data()))
+    assert table.column_names == COLUMNS
+    assert table.num_rows == _count_sales("dept_id = 2")
+    assert table.schema.field("weekly_sales").type == pa.float64()
+    assert set(table.column("dept_id").to_pylist()) == {2}
+
+
+def test_export_sales_arrow(client):
+    """Test exporting sales as an Arrow IPC stream"""
+    response = client.get("/api/dashboard/export/sales?format=arrow&store_id=2")
+    assert response.status_code == 200
+
+    table = pa.ipc.open_stream(response.get_data()).read_all()
+    assert table.num_rows == _count_sales("store_id = 2")
+
+
+def test_export_sales_validation(client):
+    """Test export parameter validation and connection release"""
+    assert client.get("/api/dashboard/export/sales?format=xml").status_code == 400
+    assert client.get("/api/dashboard/export/sales?start_date=bad").status_code == 400
+    assert client.get("/api/dashboard/export/sales?is_holiday=maybe").status_code == 400
+
+    client.get("/api/dashboard/export/sales?format=csv").get_data()
+    assert db.get_pool_stats()["in_use"] == 0
@@ -0,0 +1,168 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src.controllers import forecast_controller
+from src.controllers.forecast_controller import fitted_model, forecast_stats
+from src.database import db
+from src.utils import forecasting
+
+
+def _panel(weeks=110):
+    t = np.arange(weeks, dtype=float)
+    return np.vstack(
+        [100 + 2 * t, 50 + 10 * np.sin(2 * np.pi * t / 52), np.full(weeks, 7.0), np.zeros(weeks)]
+    )
+
+
+@pytest.mark.parametrize("model", forecasting.INCREMENTAL_MODELS)
+def test_update_matches_refit(model):
+    """Test that advancing a fitted state equals fitting the longer history"""
+    values = _panel()
+    refit = forecasting.fit(model, values)
+    updated = forecasting.update(model, forecasting.fit(model, values[:, :100]), values[:, 100:])
+
+    for key, value in refit.items():
+        assert np.allclose(updated[key], value), key
+
+
+def test_seasonal_naive_switches_to_yearly_season_on_update():
+    """Test that updating a short fit past a year equals refitting with the season"""
+    values = _panel(60)
+    state = forecasting.fit("seasonal_naive", values[:, :40])
+    for start in range(40, 60, 5):
+        state = forecasting.update("seasonal_naive", state, values[:, start : start + 5])
+    refit = forecasting.fit("seasonal_naive", values)
+
+    assert state["tail"].shape[1] == forecasting.SEASON_LENGTH
+    assert state.keys() == refit.keys()
+    for key, value in refit.items():
+        assert np.allclose(state[key], value), key
+
+
+def test_exp_smoothing_follows_trend():
+    """Test forecasts and intervals on simple series"""
+    state = forecasting.fit("exp_smoothing", _panel())
+    forecast, lower, upper = forecasting.predict("exp_smoothing", state, 3)
+
+    assert forecast[0] == pytest.approx([320, 322, 324], rel=1e-3)
+    assert forecast[2] == pytest.approx([7, 7, 7])
+    assert np.all(upper[0] - lower[0] > 0) and np.all(np.diff(upper[0] - lower[0]) > 0)
+    assert np.isnan(forecasting.mape(state)[3])
+
+
+def test_fit_batched_on_process_pool():
+    """Test that chunked fitting across processes matches a single batch"""
+    values = np.tile(_panel(60), (5, 1))
+    pooled = forecasting.fit_batched("exp_smoothing", values, workers=2, chunk_series=6)
+    single = forecasting.fit("exp_smoothing", values)
+
+    for key, value in single.items():
+        assert np.allclose(pooled[key], value), key
+
+
+def test_forecast_endpoint(client):
+    """Test forecasts for every series and for one store"""
+    response = client.get("/api/analytics/forecast?horizon=4")
+    assert response.status_code == 200
+    data = response.json["data"]
+    assert data["series_count"] == 100
+    assert len(data["dates"]) == 4 and data["dates"][0] > data["last_date"]
+    assert len(data["total"]) == 4
+
+    store = client.get("/api/analytics/forecast?store_id=3&model=seasonal_naive").json["data"]
+    assert store["series_count"] == 10
+    assert {series["store_id"] for series in store["series"]} == {3}
+    assert all(len(series["forecast"]) == 8 for series in store["series"])
+
+
+def test_forecast_rejects_bad_parameters(client):
+    """Test model and horizon validation"""
+    assert client.get("/api/analytics/forecast?model=arima").status_code == 400
+    assert client.get("/api/analytics/forecast?horizon=53").status_code == 400
+    if not forecasting.engine_available("prophet"):
+        assert client.get("/api/analytics/forecast?model=prophet").status_code == 501
+
+
+def test_forecast_updates_incrementally(client):
+    """Test that a new week advances the cached fit instead of refitting"""
+    client.get("/api/analytics/forecast")
+    last_date = client.get("/api/analytics/forecast").json["data"]["last_date"]
+    before = forecast_stats()
+
+    conn = db.get_db_connection()
+    try:
+        new_week = np.datetime64(last_date) + np.timedelta64(7, "D")
+        conn.execute(
+            "INSERT INTO sales (store_id, dept_id, date, weekly_sales, is_holiday) "
+            "VALUES (1, 1, ?, 1000.0, 0)",
+            (str(new_week),),
+        )
+        conn.commit()
+
+        data = client.get("/api/analytics/forecast").json["data"]
+        after = forecast_stats()
+        assert data["last_date"] == str(new_week)
+        assert after["updates"] == before["updates"] + 1
+        assert after["fits"] == before["fits"]
+    finally:
+        conn.execute("DELETE FROM sales WHERE date = ?", (str(new_week),))
+        conn.commit()
+        conn.close()
+
+
+
+def test_small_past_correction_refits(client):
+    """Test that a correction to a fitted week, however small, forces a refit"""
+    client.get("/api/analytics/forecast")
+    before = forecast_stats()
+
+    conn = db.get_db_connection()
+    try:
+        sale_id = conn.execute("SELECT MIN(sale_id) FROM sales").fetchone()[0]
+        conn.execute(
+            "UPDATE sales SET weekly_sales = weekly_sales + 0.1 WHERE sale_id = ?", (sale_id,)
+        )
+        conn.commit()
+
+        assert client.get("/api/analytics/forecast").status_code == 200
+        after = forecast_stats()
+        assert after["fits"] == before["fits"] + 1
+        assert after["updates"] == before["updates"]
+    finally:
+        conn.execute(
+            "UPDATE sales SET weekly_sales = weekly_sales - 0.1 WHERE sale_id = ?", (sale_id,)
+        )
+        conn.commit()
+        conn.close()
+
+
+def test_concurrent_requests_share_one_fit(monkeypatch):
+    """Test that a model is fitted once for concurrent callers, outside the state lock"""
+    fit_batched = forecasting.fit_batched
+    calls = []
+
+    def slow_fit(model, values, **kwargs):
+        # Other models and cache hits are not blocked while fitting
+        assert forecast_controller._states_lock.acquire(blocking=False)
+        forecast_controller._states_lock.release()
+        calls.append(model)
+        time.sleep(0.2)
+        return fit_batched(model, values, **kwargs)
+
+    monkeypatch.setattr(forecasting, "fit_batched", slow_fit)
+    monkeypatch.setattr(forecast_controller, "_states", {})
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(fitted_model("seasonal_naive"))) for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["seasonal_naive"]
+    assert len(results) == 4 and all(result is results[0] for result in results)
+    assert forecast_controller._fitting == {}
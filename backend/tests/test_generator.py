@@ -0,0 +1,90 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from src.database import db
+from src.database.generator import (generate_sales_chunks, load_synthetic_data,
+                                    week_dates)
+from src.database.pool import ConnectionPool
+
+END_DATE = datetime(2024, 12, 31)
+
+
+def _concat(chunks):
+    chunks = list(chunks)
+    return {name: np.concatenate([c[name] for c in chunks]) for name in chunks[0]}
+
+
+def test_week_dates():
+    """Test that weekly dates span the requested number of years"""
+    dates = week_dates(2, END_DATE)
+    assert len(dates) == 105
+    assert str(dates[0]) == "2023-01-01"
+    assert np.all(np.diff(dates).astype(int) == 7)
+
+
+def test_generate_sales_chunks_shape_and_chunking():
+    """Test that every store x dept x week row is generated across chunks"""
+    chunks = list(
+        generate_sales_chunks(stores=15, departments=12, years=1, seed=1,
+                              end_date=END_DATE, chunk_rows=1000)
+    )
+    assert len(chunks) > 1
+    assert all(len(c["store_id"]) <= 1000 for c in chunks)
+
+    data = _concat(chunks)
+    weeks = len(week_dates(1, END_DATE))
+    assert len(data["weekly_sales"]) == 15 * 12 * weeks
+    assert data["store_id"].max() == 15
+    assert data["dept_id"].max() == 12
+    assert len(set(zip(data["store_id"], data["dept_id"], data["date"]))) == 15 * 12 * weeks
+
+
+def test_generate_sales_chunks_is_seeded():
+    """Test that the same seed reproduces the same data"""
+    first = _concat(generate_sales_chunks(years=1, seed=7, end_date=END_DATE))
+    second = _concat(generate_sales_chunks(years=1, seed=7, end_date=END_DATE))
+    third = _concat(generate_sales_chunks(years=1, seed=8, end_date=END_DATE))
+    assert np.array_equal(first["weekly_sales"], second["weekly_sales"])
+    assert not np.array_equal(first["weekly_sales"], third["weekly_sales"])
+
+
+def test_generated_sales_follow_the_model():
+    """Test markdown rate, markdown range and the December toy boost"""
+    data = _concat(generate_sales_chunks(years=3, seed=3, end_date=END_DATE))
+
+    markdowns = data["markdown"][data["markdown"] > 0]
+    assert 0.25 < len(markdowns) / len(data["markdown"]) < 0.35
+    assert markdowns.min() >= 5 and markdowns.max() <= 30
+
+    months = np.array([int(d[5:7]) for d in data["date"]])
+    no_markdown = (data["markdown"] == 0) & (data["is_holiday"] == 0)
+    toys = no_markdown & (data["dept_id"] == 10) & (data["store_id"] == 1)
+    december = data["weekly_sales"][toys & (months == 12)].mean()
+    # Store A toys: 8000 baseline x 1.2 store x 1.8 season x 2.0 December boost
+    assert december == pytest.approx(8000 * 1.2 * 1.8 * 2.0, rel=0.05)
+
+
+def test_load_synthetic_data(tmp_path):
+    """Test bulk loading restores indexes, triggers and rollups"""
+    pool = ConnectionPool(str(tmp_path / "synthetic.db"))
+    conn = pool.acquire()
+    db.create_tables(conn)
+    version = db.get_data_version(conn)
+
+    rows = load_synthetic_data(conn, stores=12, departments=11, years=1, seed=5,
+                               chunk_rows=500)
+    assert rows == conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+    assert conn.execute("SELECT COUNT(*) FROM stores").fetchone()[0] == 12
+    assert conn.execute("SELECT COUNT(*) FROM departments").fetchone()[0] == 11
+    assert db.get_data_version(conn) > version
+
+    rolled_up = conn.execute("SELECT SUM(sale_count) FROM sales_monthly_rollup").fetchone()[0]
+    assert rolled_up == rows
+    names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+    assert set(db.SALES_INDEXES) <= names
+    assert {"sales_rollup_insert", "sales_insert_version"} <= names
+
+    conn.close()
+    pool.close()
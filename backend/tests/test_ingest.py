@@ -0,0 +1,117 @@
+import os
+
+import pytest
+
+from src.database import db
+from src.database.ingest import find_data_files, ingest, json_records, read_chunks, read_features
+from src.database.pool import ConnectionPool
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+
+
+@pytest.fixture
+def conn(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "ingest.db"))
+    conn = pool.acquire()
+    db.create_tables(conn)
+    yield conn
+    conn.close()
+    pool.close()
+
+
+def _sale(conn, store_id, dept_id, date):
+    return conn.execute(
+        "SELECT * FROM sales WHERE store_id = ? AND dept_id = ? AND date = ?",
+        (store_id, dept_id, date),
+    ).fetchone()
+
+
+def test_read_features_sums_markdowns():
+    """Test that NA/NaN markdowns are skipped and day-first dates normalized"""
+    files = find_data_files(DATA_DIR)["features"]
+    features = read_features(files, chunk_rows=1000).set_index(["store_id", "date"])
+
+    # The CSV has no markdowns for this week; the JSON fixture (read last) does
+    assert features.loc[(1, "2010-02-05"), "markdown"] == 100.0
+    assert features.loc[(1, "2010-02-12"), "markdown"] == 260.0
+    assert features.loc[(1, "2010-02-12"), "feature_holiday"] == 1
+    assert features.loc[(3, "2010-02-05"), "markdown"] != features.loc[(3, "2010-02-05"), "markdown"]
+
+
+@pytest.mark.parametrize("chunk_rows", [2, 100_000])
+def test_ingest_data_directory(conn, chunk_rows):
+    """Test loading the shipped datasets into the schema"""
+    files = find_data_files(DATA_DIR)
+    if chunk_rows < 100:
+        # Keep tiny chunks quick: the JSON fixture overrides the CSV weeks used below
+        files["features"] = [path for path in files["features"] if path.endswith(".json")]
+    counts = ingest(conn, chunk_rows=chunk_rows, **files)
+    assert counts["sales"] == conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+    # Keys whose transactions span chunks are written once
+    duplicates = conn.execute(
+        "SELECT COUNT(*) FROM (SELECT 1 FROM sales GROUP BY store_id, dept_id, date "
+        "HAVING COUNT(*) > 1)"
+    ).fetchone()[0]
+    assert duplicates == 0
+
+    store = conn.execute("SELECT * FROM stores WHERE store_id = 3").fetchone()
+    assert (store["type"], store["size_sqft"]) == ("B", 37392)
+    assert conn.execute("SELECT COUNT(*) FROM stores").fetchone()[0] == 45
+
+    # Weekly rows are joined with that store-week's features
+    sale = _sale(conn, 1, 2, "2010-02-12")
+    assert sale["weekly_sales"] == 46039.49
+    assert sale["is_holiday"] == 1
+    assert sale["markdown"] == 260.0
+    assert sale["cpi"] == 211.242
+
+    # Transaction rows are summed per store, department and date
+    electronics = conn.execute(
+        "SELECT dept_id FROM departments WHERE name = 'Electronics'"
+    ).fetchone()[0]
+    sale = _sale(conn, 1, electronics, "2024-01-01")
+    assert sale["weekly_sales"] == pytest.approx(2300.75)
+    assert sale["markdown"] is None
+    clothing = conn.execute("SELECT * FROM departments WHERE name = 'Clothing'").fetchone()
+    assert clothing is not None
+
+    # Rollups and indexes are rebuilt after the load
+    rolled_up = conn.execute("SELECT SUM(sale_count) FROM sales_weekly_rollup").fetchone()[0]
+    assert rolled_up == counts["sales"]
+    names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+    assert set(db.SALES_INDEXES) <= names
+
+
+def test_ingest_is_idempotent(conn):
+    """Test that loading the same files again changes nothing"""
+    files = find_data_files(DATA_DIR)
+    files["features"] = [path for path in files["features"] if path.endswith(".json")]
+    ingest(conn, chunk_rows=3, **files)
+    before = conn.execute("SELECT * FROM sales ORDER BY sale_id").fetchall()
+    version = db.get_data_version(conn)
+
+    ingest(conn, chunk_rows=5, **files)
+    after = conn.execute("SELECT * FROM sales ORDER BY sale_id").fetchall()
+    assert [tuple(row) for row in after] == [tuple(row) for row in before]
+    assert db.get_data_version(conn) == version + 1
+
+
+def test_json_arrays_are_read_incrementally(tmp_path):
+    """Test that JSON array elements are decoded across small read buffers"""
+    path = tmp_path / "sales.json"
+    path.write_text('[ {"Store": 1, "Sales": NaN},\n {"Store": 22, "Sales": 1.5} ,{"Store": 333}]')
+    records = list(json_records(str(path), read_chars=4))
+    assert [record["Store"] for record in records] == [1, 22, 333]
+    assert [len(chunk) for chunk in read_chunks(str(path), chunk_rows=2)] == [2, 1]
+
+    path.write_text('{"Store": 1}')
+    with pytest.raises(ValueError):
+        list(json_records(str(path)))
+
+
+def test_ingest_replace(conn):
+    """Test that --replace reloads instead of appending"""
+    files = find_data_files(DATA_DIR)
+    first = ingest(conn, **files)["sales"]
+    ingest(conn, replace=True, **files)
+    assert conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0] == first
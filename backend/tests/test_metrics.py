@@ -0,0 +1,80 @@
+import re
+
+from src.database import db
+from src.utils.cache import response_cache
+from src.utils.metrics import LATENCY_BUCKETS
+
+SAMPLE = re.compile(r'^(\w+)\{(.*)\} (\S+)$')
+
+
+def _scrape(client):
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    samples = {}
+    for line in response.get_data(as_text=True).splitlines():
+        if line.startswith("#"):
+            continue
+        name, labels, value = SAMPLE.match(line).groups()
+        samples[(name, labels)] = float(value)
+    return samples
+
+
+def _delta(before, after, name, labels):
+    return after.get((name, labels), 0) - before.get((name, labels), 0)
+
+
+def test_request_metrics(client):
+    """Test the per-endpoint counters and latency histogram of a request"""
+    response_cache.clear()
+    before = _scrape(client)
+    response = client.get("/api/sales?store_id=4&limit=17")
+    assert response.status_code == 200
+    after = _scrape(client)
+
+    labels = 'endpoint="sales.get_sales_data",method="GET"'
+    assert _delta(before, after, "http_requests_total", labels + ',status="200"') == 1
+    assert _delta(before, after, "http_request_duration_seconds_count", labels) == 1
+    assert _delta(before, after, "http_request_duration_seconds_bucket", labels + ',le="+Inf"') == 1
+    assert _delta(before, after, "http_response_size_bytes_total", labels) == len(response.data)
+    assert _delta(before, after, "db_statements_total", labels) >= 1
+    assert _delta(before, after, "db_statement_duration_seconds_total", labels) > 0
+    assert _delta(before, after, "db_rows_fetched_total", labels) >= 17
+
+    # Buckets are cumulative
+    counts = [
+        after[("http_request_duration_seconds_bucket", f'{labels},le="{bound}"')]
+        for bound in LATENCY_BUCKETS + ("+Inf",)
+    ]
+    assert counts == sorted(counts)
+
+
+def test_streamed_response_metrics(client):
+    """Test that rows and bytes of a streamed export are counted when the stream ends"""
+    before = _scrape(client)
+    response = client.get("/api/dashboard/export/sales?format=csv&store_id=2")
+    body = response.get_data()
+    response.close()
+    after = _scrape(client)
+
+    conn = db.get_db_connection()
+    try:
+        rows = conn.execute("SELECT COUNT(*) FROM sales WHERE store_id = 2").fetchone()[0]
+    finally:
+        conn.close()
+
+    labels = 'endpoint="dashboard.export_sales",method="GET"'
+    assert _delta(before, after, "http_requests_total", labels + ',status="200"') == 1
+    assert _delta(before, after, "http_response_size_bytes_total", labels) == len(body)
+    # The rows streamed, plus the data version read by the response cache
+    assert _delta(before, after, "db_rows_fetched_total", labels) >= rows > 0
+
+
+def test_unmatched_requests_share_one_endpoint(client):
+    """Test that unknown paths do not create a series each"""
+    before = _scrape(client)
+    client.get("/no/such/path")
+    client.get("/another/missing/path")
+    after = _scrape(client)
+    labels = 'endpoint="unmatched",method="GET",status="404"'
+    assert _delta(before, after, "http_requests_total", labels) == 2
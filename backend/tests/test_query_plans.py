@@ -0,0 +1,81 @@
+import json
+
+from benchmarks.audit_queries import new_violations
+from benchmarks.bench_endpoints import discover_requests
+from src.database import db
+from src.database.query_plans import QueryAudit, table_aliases
+from src.utils.cache import response_cache
+
+
+def test_table_aliases():
+    """Test that plan names are resolved through the statement's aliases"""
+    sql = "SELECT * FROM sales AS s JOIN stores st ON s.store_id = st.store_id WHERE 1=1"
+    assert table_aliases(sql) == {"sales": "sales", "s": "sales", "stores": "stores", "st": "stores"}
+    assert table_aliases("SELECT * FROM departments WHERE dept_id = ?") == {
+        "departments": "departments"
+    }
+
+
+def test_explain_classifies_plan_steps():
+    """Test SCAN vs SEARCH, temp B-trees and row estimates of explained statements"""
+    audit = QueryAudit()
+    conn = db.get_db_connection()
+    try:
+        total = conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+        scan = audit.explain(
+            conn, "SELECT * FROM sales s WHERE s.weekly_sales > ? ORDER BY s.weekly_sales", (0,)
+        )
+        search = audit.explain(
+            conn,
+            "SELECT SUM(weekly_sales) FROM sales WHERE store_id = ? AND date >= ?",
+            (1, "2025-01-01"),
+        )
+        broken = audit.explain(conn, "SELECT * FROM no_such_table")
+    finally:
+        conn.close()
+
+    assert (scan["scans"], scan["searches"], scan["temp_btrees"]) == (1, 0, 1)
+    assert scan["unindexed"] == ["sales"]
+    assert scan["plan"][0]["table"] == "sales"
+    assert scan["estimated_rows"] == total
+
+    assert (search["scans"], search["searches"]) == (0, 1)
+    assert search["unindexed"] == []
+    assert search["plan"][0]["index"] == "idx_sales_store_date"
+    assert 0 < search["estimated_rows"] < total
+
+    assert "no such table" in broken["error"]
+
+
+def test_endpoints_do_not_scan_sales_without_an_index(app):
+    """Test that no statement of any GET route reads sales without an index"""
+    client = app.test_client()
+    urls, _ = discover_requests(app)
+    audit = QueryAudit()
+    with audit.capture():
+        for url in urls:
+            response_cache.clear()
+            client.get(url).close()
+
+    assert "sales.get_sales_data" in audit.report()
+    assert audit.unindexed_scans() == [], "\n".join(
+        f"{entry['endpoint']}: {entry['sql']}" for entry in audit.unindexed_scans()
+    )
+
+
+def test_baseline_tolerates_known_scans():
+    """Test that only scans missing from the baseline are violations"""
+    audit = QueryAudit()
+    conn = db.get_db_connection()
+    try:
+        with audit.capture():
+            for _ in range(2):
+                conn.execute("SELECT * FROM sales WHERE weekly_sales > 0").fetchone()
+            conn.execute("SELECT COUNT(*) FROM sales WHERE store_id = 1").fetchone()
+    finally:
+        conn.close()
+
+    violations = new_violations(audit)
+    assert [(entry["endpoint"], entry["executions"]) for entry in violations] == [("background", 2)]
+    baseline = json.loads(json.dumps({"endpoints": audit.report()}))
+    assert new_violations(audit, baseline) == []
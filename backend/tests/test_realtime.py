@@ -0,0 +1,97 @@
+import pytest
+from flask_socketio import SocketIO
+
+from src.controllers.realtime_controller import compute_room_kpis, kpi_delta, room_name
+from src.database.db import get_db_connection
+from src.routes.realtime import register_realtime_handlers
+
+
+@pytest.fixture
+def realtime(app):
+    socketio = SocketIO(app, async_mode="threading")
+    broadcaster = register_realtime_handlers(socketio)
+    return socketio, broadcaster
+
+
+def _events(client, name):
+    return [event["args"][0] for event in client.get_received() if event["name"] == name]
+
+
+def test_room_name():
+    """Test subscription scopes map to validated room names"""
+    assert room_name("dashboard") == "dashboard"
+    assert room_name("store", "3") == "store:3"
+    assert room_name("region", " North ") == "region:North"
+    for scope, key in [("planet", 1), ("store", None), ("store", "abc"), ("store", 0)]:
+        with pytest.raises(ValueError):
+            room_name(scope, key)
+
+
+def test_kpi_delta():
+    """Test only changed KPIs are reported"""
+    assert kpi_delta({"a": 1, "b": 2.0}, {"a": 1, "b": 2.0}) == {}
+    assert kpi_delta({"a": 1, "b": 2.0}, {"a": 1, "b": 3.5}) == {
+        "kpis": {"b": 3.5},
+        "deltas": {"b": 1.5},
+    }
+
+
+def test_subscribe_and_push_deltas(app, realtime):
+    """Test rooms get one snapshot, then only deltas after data changes"""
+    socketio, broadcaster = realtime
+    dashboard = socketio.test_client(app)
+    store = socketio.test_client(app)
+    other_store = socketio.test_client(app)
+
+    assert dashboard.emit("subscribe", {"scope": "dashboard"}, callback=True)["room"] == "dashboard"
+    store.emit("subscribe", {"scope": "store", "id": 1})
+    other_store.emit("subscribe", {"scope": "store", "id": 2})
+    snapshot = _events(dashboard, "kpi_snapshot")[0]
+    assert snapshot["kpis"] == compute_room_kpis("dashboard")
+    assert broadcaster.rooms() == {"dashboard": 1, "store:1": 1, "store:2": 1}
+    store.get_received()
+    other_store.get_received()
+
+    # Nothing changed: nothing is computed or pushed
+    assert broadcaster.check() == 0
+
+    conn = get_db_connection()
+    sale_id = conn.execute(
+        "INSERT INTO sales (store_id, dept_id, date, weekly_sales, is_holiday) "
+        "SELECT 1, 1, MAX(date), 1000.0, 0 FROM sales"
+    ).lastrowid
+    conn.commit()
+    try:
+        # Two writes before the next check are pushed as one update
+        conn.execute("UPDATE sales SET weekly_sales = 1500.0 WHERE sale_id = ?", (sale_id,))
+        conn.commit()
+        assert broadcaster.check() == 2
+
+        update = _events(dashboard, "kpi_update")
+        assert len(update) == 1
+        assert update[0]["deltas"]["total_sales"] == pytest.approx(1500.0)
+        assert update[0]["deltas"]["total_orders"] == 1
+        assert "store_count" not in update[0]["kpis"]
+        assert _events(store, "kpi_update")[0]["room"] == "store:1"
+        assert _events(other_store, "kpi_update") == []
+    finally:
+        conn.execute("DELETE FROM sales WHERE sale_id = ?", (sale_id,))
+        conn.commit()
+        conn.close()
+
+
+def test_unsubscribe_and_disconnect(app, realtime):
+    """Test leaving rooms stops their computation"""
+    socketio, broadcaster = realtime
+    client = socketio.test_client(app)
+
+    ack = client.emit("subscribe", {"scope": "planet"}, callback=True)
+    assert ack["status"] == "error"
+
+    client.emit("subscribe", {"scope": "region", "id": "North"})
+    client.emit("subscribe", {"scope": "dashboard"})
+    client.emit("unsubscribe", {"scope": "dashboard"})
+    assert broadcaster.rooms() == {"region:North": 1}
+
+    client.disconnect()
+    assert broadcaster.rooms() == {}
@@ -0,0 +1,175 @@
+import csv
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from src.controllers.report_controller import ReportQueue, record_job
+from src.database import db
+from src.utils import reports
+
+
+def _wait(client, job_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f"/api/reports/{job_id}").json["data"]
+        if job["status"] not in ("queued", "running") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+def _expected_rows(report_type, filters):
+    query, params = reports.report_query(report_type, filters)
+    conn = db.get_db_connection()
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM ({query})", params).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _read_rows(report_format, content):
+    if report_format == "csv":
+        return list(csv.reader(io.StringIO(content.decode())))[1:]
+    if report_format == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.read_table(io.BytesIO(content)).to_pylist()
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(io.BytesIO(content), read_only=True)
+    return [row for sheet in workbook.worksheets for row in sheet.iter_rows(values_only=True)][1:]
+
+
+@pytest.mark.parametrize("report_format", reports.REPORT_FORMATS)
+@pytest.mark.parametrize("report_type", reports.REPORT_TYPES)
+def test_report_is_rendered_and_downloaded(client, report_type, report_format):
+    """Test each report type in each format, from creation to download"""
+    filters = {"store_id": 2, "end_date": "2030-01-01"}
+    response = client.post(
+        "/api/reports",
+        json={"type": report_type, "format": report_format, "name": "Store 2", "filters": filters},
+    )
+    assert response.status_code == 202
+    job = response.json["data"]
+    assert job["status"] in ("queued", "running", "completed")
+    assert job["filters"] == filters
+
+    job = _wait(client, job["id"])
+    expected = _expected_rows(report_type, filters)
+    assert job["status"] == "completed", job["error"]
+    assert job["rows_written"] == job["rows_total"] == expected > 0
+    assert job["progress"] == 100
+
+    download = client.get(job["download_url"])
+    assert download.status_code == 200
+    assert download.mimetype == reports.REPORT_FORMATS[report_format][0]
+    assert f"Store 2.{reports.REPORT_FORMATS[report_format][1]}" in download.headers[
+        "Content-Disposition"
+    ]
+    assert len(download.data) == job["file_size"]
+    assert len(_read_rows(report_format, download.data)) == expected
+
+    assert client.delete(f"/api/reports/{job['id']}").status_code == 200
+    assert client.get(f"/api/reports/{job['id']}").status_code == 404
+
+
+def test_xlsx_starts_a_new_sheet_when_one_is_full(tmp_path, monkeypatch):
+    """Test that write-only workbooks split rows over sheets"""
+    from openpyxl import load_workbook
+
+    monkeypatch.setattr(reports, "XLSX_MAX_ROWS", 3)
+    path = tmp_path / "report.xlsx"
+    reports.write_xlsx(["a", "b"], iter([[(1, "x"), (2, "y")], [(3, "z"), (4, "w")]]), str(path))
+
+    sheets = load_workbook(path, read_only=True).worksheets
+    assert [len(list(sheet.iter_rows())) for sheet in sheets] == [4, 2]
+
+
+def test_report_list_and_errors(client):
+    """Test listing reports and the error responses"""
+    job = client.post("/api/reports", json={"type": "store_summary"}).json["data"]
+    assert job["format"] == "csv"
+    assert job["name"] == "store_summary report"
+    _wait(client, job["id"])
+
+    listed = client.get("/api/reports?status=completed").json
+    assert isinstance(listed, list)
+    assert job["id"] in [report["id"] for report in listed]
+
+    assert client.post("/api/reports", json={"type": "payroll"}).status_code == 400
+    assert client.post("/api/reports", json={"type": "sales", "format": "pdf"}).status_code == 400
+    assert (
+        client.post(
+            "/api/reports", json={"type": "sales", "filters": {"start_date": "01/02/2024"}}
+        ).status_code
+        == 400
+    )
+    assert client.get("/api/reports?status=lost").status_code == 400
+    assert client.get("/api/reports/missing").status_code == 404
+    assert client.get("/api/reports/missing/download").status_code == 404
+
+    client.delete(f"/api/reports/{job['id']}")
+
+
+def test_download_before_completion_is_a_conflict(client):
+    """Test that an unfinished report cannot be downloaded"""
+    conn = db.get_db_connection()
+    try:
+        conn.execute(
+            "INSERT INTO report_jobs (job_id, name, report_type, format, filters, status, created_at) "
+            "VALUES ('pending', 'Pending', 'sales', 'csv', '{}', 'running', '2024-01-01T00:00:00')"
+        )
+        conn.commit()
+        assert client.get("/api/reports/pending/download").status_code == 409
+    finally:
+        conn.execute("DELETE FROM report_jobs WHERE job_id = 'pending'")
+        conn.commit()
+        conn.close()
+
+
+def test_deleting_one_shared_report_keeps_the_others(client, tmp_path):
+    """Test that dropping a report of a shared scan leaves its siblings to render"""
+    definition = {"report_type": "store_summary", "report_format": "csv"}
+    conn = db.get_db_connection()
+    try:
+        jobs = [{**definition, "filters": {"store_id": store_id}} for store_id in (1, 2, 3)]
+        for job in jobs:
+            job["job_id"] = record_job(conn, "Shared", **job)
+    finally:
+        conn.close()
+
+    queue = ReportQueue(db.DB_PATH, str(tmp_path), workers=1)
+    # Keep the only worker (and the pool's call queue) busy so the scans stay queued
+    queue._executor = ProcessPoolExecutor(max_workers=1)
+    blockers = [queue._executor.submit(time.sleep, 0.5) for _ in range(2)]
+    try:
+        shared = queue.submit_shared({"store_ids": [1, 2]}, jobs[:2])
+        alone = queue.submit_shared({"store_ids": [3]}, jobs[2:])
+
+        assert queue.cancel(jobs[0]["job_id"])
+        conn = db.get_db_connection()
+        conn.execute("DELETE FROM report_jobs WHERE job_id = ?", (jobs[0]["job_id"],))
+        conn.commit()
+        conn.close()
+        # The last job of a scan cancels it
+        assert queue.cancel(jobs[2]["job_id"])
+        assert alone.cancelled()
+
+        result = shared.result(timeout=60)
+        assert result["reports"][jobs[0]["job_id"]] == {"error": reports.REPORT_DELETED}
+        assert "error" not in result["reports"][jobs[1]["job_id"]]
+        assert not os.path.exists(queue.artifact_path(jobs[0]["job_id"], "csv"))
+        assert client.get(f"/api/reports/{jobs[1]['job_id']}").json["data"]["status"] == "completed"
+        assert client.get(f"/api/reports/{jobs[2]['job_id']}").json["data"]["status"] == "failed"
+    finally:
+        for blocker in blockers:
+            blocker.result()
+        queue.stop()
+        conn = db.get_db_connection()
+        conn.executemany(
+            "DELETE FROM report_jobs WHERE job_id = ?", [(job["job_id"],) for job in jobs]
+        )
+        conn.commit()
+        conn.close()
@@ -0,0 +1,160 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.controllers.schedule_controller import (
+    ReportScheduler,
+    period_range,
+    shared_scans,
+)
+from src.database import db
+from src.database.rollups import WEEKLY_ROLLUP
+from src.utils.cron import next_run, parse_cron
+
+SATURDAY = datetime(2026, 10, 17, 14, 37, 12)
+
+
+@pytest.mark.parametrize(
+    "expression, expected",
+    [
+        ("*/15 * * * *", datetime(2026, 10, 17, 14, 45)),
+        ("0 2 * * *", datetime(2026, 10, 18, 2, 0)),
+        ("30 6 * * 1-5", datetime(2026, 10, 19, 6, 30)),
+        ("@monthly", datetime(2026, 11, 1, 0, 0)),
+        ("0 0 29 2 *", datetime(2028, 2, 29, 0, 0)),
+        # Day of month or day of week, as in cron
+        ("0 9 13 * 5", datetime(2026, 10, 23, 9, 0)),
+        ("0 3 * * 7", datetime(2026, 10, 18, 3, 0)),
+    ],
+)
+def test_next_run(expression, expected):
+    """Test the next matching time of cron expressions"""
+    assert next_run(expression, SATURDAY) == expected
+
+
+@pytest.mark.parametrize("expression", ["* * * *", "60 * * * *", "0 0 * * 8", "*/0 * * * *", "a b c d e"])
+def test_invalid_cron(expression):
+    """Test that malformed expressions are rejected"""
+    with pytest.raises(ValueError):
+        parse_cron(expression)
+
+
+def test_period_range():
+    """Test the date ranges covered by weekly and monthly runs"""
+    assert period_range("week", SATURDAY) == ("2026-10-10", "2026-10-16")
+    assert period_range("month", SATURDAY) == ("2026-09-01", "2026-09-30")
+    assert period_range("month", datetime(2026, 1, 5)) == ("2025-12-01", "2025-12-31")
+    assert period_range(None, SATURDAY) == (None, None)
+
+
+def test_shared_scans_group_by_date_range():
+    """Test that runs over the same dates share one scan of their stores"""
+    week = {"start_date": "2026-10-10", "end_date": "2026-10-16"}
+    runs = [
+        ("a", {**week, "store_id": 3}),
+        ("b", {**week, "store_id": 1, "dept_id": 2}),
+        ("c", {**week, "store_id": 3}),
+        ("d", {"start_date": "2026-09-01", "end_date": "2026-09-30", "store_id": 1}),
+        ("e", {"start_date": "2026-09-01", "end_date": "2026-09-30"}),
+    ]
+    scans = shared_scans(runs)
+    assert [(scan["store_ids"], [name for name, _ in members]) for scan, members in scans] == [
+        ([1, 3], ["a", "b", "c"]),
+        (None, ["d", "e"]),
+    ]
+
+
+def test_stagger_during_business_hours():
+    """Test that scans are spread out only during business hours"""
+    scheduler = ReportScheduler(db.DB_PATH, stagger=(30.0, 0.0), business_hours=(8, 20))
+    assert scheduler.stagger_delay(SATURDAY) == 30.0
+    assert scheduler.stagger_delay(SATURDAY.replace(hour=2)) == 0.0
+
+
+def test_schedule_endpoints_validate(client):
+    """Test schedule validation errors"""
+    definition = {"type": "store_summary", "cron": "0 2 * * 1", "period": "week"}
+    assert client.post("/api/reports/scheduled", json={**definition, "cron": "0 25 * * *"}).status_code == 400
+    assert client.post("/api/reports/scheduled", json={**definition, "cron": None}).status_code == 400
+    assert client.post("/api/reports/scheduled", json={**definition, "period": "day"}).status_code == 400
+    assert client.post("/api/reports/scheduled", json={**definition, "type": "hr"}).status_code == 400
+    assert client.get("/api/reports/scheduled/999999").status_code == 404
+    assert client.patch("/api/reports/scheduled/999999", json={"enabled": False}).status_code == 404
+
+
+def test_due_schedules_share_one_scan(client):
+    """Test that due schedules over the same week run off one scan and record their runs"""
+    definitions = [
+        {"type": "weekly_summary", "format": "csv", "filters": {"store_id": 1}},
+        {"type": "weekly_summary", "format": "parquet", "filters": {"store_id": 2}},
+        {"type": "store_summary", "format": "xlsx", "filters": {"store_id": 2, "dept_id": 3}},
+    ]
+    ids = []
+    for definition in definitions:
+        response = client.post(
+            "/api/reports/scheduled", json={**definition, "cron": "0 2 * * *", "period": "week"}
+        )
+        assert response.status_code == 201
+        ids.append(response.json["data"]["id"])
+    monthly = client.post(
+        "/api/reports/scheduled",
+        json={"type": "store_summary", "cron": "0 3 1 * *", "period": "month"},
+    ).json["data"]["id"]
+    ids.append(monthly)
+    assert client.patch(f"/api/reports/scheduled/{monthly}", json={"enabled": False}).status_code == 200
+
+    now = datetime.now()
+    due = (now - timedelta(minutes=1)).isoformat(timespec="seconds")
+    conn = db.get_db_connection()
+    try:
+        conn.executemany(
+            "UPDATE report_schedules SET next_run_at = ? WHERE schedule_id = ?",
+            [(due, schedule_id) for schedule_id in ids],
+        )
+        conn.commit()
+
+        scheduler = ReportScheduler(db.DB_PATH, stagger=(0.0, 0.0))
+        scans = scheduler.run_due(now)
+        start_date, end_date = period_range("week", now - timedelta(minutes=1))
+        expected_rows = conn.execute(
+            f"SELECT COUNT(*) FROM {WEEKLY_ROLLUP} WHERE date BETWEEN ? AND ? AND store_id IN (1, 2)",
+            (start_date, end_date),
+        ).fetchone()[0]
+
+        # The paused monthly schedule does not run
+        assert len(scans) == 1
+        assert scans[0]["schedules"] == ids[:3]
+        assert scans[0]["store_ids"] == [1, 2]
+        assert scans[0]["rows_scanned"] == expected_rows > 0
+        assert scheduler.run_due(now) == []
+
+        listed = {schedule["id"]: schedule for schedule in client.get("/api/reports/scheduled").json}
+        for schedule_id in ids[:3]:
+            schedule = listed[schedule_id]
+            assert schedule["next_run_at"] > now.isoformat()
+            assert schedule["last_run"]["status"] == "completed"
+            assert schedule["last_run"]["rows_scanned"] == expected_rows
+            assert schedule["last_run"]["shared_with"] == 3
+        assert listed[monthly]["last_run"] is None
+
+        runs = client.get(f"/api/reports/scheduled/{ids[2]}").json["data"]["runs"]
+        assert len(runs) == 1
+        assert runs[0]["runtime_ms"] >= 0
+        job = client.get(f"/api/reports/{runs[0]['job_id']}").json["data"]
+        assert job["status"] == "completed"
+        assert job["filters"] == {
+            "store_id": 2,
+            "dept_id": 3,
+            "start_date": start_date,
+            "end_date": end_date,
+        }
+        assert job["rows_written"] == 1
+    finally:
+        conn.close()
+        jobs = []
+        for schedule_id in ids:
+            data = client.get(f"/api/reports/scheduled/{schedule_id}").json["data"]
+            jobs.extend(run["job_id"] for run in data["runs"])
+            client.delete(f"/api/reports/scheduled/{schedule_id}")
+        for job_id in jobs:
+            client.delete(f"/api/reports/{job_id}")
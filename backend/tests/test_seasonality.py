@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from src.utils import seasonality
+
+WEEKS = np.arange(156, dtype=float)
+
+
+def test_analyze_finds_annual_and_quarterly_cycles():
+    """Test the vectorized report on known seasonal, trending and flat rows"""
+    values = np.vstack(
+        [
+            100 + 50 * np.sin(2 * np.pi * WEEKS / 52),
+            10 + 5 * np.sin(2 * np.pi * WEEKS / 13),
+            100 + 2 * WEEKS,
+            np.full(len(WEEKS), 5.0),
+        ]
+    )
+    report = seasonality.analyze(values)
+
+    assert report["has_seasonality"].tolist() == [True, True, False, False]
+    assert report["periodicity_lag"][:2].tolist() == [51, 13]
+    assert report["spectral_period"][:2] == pytest.approx([52, 13], rel=0.05)
+    assert report["trend_strength"][2] == pytest.approx(np.tanh(2 * 156 / (2 * 155)))
+    assert report["trend_strength"][3] == 0
+    assert report["seasonal_indices"].shape == (4, 52)
+    # sin peaks a quarter into the cycle
+    assert report["peak_week"][0] == 14
+
+
+def test_short_history_has_no_seasonality():
+    """Test that less than one season is never reported as seasonal"""
+    report = seasonality.analyze(np.vstack([np.sin(WEEKS[:30]), np.ones(30)]))
+    assert not report["has_seasonality"].any()
+    assert np.isnan(report["spectral_period"][1])
+
+
+@pytest.mark.parametrize(
+    "group_by, expected",
+    [("series", 100), ("store", 10), ("department", 10), ("chain", 1)],
+)
+def test_seasonality_endpoint(client, group_by, expected):
+    """Test the report for each grouping"""
+    response = client.get(f"/api/analytics/seasonality?group_by={group_by}&limit=5")
+    assert response.status_code == 200
+    data = response.json["data"]
+    assert data["series_count"] == expected
+    assert len(data["series"]) == min(5, expected)
+
+    strengths = [series["seasonality_strength"] for series in data["series"]]
+    assert strengths == sorted(strengths, reverse=True)
+    assert "seasonal_indices" not in data["series"][0]
+
+
+def test_seasonality_endpoint_options(client):
+    """Test seasonal indices output and parameter validation"""
+    data = client.get("/api/analytics/seasonality?group_by=region&indices=true").json["data"]
+    assert all(len(series["seasonal_indices"]) == 52 for series in data["series"])
+    assert all(isinstance(series["region"], str) for series in data["series"])
+
+    assert client.get("/api/analytics/seasonality?group_by=city").status_code == 400
@@ -0,0 +1,111 @@
+import json
+from datetime import date
+
+import msgpack
+import pyarrow as pa
+import pytest
+
+from src.controllers.analytics_controller import TIME_SERIES_COLUMN_TYPES
+from src.controllers.sales_controller import SALES_COLUMN_TYPES
+from src.routes.sales import SUMMARY_COLUMN_TYPES
+from src.utils import serialization
+from src.utils.serialization import ARROW_MIMETYPE
+
+ENDPOINTS = [
+    ("/api/analytics/time-series", TIME_SERIES_COLUMN_TYPES),
+    ("/api/sales/summary?group_by=store", SUMMARY_COLUMN_TYPES["store"]),
+    ("/api/sales/summary?group_by=date&time_period=week", SUMMARY_COLUMN_TYPES["date"]),
+    ("/api/sales?store_id=1&limit=50", SALES_COLUMN_TYPES),
+]
+
+
+def _iso_dates(row):
+    return {
+        name: value.isoformat() if isinstance(value, date) else value
+        for name, value in row.items()
+    }
+
+
+@pytest.mark.parametrize("url, column_types", ENDPOINTS)
+def test_arrow_stream_matches_json(client, url, column_types):
+    """Test that Accept: Arrow returns the declared column types and the JSON rows"""
+    rows = json.loads(client.get(url).data)["data"]
+
+    response = client.get(url, headers={"Accept": ARROW_MIMETYPE})
+    assert response.status_code == 200
+    assert response.mimetype == ARROW_MIMETYPE
+    assert "Accept" in response.headers["Vary"]
+
+    table = pa.ipc.open_stream(response.get_data()).read_all()
+    assert table.num_rows == len(rows)
+    assert set(table.column_names) == set(rows[0])
+    for field in table.schema:
+        assert field.type == getattr(pa, column_types[field.name])(), field.name
+    assert [_iso_dates(row) for row in table.to_pylist()] == rows
+
+
+def test_arrow_schema_does_not_depend_on_the_rows(client):
+    """Test that an empty result keeps the declared column types"""
+    response = client.get(
+        "/api/analytics/time-series?start_date=2100-01-01", headers={"Accept": ARROW_MIMETYPE}
+    )
+    table = pa.ipc.open_stream(response.get_data()).read_all()
+    assert table.num_rows == 0
+    assert table.schema.types == [getattr(pa, name)() for name in TIME_SERIES_COLUMN_TYPES.values()]
+
+
+def test_arrow_pagination_metadata(client):
+    """Test that the continuation token travels as header and schema metadata"""
+    response = client.get("/api/sales?limit=10", headers={"Accept": ARROW_MIMETYPE})
+    token = response.headers["X-Next-Cursor"]
+    schema = pa.ipc.open_stream(response.get_data()).schema
+    assert schema.metadata[b"next_cursor"].decode() == token
+
+    following = client.get(f"/api/sales?limit=10&cursor={token}")
+    assert following.status_code == 200
+
+
+def test_negotiation_keeps_json_by_default(client):
+    """Test that browsers and explicit formats keep getting JSON"""
+    for headers in ({}, {"Accept": "*/*"}, {"Accept": f"application/json, {ARROW_MIMETYPE};q=0.5"}):
+        response = client.get("/api/analytics/time-series", headers=headers)
+        assert response.mimetype == "application/json"
+
+    response = client.get(
+        "/api/analytics/time-series?format=columnar", headers={"Accept": ARROW_MIMETYPE}
+    )
+    assert response.mimetype == "application/json"
+
+
+def test_cached_representations_are_separate(client):
+    """Test that JSON and Arrow responses are cached and tagged separately"""
+    url = "/api/sales/summary?group_by=department"
+    json_response = client.get(url)
+    arrow_response = client.get(url, headers={"Accept": ARROW_MIMETYPE})
+    assert arrow_response.mimetype == ARROW_MIMETYPE
+    assert json_response.headers["ETag"] != arrow_response.headers["ETag"]
+
+    cached = client.get(url, headers={"Accept": ARROW_MIMETYPE})
+    assert cached.headers["X-Cache"] == "HIT"
+    assert cached.mimetype == ARROW_MIMETYPE
+
+
+def test_msgpack_response(client):
+    """Test that MessagePack responses carry the JSON columns"""
+    url = "/api/sales?store_id=1&limit=5"
+    columnar = client.get(f"{url}&format=columnar").json
+
+    response = client.get(url, headers={"Accept": "application/msgpack"})
+    assert response.status_code == 200
+    assert response.mimetype == "application/msgpack"
+    payload = msgpack.unpackb(response.get_data())
+    assert payload["columns"] == columnar["columns"]
+    assert payload["data"] == columnar["data"]
+    assert payload["next_cursor"] == columnar["next_cursor"]
+
+
+def test_msgpack_refused_without_the_package(client, monkeypatch):
+    """Test the 406 answer when msgpack is not installed"""
+    monkeypatch.setattr(serialization, "msgpack", None)
+    response = client.get("/api/analytics/time-series", headers={"Accept": "application/msgpack"})
+    assert response.status_code == 406
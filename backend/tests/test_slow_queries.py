@@ -0,0 +1,97 @@
+import json
+
+from src.database import db
+from src.database.instrumentation import statement_listener
+from src.database.slow_queries import SlowQueryLog, get_slow_query_log, loggable_parameters
+from src.utils.cache import response_cache
+
+
+def _run(log, sql, parameters=()):
+    conn = db.get_db_connection()
+    try:
+        with statement_listener(log.record):
+            conn.execute(sql, parameters).fetchall()
+    finally:
+        conn.close()
+
+
+def test_slow_statement_is_logged_with_request_and_plan(app, tmp_path):
+    """Test that statements over the threshold are logged with their context"""
+    path = tmp_path / "slow.log"
+    log = SlowQueryLog(str(path), threshold_ms=0, sample_rate=0)
+    try:
+        with app.test_request_context("/api/sales?store_id=3"):
+            _run(log, "SELECT SUM(weekly_sales) FROM sales WHERE store_id = ?", (3,))
+    finally:
+        log.close()
+
+    entry = log.entries()[0]
+    assert entry["kind"] == "slow"
+    assert entry["parameters"] == [3]
+    assert entry["endpoint"] == "sales.get_sales_data"
+    assert entry["request"] == {"method": "GET", "path": "/api/sales", "args": {"store_id": "3"}}
+    assert any(step.startswith("SEARCH sales") for step in entry["plan"])
+    assert json.loads(path.read_text().splitlines()[0]) == entry
+    assert log.stats()["logged"] == {"slow": 1, "sampled": 0}
+
+
+def test_fast_statements_are_sampled(tmp_path):
+    """Test that statements under the threshold are only logged when sampled"""
+    never = SlowQueryLog(str(tmp_path / "never.log"), threshold_ms=60_000, sample_rate=0)
+    always = SlowQueryLog(str(tmp_path / "always.log"), threshold_ms=60_000, sample_rate=1.0)
+    try:
+        _run(never, "SELECT COUNT(*) FROM stores")
+        _run(always, "SELECT COUNT(*) FROM stores")
+    finally:
+        never.close()
+        always.close()
+
+    assert never.entries() == []
+    assert [entry["kind"] for entry in always.entries()] == ["sampled"]
+    assert always.entries()[0]["endpoint"] is None
+    assert always.entries(kind="slow") == []
+
+
+def test_log_file_rotates(tmp_path):
+    """Test that the log file is rotated and old files are capped"""
+    path = tmp_path / "slow.log"
+    log = SlowQueryLog(str(path), threshold_ms=0, sample_rate=0, max_bytes=1024, backups=2)
+    try:
+        for store_id in range(40):
+            _run(log, "SELECT * FROM stores WHERE store_id = ?", (store_id,))
+    finally:
+        log.close()
+
+    assert sorted(file.name for file in tmp_path.iterdir()) == ["slow.log", "slow.log.1", "slow.log.2"]
+
+
+def test_long_parameters_are_shortened():
+    """Test that parameters are kept small in the log"""
+    parameters = loggable_parameters(["x" * 500, b"\x00" * 10] + list(range(100)))
+    assert parameters[0] == "x" * 200 + "..."
+    assert parameters[1] == "<10 bytes>"
+    assert parameters[-1] == "... 52 more"
+    assert loggable_parameters({"store_id": 1}) == {"store_id": 1}
+    assert loggable_parameters(None) is None
+
+
+def test_admin_endpoint_lists_recent_entries(client, monkeypatch):
+    """Test the slow-query admin endpoint"""
+    monkeypatch.setattr(get_slow_query_log(), "threshold", 0)
+    response_cache.clear()
+    assert client.get("/api/sales?store_id=5&limit=3").status_code == 200
+
+    response = client.get("/admin/slow-queries?kind=slow&limit=1000")
+    assert response.status_code == 200
+    data = response.json["data"]
+    assert data["config"]["threshold_ms"] == 0
+    entries = [
+        entry
+        for entry in data["entries"]
+        if entry["endpoint"] == "sales.get_sales_data"
+        and entry["request"]["args"] == {"store_id": "5", "limit": "3"}
+    ]
+    assert entries and 5 in entries[0]["parameters"]
+    assert entries[0]["plan"]
+
+    assert client.get("/admin/slow-queries?kind=fast").status_code == 400
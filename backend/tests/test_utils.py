@@ -5,7 +5,9 @@ from werkzeug.exceptions import BadRequest
 
 from src.utils.error_handlers import (APIError, DatabaseError, NotFoundError,
                                       ValidationError)
-from src.utils.validation import (format_response, validate_date,
+from src.utils.pagination import decode_cursor, encode_cursor
+from src.utils.validation import (format_response, validate_bool,
+                                  validate_date, validate_format,
                                   validate_group_by, validate_id,
                                   validate_limit, validate_time_period,
                                   validate_year)
@@ -132,6 +134,40 @@ def test_validate_time_period():
         validate_time_period(None, allowed_values)
 
 
+def test_validate_format():
+    """Test format validation"""
+    assert validate_format("csv", ["csv", "parquet"]) == "csv"
+
+    with pytest.raises(BadRequest):
+        validate_format("xml", ["csv", "parquet"])
+
+
+def test_validate_bool():
+    """Test boolean flag validation"""
+    assert validate_bool("true") is True
+    assert validate_bool("0") is False
+    assert validate_bool(None) is None
+
+    with pytest.raises(BadRequest):
+        validate_bool("maybe")
+
+
+def test_cursor_round_trip():
+    """Test continuation token encoding and validation"""
+    token = encode_cursor("2024-01-05", 42)
+    assert decode_cursor(token, (str, int)) == ("2024-01-05", 42)
+    assert decode_cursor(None, (str, int)) is None
+
+    with pytest.raises(BadRequest):
+        decode_cursor("garbage!", (str, int))
+
+    with pytest.raises(BadRequest):
+        decode_cursor(encode_cursor("2024-01-05"), (str, int))
+
+    with pytest.raises(BadRequest):
+        decode_cursor(encode_cursor("2024-01-05", "42"), (str, int))
+
+
 def test_format_response():
     """Test response formatting"""
     # Test basic response
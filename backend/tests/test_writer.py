@@ -0,0 +1,157 @@
+import pytest
+
+from src.database import db
+from src.database.pool import ConnectionPool
+from src.database.writer import SalesWriter
+from src.utils.error_handlers import ValidationError
+from src.utils.validation import validate_sales_rows
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "writer.db")
+    pool = ConnectionPool(path)
+    conn = pool.acquire()
+    db.create_tables(conn)
+    conn.executemany("INSERT INTO stores VALUES (?, ?, 'North', 1000, 'A')", [(1, "Store 1"), (2, "Store 2")])
+    conn.execute("INSERT INTO departments VALUES (1, 'Grocery', 'Food')")
+    conn.commit()
+    conn.close()
+    pool.close()
+    return path
+
+
+@pytest.fixture
+def writer(db_path):
+    writer = SalesWriter(db_path, delay=0.05)
+    yield writer
+    writer.stop()
+
+
+def _rows(store_id, weeks, sales=100.0):
+    return [
+        {"store_id": store_id, "dept_id": 1, "date": f"2024-01-{day:02d}", "weekly_sales": sales}
+        for day in range(1, weeks + 1)
+    ]
+
+
+def _sales(db_path):
+    pool = ConnectionPool(db_path)
+    conn = pool.acquire()
+    rows = conn.execute(
+        "SELECT store_id, date, weekly_sales, is_holiday FROM sales ORDER BY store_id, date"
+    ).fetchall()
+    conn.close()
+    pool.close()
+    return [tuple(row) for row in rows]
+
+
+def test_validate_sales_rows_reports_every_problem():
+    """Test that invalid values are reported by row and field"""
+    with pytest.raises(ValidationError) as error:
+        validate_sales_rows(
+            [
+                {"store_id": 1, "dept_id": 1, "date": "2024-01-05", "weekly_sales": 10},
+                {"store_id": 0, "dept_id": 1, "date": "05/01/2024", "weekly_sales": "x"},
+                {"store_id": 1, "date": "2024-01-05", "weekly_sales": 1, "is_holiday": "maybe"},
+            ]
+        )
+
+    problems = {(e["row"], e["field"]) for e in error.value.payload["errors"]}
+    assert problems == {
+        (1, "store_id"),
+        (1, "date"),
+        (1, "weekly_sales"),
+        (2, "dept_id"),
+        (2, "is_holiday"),
+    }
+
+
+def test_writer_upserts_on_store_department_date(writer, db_path):
+    """Test that a second batch updates changed rows and skips unchanged ones"""
+    first = writer.write(validate_sales_rows(_rows(1, 3)))
+    assert first == {"received": 3, "inserted": 3, "updated": 0, "unchanged": 0}
+
+    rows = _rows(1, 4)
+    rows[0]["weekly_sales"] = 250.0
+    rows[1]["is_holiday"] = True
+    second = writer.write(validate_sales_rows(rows))
+    assert second == {"received": 4, "inserted": 1, "updated": 2, "unchanged": 1}
+
+    assert _sales(db_path) == [
+        (1, "2024-01-01", 250.0, 0),
+        (1, "2024-01-02", 100.0, 1),
+        (1, "2024-01-03", 100.0, 0),
+        (1, "2024-01-04", 100.0, 0),
+    ]
+
+
+def test_writer_group_commits_concurrent_batches(writer, db_path):
+    """Test that batches queued together share one transaction"""
+    frames = [validate_sales_rows(_rows(store_id, 5)) for store_id in (1, 2)]
+    futures = [writer.submit(frame) for frame in frames]
+    results = [future.result(5) for future in futures]
+
+    assert [result["inserted"] for result in results] == [5, 5]
+    assert writer.stats()["transactions"] == 1
+    assert writer.stats()["batches"] == 2
+    assert len(_sales(db_path)) == 10
+
+
+def test_writer_isolates_failing_batch(writer, db_path):
+    """Test that a failing batch does not roll back the rest of its group"""
+    bad = validate_sales_rows(_rows(1, 2)).drop(columns=["cpi"])
+    good = validate_sales_rows(_rows(2, 2))
+    futures = [writer.submit(bad), writer.submit(good)]
+
+    with pytest.raises(KeyError):
+        futures[0].result(5)
+    assert futures[1].result(5)["inserted"] == 2
+    assert [row[0] for row in _sales(db_path)] == [2, 2]
+
+
+def test_post_sales_batch(client):
+    """Test the batch ingestion endpoint end to end"""
+    rows = [
+        {"store_id": 1, "dept_id": 1, "date": "2030-01-04", "weekly_sales": 1000.0},
+        {"store_id": 2, "dept_id": 1, "date": "2030-01-04", "weekly_sales": 2000.0},
+    ]
+    try:
+        response = client.post("/api/sales/batch", json={"rows": rows})
+        assert response.status_code == 200
+        assert response.json["data"]["inserted"] == 2
+
+        rows[0]["weekly_sales"] = 1500.0
+        response = client.post("/api/sales/batch", json=rows)
+        assert response.json["data"] == {
+            "received": 2,
+            "inserted": 0,
+            "updated": 1,
+            "unchanged": 1,
+        }
+
+        response = client.get("/api/sales", query_string={"start_date": "2030-01-01"})
+        assert sorted(row["weekly_sales"] for row in response.json["data"]) == [1500.0, 2000.0]
+    finally:
+        conn = db.get_db_connection()
+        conn.execute("DELETE FROM sales WHERE date = '2030-01-04'")
+        conn.commit()
+        conn.close()
+
+
+def test_post_sales_batch_rejects_invalid_rows(client):
+    """Test that invalid or unknown references reject the whole batch"""
+    response = client.post(
+        "/api/sales/batch",
+        json=[
+            {"store_id": 1, "dept_id": 1, "date": "2030-01-04", "weekly_sales": 1.0},
+            {"store_id": 999, "dept_id": 1, "date": "2030-01-04", "weekly_sales": 1.0},
+        ],
+    )
+    assert response.status_code == 400
+    assert response.json["errors"] == [
+        {"row": 1, "field": "store_id", "message": "Unknown store_id"}
+    ]
+
+    assert client.post("/api/sales/batch", json={"rows": []}).status_code == 400
+    assert client.post("/api/sales/batch", data="not json").status_code == 400
@@ -20,6 +20,8 @@ const reportsApi = new ReportsApi();
 const state = {
   theme: localStorage.getItem('theme') || 'light',
   currentView: null,
+  // Whether the KPI room answered the current connection's subscribe
+  kpiSnapshotReceived: false,
   filters: {
     period: '30d',
     store: 'all',
@@ -47,6 +49,7 @@ async function initializeDashboard() {
     setupNavigation();
     
     // Initialize WebSocket connection
+    registerRealtimeHandlers();
     await initializeWebSocket();
     
     // Load initial data
@@ -72,27 +75,47 @@ async function initializeDashboard() {
   }
 }
 
+// Register the real-time handlers once; they survive reconnections and the
+// settings toggle, which replace the socket
+function registerRealtimeHandlers() {
+  realtimeUpdates.on('sales_update', (data) => {
+    updateSalesMetrics(data);
+  });
+
+  // KPI push: a snapshot on subscribe, then only the values that changed
+  realtimeUpdates.on('kpi_snapshot', ({ kpis }) => {
+    state.kpis = { ...kpis };
+    state.kpiSnapshotReceived = true;
+    updateDataSummary(state.kpis);
+  });
+  realtimeUpdates.on('kpi_update', ({ kpis }) => {
+    state.kpis = { ...state.kpis, ...kpis };
+    updateDataSummary(state.kpis);
+  });
+
+  realtimeUpdates.on('inventory_update', (data) => {
+    updateInventoryMetrics(data);
+  });
+
+  // Every connection starts outside the room: join it again, and keep
+  // polling until its snapshot arrives
+  realtimeUpdates.onConnect(() => {
+    state.kpiSnapshotReceived = false;
+    realtimeUpdates.emit('subscribe', { scope: 'dashboard' });
+  });
+
+  // Clean up WebSocket connection when the window is closed
+  window.addEventListener('beforeunload', () => {
+    realtimeUpdates.disconnect();
+  });
+}
+
 // Initialize WebSocket connection with retry logic
 async function initializeWebSocket(retries = 3, delay = 1000) {
   try {
     await realtimeUpdates.connect();
     console.log('WebSocket connected successfully');
     showToast('Real-time updates connected', 'success'); // Show success toast
-    
-    // Set up event listeners for real-time updates
-    realtimeUpdates.on('sales_update', (data) => {
-      updateSalesMetrics(data);
-    });
-    
-    realtimeUpdates.on('inventory_update', (data) => {
-      updateInventoryMetrics(data);
-    });
-    
-    // Clean up WebSocket connection when the window is closed
-    window.addEventListener('beforeunload', () => {
-      realtimeUpdates.disconnect();
-    });
-    
   } catch (error) {
     console.error(`WebSocket connection failed: ${error.message}. Retries left: ${retries}`);
     if (retries > 0) {
@@ -144,8 +167,9 @@ function setupEventListeners() {
 
 // Start periodic updates
 function startPeriodicUpdates() {
-  // Update analytics every 5 minutes
+  // Update analytics every 5 minutes, unless KPI updates are being pushed
   setInterval(async () => {
+    if (realtimeUpdates.socket?.connected && state.kpiSnapshotReceived) return;
     try {
       await updateAnalytics();
     } catch (error) {
@@ -570,8 +594,12 @@ function loadSettings() {
       
       if (!enableRealtime) {
         realtimeUpdates.disconnect();
+        state.kpiSnapshotReceived = false;
       } else {
-        realtimeUpdates.connect();
+        // The registered handlers and the room subscription follow the new socket
+        realtimeUpdates.connect().catch((error) => {
+          console.error('Error reconnecting real-time updates:', error);
+        });
       }
       
       showToast('Display settings applied successfully', 'success');
@@ -767,9 +795,9 @@ async function loadReports(mainContent) {
                             ${report?.isNew ? '<span class="badge bg-success ms-2">New</span>' : ''}
                           </td>
                           <td><span class="badge bg-light text-dark">${report?.type || 'N/A'}</span></td>
-                          <td>${report?.lastGenerated || 'N/A'}</td>
+                          <td>${report?.finished_at || report?.lastGenerated || 'N/A'}</td>
                           <td>
-                            <span class="badge ${report?.status === 'completed' ? 'bg-success' : report?.status === 'pending' ? 'bg-warning' : 'bg-danger'}">
+                            <span class="badge ${report?.status === 'completed' ? 'bg-success' : ['pending', 'queued', 'running'].includes(report?.status) ? 'bg-warning' : 'bg-danger'}">
                               ${report?.status || 'unknown'}
                             </span>
                           </td>
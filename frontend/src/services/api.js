@@ -139,6 +139,35 @@ export const analyticsApi = {
         throw new Error('Failed to fetch inventory data');
       });
   },
+  // Server-side forecasts for every store x department series
+  getForecast: (filters = {}) => {
+    const params = new URLSearchParams();
+    if (filters.model) params.append('model', filters.model);
+    if (filters.horizon) params.append('horizon', filters.horizon);
+    if (filters.storeId && filters.storeId !== '') params.append('store_id', filters.storeId);
+    if (filters.deptId && filters.deptId !== '') params.append('dept_id', filters.deptId);
+    const queryString = params.toString();
+    return apiCall(`/analytics/forecast${queryString ? `?${queryString}` : ''}`);
+  },
+  // Seasonality/trend/periodicity report for every series of a grouping
+  getSeasonality: (groupBy = 'series', options = {}) => {
+    const params = new URLSearchParams({ group_by: groupBy });
+    if (options.limit) params.append('limit', options.limit);
+    if (options.indices) params.append('indices', 'true');
+    return apiCall(`/analytics/seasonality?${params.toString()}`);
+  },
+  getAnomalies: (method = 'zscore', options = {}) => {
+    const params = new URLSearchParams({ method });
+    if (options.storeId) params.append('store_id', options.storeId);
+    if (options.deptId) params.append('dept_id', options.deptId);
+    if (options.limit) params.append('limit', options.limit);
+    return apiCall(`/analytics/anomalies?${params.toString()}`);
+  },
+  // Scan new data for anomalies now rather than in the background
+  scanAnomalies: (method) => {
+    const query = method ? `?method=${encodeURIComponent(method)}` : '';
+    return apiCall(`/analytics/anomalies/scan${query}`, { method: 'POST' });
+  },
   // ... (other methods)
 };
 
@@ -170,14 +199,34 @@ export class ReportsApi {
     return response.json();
   }
 
+  // Create a recurring report ({type, format, filters, cron, period})
+  async createScheduledReport(scheduleData) {
+    return apiCall('/reports/scheduled', {
+      method: 'POST',
+      body: JSON.stringify(scheduleData)
+    });
+  }
+
+  // Delete a recurring report
+  async deleteScheduledReport(scheduleId) {
+    return apiCall(`/reports/scheduled/${scheduleId}`, { method: 'DELETE' });
+  }
+
   // Delete report
   async deleteReport(reportId) {
     return apiCall(`/reports/${reportId}`, { method: 'DELETE' });
   }
 
-  // Download report
+  // Get status and progress of a report
+  async getReport(reportId) {
+    return apiCall(`/reports/${reportId}`);
+  }
+
+  // Download report file (CSV, XLSX or Parquet)
   async downloadReport(reportId) {
-    return apiCall(`/reports/${reportId}/download`);
+    const response = await fetch(`${this.baseUrl}/reports/${reportId}/download`);
+    if (!response.ok) throw new Error('Report is not ready for download');
+    return response.blob();
   }
 }
 
@@ -189,6 +238,8 @@ export class RealtimeUpdates {
         this.maxReconnectAttempts = 5;
         this.reconnectDelay = 1000;
         this.eventHandlers = new Map();
+        // Run on every (re)connection: rooms must be joined again each time
+        this.connectHandlers = [];
         this.isConnecting = false;
     }
 
@@ -223,6 +274,12 @@ export class RealtimeUpdates {
                 autoConnect: false,
                 withCredentials: true
             });
+            // Handlers are attached before connecting, so nothing sent right
+            // after the connect handlers run is missed
+            this.setupEventListeners();
+            this.socket.on('connect', () => {
+                this.connectHandlers.forEach((handler) => handler());
+            });
 
             await new Promise((resolve, reject) => {
                 const timeout = setTimeout(() => {
@@ -244,8 +301,6 @@ export class RealtimeUpdates {
 
                 this.socket.connect();
             });
-
-            this.setupEventListeners();
         } catch (error) {
             console.error('Socket connection failed:', error);
             this.reconnectAttempts++;
@@ -255,13 +310,13 @@ export class RealtimeUpdates {
         }
     }
 
+    // Handlers stay registered, so a later connect() restores them
     disconnect() {
         if (this.socket) {
             this.socket.removeAllListeners();
             this.socket.close();
             this.socket = null;
         }
-        this.eventHandlers.clear();
     }
 
     setupEventListeners() {
@@ -281,16 +336,24 @@ export class RealtimeUpdates {
         });
     }
 
+    // Handlers registered before connect() are attached once connected
     on(event, handler) {
-        if (!this.socket) return;
+        const previous = this.eventHandlers.get(event);
         this.eventHandlers.set(event, handler);
+        if (!this.socket) return;
+        if (previous) this.socket.off(event, previous);
         this.socket.on(event, handler);
     }
 
     off(event) {
-        if (!this.socket) return;
+        const handler = this.eventHandlers.get(event);
         this.eventHandlers.delete(event);
-        this.socket.off(event);
+        if (this.socket && handler) this.socket.off(event, handler);
+    }
+
+    onConnect(handler) {
+        this.connectHandlers.push(handler);
+        if (this.socket?.connected) handler();
     }
 
     emit(event, data) {